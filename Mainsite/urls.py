@@ -96,14 +96,19 @@ urlpatterns = [
     path('load_project_paper/', views.load_project_paper, name='load_project_paper'),  # 加载项目paper.json文件API
     path('load_parameter_config/', views.load_parameter_config, name='load_parameter_config'),  # 加载项目parameter.ini文件API
     path('generate_image/', views.generate_image, name='generate_image'),  # 生成图像API
+    path('generate_images_batch/', views.generate_images_batch, name='generate_images_batch'),  # 批量生成图像API（NDJSON流式返回）
+    path('comfyui_pool_status/', views.get_comfyui_pool_status, name='comfyui_pool_status'),  # ComfyUI服务器池状态API
     path('api/save_theme/', views.save_theme, name='save_theme'),  # 保存主题API
     path('upload_image/', views.upload_image, name='upload_image'),  # 上传图像API
     path('clear_all_images/', views.clear_all_images, name='clear_all_images'),  # 清除所有图片API
     
     # 音频生成相关API路由
     path('generate_audio/', views.generate_audio, name='generate_audio'),  # 生成音频API
+    path('generate_audios_batch/', views.generate_audios_batch, name='generate_audios_batch'),  # 批量生成音频API（NDJSON流式返回）
     path('clear_all_audios/', views.clear_all_audios, name='clear_all_audios'),  # 清除所有音频API
     path('list_project_audios/', views.list_project_audios, name='list_project_audios'),  # 列出项目音频文件API
+    path('get_audio_durations/', views.get_audio_durations, name='get_audio_durations'),  # 批量获取项目音频时长API
+    path('process_project_audios/', views.process_project_audios, name='process_project_audios'),  # 批量处理项目旁白（去静音+时长）API
     path('delete_audio_file/', views.delete_audio_file, name='delete_audio_file'),  # 删除音频文件API
     path('convert_ini_to_paper_json/', views.convert_ini_to_paper_json, name='convert_ini_to_paper_json'),  # 转换parameter.ini到paper.json API
     path('load_audio_pause_settings/', views.load_audio_pause_settings, name='load_audio_pause_settings'),  # 加载音频停顿设置API
@@ -113,6 +118,13 @@ urlpatterns = [
     path('save_video_settings/', views.save_video_settings, name='save_video_settings'),  # 保存视频设置API
     path('load_video_fade_settings/', views.load_video_fade_settings, name='load_video_fade_settings'),  # 加载淡入淡出设置API
     path('generate_video/', views.generate_video, name='generate_video'),  # 生成视频API
+    path('get_segment_cache_stats/', views.get_segment_cache_stats, name='get_segment_cache_stats'),  # 获取视频片段缓存统计API
+    path('get_generation_cache_stats/', views.get_generation_cache_stats, name='get_generation_cache_stats'),  # 获取ComfyUI生成结果缓存统计API
+    path('get_narration_cache_stats/', views.get_narration_cache_stats, name='get_narration_cache_stats'),  # 获取旁白缓存统计API
+    path('video_maker/submit/', views.submit_video_job, name='submit_video_job'),  # 提交后台视频渲染任务API
+    path('video_maker/preview/', views.submit_preview_job, name='submit_preview_job'),  # 提交低分辨率预览渲染任务API
+    path('video_maker/progress/<str:task_id>/', views.get_video_job_progress, name='get_video_job_progress'),  # 查询视频渲染任务进度API
+    path('video_maker/cancel/<str:task_id>/', views.cancel_video_job, name='cancel_video_job'),  # 取消视频渲染任务API
     
     # 自动生成视频相关API路由
     path('save_continuous_generation_settings/', views.save_continuous_generation_settings, name='save_continuous_generation_settings'),  # 保存连续生成设置API
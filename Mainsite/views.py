@@ -3,7 +3,7 @@
 # 视图函数是连接URL和模板的桥梁，就像餐厅的服务员，接收客人的点餐需求并提供相应的服务
 
 from django.shortcuts import render  # 导入render函数，用于渲染模板
-from django.http import HttpResponse, JsonResponse  # 导入HttpResponse和JsonResponse类，用于返回HTTP响应
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse  # 导入HttpResponse、JsonResponse和StreamingHttpResponse类，用于返回HTTP响应
 from django.views.decorators.csrf import csrf_exempt  # 导入csrf_exempt装饰器，用于免除CSRF验证
 from django.views.decorators.http import require_http_methods  # 导入require_http_methods装饰器，用于限制HTTP方法
 from django.conf import settings  # 导入Django设置
@@ -964,6 +964,7 @@ def generate_image(request):
         steps = data.get('steps', 20)
         cfg = data.get('cfg', 8.0)
         seed = data.get('seed')
+        force_new = bool(data.get('force_new', False))  # 重新生成时跳过生成结果缓存
         
         if script_id is None:
             return JsonResponse({
@@ -1000,16 +1001,16 @@ def generate_image(request):
             if common_path not in sys.path:
                 sys.path.append(common_path)
             
-            from comfyui_client import ComfyUIClient
+            from comfyui_pool import get_comfyui_pool
             
-            # 创建ComfyUI客户端
-            client = ComfyUIClient(server_address)
+            # 获取ComfyUI服务器池（未配置多台服务器时只包含comfyui_address一台）
+            client = get_comfyui_pool(server_address)
             
             # 测试连接
             if not client.test_connection():
                 return JsonResponse({
                     'success': False,
-                    'error': f'无法连接到ComfyUI服务器: {comfyui_address}'
+                    'error': f'无法连接到ComfyUI服务器: {client.server_address}'
                 })
             
             # 创建项目图像目录
@@ -1021,7 +1022,8 @@ def generate_image(request):
             saved_files = client.generate_image(
                 project_path=project_path,
                 sentence_id=script_id,
-                seed=seed
+                seed=seed,
+                force_new=force_new
             )
             
             if saved_files:
@@ -1088,6 +1090,7 @@ def generate_audio(request):
         data = json.loads(request.body)
         script_id = data.get('script_id')
         project_path = data.get('project_path', '').strip()
+        force_new = bool(data.get('force_new', False))  # 重新生成时跳过生成结果缓存
         
         if script_id is None:
             return JsonResponse({
@@ -1124,17 +1127,35 @@ def generate_audio(request):
             if common_path not in sys.path:
                 sys.path.append(common_path)
             
-            from comfyui_client import ComfyUIClient
+            from comfyui_pool import get_comfyui_pool
             from audio_processor import AudioProcessor
             
-            # 创建ComfyUI客户端
-            client = ComfyUIClient(server_address)
+            # 获取ComfyUI服务器池（未配置多台服务器时只包含comfyui_address一台）
+            client = get_comfyui_pool(server_address)
+            project_name = os.path.basename(project_path)
+            
+            # 相同文本、音频工作流和参考音频的旁白已生成过时，直接使用缓存中裁剪好的音频和时长
+            audio_processor = AudioProcessor()
+            narration = client.lookup_narration_cache(
+                project_path, [script_id], audio_processor.load_trim_settings(project_path), force_new
+            )[script_id]
+            if narration['files']:
+                duration = narration['duration']
+                audio_processor.update_parameter_ini(project_path, script_id, duration)
+                logger.info(f'旁白缓存命中: script_id={script_id}, 时长={duration:.2f}秒')
+                return JsonResponse({
+                    'success': True,
+                    'audio_url': f'/media/{project_name}/audios/{os.path.basename(narration["files"][0])}',
+                    'duration': duration,
+                    'cached': True,
+                    'message': f'音频生成成功 (script_id: {script_id}，使用旁白缓存)'
+                })
             
             # 测试连接
             if not client.test_connection():
                 return JsonResponse({
                     'success': False,
-                    'error': f'无法连接到ComfyUI服务器: {comfyui_address}'
+                    'error': f'无法连接到ComfyUI服务器: {client.server_address}'
                 })
             
             # 创建项目音频目录
@@ -1145,7 +1166,8 @@ def generate_audio(request):
             # 生成音频
             saved_files = client.generate_audio(
                 project_path=project_path,
-                sentence_id=script_id
+                sentence_id=script_id,
+                force_new=force_new
             )
             
             if saved_files:
@@ -1158,19 +1180,23 @@ def generate_audio(request):
                     
                     # 音频后处理：去除静音 + 更新parameter.ini
                     try:
-                        audio_processor = AudioProcessor()
                         processed_path, duration = audio_processor.process_audio_after_generation(
                             audio_path, project_path, script_id
                         )
                         
                         logger.info(f'音频处理完成: script_id={script_id}, 原始文件={audio_path}, 处理后时长={duration:.2f}秒')
                         
+                        # 裁剪后的音频和时长写入旁白缓存，其他项目的相同句子直接复用
+                        client.store_narration_cache(narration['key'], processed_path, duration)
+                        
                     except ImportError:
                         logger.warning('音频处理库未安装，跳过静音去除，仅计算时长')
-                        # 如果音频处理库未安装，尝试使用基本方法计算时长
+                        # 如果音频处理库未安装，只读取文件头获取时长（ffprobe）
                         try:
-                            import librosa
-                            duration = librosa.get_duration(filename=audio_path)
+                            from audio_duration import get_audio_duration
+                            duration = get_audio_duration(audio_path)
+                            if duration is None:
+                                raise ValueError(f'无法读取音频时长: {audio_path}')
                             
                             # 手动更新parameter.ini文件
                             parameter_file = os.path.join(project_path, 'parameter.ini')
@@ -1191,9 +1217,6 @@ def generate_audio(request):
                             
                             logger.info(f'音频时长已写入parameter.ini: script_{script_id}_duration={duration:.2f}秒')
                             
-                        except ImportError:
-                            logger.warning('librosa库未安装，无法计算音频时长')
-                            duration = 0.0
                         except Exception as e:
                             logger.error(f'计算音频时长失败: {e}')
                             duration = 0.0
@@ -1202,13 +1225,12 @@ def generate_audio(request):
                         logger.error(f'音频后处理失败: {e}')
                         # 如果处理失败，至少尝试计算时长
                         try:
-                            import librosa
-                            duration = librosa.get_duration(filename=audio_path)
-                        except:
+                            from audio_duration import get_audio_duration
+                            duration = get_audio_duration(audio_path) or 0.0
+                        except Exception:
                             duration = 0.0
                     
                     # 生成媒体URL路径
-                    project_name = os.path.basename(project_path)
                     audio_url = f'/media/{project_name}/audios/{audio_filename}'
                     
                     logger.info(f'音频生成成功: script_id={script_id}, 文件路径={audio_path}')
@@ -1255,6 +1277,321 @@ def generate_audio(request):
             'error': f'生成音频时发生错误: {str(e)}'
         })
 
+def _load_comfyui_server_address():
+    """
+    从系统配置中读取ComfyUI地址
+    
+    返回:
+        tuple: (配置中的完整地址, ComfyUIClient需要的host:port格式地址)
+    """
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    config = configparser.ConfigParser(interpolation=None)
+    config.read(os.path.join(project_root, 'config.ini'), encoding='utf-8')
+    
+    comfyui_address = 'http://192.168.1.85:8188/'  # 默认地址
+    if config.has_section('COMFYUI_CONFIG'):
+        comfyui_address = config.get('COMFYUI_CONFIG', 'comfyui_address', fallback='http://192.168.1.85:8188/')
+    
+    # 移除协议前缀，因为ComfyUIClient需要的是host:port格式
+    server_address = comfyui_address.replace('http://', '').replace('https://', '').rstrip('/')
+    return comfyui_address, server_address
+
+def _parse_batch_generation_request(request):
+    """
+    解析批量生成请求的project_path和script_ids
+    
+    参数:
+        request: Django的HttpRequest对象
+    
+    返回:
+        tuple: (project_path, script_ids, 请求数据)，参数无效时抛出ValueError
+    """
+    data = json.loads(request.body) if request.body else {}
+    project_path = (data.get('project_path') or '').strip() or get_current_project_path()
+    if not project_path:
+        raise ValueError('缺少project_path参数')
+    
+    script_ids = data.get('script_ids')
+    if not script_ids:
+        raise ValueError('缺少script_ids参数')
+    script_ids = list(dict.fromkeys(int(script_id) for script_id in script_ids))
+    return project_path, script_ids, data
+
+def _ndjson_line(payload):
+    """将一条结果编码为NDJSON行"""
+    return json.dumps(payload, ensure_ascii=False) + '\n'
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def generate_images_batch(request):
+    """
+    批量生成多个句子的图像，以NDJSON流逐行返回每个句子的完成结果
+    
+    ComfyUI地址、paper.json和工作流文件只加载一次，所有句子的prompt一次提交到ComfyUI队列，
+    通过同一条WebSocket等待完成，页面不再需要逐个请求和等待。
+    
+    参数:
+        request: Django的HttpRequest对象，包含script_ids列表、project_path（默认当前项目）、
+                 可选的seed、max_in_flight（同时排队的最大prompt数，0表示不限制）和force_new（跳过生成结果缓存）
+    
+    返回:
+        StreamingHttpResponse: 每行一个JSON对象，type为result（单个句子结果）、error（整体失败）或done（汇总）
+    """
+    try:
+        project_path, script_ids, data = _parse_batch_generation_request(request)
+    except (ValueError, TypeError) as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+    
+    comfyui_address, server_address = _load_comfyui_server_address()
+    project_name = os.path.basename(project_path)
+    logger.info(f'开始批量生成图像: {len(script_ids)} 个句子, project_path={project_path}, ComfyUI地址={server_address}')
+    
+    def stream():
+        import sys
+        import time
+        sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+        
+        started = time.perf_counter()
+        success_count = 0
+        fail_count = 0
+        try:
+            from comfyui_pool import get_comfyui_pool
+            
+            # 按各服务器排队数分配句子，每台服务器一条WebSocket并发生成
+            pool = get_comfyui_pool(server_address)
+            for result in pool.iter_generate_batch('image', project_path, script_ids, seed=data.get('seed'),
+                                                   max_in_flight=int(data.get('max_in_flight', 0)),
+                                                   force_new=bool(data.get('force_new', False))):
+                script_id = result['sentence_id']
+                if result['files']:
+                    success_count += 1
+                    yield _ndjson_line({
+                        'type': 'result',
+                        'script_id': script_id,
+                        'success': True,
+                        'image_url': f'/media/{project_name}/images/script_{script_id}.png'
+                    })
+                else:
+                    fail_count += 1
+                    yield _ndjson_line({
+                        'type': 'result',
+                        'script_id': script_id,
+                        'success': False,
+                        'error': result['error'] or '图像生成失败，未返回任何图像文件'
+                    })
+        except Exception as e:
+            logger.error(f'批量生成图像失败: {str(e)}')
+            yield _ndjson_line({
+                'type': 'error',
+                'error': f'批量生成图像失败 ({comfyui_address}): {str(e)}'
+            })
+        
+        elapsed = round(time.perf_counter() - started, 2)
+        logger.info(f'批量生成图像完成: 成功 {success_count} 个, 失败 {fail_count} 个, 耗时 {elapsed}秒')
+        yield _ndjson_line({
+            'type': 'done',
+            'success_count': success_count,
+            'fail_count': fail_count,
+            'elapsed': elapsed
+        })
+    
+    response = StreamingHttpResponse(stream(), content_type='application/x-ndjson; charset=utf-8')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # 禁止反向代理缓冲，保证逐行推送
+    return response
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def generate_audios_batch(request):
+    """
+    批量生成多个句子的音频，以NDJSON流逐行返回每个句子的完成结果
+    
+    每个音频完成后立即去除静音并测量时长，停顿和静音阈值只读取一次，所有时长在结束时一次写入parameter.ini。
+    页面中途断开时已提交的prompt仍会完成并保存音频，其余句子转到后台线程继续去除静音、写入旁白缓存，
+    全部完成后再一次写入parameter.ini。
+    旁白缓存命中的句子（其他项目生成过相同文本）不再提交到ComfyUI，也不再去除静音。
+    
+    参数:
+        request: Django的HttpRequest对象，包含script_ids列表、project_path（默认当前项目）
+                 、可选的max_in_flight和force_new
+    
+    返回:
+        StreamingHttpResponse: 每行一个JSON对象，type为result（单个句子结果）、error（整体失败）或done（汇总）
+    """
+    try:
+        project_path, script_ids, data = _parse_batch_generation_request(request)
+    except (ValueError, TypeError) as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+    
+    comfyui_address, server_address = _load_comfyui_server_address()
+    project_name = os.path.basename(project_path)
+    logger.info(f'开始批量生成音频: {len(script_ids)} 个句子, project_path={project_path}, ComfyUI地址={server_address}')
+    
+    def stream():
+        import sys
+        import time
+        import threading
+        sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+        
+        started = time.perf_counter()
+        success_count = 0
+        fail_count = 0
+        durations = {}
+        audio_processor = None
+        generating = False
+        handed_off = False
+        try:
+            from comfyui_pool import get_comfyui_pool
+            from audio_processor import AudioProcessor, AUDIO_LIBS_AVAILABLE
+            from audio_duration import get_audio_duration
+            
+            audio_processor = AudioProcessor()
+            pre_pause, post_pause, top_db = audio_processor.load_trim_settings(project_path)
+            
+            def process(result):
+                """去除静音并测量时长（失败时只读取文件头获取时长），写入旁白缓存，返回该句子的结果行"""
+                script_id = result['sentence_id']
+                audio_files = [f for f in result['files'] if not f.endswith('.json')]
+                if not audio_files:
+                    return {
+                        'type': 'result',
+                        'script_id': script_id,
+                        'success': False,
+                        'error': result['error'] or '音频生成失败，未返回任何音频文件'
+                    }
+                
+                audio_path = audio_files[0]
+                duration = None
+                if AUDIO_LIBS_AVAILABLE:
+                    try:
+                        _, duration = audio_processor.trim_silence(
+                            audio_path, pre_pause=pre_pause, post_pause=post_pause, top_db=top_db
+                        )
+                        pool.store_narration_cache(narrations[script_id]['key'], audio_path, duration)
+                    except Exception as e:
+                        logger.error(f'音频后处理失败: script_id={script_id}, {e}')
+                if duration is None:
+                    duration = get_audio_duration(audio_path)
+                if duration is not None:
+                    durations[script_id] = duration
+                return {
+                    'type': 'result',
+                    'script_id': script_id,
+                    'success': True,
+                    'audio_url': f'/media/{project_name}/audios/{os.path.basename(audio_path)}',
+                    'duration': duration or 0.0
+                }
+            
+            def finish_in_background(remaining):
+                """页面断开后继续处理其余句子，全部完成后一次写入parameter.ini"""
+                try:
+                    for result in remaining:
+                        process(result)
+                except Exception as e:
+                    logger.error(f'页面断开后处理剩余音频失败: {str(e)}')
+                finally:
+                    if durations:
+                        audio_processor.update_parameter_ini_batch(project_path, durations)
+                    logger.info(f'页面断开后剩余音频处理完成，共写入 {len(durations)} 个时长')
+            
+            pool = get_comfyui_pool(server_address)
+            
+            # 旁白缓存命中的句子直接使用裁剪好的音频和时长，只把未命中的句子提交到ComfyUI
+            narrations = pool.lookup_narration_cache(project_path, script_ids, (pre_pause, post_pause, top_db),
+                                                     bool(data.get('force_new', False)))
+            pending_ids = []
+            for script_id in script_ids:
+                narration = narrations[script_id]
+                if not narration['files']:
+                    pending_ids.append(script_id)
+                    continue
+                durations[script_id] = narration['duration']
+                success_count += 1
+                yield _ndjson_line({
+                    'type': 'result',
+                    'script_id': script_id,
+                    'success': True,
+                    'audio_url': f'/media/{project_name}/audios/{os.path.basename(narration["files"][0])}',
+                    'duration': narration['duration'],
+                    'cached': True
+                })
+            
+            results = pool.iter_generate_batch('audio', project_path, pending_ids,
+                                               max_in_flight=int(data.get('max_in_flight', 0)),
+                                               force_new=bool(data.get('force_new', False))) if pending_ids else []
+            generating = bool(pending_ids)
+            for result in results:
+                line = process(result)
+                if line['success']:
+                    success_count += 1
+                else:
+                    fail_count += 1
+                yield _ndjson_line(line)
+        except GeneratorExit:
+            # 页面中途断开：已提交的prompt仍会完成并保存音频，在后台线程中继续处理，不占用当前请求
+            if generating:
+                threading.Thread(target=finish_in_background, args=(results,),
+                                 name='audio-batch-finish', daemon=True).start()
+                handed_off = True
+                logger.info('页面已断开，剩余音频转到后台继续处理')
+            raise
+        except Exception as e:
+            logger.error(f'批量生成音频失败: {str(e)}')
+            yield _ndjson_line({
+                'type': 'error',
+                'error': f'批量生成音频失败 ({comfyui_address}): {str(e)}'
+            })
+        finally:
+            # 所有时长一次写入parameter.ini（转到后台时由后台线程在全部完成后写入）
+            if durations and audio_processor is not None and not handed_off:
+                audio_processor.update_parameter_ini_batch(project_path, durations)
+        
+        elapsed = round(time.perf_counter() - started, 2)
+        logger.info(f'批量生成音频完成: 成功 {success_count} 个, 失败 {fail_count} 个, 耗时 {elapsed}秒')
+        yield _ndjson_line({
+            'type': 'done',
+            'success_count': success_count,
+            'fail_count': fail_count,
+            'elapsed': elapsed
+        })
+    
+    response = StreamingHttpResponse(stream(), content_type='application/x-ndjson; charset=utf-8')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # 禁止反向代理缓冲，保证逐行推送
+    return response
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def get_comfyui_pool_status(request):
+    """
+    获取ComfyUI服务器池中各服务器的状态
+    
+    参数:
+        request: Django的HttpRequest对象，可选参数refresh（为true时立即做一次健康检查）
+    
+    返回:
+        JsonResponse: 每台服务器的地址、图像/音频权重、健康状态、排队数和任务计数
+    """
+    try:
+        import sys
+        sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+        from comfyui_pool import get_comfyui_pool
+        
+        pool = get_comfyui_pool(_load_comfyui_server_address()[1])
+        if request.GET.get('refresh', '').lower() in ('1', 'true', 'yes'):
+            pool.check_health()
+        return JsonResponse({
+            'success': True,
+            'servers': pool.get_status()
+        })
+    
+    except Exception as e:
+        logger.error(f'获取ComfyUI服务器池状态时发生错误: {str(e)}')
+        return JsonResponse({
+            'success': False,
+            'error': f'获取ComfyUI服务器池状态时发生错误: {str(e)}'
+        })
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def clear_all_audios(request):
@@ -5653,11 +5990,269 @@ def format_text_from_ini(request):
             'error': f'格式化文案时发生错误: {str(e)}'
         })
 
+def _collect_segment_jobs(project_path, config, sentence_count):
+    """
+    收集项目中每个视频片段的渲染任务（音频时长和对应图片）
+    
+    参数:
+        project_path: 项目路径
+        config: 已读取parameter.ini的ConfigParser对象
+        sentence_count: 片段数量
+        
+    返回:
+        list: 片段任务列表，每个元素为 (片段索引, 音频时长, 图片路径)
+    """
+    # AUDIO_INFO缺少时长时，从音频文件头补全（不解码音频）
+    missing_durations = [
+        segment_index for segment_index in range(1, sentence_count + 1)
+        if not config.has_option('AUDIO_INFO', f'script_{segment_index}_duration')
+    ]
+    if missing_durations:
+        import sys
+        sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+        from audio_duration import get_audio_duration_service
+        try:
+            get_audio_duration_service().backfill_audio_info(project_path, config)
+        except Exception as e:
+            logger.error(f"补全音频时长失败: {e}")
+    
+    segment_jobs = []
+    for segment_index in range(1, sentence_count + 1):
+        try:
+            # 获取音频时长
+            audio_duration_key = f'script_{segment_index}_duration'
+            if not config.has_section('AUDIO_INFO') or not config.has_option('AUDIO_INFO', audio_duration_key):
+                logger.warning(f"未找到片段{segment_index}的音频时长信息")
+                continue
+            
+            audio_duration = config.getfloat('AUDIO_INFO', audio_duration_key)
+            
+            # 查找对应的图片文件
+            images_dir = os.path.join(project_path, 'images')
+            image_files = [f for f in os.listdir(images_dir) if f.lower().endswith(('.png', '.jpg', '.jpeg'))] if os.path.exists(images_dir) else []
+            
+            # 按数字顺序排序
+            import re
+            def extract_number(filename):
+                match = re.search(r'script_(\d+)', filename)
+                return int(match.group(1)) if match else 0
+            
+            image_files.sort(key=extract_number)
+            
+            if segment_index - 1 >= len(image_files):
+                logger.warning(f"未找到片段{segment_index}对应的图片文件")
+                continue
+            
+            image_path = os.path.join(images_dir, image_files[segment_index - 1])
+            
+            logger.info(f"生成片段{segment_index}: 音频时长={audio_duration}秒, 图片={image_files[segment_index - 1]}")
+            
+            segment_jobs.append((segment_index, audio_duration, image_path))
+                
+        except Exception as e:
+            logger.error(f"生成片段{segment_index}时发生错误: {e}")
+            continue
+    
+    return segment_jobs
+
+def _render_project_video(project_path, resolution, quality, filename, job=None):
+    """
+    按片段渲染并合并项目视频（同步执行，generate_video和后台渲染任务共用）
+    
+    参数:
+        project_path: 项目路径
+        resolution: 分辨率设置，包含width和height
+        quality: 质量设置
+        filename: 输出文件名，为空时按时间戳生成
+        job: 后台渲染任务（RenderJob），用于上报进度和响应取消，同步调用时为None
+        
+    返回:
+        dict: 生成结果，success为False时包含error
+    """
+    # 导入VideoProcessor
+    import sys
+    sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+    from video_processor import VideoProcessor, resolve_output_settings
+    
+    logger.info(f"开始按片段生成视频，项目路径: {project_path}")
+    logger.info(f"输出设置 - 分辨率: {resolution['width']}x{resolution['height']}, 质量: {quality}, 文件名: {filename}")
+    
+    # 读取项目配置
+    parameter_file = os.path.join(project_path, 'parameter.ini')
+    if not os.path.exists(parameter_file):
+        return {
+            'success': False,
+            'error': 'parameter.ini文件不存在'
+        }
+    
+    config = configparser.ConfigParser(interpolation=None)
+    config.read(parameter_file, encoding='utf-8')
+    
+    # 获取片段数量
+    sentence_count = config.getint('PAPER_INFO', 'sentence_count', fallback=0)
+    if sentence_count == 0:
+        return {
+            'success': False,
+            'error': '项目中没有找到有效的片段数量'
+        }
+    
+    logger.info(f"需要生成 {sentence_count} 个视频片段")
+    
+    # 创建视频处理器，分辨率和质量档位在片段编码时一次性应用
+    output_settings = resolve_output_settings(resolution, quality)
+    logger.info(f"编码设置: {output_settings}")
+    processor = VideoProcessor(output_settings=output_settings)
+    
+    # 收集每个视频片段的渲染任务
+    segment_jobs = _collect_segment_jobs(project_path, config, sentence_count)
+    
+    if not segment_jobs:
+        return {
+            'success': False,
+            'error': '没有成功生成任何视频片段'
+        }
+    
+    # 生成最终文件名
+    if not filename:
+        from datetime import datetime
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        filename = f'video_{timestamp}.mp4'
+    
+    if not filename.endswith('.mp4'):
+        filename += '.mp4'
+    
+    # 输出到项目根目录（不是videos目录）
+    final_video_path = os.path.join(project_path, filename)
+    
+    # 片段少且总时长短时，用单个滤镜图一次渲染整段视频，跳过逐片段渲染和拼接
+    if processor.should_use_single_graph(project_path, segment_jobs):
+        if job:
+            job.set_segments({0: sum(audio_duration for _, audio_duration, _ in segment_jobs)})
+            processor.progress_callback = job.update_segment
+            processor.cancel_event = job.cancel_event
+        if processor.concatenate_videos([], final_video_path, project_path, segments=segment_jobs):
+            logger.info(f"最终视频生成完成: {final_video_path}")
+            return {
+                'success': True,
+                'message': '视频生成成功',
+                'video_path': final_video_path,
+                'video_info': _summarize_video_info(processor.get_video_info(final_video_path)),
+                'segments_generated': len(segment_jobs),
+                'total_segments': sentence_count
+            }
+        if job:
+            job.check_cancelled()
+        logger.warning("单次滤镜图渲染失败，改为逐片段渲染")
+        processor.progress_callback = None
+        processor.cancel_event = None
+    
+    # 使用进程池并行生成视频片段，返回结果已按片段索引排序
+    if job:
+        job.set_segments({segment_index: audio_duration for segment_index, audio_duration, _ in segment_jobs})
+    generated_segments = processor.generate_video_segments(
+        project_path, segment_jobs,
+        progress_callback=job.update_segment if job else None,
+        cancel_event=job.cancel_event if job else None
+    )
+    if job:
+        job.check_cancelled()
+    
+    if not generated_segments:
+        return {
+            'success': False,
+            'error': '没有成功生成任何视频片段'
+        }
+    
+    logger.info(f"成功生成 {len(generated_segments)} 个视频片段: {generated_segments}")
+    
+    # 合并所有视频片段
+    if job:
+        job.set_stage('concatenating', '正在合并视频片段')
+    videos_dir = os.path.join(project_path, 'videos')
+    segment_files = []
+    for segment_index in generated_segments:
+        segment_file = os.path.join(videos_dir, f'segment_{segment_index:03d}.mp4')
+        if os.path.exists(segment_file):
+            segment_files.append(segment_file)
+        else:
+            logger.warning(f"视频片段文件不存在: {segment_file}")
+    
+    if not segment_files:
+        return {
+            'success': False,
+            'error': '没有找到生成的视频片段文件'
+        }
+    
+    # 使用FFMPEG合并视频片段
+    success = processor.concatenate_videos(
+        segment_files, final_video_path, project_path
+    )
+    
+    if success:
+        logger.info(f"最终视频生成完成: {final_video_path}")
+        return {
+            'success': True,
+            'message': '视频生成成功',
+            'video_path': final_video_path,
+            'video_info': _summarize_video_info(processor.get_video_info(final_video_path)),
+            'segments_generated': len(generated_segments),
+            'total_segments': sentence_count
+        }
+    else:
+        return {
+            'success': False,
+            'error': '合并视频片段失败'
+        }
+
+def _summarize_video_info(info):
+    """
+    从get_video_info的结果中提取前端需要的概要字段
+    
+    参数:
+        info: 视频信息字典或None
+        
+    返回:
+        dict或None: 时长、分辨率、帧率、编码和音频采样率
+    """
+    if not info:
+        return None
+    video = info.get('video') or {}
+    audio = info.get('audio') or {}
+    return {
+        'duration': round(info.get('duration') or 0.0, 2),
+        'width': info.get('width', 0),
+        'height': info.get('height', 0),
+        'fps': info.get('fps', 0.0),
+        'video_codec': video.get('codec', ''),
+        'audio_codec': audio.get('codec', ''),
+        'audio_sample_rate': audio.get('sample_rate', 0),
+        'streams': info.get('streams', [])
+    }
+
+def _run_video_render_job(job, project_path, resolution, quality, filename):
+    """
+    后台渲染任务函数，渲染失败时抛出异常使任务进入failed状态
+    
+    参数:
+        job: 渲染任务（RenderJob）
+        project_path: 项目路径
+        resolution: 分辨率设置
+        quality: 质量设置
+        filename: 输出文件名
+        
+    返回:
+        dict: 生成结果
+    """
+    result = _render_project_video(project_path, resolution, quality, filename, job=job)
+    if not result.get('success'):
+        raise RuntimeError(result.get('error', '视频生成失败'))
+    return result
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def generate_video(request):
     """
-    生成视频的API端点 - 按片段生成视频
+    生成视频的API端点 - 按片段生成视频（同步执行，长视频建议使用submit_video_job）
     
     参数:
         request: Django的HttpRequest对象，包含分辨率、质量和文件名设置
@@ -5674,11 +6269,6 @@ def generate_video(request):
         quality = data.get('quality', {'preset': 'medium'})  # 默认中等质量
         filename = data.get('filename', '').strip()  # 文件名
         
-        # 导入VideoProcessor
-        import sys
-        sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
-        from video_processor import VideoProcessor
-        
         # 获取当前项目路径
         project_path = get_current_project_path()
         if not project_path:
@@ -5687,148 +6277,340 @@ def generate_video(request):
                 'error': '无法获取当前项目路径'
             })
         
-        logger.info(f"开始按片段生成视频，项目路径: {project_path}")
-        logger.info(f"输出设置 - 分辨率: {resolution['width']}x{resolution['height']}, 质量: {quality}, 文件名: {filename}")
+        return JsonResponse(_render_project_video(project_path, resolution, quality, filename))
+        
+    except Exception as e:
+        logger.error(f'生成视频时发生错误: {str(e)}')
+        return JsonResponse({
+            'success': False,
+            'error': f'生成视频时发生错误: {str(e)}'
+        })
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def submit_video_job(request):
+    """
+    提交后台视频渲染任务，立即返回任务ID，通过get_video_job_progress查询进度
+    
+    参数:
+        request: Django的HttpRequest对象，参数与generate_video相同
+        
+    返回:
+        JsonResponse: 包含任务ID的JSON响应
+    """
+    try:
+        # 解析请求参数
+        data = json.loads(request.body) if request.body else {}
         
-        # 读取项目配置
-        parameter_file = os.path.join(project_path, 'parameter.ini')
-        if not os.path.exists(parameter_file):
+        # 获取输出设置
+        resolution = data.get('resolution', {'width': 1080, 'height': 1920})  # 默认手机分辨率
+        quality = data.get('quality', {'preset': 'medium'})  # 默认中等质量
+        filename = data.get('filename', '').strip()  # 文件名
+        
+        # 获取当前项目路径
+        project_path = get_current_project_path()
+        if not project_path:
             return JsonResponse({
                 'success': False,
-                'error': 'parameter.ini文件不存在'
+                'error': '无法获取当前项目路径'
             })
         
-        config = configparser.ConfigParser(interpolation=None)
-        config.read(parameter_file, encoding='utf-8')
+        import sys
+        sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+        from render_jobs import get_render_job_manager
         
-        # 获取片段数量
-        sentence_count = config.getint('PAPER_INFO', 'sentence_count', fallback=0)
-        if sentence_count == 0:
+        job = get_render_job_manager().submit(
+            _run_video_render_job, project_path, resolution, quality, filename,
+            description=f'生成视频: {os.path.basename(project_path)}'
+        )
+        
+        return JsonResponse({
+            'success': True,
+            'task_id': job.job_id,
+            'message': '渲染任务已提交'
+        })
+        
+    except Exception as e:
+        logger.error(f'提交渲染任务时发生错误: {str(e)}')
+        return JsonResponse({
+            'success': False,
+            'error': f'提交渲染任务时发生错误: {str(e)}'
+        })
+
+def _run_preview_render_job(job, project_path, resolution, quality, first_segment, last_segment):
+    """
+    后台预览渲染任务函数
+    
+    参数:
+        job: 渲染任务（RenderJob）
+        project_path: 项目路径
+        resolution: 正式输出分辨率设置（预览按比例缩小）
+        quality: 质量设置
+        first_segment: 起始片段索引，None表示第一个片段
+        last_segment: 结束片段索引，None表示最后一个片段
+        
+    返回:
+        dict: 包含预览视频路径和访问URL的结果
+    """
+    import sys
+    sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+    from video_processor import VideoProcessor, resolve_output_settings
+    
+    parameter_file = os.path.join(project_path, 'parameter.ini')
+    if not os.path.exists(parameter_file):
+        raise RuntimeError('parameter.ini文件不存在')
+    
+    config = configparser.ConfigParser(interpolation=None)
+    config.read(parameter_file, encoding='utf-8')
+    sentence_count = config.getint('PAPER_INFO', 'sentence_count', fallback=0)
+    
+    segment_jobs = [
+        segment for segment in _collect_segment_jobs(project_path, config, sentence_count)
+        if (first_segment is None or segment[0] >= first_segment)
+        and (last_segment is None or segment[0] <= last_segment)
+    ]
+    if not segment_jobs:
+        raise RuntimeError('预览范围内没有可渲染的片段')
+    
+    job.set_segments({0: sum(audio_duration for _, audio_duration, _ in segment_jobs)})
+    
+    processor = VideoProcessor(output_settings=resolve_output_settings(resolution, quality))
+    processor.progress_callback = job.update_segment
+    processor.cancel_event = job.cancel_event
+    
+    first_index, last_index = segment_jobs[0][0], segment_jobs[-1][0]
+    preview_filename = f'preview_{first_index:03d}_{last_index:03d}.mp4'
+    preview_path = os.path.join(project_path, 'previews', preview_filename)
+    
+    success = processor.render_preview(project_path, segment_jobs, preview_path)
+    job.check_cancelled()
+    if not success:
+        raise RuntimeError('预览渲染失败')
+    
+    project_name = os.path.basename(os.path.normpath(project_path))
+    return {
+        'success': True,
+        'video_path': preview_path,
+        'video_url': f'{settings.MEDIA_URL}{project_name}/previews/{preview_filename}?t={int(os.path.getmtime(preview_path))}',
+        'first_segment': first_index,
+        'last_segment': last_index
+    }
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def submit_preview_job(request):
+    """
+    提交低分辨率预览渲染任务（优先于正式渲染执行），立即返回任务ID
+    
+    参数:
+        request: Django的HttpRequest对象，包含分辨率、质量以及可选的first_segment/last_segment
+        
+    返回:
+        JsonResponse: 包含任务ID的JSON响应
+    """
+    try:
+        # 解析请求参数
+        data = json.loads(request.body) if request.body else {}
+        
+        resolution = data.get('resolution', {'width': 1080, 'height': 1920})  # 默认手机分辨率
+        quality = data.get('quality', {'preset': 'medium'})  # 默认中等质量
+        first_segment = data.get('first_segment')
+        last_segment = data.get('last_segment')
+        first_segment = int(first_segment) if first_segment not in (None, '') else None
+        last_segment = int(last_segment) if last_segment not in (None, '') else None
+        
+        # 获取当前项目路径
+        project_path = get_current_project_path()
+        if not project_path:
             return JsonResponse({
                 'success': False,
-                'error': '项目中没有找到有效的片段数量'
+                'error': '无法获取当前项目路径'
             })
         
-        logger.info(f"需要生成 {sentence_count} 个视频片段")
+        import sys
+        sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+        from render_jobs import get_render_job_manager, PRIORITY_PREVIEW
         
-        # 创建视频处理器
-        processor = VideoProcessor()
+        job = get_render_job_manager().submit(
+            _run_preview_render_job, project_path, resolution, quality, first_segment, last_segment,
+            description=f'预览: {os.path.basename(project_path)}',
+            priority=PRIORITY_PREVIEW
+        )
         
-        # 生成每个视频片段
-        generated_segments = []
-        for segment_index in range(1, sentence_count + 1):
-            try:
-                # 获取音频时长
-                audio_duration_key = f'script_{segment_index}_duration'
-                if not config.has_section('AUDIO_INFO') or not config.has_option('AUDIO_INFO', audio_duration_key):
-                    logger.warning(f"未找到片段{segment_index}的音频时长信息")
-                    continue
-                
-                audio_duration = config.getfloat('AUDIO_INFO', audio_duration_key)
-                
-                # 查找对应的图片文件
-                images_dir = os.path.join(project_path, 'images')
-                image_files = [f for f in os.listdir(images_dir) if f.lower().endswith(('.png', '.jpg', '.jpeg'))] if os.path.exists(images_dir) else []
-                
-                # 按数字顺序排序
-                import re
-                def extract_number(filename):
-                    match = re.search(r'script_(\d+)', filename)
-                    return int(match.group(1)) if match else 0
-                
-                image_files.sort(key=extract_number)
-                
-                if segment_index - 1 >= len(image_files):
-                    logger.warning(f"未找到片段{segment_index}对应的图片文件")
-                    continue
-                
-                image_path = os.path.join(images_dir, image_files[segment_index - 1])
-                
-                logger.info(f"生成片段{segment_index}: 音频时长={audio_duration}秒, 图片={image_files[segment_index - 1]}")
-                
-                # 生成视频片段
-                success = processor.generate_video_segment(
-                    project_path, segment_index, audio_duration, image_path
-                )
-                
-                if success:
-                    generated_segments.append(segment_index)
-                    logger.info(f"片段{segment_index}生成成功")
-                else:
-                    logger.error(f"片段{segment_index}生成失败")
-                    
-            except Exception as e:
-                logger.error(f"生成片段{segment_index}时发生错误: {e}")
-                continue
+        return JsonResponse({
+            'success': True,
+            'task_id': job.job_id,
+            'message': '预览任务已提交'
+        })
+        
+    except Exception as e:
+        logger.error(f'提交预览任务时发生错误: {str(e)}')
+        return JsonResponse({
+            'success': False,
+            'error': f'提交预览任务时发生错误: {str(e)}'
+        })
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def get_video_job_progress(request, task_id):
+    """
+    查询后台渲染任务进度
+    
+    参数:
+        request: Django的HttpRequest对象
+        task_id: 任务ID
         
-        if not generated_segments:
+    返回:
+        JsonResponse: 包含任务状态、整体/片段进度、ETA和编码速度的JSON响应
+    """
+    try:
+        import sys
+        sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+        from render_jobs import get_render_job_manager
+        
+        job = get_render_job_manager().get(task_id)
+        if not job:
             return JsonResponse({
                 'success': False,
-                'error': '没有成功生成任何视频片段'
+                'error': f'渲染任务不存在: {task_id}'
             })
         
-        logger.info(f"成功生成 {len(generated_segments)} 个视频片段: {generated_segments}")
+        return JsonResponse({
+            'success': True,
+            'task': job.to_dict()
+        })
         
-        # 合并所有视频片段
-        videos_dir = os.path.join(project_path, 'videos')
-        segment_files = []
-        for segment_index in generated_segments:
-            segment_file = os.path.join(videos_dir, f'segment_{segment_index:03d}.mp4')
-            if os.path.exists(segment_file):
-                segment_files.append(segment_file)
-            else:
-                logger.warning(f"视频片段文件不存在: {segment_file}")
+    except Exception as e:
+        logger.error(f'查询渲染任务进度时发生错误: {str(e)}')
+        return JsonResponse({
+            'success': False,
+            'error': f'查询渲染任务进度时发生错误: {str(e)}'
+        })
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def cancel_video_job(request, task_id):
+    """
+    取消后台渲染任务，正在运行的FFMPEG进程会被终止
+    
+    参数:
+        request: Django的HttpRequest对象
+        task_id: 任务ID
+        
+    返回:
+        JsonResponse: 取消结果
+    """
+    try:
+        import sys
+        sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+        from render_jobs import get_render_job_manager
         
-        if not segment_files:
+        if not get_render_job_manager().cancel(task_id):
             return JsonResponse({
                 'success': False,
-                'error': '没有找到生成的视频片段文件'
+                'error': f'渲染任务不存在或已结束: {task_id}'
             })
         
-        # 生成最终文件名
-        if not filename:
-            from datetime import datetime
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f'video_{timestamp}.mp4'
+        return JsonResponse({
+            'success': True,
+            'message': '已请求取消渲染任务'
+        })
         
-        if not filename.endswith('.mp4'):
-            filename += '.mp4'
+    except Exception as e:
+        logger.error(f'取消渲染任务时发生错误: {str(e)}')
+        return JsonResponse({
+            'success': False,
+            'error': f'取消渲染任务时发生错误: {str(e)}'
+        })
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def get_segment_cache_stats(request):
+    """
+    获取视频片段缓存的统计信息（条目数、占用空间、命中率）
+    
+    参数:
+        request: Django的HttpRequest对象
         
-        # 输出到项目根目录（不是videos目录）
-        final_video_path = os.path.join(project_path, filename)
+    返回:
+        JsonResponse: 包含缓存统计的JSON响应
+    """
+    try:
+        import sys
+        sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+        from segment_cache import SegmentCache
         
-        # 使用FFMPEG合并视频片段
-        success = processor.concatenate_videos(
-            segment_files, final_video_path, project_path
-        )
+        stats = SegmentCache().get_stats()
+        return JsonResponse({
+            'success': True,
+            'stats': stats
+        })
         
-        if success:
-            logger.info(f"最终视频生成完成: {final_video_path}")
-            return JsonResponse({
-                'success': True,
-                'message': '视频生成成功',
-                'video_path': final_video_path,
-                'segments_generated': len(generated_segments),
-                'total_segments': sentence_count
-            })
-        else:
-            return JsonResponse({
-                'success': False,
-                'error': '合并视频片段失败'
-            })
+    except Exception as e:
+        logger.error(f'获取片段缓存统计时发生错误: {str(e)}')
+        return JsonResponse({
+            'success': False,
+            'error': f'获取片段缓存统计时发生错误: {str(e)}'
+        })
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def get_generation_cache_stats(request):
+    """
+    获取ComfyUI生成结果缓存的统计信息（条目数、占用空间、总命中率和各项目命中率）
+    
+    参数:
+        request: Django的HttpRequest对象
+        
+    返回:
+        JsonResponse: 包含缓存统计的JSON响应
+    """
+    try:
+        import sys
+        sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+        from generation_cache import get_generation_cache
         
+        stats = get_generation_cache().get_stats()
         return JsonResponse({
             'success': True,
-            'message': '视频生成成功',
-            'output_path': output_path,
-            'filename': output_filename
+            'stats': stats
         })
         
     except Exception as e:
-        logger.error(f'生成视频时发生错误: {str(e)}')
+        logger.error(f'获取生成结果缓存统计时发生错误: {str(e)}')
         return JsonResponse({
             'success': False,
-            'error': f'生成视频时发生错误: {str(e)}'
+            'error': f'获取生成结果缓存统计时发生错误: {str(e)}'
+        })
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def get_narration_cache_stats(request):
+    """
+    获取旁白缓存的统计信息（条目数、占用空间、总命中率和各项目命中率）
+    
+    参数:
+        request: Django的HttpRequest对象
+        
+    返回:
+        JsonResponse: 包含缓存统计的JSON响应
+    """
+    try:
+        import sys
+        sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+        from narration_cache import get_narration_cache
+        
+        stats = get_narration_cache().get_stats()
+        return JsonResponse({
+            'success': True,
+            'stats': stats
+        })
+        
+    except Exception as e:
+        logger.error(f'获取旁白缓存统计时发生错误: {str(e)}')
+        return JsonResponse({
+            'success': False,
+            'error': f'获取旁白缓存统计时发生错误: {str(e)}'
         })
 
 @csrf_exempt
@@ -6331,6 +7113,104 @@ def load_active_format_prompt_content(request):
             'error': f'加载活动格式化提示词内容时发生错误: {str(e)}'
         })
 
+@csrf_exempt
+@require_http_methods(["POST"])
+def process_project_audios(request):
+    """
+    批量处理项目旁白：多进程并行去除静音、添加停顿并测量时长，所有时长一次写入parameter.ini
+    
+    参数:
+        request: Django的HttpRequest对象，可选参数script_ids（默认全部script_N_1.*）、
+                 project_path（默认当前项目）和max_workers
+        
+    返回:
+        JsonResponse: 包含每个文件时长和处理耗时的JSON响应
+    """
+    try:
+        data = json.loads(request.body) if request.body else {}
+        
+        project_path = data.get('project_path') or get_current_project_path()
+        if not project_path:
+            return JsonResponse({
+                'success': False,
+                'error': '无法获取当前项目路径'
+            })
+        
+        script_ids = data.get('script_ids')
+        if script_ids is not None:
+            script_ids = [int(script_id) for script_id in script_ids]
+        
+        import sys
+        sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+        from audio_processor import AudioProcessor
+        
+        result = AudioProcessor().process_project_audios(
+            project_path, script_ids=script_ids, max_workers=int(data.get('max_workers', 0))
+        )
+        if not result['success']:
+            result['error'] = '写入parameter.ini失败'
+        return JsonResponse(result)
+        
+    except Exception as e:
+        logger.error(f'批量处理音频时发生错误: {str(e)}')
+        return JsonResponse({
+            'success': False,
+            'error': f'批量处理音频时发生错误: {str(e)}'
+        })
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def get_audio_durations(request):
+    """
+    批量获取项目audios目录下所有音频文件的时长（只读取文件头，结果按路径和修改时间缓存）
+    
+    参数:
+        request: Django的HttpRequest对象，可选参数project_path（默认当前项目）和
+                 backfill（为true时把缺少的script_N_duration写入AUDIO_INFO）
+        
+    返回:
+        JsonResponse: 包含每个音频文件时长和总时长的JSON响应
+    """
+    try:
+        project_path = request.GET.get('project_path')  # 优先使用请求参数中的项目路径
+        if not project_path:
+            project_path = get_current_project_path()  # 如果没有传递项目路径，使用当前项目路径
+        if not project_path:
+            return JsonResponse({
+                'success': False,
+                'error': '无法获取当前项目路径'
+            })
+        
+        import sys
+        sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+        from audio_duration import get_audio_duration_service
+        
+        service = get_audio_duration_service()
+        audios = service.get_project_durations(project_path)
+        
+        backfilled = 0
+        if request.GET.get('backfill', '').lower() in ('1', 'true', 'yes'):
+            parameter_file = os.path.join(project_path, 'parameter.ini')
+            if os.path.exists(parameter_file):
+                config = configparser.ConfigParser(interpolation=None)
+                config.read(parameter_file, encoding='utf-8')
+                backfilled = service.backfill_audio_info(project_path, config)
+        
+        return JsonResponse({
+            'success': True,
+            'audios': audios,
+            'count': len(audios),
+            'total_duration': round(sum(item['duration'] or 0.0 for item in audios), 3),
+            'backfilled': backfilled
+        })
+        
+    except Exception as e:
+        logger.error(f'获取音频时长时发生错误: {str(e)}')
+        return JsonResponse({
+            'success': False,
+            'error': f'获取音频时长时发生错误: {str(e)}'
+        })
+
 @csrf_exempt
 @require_http_methods(["GET"])
 def get_video_history(request):
@@ -6358,6 +7238,11 @@ def get_video_history(request):
                 'count': 0
             })
         
+        # 媒体信息按 路径+修改时间+文件大小 缓存，未变化的视频不会重复调用ffprobe
+        import sys
+        sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+        from media_probe import get_media_probe, probe_media
+        
         # 遍历projects目录下的所有子目录
         for project_name in os.listdir(projects_dir):
             project_path = os.path.join(projects_dir, project_name)
@@ -6392,6 +7277,9 @@ def get_video_history(request):
                         modified_datetime = datetime.fromtimestamp(modified_time)
                         time_str = modified_datetime.strftime('%Y-%m-%d %H:%M:%S')
                         
+                        video_info = _summarize_video_info(probe_media(file_path))
+                        duration = video_info['duration'] if video_info else 0.0
+                        
                         videos.append({
                             'filename': file_name,
                             'project_name': project_name,
@@ -6400,13 +7288,19 @@ def get_video_history(request):
                             'size': file_size,
                             'formatted_size': size_str,
                             'modified_time': modified_time,
-                            'formatted_time': time_str
+                            'formatted_time': time_str,
+                            'duration': duration,
+                            'formatted_duration': f"{int(duration // 60):02d}:{int(duration % 60):02d}",
+                            'video_info': video_info
                         })
                         
                     except OSError as e:
                         logger.warning(f'无法获取文件信息: {file_path}, 错误: {str(e)}')
                         continue
         
+        # 本次新探测的视频信息一次写入缓存文件
+        get_media_probe().flush()
+        
         # 按修改时间降序排序（最新的在前面）
         videos.sort(key=lambda x: x['modified_time'], reverse=True)
         
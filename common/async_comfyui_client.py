@@ -0,0 +1,672 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AutoMovie异步ComfyUI客户端
+每个client_id只保持一条WebSocket连接，后台监听任务按prompt_id把executing/executed/execution_error消息
+分发给各个prompt的Future，因此可以一次提交多个prompt并让ComfyUI队列保持满载；
+输出文件通过连接池化的HTTP会话并发下载。安装了aiohttp时使用aiohttp的会话和WebSocket，
+否则使用requests.Session（在线程池中执行）和websocket-client（后台线程接收消息）
+"""
+
+import os
+import json
+import asyncio
+import logging
+import queue
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Tuple, AsyncIterator, Iterator
+
+import requests
+import websocket
+from requests.adapters import HTTPAdapter
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+from comfyui_client import ComfyUIClient, HISTORY_POLL_INTERVAL, DOWNLOAD_CHUNK_SIZE
+from comfyui_pool import is_server_error
+
+logger = logging.getLogger(__name__)
+
+# WebSocket断开后重连的等待时间（秒），逐次翻倍直到上限
+RECONNECT_DELAY = 1.0
+RECONNECT_DELAY_MAX = 30.0
+
+
+class _PromptState:
+    """单个prompt的执行状态：完成Future、executed消息带回的节点输出，以及是否有节点命中ComfyUI缓存"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.future = loop.create_future()
+        self.outputs = {}
+        self.cached = False
+
+
+class AsyncComfyUIClient:
+    """
+    ComfyUI异步客户端
+
+    工作流的加载、占位符替换、输出地址解析和文件写入复用ComfyUIClient的实现，
+    generate_image/generate_audio的参数和返回值与ComfyUIClient一致。需在同一个事件循环内使用：
+
+        async with AsyncComfyUIClient() as client:
+            async for result in client.generate_batch('image', project_path, [1, 2, 3]):
+                ...
+    """
+
+    def __init__(self, server_address: str = None, max_connections: int = 8,
+                 prompt_timeout: Optional[float] = None, http_timeout: float = 30.0,
+                 comfyui_output_dir: Optional[str] = None):
+        self._client = ComfyUIClient(server_address, comfyui_output_dir=comfyui_output_dir)
+        self.server_address = self._client.server_address
+        self.client_id = self._client.client_id
+        self.max_connections = max(1, max_connections)
+        self.prompt_timeout = prompt_timeout
+        self.http_timeout = http_timeout
+
+        self._loop = None
+        self._session = None
+        self._executor = None  # 未安装aiohttp时执行requests调用的线程池
+        self._listener = None  # aiohttp监听任务或websocket-client监听线程
+        self._ws = None
+        self._connected = None
+        self._closing = False
+        self._prompts: Dict[str, _PromptState] = {}
+
+    async def __aenter__(self) -> 'AsyncComfyUIClient':
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def start(self):
+        """创建HTTP会话并建立WebSocket连接（等待连接成功后返回，避免错过第一个prompt的消息）"""
+        if self._session is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._connected = asyncio.Event()
+        self._closing = False
+
+        if AIOHTTP_AVAILABLE:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=self.http_timeout, sock_read=self.http_timeout)
+            )
+            self._listener = asyncio.create_task(self._listen_aiohttp())
+        else:
+            self._session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_connections)
+            self._session.mount('http://', adapter)
+            self._executor = ThreadPoolExecutor(max_workers=self.max_connections,
+                                                thread_name_prefix='comfyui-http')
+            self._listener = threading.Thread(target=self._listen_websocket_client,
+                                              name='comfyui-ws', daemon=True)
+            self._listener.start()
+
+        try:
+            await asyncio.wait_for(self._connected.wait(), self.http_timeout)
+        except asyncio.TimeoutError:
+            await self.close()
+            raise ConnectionError(f"无法连接到ComfyUI WebSocket: {self.server_address}")
+        logger.info(f"已连接ComfyUI WebSocket: {self.server_address} (client_id={self.client_id})")
+
+    async def close(self):
+        """关闭WebSocket和HTTP会话，尚未完成的prompt以CancelledError结束"""
+        self._closing = True
+        for state in self._prompts.values():
+            if not state.future.done():
+                state.future.cancel()
+        self._prompts.clear()
+
+        if AIOHTTP_AVAILABLE:
+            if self._listener is not None:
+                self._listener.cancel()
+                try:
+                    await self._listener
+                except (asyncio.CancelledError, Exception):
+                    pass
+            if self._session is not None:
+                await self._session.close()
+        else:
+            if self._ws is not None:
+                try:
+                    self._ws.close()
+                except Exception:
+                    pass
+            if self._session is not None:
+                self._session.close()
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+        self._listener = None
+        self._session = None
+        self._ws = None
+
+    # ------------------------------------------------------------------
+    # WebSocket消息分发
+    # ------------------------------------------------------------------
+
+    def _state(self, prompt_id: str) -> _PromptState:
+        """获取prompt状态（消息可能先于/prompt响应到达，因此由先到的一方创建）"""
+        state = self._prompts.get(prompt_id)
+        if state is None:
+            state = self._prompts[prompt_id] = _PromptState(self._loop)
+        return state
+
+    def _dispatch(self, message: Dict[str, Any]):
+        """按prompt_id把ComfyUI消息路由到对应的prompt状态（在事件循环线程中调用）"""
+        message_type = message.get('type')
+        data = message.get('data') or {}
+        prompt_id = data.get('prompt_id')
+        if not prompt_id or self._closing:
+            return
+
+        if message_type == 'executing':
+            if data.get('node') is None:
+                state = self._state(prompt_id)
+                if not state.future.done():
+                    state.future.set_result(None)
+        elif message_type == 'executed':
+            if data.get('node') is not None and data.get('output'):
+                self._state(prompt_id).outputs[str(data['node'])] = data['output']
+        elif message_type == 'execution_cached':
+            if data.get('nodes'):
+                self._state(prompt_id).cached = True
+        elif message_type == 'execution_error':
+            state = self._state(prompt_id)
+            if not state.future.done():
+                state.future.set_exception(RuntimeError(
+                    f"ComfyUI执行失败 (节点 {data.get('node_id')} {data.get('node_type', '')}): "
+                    f"{data.get('exception_message', '')}"
+                ))
+
+    def _on_connected(self, reconnected: bool):
+        """WebSocket连接（或重连）成功"""
+        self._connected.set()
+        if reconnected and self._prompts:
+            # 断线期间完成的prompt收不到executing消息，改为查询/history补齐
+            self._loop.create_task(self._recover_pending())
+
+    def _on_disconnected(self):
+        """WebSocket断开：立即检查未完成的prompt，服务器已停止时让等待方马上得到连接错误而不是等到重连"""
+        self._connected.clear()
+        if self._prompts and not self._closing:
+            self._loop.create_task(self._recover_pending())
+
+    async def _poll_prompt(self, prompt_id: str) -> bool:
+        """
+        通过/history和/queue检查prompt的状态
+
+        Returns:
+            bool: 已执行完毕时返回True，仍在排队或执行中时返回False
+
+        Raises:
+            ConnectionError: prompt既不在历史记录中也不在队列中（ComfyUI已重启，任务丢失）
+            Exception: 无法访问ComfyUI（连接错误原样抛出，由调用方决定是否换服务器）
+        """
+        if prompt_id in await self._get_json(f"/history/{prompt_id}"):
+            return True
+        queue_info = await self._get_json('/queue')
+        for item in queue_info.get('queue_running', []) + queue_info.get('queue_pending', []):
+            if len(item) > 1 and item[1] == prompt_id:
+                return False
+        # 查询/queue前刚好执行完的prompt已从队列移到历史记录中
+        if prompt_id in await self._get_json(f"/history/{prompt_id}"):
+            return True
+        raise ConnectionError(f"prompt已不在ComfyUI队列和历史记录中，服务器可能已重启: {prompt_id}")
+
+    async def _recover_pending(self):
+        """断线或重连后检查未完成的prompt：已执行完毕的补齐完成状态，无法查询或已丢失的以异常结束"""
+        for prompt_id, state in list(self._prompts.items()):
+            if state.future.done():
+                continue
+            try:
+                finished = await self._poll_prompt(prompt_id)
+            except Exception as e:
+                logger.warning(f"查询prompt状态失败 {prompt_id}: {e}")
+                if not state.future.done():
+                    state.future.set_exception(e)
+                continue
+            if finished and not state.future.done():
+                state.cached = True  # 输出以/history为准
+                state.future.set_result(None)
+
+    async def _listen_aiohttp(self):
+        """aiohttp WebSocket监听任务，断线后自动重连"""
+        url = f"http://{self.server_address}/ws?clientId={self.client_id}"
+        delay = RECONNECT_DELAY
+        reconnected = False
+        while not self._closing:
+            try:
+                async with self._session.ws_connect(url, heartbeat=30) as ws:
+                    delay = RECONNECT_DELAY
+                    self._on_connected(reconnected)
+                    async for msg in ws:
+                        if msg.type == aiohttp.WSMsgType.TEXT:
+                            self._dispatch(json.loads(msg.data))
+                        elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                            break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"ComfyUI WebSocket连接异常: {e}")
+            if self._closing:
+                break
+            self._on_disconnected()
+            reconnected = True
+            logger.warning(f"ComfyUI WebSocket已断开，{delay:.0f}秒后重连")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_DELAY_MAX)
+
+    def _listen_websocket_client(self):
+        """websocket-client监听线程，消息通过call_soon_threadsafe交给事件循环，断线后自动重连"""
+        url = f"ws://{self.server_address}/ws?clientId={self.client_id}"
+        delay = RECONNECT_DELAY
+        reconnected = False
+        while not self._closing:
+            try:
+                ws = websocket.WebSocket()
+                ws.connect(url, timeout=self.http_timeout)
+                ws.settimeout(None)
+                self._ws = ws
+                delay = RECONNECT_DELAY
+                self._loop.call_soon_threadsafe(self._on_connected, reconnected)
+                while not self._closing:
+                    out = ws.recv()
+                    if isinstance(out, str):
+                        if not out:
+                            break  # 连接已关闭
+                        self._loop.call_soon_threadsafe(self._dispatch, json.loads(out))
+            except Exception as e:
+                if not self._closing:
+                    logger.warning(f"ComfyUI WebSocket连接异常: {e}")
+            if self._closing or self._loop.is_closed():
+                break
+            self._loop.call_soon_threadsafe(self._on_disconnected)
+            reconnected = True
+            logger.warning(f"ComfyUI WebSocket已断开，{delay:.0f}秒后重连")
+            threading.Event().wait(delay)
+            delay = min(delay * 2, RECONNECT_DELAY_MAX)
+
+    # ------------------------------------------------------------------
+    # HTTP
+    # ------------------------------------------------------------------
+
+    async def _get_json(self, path: str) -> Any:
+        """GET请求并解析JSON"""
+        url = f"http://{self.server_address}{path}"
+        if AIOHTTP_AVAILABLE:
+            async with self._session.get(url) as response:
+                response.raise_for_status()
+                return await response.json(content_type=None)
+
+        def fetch():
+            response = self._session.get(url, timeout=self.http_timeout)
+            response.raise_for_status()
+            return response.json()
+        return await self._loop.run_in_executor(self._executor, fetch)
+
+    async def _post_json(self, path: str, payload: dict) -> Any:
+        """POST JSON并解析响应"""
+        url = f"http://{self.server_address}{path}"
+        if AIOHTTP_AVAILABLE:
+            async with self._session.post(url, json=payload) as response:
+                response.raise_for_status()
+                return await response.json(content_type=None)
+
+        def post():
+            response = self._session.post(url, json=payload, timeout=self.http_timeout)
+            response.raise_for_status()
+            return response.json()
+        return await self._loop.run_in_executor(self._executor, post)
+
+    async def download(self, url: str, directory: str) -> Tuple[str, bytes, str]:
+        """
+        以流式方式把输出文件下载到directory下的临时文件，内存中只保留一个数据块
+
+        Args:
+            url: /view下载地址
+            directory: 临时文件所在目录（与目标文件同目录，保证随后可以原子重命名）
+
+        Returns:
+            Tuple[str, bytes, str]: (临时文件路径, 文件开头32字节, content-type)
+        """
+        if AIOHTTP_AVAILABLE:
+            async with self._session.get(url) as response:
+                response.raise_for_status()
+                fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.download.', suffix='.part')
+                header = b''
+                try:
+                    with os.fdopen(fd, 'wb') as f:
+                        async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                            if len(header) < 32:
+                                header += chunk[:32 - len(header)]
+                            await self._loop.run_in_executor(None, f.write, chunk)
+                except BaseException:
+                    os.remove(temp_path)
+                    raise
+                return temp_path, header, response.headers.get('content-type', '')
+
+        def fetch():
+            with self._session.get(url, timeout=self.http_timeout, stream=True) as response:
+                response.raise_for_status()
+                temp_path, header = self._client._write_temp_file(
+                    response.iter_content(DOWNLOAD_CHUNK_SIZE), directory, 'download')
+                return temp_path, header, response.headers.get('content-type', '')
+        return await self._loop.run_in_executor(self._executor, fetch)
+
+    async def test_connection(self) -> bool:
+        """测试与ComfyUI服务器的连接"""
+        try:
+            await self._get_json('/system_stats')
+            return True
+        except Exception as e:
+            logger.error(f"Connection test failed: {e}")
+            return False
+
+    # ------------------------------------------------------------------
+    # prompt提交与结果获取
+    # ------------------------------------------------------------------
+
+    async def queue_prompt(self, prompt: dict) -> dict:
+        """提交prompt到ComfyUI队列（只提交，不等待执行完成）"""
+        result = await self._post_json('/prompt', {"prompt": prompt, "client_id": self.client_id})
+        self._state(result['prompt_id'])
+        return result
+
+    async def wait_for_outputs(self, prompt_id: str) -> Dict[str, Any]:
+        """
+        等待prompt执行完成并返回各输出节点的输出
+
+        executed消息已带回全部输出时直接使用；有节点命中ComfyUI缓存（不会发送executed）、
+        断线重连过或超过HISTORY_POLL_INTERVAL仍未收到完成消息时，以/history为准。
+
+        Args:
+            prompt_id: queue_prompt返回的prompt_id
+
+        Returns:
+            dict: 节点ID -> 节点输出
+
+        Raises:
+            TimeoutError: 超过prompt_timeout仍未完成
+            ConnectionError: 服务器已停止或重启后丢失了该prompt
+        """
+        state = self._state(prompt_id)
+        deadline = None if self.prompt_timeout is None else self._loop.time() + self.prompt_timeout
+        try:
+            while True:
+                interval = HISTORY_POLL_INTERVAL
+                if deadline is not None:
+                    interval = min(interval, max(0.0, deadline - self._loop.time()))
+                try:
+                    await asyncio.wait_for(asyncio.shield(state.future), interval)
+                    break
+                except asyncio.TimeoutError:
+                    pass
+                if deadline is not None and self._loop.time() >= deadline:
+                    raise TimeoutError(f"等待ComfyUI执行超时 ({self.prompt_timeout}秒): {prompt_id}")
+                # WebSocket消息可能丢失，也可能服务器已不可用：查询一次状态，连接错误直接抛出
+                if await self._poll_prompt(prompt_id):
+                    state.cached = True
+                    break
+        finally:
+            self._prompts.pop(prompt_id, None)
+
+        if state.outputs and not state.cached:
+            return state.outputs
+        history = await self._get_json(f"/history/{prompt_id}")
+        return history.get(prompt_id, {}).get('outputs', {})
+
+    async def get_images_from_websocket(self, prompt: dict) -> List[str]:
+        """提交prompt并等待完成，返回生成文件的下载地址（与ComfyUIClient同名方法对应）"""
+        prompt_id = (await self.queue_prompt(prompt))['prompt_id']
+        outputs = await self.wait_for_outputs(prompt_id)
+        return self._client._extract_output_urls(outputs)
+
+    async def _fetch_to_temp(self, url: str, directory: str) -> Tuple[str, bytes, str]:
+        """
+        把一个输出文件取到directory下的临时文件（与ComfyUIClient._fetch_output对应）
+
+        文件在本机可访问的ComfyUI输出目录中时在线程池中硬链接或复制，否则通过HTTP流式下载到临时文件。
+
+        Returns:
+            Tuple[str, bytes, str]: (临时文件路径, 文件开头32字节, content-type)
+        """
+        if self._client._local_output_path(url):
+            return await self._loop.run_in_executor(None, self._client._fetch_output, url, directory)
+        return await self.download(url, directory)
+
+    async def _fetch_all(self, urls: List[str], directory: str) -> List[Any]:
+        """并发获取多个文件到临时文件，单个失败时对应位置为异常对象"""
+        return await asyncio.gather(*(self._fetch_to_temp(url, directory) for url in urls), return_exceptions=True)
+
+    async def save_images_to_disk(self, image_urls: List[str], output_dir: str,
+                                  filename_prefix: str = "script", workflow: dict = None) -> List[str]:
+        """并发获取图像并保存到磁盘"""
+        os.makedirs(output_dir, exist_ok=True)
+        saved_files = []
+        for i, result in enumerate(await self._fetch_all(image_urls, output_dir)):
+            if isinstance(result, Exception):
+                logger.error(f"保存图像 {i} 失败: {result}")
+                continue
+            temp_path, header, _ = result
+            try:
+                saved_files.append(await self._loop.run_in_executor(
+                    None, self._client._finalize_image, temp_path, header, output_dir, filename_prefix, workflow))
+            except Exception as e:
+                logger.error(f"保存图像 {i} 失败: {e}")
+        return saved_files
+
+    async def _save_audios_to_disk(self, audio_urls: List[str], project_path: str,
+                                   sentence_index: int, workflow: dict) -> List[str]:
+        """并发获取音频并保存到项目audios目录"""
+        audios_dir = os.path.join(project_path, 'audios')
+        os.makedirs(audios_dir, exist_ok=True)
+
+        saved_files = []
+        for i, (audio_url, result) in enumerate(zip(audio_urls, await self._fetch_all(audio_urls, audios_dir))):
+            if isinstance(result, Exception):
+                logger.error(f"保存音频文件失败 {audio_url}: {result}")
+                continue
+            temp_path, _, content_type = result
+            ext = self._client._audio_extension(content_type, audio_url)
+            audio_path = os.path.join(audios_dir, f"script_{sentence_index}_{i+1}{ext}")
+            self._client._replace_file(temp_path, audio_path)
+            saved_files.append(audio_path)
+            logger.info(f"音频已保存: {audio_path}")
+
+        if saved_files:
+            saved_files.append(self._client._write_audio_workflow(workflow, audios_dir, sentence_index))
+        return saved_files
+
+    # ------------------------------------------------------------------
+    # 生成接口
+    # ------------------------------------------------------------------
+
+    async def generate_image(self, project_path: str, sentence_id: int = 1, seed: Optional[int] = None,
+                             paper_data: dict = None, workflow_template: dict = None,
+                             force_new: bool = False) -> List[str]:
+        """
+        生成图像（与ComfyUIClient.generate_image对应）
+
+        Args:
+            project_path: 项目路径
+            sentence_id: 句子ID
+            seed: 随机种子，None表示随机生成（不使用生成结果缓存）
+            paper_data: 已加载的文案数据（批量生成时传入，避免重复读取paper.json）
+            workflow_template: 已加载的图像工作流模板（批量生成时传入，避免重复读取工作流文件）
+            force_new: 为True时不使用生成结果缓存
+
+        Returns:
+            List[str]: 保存的图像文件路径
+        """
+        workflow = self._client.prepare_image_workflow(project_path, sentence_id, seed, paper_data, workflow_template)
+        # 随机种子的工作流不会重复，只有指定seed时才查询和写入生成结果缓存
+        cache_key, saved_files = None, None
+        if seed is not None:
+            cache_key, saved_files = await self._loop.run_in_executor(
+                None, self._client.lookup_generation_cache, 'image', workflow, project_path, sentence_id, force_new)
+        if saved_files:
+            return saved_files
+
+        image_urls = await self.get_images_from_websocket(workflow)
+        output_dir = os.path.join(project_path, 'images')
+        saved_files = await self.save_images_to_disk(image_urls, output_dir, f"script_{sentence_id}", workflow)
+        await self._loop.run_in_executor(None, self._client.store_generation_cache, cache_key, saved_files)
+        logger.info(f"成功生成 {len(saved_files)} 张图像 (句子ID: {sentence_id})")
+        return saved_files
+
+    async def generate_audio(self, project_path: str, sentence_id: int = 1,
+                             paper_data: dict = None, workflow_template: dict = None,
+                             force_new: bool = False) -> List[str]:
+        """
+        生成音频（与ComfyUIClient.generate_audio对应）
+
+        Args:
+            project_path: 项目路径
+            sentence_id: 句子ID
+            paper_data: 已加载的文案数据
+            workflow_template: 已加载的音频工作流模板
+            force_new: 为True时不使用生成结果缓存
+
+        Returns:
+            List[str]: 保存的音频文件路径，最后一项为工作流JSON文件
+        """
+        workflow = self._client.prepare_audio_workflow(project_path, sentence_id, paper_data, workflow_template)
+        cache_key, saved_files = await self._loop.run_in_executor(
+            None, self._client.lookup_generation_cache, 'audio', workflow, project_path, sentence_id, force_new)
+        if saved_files:
+            return saved_files
+
+        audio_urls = await self.get_images_from_websocket(workflow)
+        saved_files = await self._save_audios_to_disk(audio_urls, project_path, sentence_id, workflow)
+        await self._loop.run_in_executor(None, self._client.store_generation_cache, cache_key, saved_files)
+        logger.info(f"成功生成 {len(saved_files)} 个音频文件 (句子ID: {sentence_id})")
+        return saved_files
+
+    async def generate_batch(self, workflow_type: str, project_path: str, sentence_ids: List[int],
+                             seed: Optional[int] = None, max_in_flight: int = 0,
+                             force_new: bool = False) -> AsyncIterator[Dict[str, Any]]:
+        """
+        批量生成多个句子的图像或音频，按完成顺序逐个返回结果
+
+        paper.json和工作流文件只加载一次；所有prompt同时提交（或最多max_in_flight个），
+        使ComfyUI队列始终有任务。单个句子的工作流或执行错误作为该句子的失败结果返回，不影响其他句子；
+        服务器不可用（连接错误、5xx、服务器重启丢失任务）时结束整批并抛出异常，
+        由调用方（ComfyUIPool）把尚未返回结果的句子分配到其他服务器。
+
+        Args:
+            workflow_type: 'image' 或 'audio'
+            project_path: 项目路径
+            sentence_ids: 句子ID列表
+            seed: 图像随机种子，None表示每个句子随机生成
+            max_in_flight: 同时在ComfyUI队列中的最大prompt数，0表示不限制
+            force_new: 为True时不使用生成结果缓存
+
+        Yields:
+            dict: {'sentence_id': int, 'files': List[str], 'error': Optional[str]}
+
+        Raises:
+            Exception: 服务器不可用（is_server_error为True的异常）
+        """
+        if workflow_type not in ('image', 'audio'):
+            raise ValueError(f"不支持的工作流类型: {workflow_type}")
+
+        paper_data = self._client._load_paper_data(project_path)
+        if not paper_data:
+            raise Exception("无法加载paper.json数据")
+        workflow_template = self._client._load_workflow_from_config(workflow_type)
+        if not workflow_template:
+            raise Exception("无法加载工作流配置")
+
+        semaphore = asyncio.Semaphore(max_in_flight) if max_in_flight > 0 else None
+
+        async def run(sentence_id: int) -> Dict[str, Any]:
+            try:
+                if semaphore:
+                    await semaphore.acquire()
+                try:
+                    if workflow_type == 'image':
+                        files = await self.generate_image(project_path, sentence_id, seed, paper_data,
+                                                          workflow_template, force_new)
+                    else:
+                        files = await self.generate_audio(project_path, sentence_id, paper_data,
+                                                          workflow_template, force_new)
+                finally:
+                    if semaphore:
+                        semaphore.release()
+                return {'sentence_id': sentence_id, 'files': files, 'error': None}
+            except Exception as e:
+                if is_server_error(e):
+                    raise
+                logger.error(f"句子 {sentence_id} 生成失败: {e}")
+                return {'sentence_id': sentence_id, 'files': [], 'error': str(e)}
+
+        tasks = [asyncio.ensure_future(run(sentence_id)) for sentence_id in sentence_ids]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+                # 服务器故障时其余句子也会以同样的错误结束（取消时可能已经结束），第一个已向上抛出，其余的取出后丢弃
+                task.add_done_callback(lambda done: done.cancelled() or done.exception())
+
+
+def iter_generate_batch(workflow_type: str, project_path: str, sentence_ids: List[int],
+                        server_address: str = None, seed: Optional[int] = None,
+                        max_in_flight: int = 0, comfyui_output_dir: Optional[str] = None,
+                        force_new: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    在后台线程的事件循环中运行AsyncComfyUIClient.generate_batch，以同步迭代器逐个返回结果（供Django视图流式输出）
+
+    调用方停止迭代后后台线程仍会等已提交的prompt完成并保存文件，不会留下写了一半的输出。
+
+    Args:
+        workflow_type: 'image' 或 'audio'
+        project_path: 项目路径
+        sentence_ids: 句子ID列表
+        server_address: ComfyUI地址（host:port），None表示从config.ini读取
+        seed: 图像随机种子，None表示每个句子随机生成
+        max_in_flight: 同时在ComfyUI队列中的最大prompt数，0表示不限制
+        comfyui_output_dir: 本机可访问的ComfyUI输出目录，设置后输出文件优先硬链接或复制
+        force_new: 为True时不使用生成结果缓存
+
+    Yields:
+        dict: {'sentence_id': int, 'files': List[str], 'error': Optional[str]}
+
+    Raises:
+        Exception: 连接ComfyUI、加载paper.json或工作流失败，或生成过程中服务器不可用
+    """
+    results = queue.Queue()
+    done = object()
+
+    async def run():
+        async with AsyncComfyUIClient(server_address, comfyui_output_dir=comfyui_output_dir) as client:
+            async for result in client.generate_batch(workflow_type, project_path, sentence_ids,
+                                                      seed, max_in_flight, force_new):
+                results.put(result)
+
+    def worker():
+        try:
+            asyncio.run(run())
+        except Exception as e:
+            results.put(e)
+        finally:
+            results.put(done)
+
+    threading.Thread(target=worker, name='comfyui-batch', daemon=True).start()
+    while True:
+        item = results.get()
+        if item is done:
+            break
+        if isinstance(item, Exception):
+            raise item
+        yield item
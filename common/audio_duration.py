@@ -0,0 +1,176 @@
+"""
+音频时长模块
+只读取容器头获取音频时长：WAV/FLAC/OGG等使用soundfile.info，压缩格式使用ffprobe，
+结果按 路径+修改时间+文件大小 缓存，并提供项目音频目录的批量查询和AUDIO_INFO补全
+"""
+
+import os
+import re
+import logging
+import threading
+import configparser
+from typing import Optional, Dict, Any, List
+
+try:
+    import soundfile as sf
+    SOUNDFILE_AVAILABLE = True
+except ImportError:
+    SOUNDFILE_AVAILABLE = False
+
+from media_probe import get_media_probe
+
+logger = logging.getLogger(__name__)
+
+# soundfile可以仅凭文件头得到采样数和采样率的格式，其余格式（mp3/m4a/aac等）交给ffprobe
+HEADER_FORMATS = ('.wav', '.flac', '.ogg', '.aiff', '.aif')
+
+# 项目audios目录中支持的音频格式
+AUDIO_EXTENSIONS = ('.flac', '.wav', '.mp3', '.m4a', '.aac', '.ogg')
+
+
+class AudioDurationService:
+    """
+    音频时长服务
+
+    时长只从文件头读取，不解码音频数据；结果按绝对路径缓存在进程内，
+    修改时间或文件大小变化时重新读取。ffprobe的结果另外由media_probe持久化缓存。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cache = {}  # 绝对路径 -> (修改时间纳秒, 文件大小, 时长)
+
+    def get_duration(self, audio_path: str) -> Optional[float]:
+        """
+        获取音频时长
+
+        Args:
+            audio_path: 音频文件路径
+
+        Returns:
+            时长（秒），文件不存在或无法读取时返回None
+        """
+        abs_path = os.path.abspath(audio_path)
+        try:
+            stat_info = os.stat(abs_path)
+        except OSError:
+            logger.error(f"音频文件不存在: {audio_path}")
+            return None
+
+        with self._lock:
+            cached = self._cache.get(abs_path)
+        if cached and cached[0] == stat_info.st_mtime_ns and cached[1] == stat_info.st_size:
+            return cached[2]
+
+        duration = self._read_duration(abs_path)
+        if duration is not None:
+            with self._lock:
+                self._cache[abs_path] = (stat_info.st_mtime_ns, stat_info.st_size, duration)
+        return duration
+
+    def _read_duration(self, abs_path: str) -> Optional[float]:
+        """从文件头读取时长（soundfile优先，失败或不支持时使用ffprobe）"""
+        if SOUNDFILE_AVAILABLE and abs_path.lower().endswith(HEADER_FORMATS):
+            try:
+                info = sf.info(abs_path)
+                if info.samplerate:
+                    return info.frames / info.samplerate
+            except Exception as e:
+                logger.warning(f"soundfile读取音频头失败，改用ffprobe {abs_path}: {e}")
+
+        info = get_media_probe().probe(abs_path)
+        if not info:
+            return None
+        audio = info.get('audio') or {}
+        return audio.get('duration') or info.get('duration')
+
+    def get_project_durations(self, project_path: str) -> List[Dict[str, Any]]:
+        """
+        获取项目audios目录下所有音频文件的时长
+
+        Args:
+            project_path: 项目路径
+
+        Returns:
+            List[dict]: 每个文件的 {'filename', 'script_id', 'duration'}，script_id对应script_N_1.*中的N，
+                        不符合命名规则的文件为None；按script_id和文件名排序
+        """
+        audios_dir = os.path.join(project_path, 'audios')
+        if not os.path.isdir(audios_dir):
+            return []
+
+        results = []
+        for filename in os.listdir(audios_dir):
+            if not filename.lower().endswith(AUDIO_EXTENSIONS):
+                continue
+            match = re.fullmatch(r'script_(\d+)_1\.\w+', filename)
+            results.append({
+                'filename': filename,
+                'script_id': int(match.group(1)) if match else None,
+                'duration': self.get_duration(os.path.join(audios_dir, filename))
+            })
+
+        get_media_probe().flush()
+        results.sort(key=lambda item: (item['script_id'] is None, item['script_id'] or 0, item['filename']))
+        return results
+
+    def backfill_audio_info(self, project_path: str, config: configparser.ConfigParser) -> int:
+        """
+        为AUDIO_INFO中缺少时长的片段补全script_N_duration，并写回parameter.ini
+
+        Args:
+            project_path: 项目路径
+            config: 已读取parameter.ini的ConfigParser对象（会被原地更新）
+
+        Returns:
+            int: 补全的条目数
+        """
+        filled = 0
+        for item in self.get_project_durations(project_path):
+            if item['script_id'] is None or item['duration'] is None:
+                continue
+            duration_key = f"script_{item['script_id']}_duration"
+            if config.has_section('AUDIO_INFO') and config.has_option('AUDIO_INFO', duration_key):
+                continue
+            if not config.has_section('AUDIO_INFO'):
+                config.add_section('AUDIO_INFO')
+            config.set('AUDIO_INFO', duration_key, str(item['duration']))
+            filled += 1
+
+        if filled:
+            parameter_file = os.path.join(project_path, 'parameter.ini')
+            with open(parameter_file, 'w', encoding='utf-8') as f:
+                config.write(f)
+            logger.info(f"已补全 {filled} 个音频时长到parameter.ini: {parameter_file}")
+        return filled
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_audio_duration_service() -> AudioDurationService:
+    """
+    获取进程内共享的音频时长服务
+
+    Returns:
+        AudioDurationService: 音频时长服务
+    """
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = AudioDurationService()
+        return _service
+
+
+def get_audio_duration(audio_path: str) -> Optional[float]:
+    """
+    获取音频时长（使用共享服务和缓存）
+
+    Args:
+        audio_path: 音频文件路径
+
+    Returns:
+        时长（秒）或None
+    """
+    return get_audio_duration_service().get_duration(audio_path)
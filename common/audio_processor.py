@@ -4,14 +4,16 @@
 """
 
 import os
+import re
+import time
 import logging
 import configparser
-from typing import Tuple, Optional
+from concurrent.futures import ProcessPoolExecutor
+from typing import Tuple, Optional, Dict, List, Any
 
+# 静音裁剪由silence_trim实现（依赖soundfile和numpy），时长读取只读文件头，不再需要导入耗时数秒的librosa
 try:
-    import librosa
-    import soundfile as sf
-    import numpy as np
+    from silence_trim import trim_silence_file
     AUDIO_LIBS_AVAILABLE = True
 except ImportError:
     AUDIO_LIBS_AVAILABLE = False
@@ -31,72 +33,49 @@ class AudioProcessor:
     def trim_silence(self, audio_path: str, output_path: str = None, 
                     silence_threshold: float = 0.01, frame_length: int = 2048, 
                     hop_length: int = 512, pre_pause: float = 0.0, 
-                    post_pause: float = 0.0) -> Tuple[str, float]:
+                    post_pause: float = 0.0, top_db: float = 20.0) -> Tuple[str, float]:
         """
         去除音频文件前后的无声部分，并添加指定的前后停顿
         
+        以原始采样率、声道和采样格式处理，静音判定与librosa.effects.trim相同
+        （帧RMS能量低于最大帧能量top_db分贝视为静音），只写入裁剪后的片段和停顿。
+        
         参数:
             audio_path: 输入音频文件路径
             output_path: 输出音频文件路径，如果为None则覆盖原文件
-            silence_threshold: 静音阈值（0-1之间）
+            silence_threshold: 保留参数，兼容旧调用，实际阈值由top_db决定
             frame_length: 帧长度
             hop_length: 跳跃长度
             pre_pause: 前停顿时长（秒）
             post_pause: 后停顿时长（秒）
+            top_db: 静音阈值（相对最大帧能量的分贝数）
             
         返回:
             (处理后的文件路径, 音频时长)
         """
         if not AUDIO_LIBS_AVAILABLE:
-            raise ImportError("音频处理库未安装，请安装 librosa 和 soundfile")
+            raise ImportError("音频处理库未安装，请安装 soundfile 和 numpy")
         
         try:
-            # 读取音频文件
             self.logger.info(f"开始处理音频文件: {audio_path}")
-            audio, sr = librosa.load(audio_path, sr=None)
-            
-            # 计算原始时长
-            original_duration = len(audio) / sr
-            self.logger.info(f"原始音频时长: {original_duration:.2f}秒")
-            
-            # 去除前后的静音部分
-            # 使用librosa的trim函数，基于能量阈值
-            audio_trimmed, index = librosa.effects.trim(
-                audio, 
-                top_db=20,  # 静音阈值（分贝）
+            output_path, original_duration, final_duration = trim_silence_file(
+                audio_path,
+                output_path,
+                top_db=top_db,
                 frame_length=frame_length,
-                hop_length=hop_length
+                hop_length=hop_length,
+                pre_pause=pre_pause,
+                post_pause=post_pause
             )
             
-            # 添加前后停顿
-            if pre_pause > 0 or post_pause > 0:
-                # 创建静音片段
-                pre_silence_samples = int(pre_pause * sr) if pre_pause > 0 else 0
-                post_silence_samples = int(post_pause * sr) if post_pause > 0 else 0
-                
-                pre_silence = np.zeros(pre_silence_samples)
-                post_silence = np.zeros(post_silence_samples)
-                
-                # 拼接：前停顿 + 音频 + 后停顿
-                audio_with_pauses = np.concatenate([pre_silence, audio_trimmed, post_silence])
-                
+            pause_duration = max(pre_pause, 0.0) + max(post_pause, 0.0)
+            trimmed_duration = final_duration - pause_duration
+            self.logger.info(f"原始音频时长: {original_duration:.2f}秒")
+            if pause_duration > 0:
                 self.logger.info(f"添加了前停顿 {pre_pause:.2f}秒，后停顿 {post_pause:.2f}秒")
-            else:
-                audio_with_pauses = audio_trimmed
-            
-            # 计算处理后的时长
-            final_duration = len(audio_with_pauses) / sr
-            trimmed_duration = len(audio_trimmed) / sr
             self.logger.info(f"去除静音后时长: {trimmed_duration:.2f}秒")
             self.logger.info(f"最终音频时长: {final_duration:.2f}秒")
             self.logger.info(f"去除了 {original_duration - trimmed_duration:.2f}秒的静音")
-            
-            # 确定输出路径
-            if output_path is None:
-                output_path = audio_path
-            
-            # 保存处理后的音频
-            sf.write(output_path, audio_with_pauses, sr)
             self.logger.info(f"处理后的音频已保存: {output_path}")
             
             return output_path, final_duration
@@ -115,11 +94,13 @@ class AudioProcessor:
         返回:
             音频时长（秒）
         """
-        if not AUDIO_LIBS_AVAILABLE:
-            raise ImportError("音频处理库未安装，请安装 librosa")
+        from audio_duration import get_audio_duration
         
         try:
-            duration = librosa.get_duration(filename=audio_path)
+            # 只读取文件头（soundfile或ffprobe），结果按路径和修改时间缓存
+            duration = get_audio_duration(audio_path)
+            if duration is None:
+                raise ValueError(f"无法读取音频时长: {audio_path}")
             return duration
         except Exception as e:
             self.logger.error(f"获取音频时长失败: {e}")
@@ -161,6 +142,19 @@ class AudioProcessor:
             script_id: 脚本ID
             duration: 音频时长
             
+        返回:
+            是否更新成功
+        """
+        return self.update_parameter_ini_batch(project_path, {script_id: duration})
+    
+    def update_parameter_ini_batch(self, project_path: str, durations: Dict[int, float]) -> bool:
+        """
+        一次性写入多个音频时长到parameter.ini文件
+        
+        参数:
+            project_path: 项目路径
+            durations: 脚本ID -> 音频时长
+            
         返回:
             是否更新成功
         """
@@ -186,14 +180,15 @@ class AudioProcessor:
                 self._add_default_video_subtitle_config(config)
             
             # 设置音频时长
-            duration_key = f'script_{script_id}_duration'
-            config.set('AUDIO_INFO', duration_key, str(duration))
+            for script_id, duration in sorted(durations.items()):
+                duration_key = f'script_{script_id}_duration'
+                config.set('AUDIO_INFO', duration_key, str(duration))
+                self.logger.info(f'音频时长已写入parameter.ini: {duration_key}={duration:.2f}秒')
             
             # 写入配置文件
             with open(parameter_file, 'w', encoding='utf-8') as f:
                 config.write(f)
             
-            self.logger.info(f'音频时长已写入parameter.ini: {duration_key}={duration:.2f}秒')
             return True
             
         except Exception as e:
@@ -222,6 +217,9 @@ class AudioProcessor:
             # 添加默认的视频淡入淡出配置
             self._add_default_video_fade_config(config)
             
+            # 添加默认的视频渲染配置
+            self._add_default_video_render_config(config)
+            
             # 写入文件
             with open(parameter_file, 'w', encoding='utf-8') as f:
                 config.write(f)
@@ -366,6 +364,75 @@ class AudioProcessor:
                 
         except Exception as e:
             self.logger.error(f'加载默认视频淡入淡出配置失败: {e}')
+        
+        return default_config
+    
+    def _add_default_video_render_config(self, config: configparser.ConfigParser):
+        """
+        添加默认的视频渲染配置到ConfigParser对象
+        
+        参数:
+            config: ConfigParser对象
+        """
+        try:
+            # 尝试从主配置文件读取默认值
+            default_values = self._load_default_video_render_config()
+            
+            # 添加VIDEO_RENDER节
+            config.add_section('VIDEO_RENDER')
+            
+            # 设置默认值
+            for key, value in default_values.items():
+                config.set('VIDEO_RENDER', key, str(value))
+            
+            self.logger.info("已添加默认VIDEO_RENDER配置")
+            
+        except Exception as e:
+            self.logger.error(f'添加默认VIDEO_RENDER配置失败: {e}')
+    
+    def _load_default_video_render_config(self) -> dict:
+        """
+        从主配置文件加载默认的视频渲染配置
+        
+        返回:
+            dict: 默认视频渲染配置字典
+        """
+        default_config = {
+            'render_mode': 'fused',
+            'still_image_mode': 'true',
+            'unified_audio_track': 'true',
+            'max_workers': 0,
+            'ffmpeg_threads': 0,
+            'single_graph_max_segments': 12,
+            'single_graph_max_duration': 60,
+            'preview_max_size': 640,
+            'preview_fps': 12
+        }
+        
+        try:
+            # 获取项目根目录路径
+            project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            config_path = os.path.join(project_root, 'config.ini')
+            
+            if os.path.exists(config_path):
+                main_config = configparser.ConfigParser(interpolation=None)
+                main_config.read(config_path, encoding='utf-8')
+                
+                # 如果主配置文件中有VIDEO_RENDER_CONFIG节，使用其中的值
+                if main_config.has_section('VIDEO_RENDER_CONFIG'):
+                    for key in default_config.keys():
+                        option = f'default_{key}'
+                        if main_config.has_option('VIDEO_RENDER_CONFIG', option):
+                            default_config[key] = main_config.get('VIDEO_RENDER_CONFIG', option)
+                    
+                    self.logger.info(f"从主配置文件加载视频渲染默认配置: {default_config}")
+                else:
+                    self.logger.info("主配置文件中未找到VIDEO_RENDER_CONFIG节，使用内置默认值")
+            else:
+                self.logger.warning("主配置文件不存在，使用内置默认值")
+                
+        except Exception as e:
+            self.logger.error(f'加载默认视频渲染配置失败: {e}')
             
         return default_config
     
@@ -386,6 +453,7 @@ class AudioProcessor:
             # 设置默认值
             config.set('AUDIO_PAUSE', 'pre_pause', str(default_values['pre_pause']))
             config.set('AUDIO_PAUSE', 'post_pause', str(default_values['post_pause']))
+            config.set('AUDIO_PAUSE', 'trim_top_db', str(default_values['trim_top_db']))
             
             self.logger.info(f"已添加默认音频停顿配置: 前停顿={default_values['pre_pause']}秒, 后停顿={default_values['post_pause']}秒")
             
@@ -401,7 +469,8 @@ class AudioProcessor:
         """
         default_config = {
             'pre_pause': 0.25,
-            'post_pause': 0.25
+            'post_pause': 0.25,
+            'trim_top_db': 20.0
         }
         
         try:
@@ -421,6 +490,8 @@ class AudioProcessor:
                         default_config['pre_pause'] = main_config.getfloat('AUDIO_PAUSE_CONFIG', 'default_pre_pause')
                     if main_config.has_option('AUDIO_PAUSE_CONFIG', 'default_post_pause'):
                         default_config['post_pause'] = main_config.getfloat('AUDIO_PAUSE_CONFIG', 'default_post_pause')
+                    if main_config.has_option('AUDIO_PAUSE_CONFIG', 'default_trim_top_db'):
+                        default_config['trim_top_db'] = main_config.getfloat('AUDIO_PAUSE_CONFIG', 'default_trim_top_db')
                     
                     self.logger.info(f"已从主配置文件加载默认音频停顿配置: 前停顿={default_config['pre_pause']}秒, 后停顿={default_config['post_pause']}秒")
                 else:
@@ -549,6 +620,38 @@ class AudioProcessor:
             default_config = self._load_default_audio_pause_config()
             return default_config['pre_pause'], default_config['post_pause']
     
+    def _load_trim_top_db_from_parameter(self, project_path: str) -> float:
+        """
+        从项目的parameter.ini文件读取静音裁剪阈值（AUDIO_PAUSE节的trim_top_db）
+        
+        参数:
+            project_path: 项目路径
+            
+        返回:
+            float: 静音阈值（分贝），未配置时使用主配置文件中的默认值
+        """
+        default_top_db = self._load_default_audio_pause_config()['trim_top_db']
+        try:
+            config = configparser.ConfigParser()
+            config.read(os.path.join(project_path, 'parameter.ini'), encoding='utf-8')
+            return config.getfloat('AUDIO_PAUSE', 'trim_top_db', fallback=default_top_db)
+        except Exception as e:
+            self.logger.error(f'从parameter.ini加载静音裁剪阈值失败: {e}')
+            return default_top_db
+    
+    def load_trim_settings(self, project_path: str) -> Tuple[float, float, float]:
+        """
+        读取项目的静音裁剪设置，批量处理时只读取一次供所有文件共用
+        
+        参数:
+            project_path: 项目路径
+            
+        返回:
+            Tuple[float, float, float]: (前停顿时长, 后停顿时长, 静音阈值top_db)
+        """
+        pre_pause, post_pause = self._load_audio_pause_from_parameter(project_path)
+        return pre_pause, post_pause, self._load_trim_top_db_from_parameter(project_path)
+    
     def process_audio_after_generation(self, audio_path: str, project_path: str, 
                                      script_id: int) -> Tuple[str, float]:
         """
@@ -570,7 +673,8 @@ class AudioProcessor:
             processed_path, duration = self.trim_silence(
                 audio_path, 
                 pre_pause=pre_pause, 
-                post_pause=post_pause
+                post_pause=post_pause,
+                top_db=self._load_trim_top_db_from_parameter(project_path)
             )
             
             # 3. 更新parameter.ini文件中的音频时长
@@ -582,6 +686,119 @@ class AudioProcessor:
         except Exception as e:
             self.logger.error(f"音频后处理失败: {e}")
             raise
+    
+    def process_project_audios(self, project_path: str, script_ids: Optional[List[int]] = None,
+                               max_workers: int = 0) -> Dict[str, Any]:
+        """
+        批量处理项目的全部旁白文件：多进程并行去除静音、添加停顿并测量时长，
+        最后一次性写入parameter.ini
+        
+        参数:
+            project_path: 项目路径
+            script_ids: 需要处理的脚本ID列表，None表示audios目录下所有script_N_1.*
+            max_workers: 并行进程数，0表示按CPU核心数自动计算
+            
+        返回:
+            dict: {'success', 'processed', 'failed', 'files': 每个文件的时长和耗时, 'elapsed'}
+        """
+        if not AUDIO_LIBS_AVAILABLE:
+            raise ImportError("音频处理库未安装，请安装 soundfile 和 numpy")
+        
+        started = time.perf_counter()
+        
+        # 查找旁白文件，同一脚本有多种格式时按优先级取第一个（与视频渲染查找顺序一致）
+        audios_dir = os.path.join(project_path, 'audios')
+        audio_extensions = ['.flac', '.wav', '.mp3', '.m4a', '.aac', '.ogg']
+        audio_files = {}
+        if os.path.isdir(audios_dir):
+            for filename in os.listdir(audios_dir):
+                match = re.fullmatch(r'script_(\d+)_1(\.\w+)', filename)
+                if not match or match.group(2).lower() not in audio_extensions:
+                    continue
+                script_id = int(match.group(1))
+                if script_ids is not None and script_id not in script_ids:
+                    continue
+                current = audio_files.get(script_id)
+                if current is None or audio_extensions.index(match.group(2).lower()) < audio_extensions.index(os.path.splitext(current)[1].lower()):
+                    audio_files[script_id] = os.path.join(audios_dir, filename)
+        
+        if not audio_files:
+            self.logger.warning(f"项目中没有需要处理的旁白文件: {audios_dir}")
+            return {'success': True, 'processed': 0, 'failed': 0, 'files': [], 'elapsed': 0.0}
+        
+        # 停顿和静音阈值只读取一次，所有文件共用
+        pre_pause, post_pause, top_db = self.load_trim_settings(project_path)
+        jobs = [(script_id, path, pre_pause, post_pause, top_db) for script_id, path in sorted(audio_files.items())]
+        
+        workers = max_workers if max_workers and max_workers > 0 else (os.cpu_count() or 1)
+        workers = min(workers, len(jobs))
+        self.logger.info(f"开始批量处理 {len(jobs)} 个旁白文件，并行进程数: {workers}")
+        
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(_process_audio_job, jobs))
+        else:
+            results = [_process_audio_job(job) for job in jobs]
+        
+        # 裁剪失败的文件（如soundfile不支持的格式）仍从文件头读取时长，保证AUDIO_INFO完整
+        durations = {}
+        for result in results:
+            if result['error']:
+                self.logger.error(f"处理旁白失败 script_{result['script_id']}: {result['error']}")
+                try:
+                    result['duration'] = self.get_audio_duration(audio_files[result['script_id']])
+                except Exception as e:
+                    self.logger.error(f"读取旁白时长失败 script_{result['script_id']}: {e}")
+            else:
+                self.logger.info(f"旁白处理完成 script_{result['script_id']}: "
+                                 f"{result['original_duration']:.2f}秒 -> {result['duration']:.2f}秒, 耗时 {result['elapsed']:.3f}秒")
+            if result['duration'] is not None:
+                durations[result['script_id']] = result['duration']
+        
+        saved = self.update_parameter_ini_batch(project_path, durations) if durations else True
+        elapsed = round(time.perf_counter() - started, 4)
+        failed = sum(1 for result in results if result['error'])
+        self.logger.info(f"批量处理旁白完成: 成功 {len(results) - failed} 个, 失败 {failed} 个, 总耗时 {elapsed:.2f}秒")
+        
+        return {
+            'success': saved,
+            'processed': len(results) - failed,
+            'failed': failed,
+            'files': results,
+            'elapsed': elapsed
+        }
+
+
+def _process_audio_job(job: Tuple[int, str, float, float, float]) -> Dict[str, Any]:
+    """
+    进程池任务：去除单个旁白文件的静音并添加停顿（模块级函数，便于子进程序列化）
+    
+    参数:
+        job: (脚本ID, 音频路径, 前停顿, 后停顿, 静音阈值top_db)
+        
+    返回:
+        dict: {'script_id', 'file', 'duration', 'original_duration', 'elapsed', 'error'}
+    """
+    script_id, audio_path, pre_pause, post_pause, top_db = job
+    started = time.perf_counter()
+    result = {
+        'script_id': script_id,
+        'file': os.path.basename(audio_path),
+        'duration': None,
+        'original_duration': None,
+        'elapsed': 0.0,
+        'error': None
+    }
+    try:
+        _, original_duration, final_duration = trim_silence_file(
+            audio_path, pre_pause=pre_pause, post_pause=post_pause, top_db=top_db
+        )
+        result['duration'] = final_duration
+        result['original_duration'] = original_duration
+    except Exception as e:
+        result['error'] = str(e)
+    result['elapsed'] = round(time.perf_counter() - started, 4)
+    return result
 
 
 def process_audio_file(audio_path: str, project_path: str, script_id: int) -> Tuple[str, float]:
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AutoMovie背景音乐底轨缓存模块
+背景音乐文件只解码一次并缓存为PCM，按目标时长生成循环、音量和淡入淡出都已处理好的底轨，
+底轨按 (文件哈希, 时长, 音量, 淡入淡出, 循环模式) 缓存，渲染时只需一次简单混音
+"""
+
+import os
+import logging
+import threading
+import configparser
+from typing import Optional, Dict, Any, Tuple
+
+import numpy as np
+
+from file_cache import FileLRUCache, hash_file, hash_payload
+
+logger = logging.getLogger(__name__)
+
+# 缓存键版本号，底轨生成逻辑发生不兼容变化时递增，使旧缓存自然失效
+BGM_BED_CACHE_VERSION = 1
+
+
+def load_bgm_cache_config() -> Dict[str, Any]:
+    """
+    从config.ini加载背景音乐底轨缓存配置
+
+    Returns:
+        dict: {'enabled': bool, 'cache_dir': str, 'max_size_mb': int}
+    """
+    # 获取项目根目录路径
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    cache_config = {
+        'enabled': True,
+        'cache_dir': os.path.join(project_root, 'cache', 'bgm'),
+        'max_size_mb': 1024
+    }
+
+    try:
+        config_path = os.path.join(project_root, 'config.ini')
+        if os.path.exists(config_path):
+            config = configparser.ConfigParser(interpolation=None)
+            config.read(config_path, encoding='utf-8')
+
+            if config.has_section('BGM_CACHE_CONFIG'):
+                cache_config['enabled'] = config.getboolean('BGM_CACHE_CONFIG', 'enable_cache', fallback=True)
+                cache_config['max_size_mb'] = config.getint('BGM_CACHE_CONFIG', 'max_size_mb', fallback=1024)
+                cache_dir = config.get('BGM_CACHE_CONFIG', 'cache_dir', fallback='').strip()
+                if cache_dir:
+                    # 支持绝对路径或相对于项目根目录的路径
+                    cache_config['cache_dir'] = cache_dir if os.path.isabs(cache_dir) else os.path.join(project_root, cache_dir)
+    except Exception as e:
+        logger.error(f"加载背景音乐缓存配置失败，使用默认值: {e}")
+
+    return cache_config
+
+
+def render_bgm_bed(bgm: np.ndarray, total_samples: int, volume: float, fade_in: float = 0.0,
+                   fade_out: float = 0.0, loop: bool = True, sample_rate: int = 44100) -> Tuple[np.ndarray, int]:
+    """
+    由解码后的背景音乐生成指定长度的底轨
+
+    Args:
+        bgm: 解码后的背景音乐 (采样数, 声道数)
+        total_samples: 底轨采样数（即成片音频长度）
+        volume: 音量（0~1）
+        fade_in: 淡入时长（秒）
+        fade_out: 淡出时长（秒），在底轨结尾处淡出
+        loop: 是否循环背景音乐以覆盖整条底轨
+        sample_rate: 采样率
+
+    Returns:
+        Tuple[np.ndarray, int]: (float32底轨, 背景音乐实际覆盖的采样数)
+    """
+    bed = np.zeros((total_samples, bgm.shape[1]), dtype=np.float32)
+    if total_samples == 0 or len(bgm) == 0:
+        return bed, 0
+
+    if loop and len(bgm) < total_samples:
+        bgm = np.tile(bgm, (-(-total_samples // len(bgm)), 1))
+    active_samples = min(len(bgm), total_samples)
+    bed[:active_samples] = bgm[:active_samples]
+    bed *= volume
+
+    if fade_in > 0:
+        fade_samples = min(int(fade_in * sample_rate), total_samples)
+        bed[:fade_samples] *= np.linspace(0.0, 1.0, fade_samples, endpoint=False, dtype=np.float32)[:, None]
+    if fade_out > 0:
+        fade_samples = min(int(fade_out * sample_rate), total_samples)
+        bed[total_samples - fade_samples:] *= np.linspace(1.0, 0.0, fade_samples, dtype=np.float32)[:, None]
+
+    return bed, active_samples
+
+
+class BGMBedCache:
+    """
+    背景音乐底轨缓存
+
+    两类条目共用一个按大小淘汰的LRU目录，均保存为.npy：
+    解码后的PCM（键为文件内容哈希+采样率+声道数）和成品底轨（键再加上时长、音量、淡入淡出和循环模式）。
+    同一背景音乐在不同项目、不同时长之间共享解码结果；参数完全相同的重复渲染直接读取底轨。
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_size_mb: Optional[int] = None,
+                 enabled: Optional[bool] = None, ffmpeg_path: str = 'ffmpeg'):
+        cache_config = load_bgm_cache_config()
+        self.enabled = cache_config['enabled'] if enabled is None else enabled
+        self.cache_dir = cache_dir or cache_config['cache_dir']
+        self.ffmpeg_path = ffmpeg_path
+        max_size_mb = cache_config['max_size_mb'] if max_size_mb is None else max_size_mb
+        self._cache = FileLRUCache(self.cache_dir, max_size_mb * 1024 * 1024, suffix='.npy') if self.enabled else None
+
+    def _load(self, key: str) -> Optional[np.ndarray]:
+        """读取缓存条目（内存映射，只读）"""
+        if not self._cache:
+            return None
+        path = self._cache.get(key)
+        if not path:
+            return None
+        try:
+            return np.load(path, mmap_mode='r')
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取背景音乐缓存失败 {path}: {e}")
+            return None
+
+    def _store(self, key: str, samples: np.ndarray):
+        """写入缓存条目（先写到缓存目录内的临时文件，再移动为正式条目）"""
+        if not self._cache:
+            return
+        temp_path = os.path.join(self.cache_dir, f'{key}.{os.getpid()}.{threading.get_ident()}.tmp')
+        try:
+            with open(temp_path, 'wb') as f:
+                np.save(f, samples)
+            self._cache.put(key, temp_path, move=True)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def get_decoded(self, bgm_path: str, sample_rate: int, channels: int,
+                    file_hash: Optional[str] = None) -> np.ndarray:
+        """
+        获取解码后的背景音乐PCM，未缓存时解码一次并写入缓存
+
+        Args:
+            bgm_path: 背景音乐文件路径
+            sample_rate: 采样率
+            channels: 声道数
+            file_hash: 文件内容哈希（已计算时传入，避免重复读取文件）
+
+        Returns:
+            np.ndarray: (采样数, 声道数) 的float32数组
+        """
+        from narration_track import decode_audio
+
+        file_hash = file_hash or hash_file(bgm_path)
+        key = hash_payload({
+            'version': BGM_BED_CACHE_VERSION,
+            'type': 'decoded',
+            'file': file_hash,
+            'sample_rate': sample_rate,
+            'channels': channels
+        })
+        decoded = self._load(key)
+        if decoded is not None:
+            return decoded
+
+        decoded = decode_audio(bgm_path, sample_rate, channels, self.ffmpeg_path)
+        self._store(key, decoded)
+        logger.info(f"背景音乐已解码并缓存: {os.path.basename(bgm_path)} ({len(decoded) / sample_rate:.1f}秒)")
+        return decoded
+
+    def get_bed(self, bgm_path: str, total_samples: int, volume: float, fade_in: float = 0.0,
+                fade_out: float = 0.0, loop: bool = True, sample_rate: int = 44100,
+                channels: int = 2) -> Tuple[np.ndarray, int]:
+        """
+        获取指定长度、音量和淡入淡出的背景音乐底轨
+
+        Args:
+            bgm_path: 背景音乐文件路径
+            total_samples: 底轨采样数
+            volume: 音量（0~1）
+            fade_in: 淡入时长（秒）
+            fade_out: 淡出时长（秒）
+            loop: 是否循环
+            sample_rate: 采样率
+            channels: 声道数
+
+        Returns:
+            Tuple[np.ndarray, int]: (底轨, 背景音乐实际覆盖的采样数)
+        """
+        file_hash = hash_file(bgm_path)
+        key = hash_payload({
+            'version': BGM_BED_CACHE_VERSION,
+            'type': 'bed',
+            'file': file_hash,
+            'samples': total_samples,
+            'volume': round(volume, 6),
+            'fade_in': round(fade_in, 6),
+            'fade_out': round(fade_out, 6),
+            'loop': loop,
+            'sample_rate': sample_rate,
+            'channels': channels
+        })
+
+        decoded = None
+        bed = self._load(key)
+        if bed is None:
+            decoded = self.get_decoded(bgm_path, sample_rate, channels, file_hash)
+            bed, active_samples = render_bgm_bed(decoded, total_samples, volume, fade_in, fade_out, loop, sample_rate)
+            self._store(key, bed)
+            if self._cache:
+                self._cache.record(misses=1)
+            logger.info(f"背景音乐底轨已生成: {os.path.basename(bgm_path)} {total_samples / sample_rate:.2f}秒")
+            return bed, active_samples
+
+        # 不循环时底轨只在背景音乐长度内有声音，覆盖长度由解码结果的长度决定
+        if loop:
+            active_samples = total_samples
+        else:
+            decoded = self.get_decoded(bgm_path, sample_rate, channels, file_hash)
+            active_samples = min(len(decoded), total_samples)
+        if self._cache:
+            self._cache.record(hits=1)
+        logger.info(f"背景音乐底轨缓存命中: {os.path.basename(bgm_path)}")
+        return bed, active_samples
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+
+        Returns:
+            dict: 缓存统计
+        """
+        if not self._cache:
+            return {'enabled': False, 'cache_dir': self.cache_dir}
+        stats = self._cache.get_stats()
+        stats['enabled'] = True
+        return stats
+
+
+_bgm_bed_cache = None
+_bgm_bed_cache_lock = threading.Lock()
+
+
+def get_bgm_bed_cache() -> BGMBedCache:
+    """
+    获取进程内共享的背景音乐底轨缓存
+
+    Returns:
+        BGMBedCache: 背景音乐底轨缓存
+    """
+    global _bgm_bed_cache
+    with _bgm_bed_cache_lock:
+        if _bgm_bed_cache is None:
+            _bgm_bed_cache = BGMBedCache()
+        return _bgm_bed_cache
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ComfyUI客户端吞吐量基准测试
+在不同并发数下提交合成的图像/音频工作流，统计吞吐量和延迟分位数（p50/p95/p99），
+用于比较ComfyUIClient（线程并发）、AsyncComfyUIClient和ComfyUIPool的表现。
+默认在本进程内启动模拟ComfyUI服务器（fake_comfyui_server.py），也可以用--address指定真实服务器。
+
+用法:
+    python comfyui_benchmark.py --jobs 32 --concurrency 1,4,16 --modes sync,async,pool
+    python comfyui_benchmark.py --fake-servers 3 --server-latency 0.2 --modes pool
+"""
+
+import os
+import sys
+import time
+import shutil
+import asyncio
+import logging
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Callable
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from comfyui_client import ComfyUIClient
+from fake_comfyui_server import FakeComfyUIServer
+
+logger = logging.getLogger(__name__)
+
+MODES = ('sync', 'async', 'pool')
+
+
+def build_workflow(workflow_type: str, index: int, width: int = 512, height: int = 512) -> dict:
+    """
+    构造最小的合成工作流（每个任务的种子/文本不同，保证输出互不相同）
+
+    Args:
+        workflow_type: 'image' 或 'audio'
+        index: 任务序号
+        width: 图像宽度
+        height: 图像高度
+
+    Returns:
+        dict: ComfyUI API格式的工作流
+    """
+    if workflow_type == 'audio':
+        return {
+            '1': {'class_type': 'CosyVoiceNode', 'inputs': {'tts_text': f'基准测试句子 {index}', 'seed': index}},
+            '2': {'class_type': 'SaveAudio', 'inputs': {'audio': ['1', 0], 'filename_prefix': 'audio/benchmark'}}
+        }
+    return {
+        '1': {'class_type': 'EmptyLatentImage', 'inputs': {'width': width, 'height': height, 'batch_size': 1}},
+        '2': {'class_type': 'KSampler', 'inputs': {'seed': index, 'steps': 1, 'latent_image': ['1', 0]}},
+        '3': {'class_type': 'SaveImage', 'inputs': {'images': ['2', 0], 'filename_prefix': 'benchmark'}}
+    }
+
+
+def percentile(values: List[float], q: float) -> float:
+    """最近秩法计算分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(q / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def summarize(mode: str, concurrency: int, latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    """汇总一轮测试结果"""
+    completed = len(latencies)
+    return {
+        'mode': mode,
+        'concurrency': concurrency,
+        'completed': completed,
+        'errors': errors,
+        'elapsed': elapsed,
+        'throughput': completed / elapsed if elapsed > 0 else 0.0,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99)
+    }
+
+
+def _run_threaded(job: Callable[[int], Any], jobs: int, concurrency: int):
+    """用线程池执行jobs个任务，返回(延迟列表, 失败数, 总耗时)"""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def timed(index: int):
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            files = job(index)
+            if not files:
+                raise RuntimeError('未返回任何文件')
+        except Exception as e:
+            logger.debug(f"任务 {index} 失败: {e}")
+            with lock:
+                errors += 1
+            return
+        with lock:
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed, range(jobs)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def run_sync(addresses: List[str], workflow_type: str, jobs: int, concurrency: int, output_dir: str,
+             comfyui_output_dirs: Dict[str, str]):
+    """ComfyUIClient：每个线程同步提交、等待、下载"""
+    client = ComfyUIClient(addresses[0], comfyui_output_dir=comfyui_output_dirs.get(addresses[0]))
+
+    def job(index: int):
+        urls = client.get_images_from_websocket(build_workflow(workflow_type, index))
+        return client.save_images_to_disk(urls, output_dir, f'sync_{index}') if workflow_type == 'image' \
+            else client._save_audios_to_disk(urls, output_dir, index, {})
+
+    try:
+        return _run_threaded(job, jobs, concurrency)
+    finally:
+        client.close()
+
+
+def run_pool(addresses: List[str], workflow_type: str, jobs: int, concurrency: int, output_dir: str,
+             comfyui_output_dirs: Dict[str, str]):
+    """ComfyUIPool：按排队数选择服务器，同步客户端在线程中执行"""
+    from comfyui_pool import ComfyUIPool, ComfyUIServer
+
+    pool = ComfyUIPool([ComfyUIServer(address, output_dir=comfyui_output_dirs.get(address)) for address in addresses],
+                       start_health_checks=False)
+
+    def job(index: int):
+        def task(server):
+            urls = server.client.get_images_from_websocket(build_workflow(workflow_type, index))
+            return server.client.save_images_to_disk(urls, output_dir, f'pool_{index}') if workflow_type == 'image' \
+                else server.client._save_audios_to_disk(urls, output_dir, index, {})
+        return pool._run_with_failover(workflow_type, task)
+
+    try:
+        return _run_threaded(job, jobs, concurrency)
+    finally:
+        pool.close()
+
+
+def run_async(addresses: List[str], workflow_type: str, jobs: int, concurrency: int, output_dir: str,
+              comfyui_output_dirs: Dict[str, str]):
+    """AsyncComfyUIClient：单个事件循环、共享WebSocket，最多concurrency个任务同时进行"""
+    from async_comfyui_client import AsyncComfyUIClient
+
+    async def main():
+        latencies = []
+        errors = 0
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async with AsyncComfyUIClient(addresses[0], max_connections=concurrency,
+                                      comfyui_output_dir=comfyui_output_dirs.get(addresses[0])) as client:
+            async def job(index: int):
+                nonlocal errors
+                async with semaphore:
+                    started = time.perf_counter()
+                    try:
+                        urls = await client.get_images_from_websocket(build_workflow(workflow_type, index))
+                        if workflow_type == 'image':
+                            files = await client.save_images_to_disk(urls, output_dir, f'async_{index}')
+                        else:
+                            files = await client._save_audios_to_disk(urls, output_dir, index, {})
+                        if not files:
+                            raise RuntimeError('未返回任何文件')
+                    except Exception as e:
+                        logger.debug(f"任务 {index} 失败: {e}")
+                        errors += 1
+                        return
+                    latencies.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(job(index) for index in range(jobs)))
+            return latencies, errors, time.perf_counter() - started
+
+    return asyncio.run(main())
+
+
+RUNNERS = {'sync': run_sync, 'async': run_async, 'pool': run_pool}
+
+
+def run_benchmark(addresses: List[str], modes: List[str], concurrency_levels: List[int], jobs: int,
+                  workflow_type: str = 'image', comfyui_output_dirs: Dict[str, str] = None) -> List[Dict[str, Any]]:
+    """
+    依次运行各模式、各并发数的测试
+
+    Args:
+        addresses: ComfyUI服务器地址列表（sync/async模式只使用第一台）
+        modes: 测试模式列表
+        concurrency_levels: 并发数列表
+        jobs: 每轮提交的任务数
+        workflow_type: 'image' 或 'audio'
+        comfyui_output_dirs: 服务器地址 -> 本机可访问的ComfyUI输出目录（从共享文件系统获取输出文件）
+
+    Returns:
+        List[dict]: 每轮的汇总结果
+    """
+    results = []
+    for mode in modes:
+        for concurrency in concurrency_levels:
+            output_dir = tempfile.mkdtemp(prefix=f'comfyui_bench_{mode}_')
+            try:
+                latencies, errors, elapsed = RUNNERS[mode](addresses, workflow_type, jobs, concurrency, output_dir,
+                                                           comfyui_output_dirs or {})
+            finally:
+                shutil.rmtree(output_dir, ignore_errors=True)
+            result = summarize(mode, concurrency, latencies, errors, elapsed)
+            results.append(result)
+            print(format_result(result), flush=True)
+    return results
+
+
+def format_result(result: Dict[str, Any]) -> str:
+    return (f"{result['mode']:<6} 并发={result['concurrency']:<4} 完成={result['completed']:<5} "
+            f"失败={result['errors']:<4} 耗时={result['elapsed']:7.2f}s 吞吐={result['throughput']:7.2f}/s "
+            f"p50={result['p50'] * 1000:8.1f}ms p95={result['p95'] * 1000:8.1f}ms p99={result['p99'] * 1000:8.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ComfyUI客户端吞吐量基准测试')
+    parser.add_argument('--address', action='append', default=[],
+                        help='真实ComfyUI服务器地址（host:port，可重复），不指定时启动模拟服务器')
+    parser.add_argument('--modes', default='sync,async', help=f'测试模式，逗号分隔，可选: {",".join(MODES)}')
+    parser.add_argument('--concurrency', default='1,4,16', help='并发数列表，逗号分隔')
+    parser.add_argument('--jobs', type=int, default=32, help='每轮提交的任务数')
+    parser.add_argument('--workflow-type', choices=('image', 'audio'), default='image')
+    parser.add_argument('--fake-servers', type=int, default=1, help='启动的模拟服务器数量（pool模式使用全部）')
+    parser.add_argument('--server-latency', type=float, default=0.05, help='模拟服务器每个prompt的执行耗时（秒）')
+    parser.add_argument('--server-jitter', type=float, default=0.0, help='模拟服务器执行耗时的随机波动（秒）')
+    parser.add_argument('--server-workers', type=int, default=1, help='每台模拟服务器并行执行的prompt数')
+    parser.add_argument('--execution-failure-rate', type=float, default=0.0, help='模拟服务器执行失败的概率')
+    parser.add_argument('--image-side', type=int, default=512, help='模拟服务器生成图像的长边上限')
+    parser.add_argument('--shared-output', action='store_true',
+                        help='模拟服务器把输出写入临时目录，客户端从共享文件系统获取输出文件而不是HTTP下载')
+    parser.add_argument('--verbose', action='store_true', help='输出客户端日志')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    modes = [mode.strip() for mode in args.modes.split(',') if mode.strip()]
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        parser.error(f"未知的测试模式: {','.join(unknown)}")
+    concurrency_levels = [int(value) for value in args.concurrency.split(',') if value.strip()]
+
+    servers = []
+    comfyui_output_dirs = {}
+    addresses = args.address
+    if not addresses:
+        for i in range(max(1, args.fake_servers)):
+            shared_dir = tempfile.mkdtemp(prefix='comfyui_bench_output_') if args.shared_output else None
+            server = FakeComfyUIServer(latency=args.server_latency, jitter=args.server_jitter,
+                                       workers=args.server_workers,
+                                       execution_failure_rate=args.execution_failure_rate,
+                                       max_image_side=args.image_side, output_dir=shared_dir, seed=i).start()
+            servers.append(server)
+            if shared_dir:
+                comfyui_output_dirs[server.address] = shared_dir
+        addresses = [server.address for server in servers]
+
+    print(f"服务器: {', '.join(addresses)}  任务数: {args.jobs}  工作流: {args.workflow_type}", flush=True)
+    try:
+        run_benchmark(addresses, modes, concurrency_levels, args.jobs, args.workflow_type, comfyui_output_dirs)
+    finally:
+        for server in servers:
+            server.stop()
+        for shared_dir in comfyui_output_dirs.values():
+            shutil.rmtree(shared_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,81 @@
 import websocket
 import uuid
 import json
-import urllib.request
+import copy
 import urllib.parse
 from PIL import Image
-import io
 import os
 import logging
 import configparser
+import hashlib
+import shutil
+import struct
+import tempfile
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
 from urllib.parse import urlparse
 from typing import Dict, List, Optional, Tuple
 
+from generation_cache import get_generation_cache
+from narration_cache import get_narration_cache
+
+# HTTP连接池大小（同一服务器的并发请求数超过该值时多出的连接用完即关闭）
+HTTP_POOL_SIZE = 8
+# 健康状态缓存时间（秒），过期后test_connection返回上次结果并在后台刷新
+HEALTH_TTL = 10.0
+# 等待prompt完成期间查询/history的间隔（秒），防止WebSocket消息丢失时一直等待
+HISTORY_POLL_INTERVAL = 30.0
+# WebSocket断开后重连的等待时间（秒），逐次翻倍直到上限
+RECONNECT_DELAY = 1.0
+RECONNECT_DELAY_MAX = 30.0
+# 下载输出文件时每次写入磁盘的块大小（字节）
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# 参考音频内容哈希的缓存时间（秒），过期后重新从ComfyUI读取，参考音频被替换后旁白缓存随之失效
+VOICE_HASH_TTL = 300.0
+
+def _sniff_image_format(header: bytes) -> Optional[str]:
+    """根据文件头识别图像格式（与PIL的格式名一致），无法识别时返回None"""
+    if header.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'PNG'
+    if header.startswith(b'\xff\xd8\xff'):
+        return 'JPEG'
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'WEBP'
+    return None
+
+def _read_png_size(header: bytes) -> Optional[Tuple[int, int]]:
+    """从PNG文件头的IHDR块读取(宽, 高)，不解码图像数据"""
+    if len(header) >= 24 and header[12:16] == b'IHDR':
+        return struct.unpack('>II', header[16:24])
+    return None
+
+class _PromptWaiter:
+    """
+    单个prompt的等待状态：完成事件、executed消息带回的节点输出、是否命中ComfyUI缓存和错误
+    （error为ComfyUI执行错误信息，或查询状态时遇到的异常，如服务器不可用、重启后任务丢失）
+    """
+    
+    def __init__(self):
+        self.event = threading.Event()
+        self.outputs = {}
+        self.cached = False
+        self.error = None
+
 class ComfyUIClient:
-    """ComfyUI WebSocket API客户端"""
+    """
+    ComfyUI WebSocket API客户端
+    
+    HTTP请求通过保持连接的requests.Session发送；等待prompt完成时所有线程共用一条WebSocket连接，
+    由后台线程按prompt_id分发消息（ComfyUI每个clientId只保留一条连接，不能每次调用都新建）。
+    设置comfyui_output_dir（ComfyUI输出目录在本机的路径）后，输出文件优先硬链接或复制，不经过HTTP。
+    长期使用时通过get_comfyui_client()获取进程内共享的实例。
+    """
     
-    def __init__(self, server_address: str = None):
+    def __init__(self, server_address: str = None, http_timeout: float = 30.0,
+                 prompt_timeout: Optional[float] = None, health_ttl: float = HEALTH_TTL,
+                 comfyui_output_dir: Optional[str] = None):
         # 如果没有提供server_address，从config.ini读取
         if server_address is None:
             server_address = self._load_comfyui_address()
@@ -23,7 +83,26 @@ class ComfyUIClient:
         self.server_address = server_address
         self.client_id = str(uuid.uuid4())
         self.logger = logging.getLogger(__name__)
+        self.http_timeout = http_timeout
+        self.prompt_timeout = prompt_timeout
+        self.health_ttl = health_ttl
+        self.health_error = ''
+        self.comfyui_output_dir = comfyui_output_dir  # 本机可访问的ComfyUI输出目录，None表示只通过HTTP下载
+        
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE))
         
+        self._lock = threading.Lock()
+        self._ws = None
+        self._ws_thread = None
+        self._ws_users = 0  # 正在等待结果的调用数，为0时断线不再重连
+        self._closing = False
+        self._waiters: Dict[str, _PromptWaiter] = {}
+        self._healthy = None
+        self._health_checked = 0.0
+        self._health_refreshing = False
+        self._voice_hashes: Dict[str, Tuple[str, float]] = {}  # 参考音频文件名 -> (内容哈希, 计算时间)
+
     def _load_comfyui_address(self) -> str:
         """从config.ini加载ComfyUI地址"""
         try:
@@ -187,91 +266,275 @@ class ComfyUIClient:
             self.logger.error(f"更新工作流参数失败: {e}")
             raise
           
+    def get_json(self, path: str, timeout: Optional[float] = None):
+        """通过保持连接的会话GET ComfyUI接口并解析JSON"""
+        response = self.session.get(f"http://{self.server_address}{path}", timeout=timeout or self.http_timeout)
+        response.raise_for_status()
+        return response.json()
+    
     def queue_prompt(self, prompt: dict) -> dict:
         """提交prompt到ComfyUI队列"""
         try:
             p = {"prompt": prompt, "client_id": self.client_id}
-            data = json.dumps(p).encode('utf-8')
-            req = urllib.request.Request(f"http://{self.server_address}/prompt", data=data)
-            response = urllib.request.urlopen(req)
-            return json.loads(response.read())
+            response = self.session.post(f"http://{self.server_address}/prompt", json=p, timeout=self.http_timeout)
+            response.raise_for_status()
+            result = response.json()
+            with self._lock:
+                if self._ws_users:
+                    self._waiter(result['prompt_id'])
+            return result
         except Exception as e:
             self.logger.error(f"Failed to queue prompt: {e}")
             raise
     
     def get_images_from_websocket(self, prompt: dict) -> List[str]:
-        """通过WebSocket监听生成进度，然后获取保存的图像文件路径"""
+        """提交prompt，通过共享的WebSocket连接等待执行完成，然后获取保存的文件下载地址"""
         try:
-            # 连接WebSocket
-            ws = websocket.WebSocket()
-            ws.connect(f"ws://{self.server_address}/ws?clientId={self.client_id}")
+            self._acquire_websocket()
+            try:
+                prompt_id = self.queue_prompt(prompt)['prompt_id']
+                outputs = self.wait_for_outputs(prompt_id)
+            finally:
+                self._release_websocket()
+            return self._extract_output_urls(outputs)
+        
+        except Exception as e:
+            self.logger.error(f"Failed to get files from websocket: {e}")
+            raise
+    
+    def wait_for_outputs(self, prompt_id: str) -> dict:
+        """
+        等待prompt执行完成并返回各输出节点的输出
+        
+        executed消息已带回全部输出时直接使用；有节点命中ComfyUI缓存（不会发送executed）、
+        断线重连过或超过HISTORY_POLL_INTERVAL仍未收到完成消息时，以/history为准。
+        """
+        with self._lock:
+            waiter = self._waiter(prompt_id)
+        deadline = None if self.prompt_timeout is None else time.time() + self.prompt_timeout
+        try:
+            while True:
+                interval = HISTORY_POLL_INTERVAL
+                if deadline is not None:
+                    interval = min(interval, max(0.0, deadline - time.time()))
+                if waiter.event.wait(interval):
+                    break
+                if deadline is not None and time.time() >= deadline:
+                    raise TimeoutError(f"等待ComfyUI执行超时 ({self.prompt_timeout}秒): {prompt_id}")
+                if self._poll_prompt(prompt_id):
+                    waiter.cached = True
+                    break
+        finally:
+            with self._lock:
+                self._waiters.pop(prompt_id, None)
+        
+        if isinstance(waiter.error, Exception):
+            raise waiter.error
+        if waiter.error:
+            raise RuntimeError(waiter.error)
+        if waiter.outputs and not waiter.cached:
+            return waiter.outputs
+        history = self.get_json(f"/history/{prompt_id}")
+        return history.get(prompt_id, {}).get('outputs', {})
+    
+    def _poll_prompt(self, prompt_id: str) -> bool:
+        """
+        通过/history和/queue检查prompt的状态
+        
+        Returns:
+            bool: 已执行完毕时返回True，仍在排队或执行中时返回False
+        
+        Raises:
+            ConnectionError: prompt既不在历史记录中也不在队列中（ComfyUI已重启，任务丢失）
+            Exception: 无法访问ComfyUI（连接错误原样抛出，由调用方决定是否换服务器）
+        """
+        if prompt_id in self.get_json(f"/history/{prompt_id}"):
+            return True
+        queue_info = self.get_json('/queue')
+        for item in queue_info.get('queue_running', []) + queue_info.get('queue_pending', []):
+            if len(item) > 1 and item[1] == prompt_id:
+                return False
+        # 查询/queue前刚好执行完的prompt已从队列移到历史记录中
+        if prompt_id in self.get_json(f"/history/{prompt_id}"):
+            return True
+        raise ConnectionError(f"prompt已不在ComfyUI队列和历史记录中，服务器可能已重启: {prompt_id}")
+    
+    def _recover_pending(self):
+        """断线或重连后检查未完成的prompt：已执行完毕的补齐完成状态，无法查询或已丢失的以异常结束"""
+        with self._lock:
+            pending = [prompt_id for prompt_id, waiter in self._waiters.items() if not waiter.event.is_set()]
+        for prompt_id in pending:
+            try:
+                finished = self._poll_prompt(prompt_id)
+            except Exception as e:
+                self.logger.warning(f"查询prompt状态失败 {prompt_id}: {e}")
+                with self._lock:
+                    waiter = self._waiter(prompt_id)
+                    waiter.error = e
+                    waiter.event.set()
+                continue
+            if finished:
+                with self._lock:
+                    waiter = self._waiter(prompt_id)
+                    waiter.cached = True  # 输出以/history为准
+                    waiter.event.set()
+    
+    def _waiter(self, prompt_id: str) -> _PromptWaiter:
+        """获取prompt的等待状态（消息可能先于/prompt响应到达，因此由先到的一方创建，调用方需持有_lock）"""
+        waiter = self._waiters.get(prompt_id)
+        if waiter is None:
+            waiter = self._waiters[prompt_id] = _PromptWaiter()
+        return waiter
+    
+    def _connect_websocket(self):
+        ws = websocket.WebSocket()
+        ws.connect(f"ws://{self.server_address}/ws?clientId={self.client_id}", timeout=self.http_timeout)
+        ws.settimeout(None)
+        return ws
+    
+    def _acquire_websocket(self):
+        """登记一个等待结果的调用；共享的WebSocket未连接时先连接并启动消息分发线程"""
+        with self._lock:
+            self._ws_users += 1
+            if self._ws_thread is not None:
+                return
+            try:
+                ws = self._connect_websocket()
+            except Exception:
+                self._ws_users -= 1
+                raise
+            self._ws = ws
+            self._closing = False
+            self._ws_thread = threading.Thread(target=self._listen, args=(ws,), name='comfyui-ws', daemon=True)
+            self._ws_thread.start()
+    
+    def _release_websocket(self):
+        with self._lock:
+            self._ws_users -= 1
+    
+    def _dispatch(self, message: dict):
+        """按prompt_id把ComfyUI消息路由到对应的等待状态"""
+        message_type = message.get('type')
+        data = message.get('data') or {}
+        prompt_id = data.get('prompt_id')
+        if not prompt_id:
+            return
+        
+        with self._lock:
+            if message_type == 'executing':
+                if data.get('node') is None:
+                    self._waiter(prompt_id).event.set()  # 执行完成
+            elif message_type == 'executed':
+                if data.get('node') is not None and data.get('output'):
+                    self._waiter(prompt_id).outputs[str(data['node'])] = data['output']
+            elif message_type == 'execution_cached':
+                if data.get('nodes'):
+                    self._waiter(prompt_id).cached = True
+            elif message_type == 'execution_error':
+                waiter = self._waiter(prompt_id)
+                waiter.error = (f"ComfyUI执行失败 (节点 {data.get('node_id')} {data.get('node_type', '')}): "
+                                f"{data.get('exception_message', '')}")
+                waiter.event.set()
+    
+    def _listen(self, ws):
+        """WebSocket消息分发线程；断线时若仍有调用在等待则自动重连，否则退出，下次调用时重新连接"""
+        delay = RECONNECT_DELAY
+        while True:
+            error = '连接已关闭'
+            try:
+                while True:
+                    out = ws.recv()
+                    if isinstance(out, str):
+                        if not out:
+                            break  # 连接已关闭
+                        self._dispatch(json.loads(out))
+            except Exception as e:
+                error = str(e)
             
-            # 提交prompt并获取prompt_id
-            prompt_id = self.queue_prompt(prompt)['prompt_id']
+            # 断线时立即检查未完成的prompt：服务器已停止或重启丢失任务时让等待方马上得到连接错误，而不是一直重连
+            with self._lock:
+                waiting = self._ws_users and not self._closing
+            if waiting:
+                self._recover_pending()
             
             while True:
-                out = ws.recv()
-                if isinstance(out, str):
-                    message = json.loads(out)
-                    if message['type'] == 'executing':
-                        data = message['data']
-                        if data['prompt_id'] == prompt_id:
-                            if data['node'] is None:
-                                break  # 执行完成
-            
-            ws.close()
-            
-            # 获取生成的图像文件列表
-            history_url = f"http://{self.server_address}/history/{prompt_id}"
-            response = urllib.request.urlopen(history_url)
-            history = json.loads(response.read())
-            
-            file_paths = []
-            if prompt_id in history:
-                outputs = history[prompt_id].get('outputs', {})
-                self.logger.info(f"ComfyUI输出节点: {list(outputs.keys())}")
-                for node_id, output in outputs.items():
-                    self.logger.info(f"节点 {node_id} 输出内容: {list(output.keys())}")
-                    # 处理图像输出
-                    if 'images' in output:
-                        for image_info in output['images']:
-                            filename = image_info['filename']
-                            subfolder = image_info.get('subfolder', '')
-                            file_url = f"http://{self.server_address}/view?filename={filename}&subfolder={subfolder}"
-                            file_paths.append(file_url)
-                            self.logger.info(f"找到图像文件: {filename}")
-                    # 处理音频输出
-                    elif 'audio' in output:
-                        for audio_info in output['audio']:
-                            filename = audio_info['filename']
-                            subfolder = audio_info.get('subfolder', '')
-                            file_url = f"http://{self.server_address}/view?filename={filename}&subfolder={subfolder}"
-                            file_paths.append(file_url)
-                            self.logger.info(f"找到音频文件: {filename}")
-                    # 处理其他可能的文件输出
-                    else:
-                        for key, value in output.items():
-                            if isinstance(value, list):
-                                for item in value:
-                                    if isinstance(item, dict) and 'filename' in item:
-                                        filename = item['filename']
-                                        subfolder = item.get('subfolder', '')
-                                        file_url = f"http://{self.server_address}/view?filename={filename}&subfolder={subfolder}"
-                                        file_paths.append(file_url)
-                                        self.logger.info(f"找到文件: {filename} (类型: {key})")
-            
-            self.logger.info(f"总共找到 {len(file_paths)} 个文件")
-            return file_paths
+                with self._lock:
+                    if self._closing or not self._ws_users:
+                        # 没有调用在等待结果，空闲连接断开无需重连
+                        self.logger.debug(f"ComfyUI WebSocket已断开: {error}")
+                        self._ws = None
+                        self._ws_thread = None
+                        return
+                self.logger.warning(f"ComfyUI WebSocket已断开 ({error})，{delay:.0f}秒后重连")
+                time.sleep(delay)
+                delay = min(delay * 2, RECONNECT_DELAY_MAX)
+                try:
+                    ws = self._connect_websocket()
+                    break
+                except Exception as e:
+                    self.logger.warning(f"ComfyUI WebSocket重连失败: {e}")
             
-        except Exception as e:
-            self.logger.error(f"Failed to get files from websocket: {e}")
-            raise
+            with self._lock:
+                self._ws = ws
+            delay = RECONNECT_DELAY
+            # 断线期间完成的prompt收不到executing消息，改为查询/history补齐；期间重启丢失的prompt以异常结束
+            self._recover_pending()
+    
+    def close(self):
+        """关闭共享的WebSocket连接和HTTP会话"""
+        with self._lock:
+            self._closing = True
+            ws = self._ws
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+        self.session.close()
+    
+    def _extract_output_urls(self, outputs: dict) -> List[str]:
+        """从/history或executed消息的节点输出中提取文件的/view下载地址"""
+        file_paths = []
+        self.logger.info(f"ComfyUI输出节点: {list(outputs.keys())}")
+        for node_id, output in outputs.items():
+            self.logger.info(f"节点 {node_id} 输出内容: {list(output.keys())}")
+            # 处理图像输出
+            if 'images' in output:
+                for image_info in output['images']:
+                    filename = image_info['filename']
+                    subfolder = image_info.get('subfolder', '')
+                    file_url = f"http://{self.server_address}/view?filename={filename}&subfolder={subfolder}"
+                    file_paths.append(file_url)
+                    self.logger.info(f"找到图像文件: {filename}")
+            # 处理音频输出
+            elif 'audio' in output:
+                for audio_info in output['audio']:
+                    filename = audio_info['filename']
+                    subfolder = audio_info.get('subfolder', '')
+                    file_url = f"http://{self.server_address}/view?filename={filename}&subfolder={subfolder}"
+                    file_paths.append(file_url)
+                    self.logger.info(f"找到音频文件: {filename}")
+            # 处理其他可能的文件输出
+            else:
+                for key, value in output.items():
+                    if isinstance(value, list):
+                        for item in value:
+                            if isinstance(item, dict) and 'filename' in item:
+                                filename = item['filename']
+                                subfolder = item.get('subfolder', '')
+                                file_url = f"http://{self.server_address}/view?filename={filename}&subfolder={subfolder}"
+                                file_paths.append(file_url)
+                                self.logger.info(f"找到文件: {filename} (类型: {key})")
+        
+        self.logger.info(f"总共找到 {len(file_paths)} 个文件")
+        return file_paths
     
     def save_images_to_disk(self, image_urls: List[str], 
                            output_dir: str, 
                            filename_prefix: str = "script",
-                           workflow: dict = None) -> List[str]:
-        """从URL下载图像并保存到磁盘"""
+                           workflow: dict = None,
+                           output_format: str = "png") -> List[str]:
+        """从URL流式下载图像并保存到磁盘（格式与output_format一致时不解码，直接写入原始字节）"""
         try:
             # 创建输出目录
             if not os.path.exists(output_dir):
@@ -281,42 +544,158 @@ class ComfyUIClient:
             
             for i, image_url in enumerate(image_urls):
                 try:
-                    # 下载图像
-                    response = urllib.request.urlopen(image_url)
-                    image_data = response.read()
-                    
-                    # 转换为PIL图像
-                    image = Image.open(io.BytesIO(image_data))
-                    
-                    # 生成文件名
-                    filename = os.path.join(output_dir, f"{filename_prefix}.png")
-                    
-                    # 保存图像
-                    image.save(filename)
-                    saved_files.append(filename)
-                    
-                    # 保存对应的工作流JSON文件
-                    if workflow:
-                        base_name = os.path.splitext(os.path.basename(filename))[0]
-                        json_filename = os.path.join(output_dir, f"{base_name}.json")
-                        try:
-                            with open(json_filename, 'w', encoding='utf-8') as f:
-                                json.dump(workflow, f, ensure_ascii=False, indent=2)
-                            self.logger.info(f"已保存工作流文件: {json_filename}")
-                        except Exception as json_e:
-                            self.logger.error(f"保存工作流文件失败: {json_e}")
-                    
-                    self.logger.info(f"已保存图像: {filename} (尺寸: {image.size})")
-                    
+                    # 获取图像到临时文件（共享输出目录或HTTP流式下载）
+                    temp_path, header, _ = self._fetch_output(image_url, output_dir)
+                    saved_files.append(self._finalize_image(
+                        temp_path, header, output_dir, filename_prefix, workflow, output_format))
+                
                 except Exception as e:
                     self.logger.error(f"保存图像 {i} 失败: {e}")
             
             return saved_files
-            
+        
         except Exception as e:
             self.logger.error(f"保存图像到磁盘失败: {e}")
             raise
     
+    def _write_temp_file(self, chunks, directory: str, name: str) -> Tuple[str, bytes]:
+        """
+        把数据块写入directory下的临时文件（与目标文件同目录，保证随后可以原子重命名）
+        
+        Returns:
+            Tuple[str, bytes]: (临时文件路径, 文件开头32字节，用于识别格式)
+        """
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{name}.", suffix='.part')
+        header = b''
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    if len(header) < 32:
+                        header += chunk[:32 - len(header)]
+                    f.write(chunk)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return temp_path, header
+    
+    def _replace_file(self, temp_path: str, path: str):
+        """把临时文件原子重命名为path（读取方不会看到写了一半的文件），失败时删除临时文件"""
+        try:
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+    
+    def _local_output_path(self, url: str) -> Optional[str]:
+        """把/view下载地址映射为本机可访问的ComfyUI输出目录（comfyui_output_dir）中的文件，不可用时返回None"""
+        if not self.comfyui_output_dir:
+            return None
+        query = urllib.parse.parse_qs(urlparse(url).query)
+        filename = query.get('filename', [''])[0]
+        if not filename or query.get('type', ['output'])[0] != 'output':
+            return None
+        root = os.path.realpath(self.comfyui_output_dir)
+        path = os.path.realpath(os.path.join(root, query.get('subfolder', [''])[0], filename))
+        # 拒绝通过subfolder/filename跳出输出目录的路径
+        if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+            return None
+        return path
+    
+    def _fetch_output(self, url: str, directory: str) -> Tuple[str, bytes, str]:
+        """
+        把一个输出文件取到directory下的临时文件
+        
+        配置了本机可访问的ComfyUI输出目录（ComfyUI在同一台机器或共享卷上）时优先硬链接，
+        无法硬链接（跨文件系统、文件系统不支持等）时复制；文件不在输出目录中或读取失败时通过HTTP /view流式下载。
+        
+        Returns:
+            Tuple[str, bytes, str]: (临时文件路径, 文件开头32字节, content-type（本地文件为空字符串）)
+        """
+        local_path = self._local_output_path(url)
+        if local_path:
+            try:
+                temp_path, header = self._link_to_temp(local_path, directory)
+                self.logger.info(f"从共享输出目录获取文件: {local_path}")
+                return temp_path, header, ''
+            except OSError as e:
+                self.logger.warning(f"从共享输出目录获取文件失败，改用HTTP下载: {local_path}: {e}")
+        
+        with self.session.get(url, timeout=self.http_timeout, stream=True) as response:
+            response.raise_for_status()
+            temp_path, header = self._write_temp_file(response.iter_content(DOWNLOAD_CHUNK_SIZE), directory, 'download')
+            return temp_path, header, response.headers.get('content-type', '')
+    
+    def _link_to_temp(self, source_path: str, directory: str) -> Tuple[str, bytes]:
+        """
+        把本机文件硬链接为directory下的临时文件，无法硬链接（跨文件系统、文件系统不支持等）时复制
+        
+        Returns:
+            Tuple[str, bytes]: (临时文件路径, 文件开头32字节)
+        """
+        temp_path = os.path.join(directory, f".{os.path.basename(source_path)}.{uuid.uuid4().hex}.part")
+        try:
+            try:
+                os.link(source_path, temp_path)
+            except OSError:
+                shutil.copyfile(source_path, temp_path)
+            with open(temp_path, 'rb') as f:
+                header = f.read(32)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return temp_path, header
+    
+    def _finalize_image(self, temp_path: str, header: bytes, output_dir: str, filename_prefix: str,
+                        workflow: dict = None, output_format: str = "png") -> str:
+        """
+        把临时图像文件保存为最终文件，并保存对应的工作流JSON文件
+        
+        图像格式与output_format一致时直接重命名为目标文件，只读取PNG文件头记录尺寸；
+        格式不同时才用PIL解码并转码。
+        """
+        target_format = output_format.upper().replace('JPG', 'JPEG')
+        extension = 'jpg' if target_format == 'JPEG' else output_format.lower()
+        filename = os.path.join(output_dir, f"{filename_prefix}.{extension}")
+        
+        try:
+            source_format = _sniff_image_format(header)
+            if source_format == target_format:
+                os.replace(temp_path, filename)
+                size = _read_png_size(header) if source_format == 'PNG' else None
+            else:
+                with Image.open(temp_path) as image:
+                    if target_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+                        image = image.convert('RGB')
+                    size = image.size
+                    converted_path = temp_path + f".{extension}"
+                    image.save(converted_path, format=target_format)
+                try:
+                    os.replace(converted_path, filename)
+                except BaseException:
+                    os.remove(converted_path)
+                    raise
+                os.remove(temp_path)
+                self.logger.info(f"图像已从{source_format or '未知格式'}转码为{target_format}")
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        
+        # 保存对应的工作流JSON文件
+        if workflow:
+            base_name = os.path.splitext(os.path.basename(filename))[0]
+            json_filename = os.path.join(output_dir, f"{base_name}.json")
+            try:
+                with open(json_filename, 'w', encoding='utf-8') as f:
+                    json.dump(workflow, f, ensure_ascii=False, indent=2)
+                self.logger.info(f"已保存工作流文件: {json_filename}")
+            except Exception as json_e:
+                self.logger.error(f"保存工作流文件失败: {json_e}")
+        
+        self.logger.info(f"已保存图像: {filename} (尺寸: {size or '未知'})")
+        return filename
+    
     def _load_paper_data(self, project_path: str) -> dict:
         """从项目路径加载文案数据，优先从paper.json加载，如果不存在则从parameter.ini加载"""
         try:
@@ -418,34 +797,253 @@ class ComfyUIClient:
             self.logger.error(f"构建提示词失败: {e}")
             return "anthropomorphic animal, masterpiece, best quality"
     
-    def generate_image(self, project_path: str, sentence_id: int = 1, seed: Optional[int] = None) -> List[str]:
-        """生成图像的便捷方法"""
+    def prepare_image_workflow(self, project_path: str, sentence_id: int = 1, seed: Optional[int] = None,
+                               paper_data: dict = None, workflow_template: dict = None) -> dict:
+        """构建替换好提示词和种子的图像工作流（批量生成时可传入已加载的文案数据和工作流模板）"""
+        # 生成15位随机seed
+        if seed is None:
+            import random
+            seed = random.randint(100000000000000, 999999999999999)
+        
+        self.logger.info(f"生成图像 - 项目路径: {project_path}, 句子ID: {sentence_id}, 种子: {seed}")
+        
+        # 加载paper.json数据
+        if paper_data is None:
+            paper_data = self._load_paper_data(project_path)
+        if not paper_data:
+            raise Exception("无法加载paper.json数据")
+        
+        # 构建提示词
+        prompt_text = self._build_prompt_from_paper(paper_data, sentence_id)
+        
+        # 从配置文件加载工作流（模板需要深拷贝，避免占位符被替换后影响下一个句子）
+        workflow = copy.deepcopy(workflow_template) if workflow_template else self._load_workflow_from_config('image')
+        if not workflow:
+            raise Exception("无法加载工作流配置")
+        
+        # 动态更新工作流参数
+        self._update_workflow_parameters(workflow, {
+            'prompt_text': prompt_text,
+            'seed': seed
+        }, 'image')
+        return workflow
+    
+    def prepare_audio_workflow(self, project_path: str, sentence_id: int = 1,
+                               paper_data: dict = None, workflow_template: dict = None) -> dict:
+        """构建替换好句子文本的音频工作流（批量生成时可传入已加载的文案数据和工作流模板）"""
+        self.logger.info(f"生成音频 - 项目路径: {project_path}, 句子ID: {sentence_id}")
+        
+        # 加载paper.json数据
+        if paper_data is None:
+            paper_data = self._load_paper_data(project_path)
+        if not paper_data:
+            raise Exception("无法加载paper.json数据")
+        
+        # 计算句子数量（支持多种格式）
+        sentence_count = 0
+        if 'scenes' in paper_data:
+            sentence_count = len(paper_data.get('scenes', []))
+            data_format = "scenes"
+        elif 'story' in paper_data:
+            sentence_count = len(paper_data.get('story', []))
+            data_format = "story"
+        elif 'sentences' in paper_data:
+            sentence_count = len(paper_data.get('sentences', []))
+            data_format = "sentences"
+        else:
+            data_format = "unknown"
+        
+        self.logger.info(f"已加载paper.json数据，包含 {sentence_count} 个句子（格式: {data_format}）")
+        
+        # 获取句子文本
+        sentence_text = self._get_sentence_text(paper_data, sentence_id)
+        self.logger.info(f"获取到句子文本: {sentence_text}")
+        
+        # 从配置文件加载工作流（模板需要深拷贝，避免占位符被替换后影响下一个句子）
+        workflow = copy.deepcopy(workflow_template) if workflow_template else self._load_workflow_from_config('audio')
+        if not workflow:
+            raise Exception("无法加载音频工作流配置")
+        self.logger.info(f"已加载音频工作流配置，包含 {len(workflow)} 个节点")
+        
+        # 动态更新工作流参数（只更新文本，保留工作流自带的seed）
+        self._update_workflow_parameters(workflow, {
+            'tts_text': sentence_text
+        }, 'audio')
+        self.logger.info("工作流参数更新完成")
+        return workflow
+    
+    def lookup_generation_cache(self, workflow_type: str, workflow: dict, project_path: str, sentence_id: int,
+                                force_new: bool = False) -> Tuple[Optional[str], Optional[List[str]]]:
+        """
+        按最终工作流查询生成结果缓存，命中时把缓存文件放置到项目目录（文件名与正常生成一致）
+        
+        Returns:
+            Tuple: (缓存键，缓存未启用时为None; 命中时放置好的文件列表，未命中或force_new时为None)
+        """
+        cache = get_generation_cache()
+        if not cache.enabled:
+            return None, None
+        key = cache.build_key(workflow_type, workflow)
+        if force_new:
+            return key, None
+        
+        project_name = os.path.basename(os.path.normpath(project_path))
+        cached_files = cache.lookup(key)
+        if cached_files:
+            try:
+                saved_files = self._restore_cached_outputs(workflow_type, cached_files, project_path,
+                                                           sentence_id, workflow)
+                cache.record_lookup(True, project_name)
+                self.logger.info(f"生成缓存命中，跳过ComfyUI: {key[:12]} -> {saved_files}")
+                return key, saved_files
+            except OSError as e:
+                self.logger.warning(f"从生成缓存放置文件失败，重新生成: {e}")
+        cache.record_lookup(False, project_name)
+        return key, None
+    
+    def store_generation_cache(self, key: Optional[str], saved_files: List[str]):
+        """把生成的图像/音频文件（不含工作流JSON）写入生成结果缓存"""
+        if key:
+            get_generation_cache().store(key, [path for path in saved_files if not path.endswith('.json')])
+    
+    def _restore_cached_outputs(self, workflow_type: str, cached_files: List[str], project_path: str,
+                                sentence_id: int, workflow: dict) -> List[str]:
+        """把缓存中的输出文件硬链接或复制到images/或audios/目录，并保存对应的工作流JSON文件"""
+        if workflow_type == 'image':
+            output_dir = os.path.join(project_path, 'images')
+            os.makedirs(output_dir, exist_ok=True)
+            saved_files = []
+            for cached_path in cached_files:
+                temp_path, header = self._link_to_temp(cached_path, output_dir)
+                saved_files.append(self._finalize_image(temp_path, header, output_dir, f"script_{sentence_id}", workflow))
+            return saved_files
+        
+        audios_dir = os.path.join(project_path, 'audios')
+        os.makedirs(audios_dir, exist_ok=True)
+        saved_files = []
+        for i, cached_path in enumerate(cached_files):
+            temp_path, _ = self._link_to_temp(cached_path, audios_dir)
+            audio_path = os.path.join(audios_dir, f"script_{sentence_id}_{i+1}{os.path.splitext(cached_path)[1]}")
+            self._replace_file(temp_path, audio_path)
+            saved_files.append(audio_path)
+        saved_files.append(self._write_audio_workflow(workflow, audios_dir, sentence_id))
+        return saved_files
+    
+    def lookup_narration_cache(self, project_path: str, sentence_ids: List[int],
+                               trim_settings: Tuple[float, float, float],
+                               force_new: bool = False, timeout: Optional[float] = None) -> Dict[int, Dict]:
+        """
+        按(规范化文本, 音频工作流, 参考音频)查询旁白缓存，命中的句子直接放置已裁剪的音频和工作流JSON
+        （文件名与正常生成一致），调用方只需把时长写入AUDIO_INFO，不再生成和去除静音
+        
+        Args:
+            project_path: 项目路径
+            sentence_ids: 句子ID列表（paper.json和工作流模板只加载一次）
+            trim_settings: AudioProcessor.load_trim_settings返回的(前停顿, 后停顿, top_db)
+            force_new: 为True时只计算缓存键（用于生成后写入），不使用缓存结果
+            timeout: 读取参考音频的超时时间（秒），None表示使用http_timeout；
+                     在确认服务器可用之前查询时应传入较短的超时，避免服务器不可达时长时间阻塞
+        
+        Returns:
+            Dict[int, dict]: 句子ID -> {'key': 缓存键（无法缓存时为None）,
+                                       'files': 命中时放置好的文件列表, 'duration': 命中时的时长}
+        """
+        results = {sentence_id: {'key': None, 'files': None, 'duration': None} for sentence_id in sentence_ids}
+        cache = get_narration_cache()
+        if not cache.enabled or not sentence_ids:
+            return results
+        
         try:
-            # 生成15位随机seed
-            if seed is None:
-                import random
-                seed = random.randint(100000000000000, 999999999999999)
-            
-            self.logger.info(f"生成图像 - 项目路径: {project_path}, 句子ID: {sentence_id}, 种子: {seed}")
-            
-            # 加载paper.json数据
             paper_data = self._load_paper_data(project_path)
-            if not paper_data:
-                raise Exception("无法加载paper.json数据")
+            workflow_template = self._load_workflow_from_config('audio')
+            if not paper_data or not workflow_template:
+                return results
+            voice_hashes = self._voice_reference_hashes(workflow_template, timeout)
+        except Exception as e:
+            self.logger.warning(f"无法计算旁白缓存键，本次不使用旁白缓存: {e}")
+            return results
+        
+        project_name = os.path.basename(os.path.normpath(project_path))
+        audios_dir = os.path.join(project_path, 'audios')
+        for sentence_id in sentence_ids:
+            entry = results[sentence_id]
+            try:
+                sentence_text = self._get_sentence_text(paper_data, sentence_id)
+                if not sentence_text:
+                    continue
+                entry['key'] = cache.build_key(sentence_text, workflow_template, voice_hashes, trim_settings)
+                if force_new:
+                    continue
+                
+                cached = cache.lookup(entry['key'])
+                cache.record_lookup(bool(cached), project_name)
+                if not cached:
+                    continue
+                cached_path, duration = cached
+                os.makedirs(audios_dir, exist_ok=True)
+                temp_path, _ = self._link_to_temp(cached_path, audios_dir)
+                audio_path = os.path.join(audios_dir, f"script_{sentence_id}_1{os.path.splitext(cached_path)[1]}")
+                self._replace_file(temp_path, audio_path)
+                workflow = self.prepare_audio_workflow(project_path, sentence_id, paper_data, workflow_template)
+                entry['files'] = [audio_path, self._write_audio_workflow(workflow, audios_dir, sentence_id)]
+                entry['duration'] = duration
+                self.logger.info(f"旁白缓存命中，跳过生成和去除静音: script_id={sentence_id}, {entry['key'][:12]}")
+            except Exception as e:
+                self.logger.warning(f"查询旁白缓存失败，正常生成: script_id={sentence_id}, {e}")
+        return results
+    
+    def store_narration_cache(self, key: Optional[str], audio_path: str, duration: Optional[float]):
+        """把去除静音、添加停顿后的旁白音频及其时长写入旁白缓存"""
+        if key:
+            get_narration_cache().store(key, audio_path, duration)
+    
+    def _voice_reference_hashes(self, workflow: dict, timeout: Optional[float] = None) -> Dict[str, str]:
+        """
+        计算工作流中LoadAudio节点引用的参考音频（ComfyUI的input目录）的内容哈希，结果缓存VOICE_HASH_TTL秒
+        （timeout为下载参考音频的超时时间，None表示使用http_timeout）
+        
+        Returns:
+            Dict[str, str]: 参考音频文件名 -> 内容哈希（没有参考音频时为空）
+        """
+        hashes = {}
+        for node in workflow.values():
+            if not isinstance(node, dict) or not str(node.get('class_type', '')).startswith('LoadAudio'):
+                continue
+            filename = node.get('inputs', {}).get('audio')
+            if not isinstance(filename, str) or not filename:
+                continue
             
-            # 构建提示词
-            prompt_text = self._build_prompt_from_paper(paper_data, sentence_id)
+            with self._lock:
+                cached = self._voice_hashes.get(filename)
+            if cached and time.time() - cached[1] < VOICE_HASH_TTL:
+                hashes[filename] = cached[0]
+                continue
             
-            # 从配置文件加载工作流
-            workflow = self._load_workflow_from_config('image')
-            if not workflow:
-                raise Exception("无法加载工作流配置")
+            subfolder, name = os.path.split(filename)
+            query = urllib.parse.urlencode({'filename': name, 'subfolder': subfolder, 'type': 'input'})
+            digest = hashlib.sha256()
+            with self.session.get(f"http://{self.server_address}/view?{query}",
+                                  timeout=timeout or self.http_timeout, stream=True) as response:
+                response.raise_for_status()
+                for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    digest.update(chunk)
+            hashes[filename] = digest.hexdigest()
+            with self._lock:
+                self._voice_hashes[filename] = (hashes[filename], time.time())
+        return hashes
+    
+    def generate_image(self, project_path: str, sentence_id: int = 1, seed: Optional[int] = None,
+                       force_new: bool = False) -> List[str]:
+        """生成图像的便捷方法（force_new为True时不使用生成结果缓存；未指定seed时每次随机生成，也不使用缓存）"""
+        try:
+            workflow = self.prepare_image_workflow(project_path, sentence_id, seed)
             
-            # 动态更新工作流参数
-            self._update_workflow_parameters(workflow, {
-                'prompt_text': prompt_text,
-                'seed': seed
-            }, 'image')
+            # 相同的最终工作流生成过时直接使用缓存结果；随机种子的工作流不会重复，不查询也不写入缓存
+            cache_key, saved_files = None, None
+            if seed is not None:
+                cache_key, saved_files = self.lookup_generation_cache('image', workflow, project_path, sentence_id, force_new)
+            if saved_files:
+                return saved_files
             
             # 通过WebSocket获取图像URL
             image_urls = self.get_images_from_websocket(workflow)
@@ -454,6 +1052,7 @@ class ComfyUIClient:
             output_dir = os.path.join(project_path, 'images')
             filename_prefix = f"script_{sentence_id}"
             saved_files = self.save_images_to_disk(image_urls, output_dir, filename_prefix, workflow)
+            self.store_generation_cache(cache_key, saved_files)
             
             self.logger.info(f"成功生成 {len(saved_files)} 张图像")
             return saved_files
@@ -462,48 +1061,16 @@ class ComfyUIClient:
             self.logger.error(f"生成图像失败: {e}")
             raise
     
-    def generate_audio(self, project_path: str, sentence_id: int = 1) -> List[str]:
-        """生成音频的便捷方法"""
+    def generate_audio(self, project_path: str, sentence_id: int = 1, force_new: bool = False) -> List[str]:
+        """生成音频的便捷方法（force_new为True时不使用生成结果缓存）"""
         try:
-            self.logger.info(f"生成音频 - 项目路径: {project_path}, 句子ID: {sentence_id}")
-            
-            # 加载paper.json数据
-            paper_data = self._load_paper_data(project_path)
-            if not paper_data:
-                raise Exception("无法加载paper.json数据")
-            
-            # 计算句子数量（支持多种格式）
-            sentence_count = 0
-            if 'scenes' in paper_data:
-                sentence_count = len(paper_data.get('scenes', []))
-                data_format = "scenes"
-            elif 'story' in paper_data:
-                sentence_count = len(paper_data.get('story', []))
-                data_format = "story"
-            elif 'sentences' in paper_data:
-                sentence_count = len(paper_data.get('sentences', []))
-                data_format = "sentences"
-            else:
-                data_format = "unknown"
-            
-            self.logger.info(f"已加载paper.json数据，包含 {sentence_count} 个句子（格式: {data_format}）")
-            
-            # 获取句子文本
-            sentence_text = self._get_sentence_text(paper_data, sentence_id)
-            self.logger.info(f"获取到句子文本: {sentence_text}")
-            
-            # 从配置文件加载工作流
-            workflow = self._load_workflow_from_config('audio')
-            if not workflow:
-                raise Exception("无法加载音频工作流配置")
-            self.logger.info(f"已加载音频工作流配置，包含 {len(workflow)} 个节点")
-            
-            # 动态更新工作流参数（只更新文本，保留工作流自带的seed）
-            self._update_workflow_parameters(workflow, {
-                'tts_text': sentence_text
-            }, 'audio')
-            self.logger.info("工作流参数更新完成")
+            workflow = self.prepare_audio_workflow(project_path, sentence_id)
             
+            # 相同的最终工作流生成过时直接使用缓存结果
+            cache_key, saved_files = self.lookup_generation_cache('audio', workflow, project_path, sentence_id, force_new)
+            if saved_files:
+                return saved_files
+
             # 通过WebSocket获取音频URL
             self.logger.info("开始通过WebSocket获取音频URL")
             audio_urls = self._get_audios_via_websocket(workflow)
@@ -512,6 +1079,7 @@ class ComfyUIClient:
             # 保存音频到项目的audios目录
             self.logger.info("开始保存音频文件到磁盘")
             saved_files = self._save_audios_to_disk(audio_urls, project_path, sentence_id, workflow)
+            self.store_generation_cache(cache_key, saved_files)
             
             self.logger.info(f"成功生成 {len(saved_files)} 个音频文件: {saved_files}")
             return saved_files
@@ -574,67 +1142,116 @@ class ComfyUIClient:
             
             for i, audio_url in enumerate(audio_urls):
                 try:
-                    # 下载音频文件
-                    response = requests.get(audio_url, timeout=30)
-                    response.raise_for_status()
-                    
-                    # 确定文件扩展名
-                    content_type = response.headers.get('content-type', '')
-                    if 'audio/wav' in content_type:
-                        ext = '.wav'
-                    elif 'audio/mp3' in content_type:
-                        ext = '.mp3'
-                    elif 'audio/flac' in content_type:
-                        ext = '.flac'
-                    else:
-                        # 从URL推断扩展名
-                        parsed_url = urlparse(audio_url)
-                        filename = os.path.basename(parsed_url.path)
-                        _, ext = os.path.splitext(filename)
-                        if not ext:
-                            ext = '.wav'  # 默认扩展名
+                    # 获取音频到临时文件（共享输出目录或HTTP流式下载）
+                    temp_path, _, content_type = self._fetch_output(audio_url, audios_dir)
                     
                     # 生成文件名
+                    ext = self._audio_extension(content_type, audio_url)
                     audio_filename = f"script_{sentence_index}_{i+1}{ext}"
                     audio_path = os.path.join(audios_dir, audio_filename)
                     
-                    # 保存音频文件
-                    with open(audio_path, 'wb') as f:
-                        f.write(response.content)
+                    # 保存音频文件（原子重命名）
+                    self._replace_file(temp_path, audio_path)
                     
                     saved_files.append(audio_path)
                     self.logger.info(f"音频已保存: {audio_path}")
-                    
+                
                 except Exception as e:
                     self.logger.error(f"保存音频文件失败 {audio_url}: {e}")
                     continue
             
             # 保存工作流JSON文件
             if saved_files:
-                workflow_filename = f"script_{sentence_index}_workflow.json"
-                workflow_path = os.path.join(audios_dir, workflow_filename)
-                
-                with open(workflow_path, 'w', encoding='utf-8') as f:
-                    json.dump(workflow, f, ensure_ascii=False, indent=2)
-                
-                saved_files.append(workflow_path)
-                self.logger.info(f"工作流已保存: {workflow_path}")
+                saved_files.append(self._write_audio_workflow(workflow, audios_dir, sentence_index))
             
             return saved_files
-            
+        
         except Exception as e:
             self.logger.error(f"保存音频文件失败: {e}")
             raise
     
-    def test_connection(self) -> bool:
-        """测试与ComfyUI服务器的连接"""
+    def _audio_extension(self, content_type: str, audio_url: str) -> str:
+        """根据响应的content-type确定音频文件扩展名，无法判断时从URL推断"""
+        if 'audio/wav' in content_type:
+            return '.wav'
+        elif 'audio/mp3' in content_type:
+            return '.mp3'
+        elif 'audio/flac' in content_type:
+            return '.flac'
+        
+        # 从URL推断扩展名（/view的文件名在查询参数中）
+        parsed_url = urlparse(audio_url)
+        filename = urllib.parse.parse_qs(parsed_url.query).get('filename', [''])[0] or os.path.basename(parsed_url.path)
+        _, ext = os.path.splitext(filename)
+        return ext or '.wav'  # 默认扩展名
+    
+    def _write_audio_workflow(self, workflow: dict, audios_dir: str, sentence_index: int) -> str:
+        """保存音频对应的工作流JSON文件"""
+        workflow_filename = f"script_{sentence_index}_workflow.json"
+        workflow_path = os.path.join(audios_dir, workflow_filename)
+        
+        with open(workflow_path, 'w', encoding='utf-8') as f:
+            json.dump(workflow, f, ensure_ascii=False, indent=2)
+        
+        self.logger.info(f"工作流已保存: {workflow_path}")
+        return workflow_path
+    
+    def check_health(self, timeout: Optional[float] = None) -> bool:
+        """立即访问ComfyUI的基本信息接口，更新并返回缓存的健康状态"""
         try:
-            # 尝试访问ComfyUI的基本信息接口
-            response = urllib.request.urlopen(f"http://{self.server_address}/system_stats")
-            return response.getcode() == 200
+            self.get_json('/system_stats', timeout)
+            healthy, error = True, ''
         except Exception as e:
-            self.logger.error(f"Connection test failed: {e}")
-            return False
+            healthy, error = False, str(e)
+        with self._lock:
+            self._healthy = healthy
+            self.health_error = error
+            self._health_checked = time.time()
+            self._health_refreshing = False
+        return healthy
+    
+    def test_connection(self) -> bool:
+        """
+        测试与ComfyUI服务器的连接
+        
+        health_ttl秒内直接返回缓存结果；缓存过期且上次健康时返回上次结果并在后台刷新，
+        从未检查过或上次不健康时同步检查。
+        """
+        with self._lock:
+            healthy = self._healthy
+            stale = time.time() - self._health_checked >= self.health_ttl
+            refresh = healthy and stale and not self._health_refreshing
+            if refresh:
+                self._health_refreshing = True
+        
+        if refresh:
+            threading.Thread(target=self.check_health, name='comfyui-health', daemon=True).start()
+        elif healthy is None or (stale and not healthy):
+            healthy = self.check_health()
+        
+        if not healthy:
+            self.logger.error(f"Connection test failed: {self.health_error}")
+        return healthy
+
+_clients: Dict[str, ComfyUIClient] = {}
+_clients_lock = threading.Lock()
+
+def get_comfyui_client(server_address: str = None) -> ComfyUIClient:
+    """
+    获取进程内共享的ComfyUIClient，同一地址的调用复用HTTP连接池、WebSocket连接和健康状态缓存
+    
+    Args:
+        server_address: host:port格式的地址，None表示读取config.ini
+    
+    Returns:
+        ComfyUIClient: 共享的客户端
+    """
+    with _clients_lock:
+        client = _clients.get(server_address) if server_address else None
+        if client is None:
+            client = ComfyUIClient(server_address)
+            client = _clients.setdefault(client.server_address, client)
+        return client
 
 # 使用示例
 if __name__ == "__main__":
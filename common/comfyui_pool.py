@@ -0,0 +1,569 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AutoMovie多服务器ComfyUI调度模块
+把多台ComfyUI服务器组成一个池：按图像/音频分别配置权重，定期做健康检查，
+每个任务分配给 (/queue排队数 + 本进程刚分配的任务数) / 权重 最小的服务器，
+连接失败时暂停该服务器一段时间并自动换下一台重试。
+ComfyUIPool提供与ComfyUIClient相同的generate_image/generate_audio/test_connection接口
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+import configparser
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Tuple, Iterator, Callable
+
+import requests
+import websocket
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+from comfyui_client import ComfyUIClient, get_comfyui_client
+
+logger = logging.getLogger(__name__)
+
+WORKFLOW_TYPES = ('image', 'audio')
+
+
+def normalize_address(address: str) -> str:
+    """将配置中的地址（可带http://前缀和结尾斜杠）转换为ComfyUIClient使用的host:port格式"""
+    address = address.strip()
+    for prefix in ('http://', 'https://'):
+        if address.startswith(prefix):
+            address = address[len(prefix):]
+    return address.rstrip('/')
+
+
+def parse_server_list(value: str) -> List[Tuple[str, float]]:
+    """
+    解析服务器列表配置
+
+    Args:
+        value: 逗号分隔的服务器列表，每项为 地址 或 地址*权重，如 "http://192.168.1.85:8188/*2, 192.168.1.86:8188"
+
+    Returns:
+        List[Tuple[str, float]]: [(host:port, 权重)]，权重小于等于0的条目被忽略
+    """
+    servers = []
+    for item in (value or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        weight = 1.0
+        if '*' in item:
+            item, weight_text = item.rsplit('*', 1)
+            try:
+                weight = float(weight_text)
+            except ValueError:
+                logger.warning(f"ComfyUI服务器权重无效，按1处理: {item}*{weight_text}")
+                weight = 1.0
+        if weight > 0:
+            servers.append((normalize_address(item), weight))
+    return servers
+
+
+def parse_output_dirs(value: str) -> Dict[str, str]:
+    """
+    解析各服务器在本机可访问的ComfyUI输出目录配置
+
+    Args:
+        value: 逗号分隔的 地址=目录 列表，如 "127.0.0.1:8188=D:\\ComfyUI\\output, 192.168.1.86:8188=/mnt/comfyui/output"
+
+    Returns:
+        Dict[str, str]: host:port -> 输出目录
+    """
+    output_dirs = {}
+    for item in (value or '').split(','):
+        address, separator, path = item.partition('=')
+        if not separator or not address.strip() or not path.strip():
+            if item.strip():
+                logger.warning(f"ComfyUI输出目录配置无效，已忽略: {item.strip()}")
+            continue
+        output_dirs[normalize_address(address)] = path.strip()
+    return output_dirs
+
+
+def load_comfyui_pool_config() -> Dict[str, Any]:
+    """
+    从config.ini加载ComfyUI服务器池配置
+
+    Returns:
+        dict: {'image_servers', 'audio_servers', 'output_dirs', 'health_check_interval', 'failure_cooldown',
+               'max_attempts', 'queue_ttl'}；未配置服务器列表时两个列表均为空
+    """
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    pool_config = {
+        'image_servers': [],
+        'audio_servers': [],
+        'output_dirs': {},
+        'health_check_interval': 30.0,
+        'failure_cooldown': 60.0,
+        'max_attempts': 3,
+        'queue_ttl': 1.0
+    }
+
+    try:
+        config_path = os.path.join(project_root, 'config.ini')
+        if os.path.exists(config_path):
+            config = configparser.ConfigParser(interpolation=None)
+            config.read(config_path, encoding='utf-8')
+
+            if config.has_section('COMFYUI_POOL_CONFIG'):
+                section = 'COMFYUI_POOL_CONFIG'
+                pool_config['image_servers'] = parse_server_list(config.get(section, 'image_servers', fallback=''))
+                pool_config['audio_servers'] = parse_server_list(config.get(section, 'audio_servers', fallback=''))
+                pool_config['output_dirs'] = parse_output_dirs(config.get(section, 'output_dirs', fallback=''))
+                pool_config['health_check_interval'] = config.getfloat(section, 'health_check_interval', fallback=30.0)
+                pool_config['failure_cooldown'] = config.getfloat(section, 'failure_cooldown', fallback=60.0)
+                pool_config['max_attempts'] = config.getint(section, 'max_attempts', fallback=3)
+                pool_config['queue_ttl'] = config.getfloat(section, 'queue_ttl', fallback=1.0)
+    except Exception as e:
+        logger.error(f"加载ComfyUI服务器池配置失败，使用默认值: {e}")
+
+    return pool_config
+
+
+def is_server_error(error: Exception) -> bool:
+    """
+    判断异常是否由服务器不可用引起（需要换服务器重试）
+
+    连接失败、WebSocket断开、超时和5xx响应视为服务器问题；
+    4xx（工作流无效等）和文案、工作流配置错误换服务器也无法解决，不重试。
+    """
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code >= 500
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code >= 500
+    if AIOHTTP_AVAILABLE:
+        if isinstance(error, aiohttp.ClientResponseError):
+            return error.status >= 500
+        if isinstance(error, aiohttp.ClientConnectionError):
+            return True
+    return isinstance(error, (OSError, ConnectionError, TimeoutError, websocket.WebSocketException))
+
+
+class ComfyUIServer:
+    """
+    服务器池成员
+
+    记录图像/音频两类任务各自的权重（0表示不承担该类任务）、输出文件的获取方式、健康状态、
+    最近一次/queue查询到的排队数，以及此后本进程又分配给它的任务数
+    """
+
+    def __init__(self, address: str, image_weight: float = 1.0, audio_weight: float = 1.0,
+                 output_dir: Optional[str] = None):
+        self.address = normalize_address(address)
+        self.weights = {'image': image_weight, 'audio': audio_weight}
+        self.client = get_comfyui_client(self.address)  # 进程内共享，服务器池按新配置重建时继续复用连接
+        # 配置了本机可访问的输出目录时从共享文件系统获取输出文件，否则通过HTTP下载
+        self.client.comfyui_output_dir = output_dir
+        self.healthy = True
+        self.failed_until = 0.0
+        self.last_error = ''
+        self.queue_depth = 0
+        self.queue_checked = 0.0
+        self.dispatched = 0  # 上次查询/queue之后分配的任务数
+        self.completed = 0
+        self.failures = 0
+
+    def accepts(self, workflow_type: str) -> bool:
+        """是否承担该类任务"""
+        return self.weights.get(workflow_type, 0) > 0
+
+    def available(self, now: float) -> bool:
+        """健康且不在失败冷却期内"""
+        return self.healthy and now >= self.failed_until
+
+    def load(self, workflow_type: str) -> float:
+        """按权重折算的负载，越小越优先"""
+        return (self.queue_depth + self.dispatched) / self.weights[workflow_type]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """服务器状态（用于接口返回和日志）"""
+        return {
+            'address': self.address,
+            'image_weight': self.weights['image'],
+            'audio_weight': self.weights['audio'],
+            'transport': 'filesystem' if self.client.comfyui_output_dir else 'http',
+            'healthy': self.healthy,
+            'cooling_down': time.time() < self.failed_until,
+            'queue_depth': self.queue_depth,
+            'dispatched': self.dispatched,
+            'completed': self.completed,
+            'failures': self.failures,
+            'last_error': self.last_error
+        }
+
+
+class ComfyUIPool:
+    """
+    ComfyUI服务器池
+
+    与ComfyUIClient接口一致，调用方只需把客户端对象换成服务器池：
+
+        pool = ComfyUIPool([ComfyUIServer('127.0.0.1:8188'), ComfyUIServer('127.0.0.1:8189', audio_weight=0)])
+        pool.generate_image(project_path, sentence_id=1)
+    """
+
+    def __init__(self, servers: List[ComfyUIServer], health_check_interval: float = 30.0,
+                 failure_cooldown: float = 60.0, max_attempts: int = 3, queue_ttl: float = 1.0,
+                 request_timeout: float = 5.0, start_health_checks: bool = True):
+        if not servers:
+            raise ValueError("ComfyUI服务器池至少需要一台服务器")
+        self.servers = servers
+        self.health_check_interval = health_check_interval
+        self.failure_cooldown = failure_cooldown
+        self.max_attempts = max(1, max_attempts)
+        self.queue_ttl = queue_ttl
+        self.request_timeout = request_timeout
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._health_thread = None
+        if start_health_checks and health_check_interval > 0:
+            self._health_thread = threading.Thread(target=self._health_loop, name='comfyui-health', daemon=True)
+            self._health_thread.start()
+
+    @classmethod
+    def from_config(cls, default_address: str = None, **kwargs) -> 'ComfyUIPool':
+        """
+        按config.ini的COMFYUI_POOL_CONFIG节创建服务器池
+
+        Args:
+            default_address: 未配置服务器列表时使用的单台服务器地址，None表示读取COMFYUI_CONFIG的comfyui_address
+            **kwargs: 覆盖配置文件中调度参数的关键字参数
+
+        Returns:
+            ComfyUIPool: 服务器池
+        """
+        pool_config = load_comfyui_pool_config()
+        image_weights = dict(pool_config['image_servers'])
+        audio_weights = dict(pool_config['audio_servers'])
+        addresses = list(dict.fromkeys(list(image_weights) + list(audio_weights)))
+        if not addresses:
+            addresses = [normalize_address(default_address) if default_address else ComfyUIClient().server_address]
+            image_weights = audio_weights = {addresses[0]: 1.0}
+        elif not image_weights or not audio_weights:
+            # 只配置了一类任务的服务器列表时，另一类任务也由这些服务器承担
+            image_weights = image_weights or audio_weights
+            audio_weights = audio_weights or image_weights
+
+        servers = [ComfyUIServer(address, image_weights.get(address, 0.0), audio_weights.get(address, 0.0),
+                                 pool_config['output_dirs'].get(address))
+                   for address in addresses]
+        options = {key: pool_config[key] for key in
+                   ('health_check_interval', 'failure_cooldown', 'max_attempts', 'queue_ttl')}
+        options.update(kwargs)
+        return cls(servers, **options)
+
+    @property
+    def server_address(self) -> str:
+        """所有成员地址（与ComfyUIClient.server_address对应，用于日志）"""
+        return ','.join(server.address for server in self.servers)
+
+    def close(self):
+        """停止后台健康检查"""
+        self._stop.set()
+
+    # ------------------------------------------------------------------
+    # 健康检查与排队数
+    # ------------------------------------------------------------------
+
+    def _check_server(self, server: ComfyUIServer) -> bool:
+        """检查单台服务器（/system_stats），更新健康状态"""
+        healthy = server.client.check_health(self.request_timeout)
+        error = server.client.health_error
+        with self._lock:
+            if healthy and not server.healthy:
+                logger.info(f"ComfyUI服务器已恢复: {server.address}")
+            elif not healthy and server.healthy:
+                logger.warning(f"ComfyUI服务器健康检查失败: {server.address}: {error}")
+            server.healthy = healthy
+            if healthy:
+                server.failed_until = 0.0
+            else:
+                server.last_error = error
+        return healthy
+
+    def check_health(self) -> Dict[str, bool]:
+        """
+        并发检查所有服务器
+
+        Returns:
+            dict: 地址 -> 是否健康
+        """
+        with ThreadPoolExecutor(max_workers=len(self.servers)) as executor:
+            results = list(executor.map(self._check_server, self.servers))
+        return {server.address: healthy for server, healthy in zip(self.servers, results)}
+
+    def _health_loop(self):
+        """后台健康检查线程"""
+        while not self._stop.wait(self.health_check_interval):
+            try:
+                self.check_health()
+            except Exception as e:
+                logger.error(f"ComfyUI服务器健康检查异常: {e}")
+
+    def _refresh_queue(self, server: ComfyUIServer):
+        """查询单台服务器的/queue排队数（运行中+等待中）"""
+        try:
+            data = server.client.get_json('/queue', self.request_timeout)
+            depth = len(data.get('queue_running', [])) + len(data.get('queue_pending', []))
+        except Exception as e:
+            self.mark_failed(server, e)
+            return
+        with self._lock:
+            server.queue_depth = depth
+            server.queue_checked = time.time()
+            server.dispatched = 0
+
+    def _refresh_queues(self, servers: List[ComfyUIServer]):
+        """并发刷新超过queue_ttl未查询的服务器排队数"""
+        now = time.time()
+        stale = [server for server in servers if now - server.queue_checked >= self.queue_ttl]
+        if len(stale) == 1:
+            self._refresh_queue(stale[0])
+        elif stale:
+            with ThreadPoolExecutor(max_workers=len(stale)) as executor:
+                list(executor.map(self._refresh_queue, stale))
+
+    def _candidates(self, workflow_type: str, exclude: Tuple[str, ...] = ()) -> List[ComfyUIServer]:
+        """可承担该类任务的可用服务器"""
+        now = time.time()
+        return [server for server in self.servers
+                if server.accepts(workflow_type) and server.available(now) and server.address not in exclude]
+
+    def select(self, workflow_type: str, exclude: Tuple[str, ...] = ()) -> ComfyUIServer:
+        """
+        选择负载最小的服务器，并把该任务计入其已分配数
+
+        Args:
+            workflow_type: 'image' 或 'audio'
+            exclude: 本任务已经失败过的服务器地址
+
+        Returns:
+            ComfyUIServer: 选中的服务器
+
+        Raises:
+            ConnectionError: 没有可用的服务器
+        """
+        if workflow_type not in WORKFLOW_TYPES:
+            raise ValueError(f"不支持的工作流类型: {workflow_type}")
+        self._refresh_queues(self._candidates(workflow_type, exclude))
+        with self._lock:
+            candidates = self._candidates(workflow_type, exclude)
+            if not candidates:
+                raise ConnectionError(f"没有可用的ComfyUI服务器处理{workflow_type}任务: {self.server_address}")
+            server = min(candidates, key=lambda item: (item.load(workflow_type), -item.weights[workflow_type]))
+            server.dispatched += 1
+            return server
+
+    def mark_failed(self, server: ComfyUIServer, error: Exception):
+        """服务器出错：在failure_cooldown秒内不再分配任务，健康检查成功后提前恢复"""
+        with self._lock:
+            server.failures += 1
+            server.last_error = str(error)
+            server.failed_until = time.time() + self.failure_cooldown
+        logger.warning(f"ComfyUI服务器不可用，暂停分配任务{self.failure_cooldown:.0f}秒: {server.address}: {error}")
+
+    # ------------------------------------------------------------------
+    # 任务执行（与ComfyUIClient接口一致）
+    # ------------------------------------------------------------------
+
+    def _run_with_failover(self, workflow_type: str, task: Callable[[ComfyUIServer], Any]) -> Any:
+        """在选中的服务器上执行任务，服务器不可用时换下一台，最多尝试max_attempts台"""
+        tried = ()
+        last_error = None
+        for _ in range(self.max_attempts):
+            try:
+                server = self.select(workflow_type, tried)
+            except ConnectionError as e:
+                if last_error is not None:
+                    raise last_error
+                raise e
+            try:
+                result = task(server)
+            except Exception as e:
+                if not is_server_error(e):
+                    raise
+                self.mark_failed(server, e)
+                tried += (server.address,)
+                last_error = e
+                continue
+            with self._lock:
+                server.completed += 1
+            return result
+        raise last_error
+
+    def generate_image(self, project_path: str, sentence_id: int = 1, seed: Optional[int] = None,
+                       force_new: bool = False) -> List[str]:
+        """生成图像（与ComfyUIClient.generate_image一致，自动选择服务器并故障转移）"""
+        return self._run_with_failover(
+            'image', lambda server: server.client.generate_image(project_path, sentence_id, seed, force_new))
+
+    def generate_audio(self, project_path: str, sentence_id: int = 1, force_new: bool = False) -> List[str]:
+        """生成音频（与ComfyUIClient.generate_audio一致，自动选择服务器并故障转移）"""
+        return self._run_with_failover(
+            'audio', lambda server: server.client.generate_audio(project_path, sentence_id, force_new))
+
+    def lookup_narration_cache(self, project_path: str, sentence_ids: List[int],
+                               trim_settings: Tuple[float, float, float],
+                               force_new: bool = False) -> Dict[int, Dict[str, Any]]:
+        """
+        查询旁白缓存（与ComfyUIClient.lookup_narration_cache一致，参考音频从一台可用的音频服务器读取）
+
+        视图在测试连接之前查询，读取参考音频使用request_timeout，服务器不可达时很快放弃缓存而不是阻塞http_timeout
+        """
+        servers = self._candidates('audio') or [server for server in self.servers if server.accepts('audio')]
+        return servers[0].client.lookup_narration_cache(project_path, sentence_ids, trim_settings, force_new,
+                                                        self.request_timeout)
+
+    def store_narration_cache(self, key: Optional[str], audio_path: str, duration: Optional[float]):
+        """写入旁白缓存（与ComfyUIClient.store_narration_cache一致）"""
+        self.servers[0].client.store_narration_cache(key, audio_path, duration)
+
+    def test_connection(self) -> bool:
+        """至少有一台服务器可用时返回True"""
+        now = time.time()
+        if any(server.available(now) for server in self.servers):
+            return True
+        return any(self.check_health().values())
+
+    def get_status(self) -> List[Dict[str, Any]]:
+        """
+        获取所有服务器的状态
+
+        Returns:
+            List[dict]: 每台服务器的地址、权重、健康状态和任务计数
+        """
+        with self._lock:
+            return [server.to_dict() for server in self.servers]
+
+    def iter_generate_batch(self, workflow_type: str, project_path: str, sentence_ids: List[int],
+                            seed: Optional[int] = None, max_in_flight: int = 0,
+                            force_new: bool = False) -> Iterator[Dict[str, Any]]:
+        """
+        把一批句子按负载分配到各服务器，每台服务器使用一个异步客户端并发生成，按完成顺序返回结果
+
+        某台服务器连接失败或在生成过程中不可用（停止、重启丢失任务）时，
+        它还没有返回结果的句子重新分配到其余服务器。
+
+        Args:
+            workflow_type: 'image' 或 'audio'
+            project_path: 项目路径
+            sentence_ids: 句子ID列表
+            seed: 图像随机种子，None表示每个句子随机生成
+            max_in_flight: 每台服务器同时排队的最大prompt数，0表示不限制
+            force_new: 为True时不使用生成结果缓存
+
+        Yields:
+            dict: {'sentence_id': int, 'files': List[str], 'error': Optional[str]}
+        """
+        from async_comfyui_client import iter_generate_batch
+
+        events = queue.Queue()
+        done = object()
+        running = 0
+        tried: Dict[int, Tuple[str, ...]] = {}
+
+        def run(server: ComfyUIServer, ids: List[int]):
+            delivered = set()
+            try:
+                for result in iter_generate_batch(workflow_type, project_path, ids, server.address,
+                                                  seed, max_in_flight, server.client.comfyui_output_dir, force_new):
+                    delivered.add(result['sentence_id'])
+                    if result['files']:
+                        with self._lock:
+                            server.completed += 1
+                    events.put(result)
+            except Exception as e:
+                remaining = [sentence_id for sentence_id in ids if sentence_id not in delivered]
+                events.put((server, e, remaining))
+            finally:
+                events.put(done)
+
+        def dispatch(ids: List[int]) -> List[Dict[str, Any]]:
+            """分配句子并启动各服务器的批量任务，返回无法分配的句子的失败结果"""
+            nonlocal running
+            assignments: Dict[str, Tuple[ComfyUIServer, List[int]]] = {}
+            failures = []
+            for sentence_id in ids:
+                try:
+                    server = self.select(workflow_type, tried.get(sentence_id, ()))
+                except ConnectionError as e:
+                    failures.append({'sentence_id': sentence_id, 'files': [], 'error': str(e)})
+                    continue
+                assignments.setdefault(server.address, (server, []))[1].append(sentence_id)
+            for server, server_ids in assignments.values():
+                logger.info(f"分配 {len(server_ids)} 个{workflow_type}任务到ComfyUI服务器 {server.address}")
+                running += 1
+                threading.Thread(target=run, args=(server, server_ids), name='comfyui-pool-batch',
+                                 daemon=True).start()
+            return failures
+
+        for failure in dispatch(list(sentence_ids)):
+            yield failure
+        while running:
+            item = events.get()
+            if item is done:
+                running -= 1
+            elif isinstance(item, tuple):
+                server, error, remaining = item
+                if not is_server_error(error):
+                    # 文案或工作流错误换服务器也无法解决
+                    for sentence_id in remaining:
+                        yield {'sentence_id': sentence_id, 'files': [], 'error': str(error)}
+                    continue
+                self.mark_failed(server, error)
+                retry = []
+                for sentence_id in remaining:
+                    tried[sentence_id] = tried.get(sentence_id, ()) + (server.address,)
+                    if len(tried[sentence_id]) < self.max_attempts:
+                        retry.append(sentence_id)
+                    else:
+                        yield {'sentence_id': sentence_id, 'files': [], 'error': str(error)}
+                for failure in dispatch(retry):
+                    yield failure
+            else:
+                yield item
+
+
+_pool = None
+_pool_key = None
+_pool_lock = threading.Lock()
+
+
+def get_comfyui_pool(default_address: str = None) -> ComfyUIPool:
+    """
+    获取进程内共享的ComfyUI服务器池，config.ini修改后自动按新配置重建
+
+    Args:
+        default_address: 未配置服务器列表时使用的单台服务器地址
+
+    Returns:
+        ComfyUIPool: 服务器池
+    """
+    global _pool, _pool_key
+    config_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config.ini')
+    try:
+        config_mtime = os.stat(config_path).st_mtime_ns
+    except OSError:
+        config_mtime = None
+    key = (config_mtime, default_address)
+
+    with _pool_lock:
+        if _pool is None or _pool_key != key:
+            if _pool is not None:
+                _pool.close()
+            _pool = ComfyUIPool.from_config(default_address)
+            _pool_key = key
+            logger.info(f"ComfyUI服务器池: {[server.to_dict() for server in _pool.servers]}")
+        return _pool
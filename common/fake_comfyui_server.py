@@ -0,0 +1,610 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地模拟ComfyUI服务器
+只依赖标准库，实现/prompt、/ws、/history/<id>、/view、/queue和/system_stats，
+按工作流生成确定性的PNG/WAV输出，可配置执行耗时、并行执行数、预置排队数和故障注入，
+用于在没有GPU服务器的情况下调试和压测ComfyUIClient、AsyncComfyUIClient和ComfyUIPool
+
+用法:
+    python fake_comfyui_server.py --port 8188 --latency 0.5 --workers 1
+"""
+
+import os
+import json
+import time
+import uuid
+import wave
+import zlib
+import base64
+import random
+import struct
+import socket
+import hashlib
+import logging
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Dict, Any, List, Tuple
+from urllib.parse import urlparse, parse_qs
+
+logger = logging.getLogger(__name__)
+
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+
+def make_png(width: int, height: int, seed: bytes) -> bytes:
+    """
+    生成确定性的PNG图像（由seed决定的上下渐变色，同一seed输出完全相同）
+
+    Args:
+        width: 宽度
+        height: 高度
+        seed: 决定颜色的字节串
+
+    Returns:
+        bytes: PNG文件内容
+    """
+    top = seed[0:3]
+    bottom = seed[3:6]
+    rows = []
+    for y in range(height):
+        ratio = y / max(height - 1, 1)
+        color = bytes(int(top[i] + (bottom[i] - top[i]) * ratio) for i in range(3))
+        rows.append(b'\x00' + color * width)
+
+    def chunk(chunk_type: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data))
+
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(b''.join(rows), 6))
+            + chunk(b'IEND', b''))
+
+
+def make_wav(seconds: float, seed: bytes, sample_rate: int = 24000) -> bytes:
+    """
+    生成确定性的WAV音频（前后各0.2秒静音，中间为由seed决定频率的正弦音）
+
+    Args:
+        seconds: 时长（秒）
+        seed: 决定频率的字节串
+        sample_rate: 采样率
+
+    Returns:
+        bytes: WAV文件内容
+    """
+    import io
+    import math
+
+    frequency = 220 + seed[0] * 2
+    total = int(seconds * sample_rate)
+    silence = min(int(0.2 * sample_rate), total // 4)
+    samples = bytearray()
+    for i in range(total):
+        value = 0
+        if silence <= i < total - silence:
+            value = int(12000 * math.sin(2 * math.pi * frequency * i / sample_rate))
+        samples += struct.pack('<h', value)
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(bytes(samples))
+    return buffer.getvalue()
+
+
+class _WebSocketConnection:
+    """服务器端WebSocket连接（只发送文本帧，接收端只处理ping和close）"""
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def _send_frame(self, opcode: int, payload: bytes):
+        header = bytes([0x80 | opcode])
+        length = len(payload)
+        if length < 126:
+            header += bytes([length])
+        elif length < 65536:
+            header += bytes([126]) + struct.pack('>H', length)
+        else:
+            header += bytes([127]) + struct.pack('>Q', length)
+        with self.lock:
+            if self.closed:
+                return
+            try:
+                self.sock.sendall(header + payload)
+            except OSError:
+                self.closed = True
+
+    def send_json(self, message: Dict[str, Any]):
+        self._send_frame(0x1, json.dumps(message).encode('utf-8'))
+
+    def _recv_exact(self, size: int) -> bytes:
+        data = b''
+        while len(data) < size:
+            chunk = self.sock.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError('WebSocket连接已关闭')
+            data += chunk
+        return data
+
+    def serve(self):
+        """读取客户端帧直到连接关闭"""
+        try:
+            while not self.closed:
+                first, second = self._recv_exact(2)
+                opcode = first & 0x0F
+                length = second & 0x7F
+                if length == 126:
+                    length = struct.unpack('>H', self._recv_exact(2))[0]
+                elif length == 127:
+                    length = struct.unpack('>Q', self._recv_exact(8))[0]
+                mask = self._recv_exact(4) if second & 0x80 else b'\x00\x00\x00\x00'
+                payload = bytes(b ^ mask[i % 4] for i, b in enumerate(self._recv_exact(length)))
+                if opcode == 0x8:
+                    self._send_frame(0x8, payload[:2])
+                    break
+                if opcode == 0x9:
+                    self._send_frame(0xA, payload)
+        except (OSError, ConnectionError, ValueError):
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class FakeComfyUIServer:
+    """
+    模拟ComfyUI服务器
+
+    提交的prompt进入先进先出队列，由workers个执行线程依次“执行”（等待latency±jitter秒），
+    然后按工作流中的SaveImage/SaveAudio节点生成输出文件，通过WebSocket向提交者发送
+    execution_start、executing、executed和执行完成消息。输出内容由工作流JSON的哈希决定，
+    相同工作流总是得到相同文件。
+
+        with FakeComfyUIServer(latency=0.1) as server:
+            client = ComfyUIClient(server.address)
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.5, jitter: float = 0.0,
+                 workers: int = 1, background_queue: int = 0, max_queue: int = 0,
+                 prompt_failure_rate: float = 0.0, execution_failure_rate: float = 0.0,
+                 audio_seconds: float = 1.0, max_image_side: int = 0, output_dir: Optional[str] = None,
+                 seed: int = 0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.workers = max(1, workers)
+        self.background_queue = background_queue
+        self.max_queue = max_queue
+        self.prompt_failure_rate = prompt_failure_rate
+        self.execution_failure_rate = execution_failure_rate
+        self.audio_seconds = audio_seconds
+        self.max_image_side = max_image_side
+        self.output_dir = output_dir
+        self._random = random.Random(seed)
+
+        self._lock = threading.Condition()
+        self._pending = deque()  # (序号, prompt_id, prompt, client_id)
+        self._running: Dict[str, Tuple[int, str]] = {}
+        self._history: Dict[str, Dict[str, Any]] = {}
+        self._files: Dict[Tuple[str, str], Tuple[bytes, str]] = {}  # (subfolder, filename) -> (内容, content-type)
+        self._inputs: Dict[Tuple[str, str], Tuple[bytes, str]] = {}  # input目录中的文件（如参考音频）
+        self._sockets: Dict[str, List[_WebSocketConnection]] = {}
+        self._connections = set()  # 所有打开的TCP连接（包括保持连接的HTTP连接）
+        self._counter = 0
+        self._file_counter = 0
+        self._stopping = False
+        self._httpd = None
+        self._threads = []
+        self.stats = {'prompts': 0, 'completed': 0, 'rejected': 0, 'failed': 0, 'downloads': 0}
+
+    # ------------------------------------------------------------------
+    # 生命周期
+    # ------------------------------------------------------------------
+
+    @property
+    def address(self) -> str:
+        """host:port（与ComfyUIClient的server_address格式一致）"""
+        return f'{self.host}:{self.port}'
+
+    def start(self) -> 'FakeComfyUIServer':
+        """在后台线程中启动HTTP服务和执行线程"""
+        server = self
+
+        class Handler(_RequestHandler):
+            fake = server
+
+        self._httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._stopping = False
+
+        # 预置排队任务（模拟其他用户占用的队列），不属于任何客户端
+        for _ in range(self.background_queue):
+            self._enqueue({}, '')
+
+        self._threads = [threading.Thread(target=self._httpd.serve_forever, name='fake-comfyui-http', daemon=True)]
+        self._threads += [threading.Thread(target=self._execute_loop, name=f'fake-comfyui-worker-{i}', daemon=True)
+                          for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"模拟ComfyUI服务器已启动: {self.address}")
+        return self
+
+    def stop(self):
+        """停止服务并断开所有WebSocket连接（可重复调用，也可在多个线程中同时调用）"""
+        with self._lock:
+            self._stopping = True
+            self._lock.notify_all()
+            connections = [conn for conns in self._sockets.values() for conn in conns]
+            sockets = list(self._connections)
+            httpd, self._httpd = self._httpd, None
+        for conn in connections:
+            conn.close()
+        # 断开保持连接的HTTP连接，让客户端看到的效果与服务器宕机一致
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if httpd is not None:
+            httpd.shutdown()
+            httpd.server_close()
+
+    def __enter__(self) -> 'FakeComfyUIServer':
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    # ------------------------------------------------------------------
+    # 队列与执行
+    # ------------------------------------------------------------------
+
+    def queue_size(self) -> int:
+        """运行中和等待中的任务总数"""
+        with self._lock:
+            return len(self._running) + len(self._pending)
+
+    def _enqueue(self, prompt: dict, client_id: str) -> Tuple[str, int]:
+        """加入队列（调用方无需持有锁）"""
+        with self._lock:
+            self._counter += 1
+            prompt_id = str(uuid.uuid4())
+            self._pending.append((self._counter, prompt_id, prompt, client_id))
+            self._lock.notify()
+            return prompt_id, self._counter
+
+    def submit(self, prompt: dict, client_id: str) -> Tuple[int, Dict[str, Any]]:
+        """
+        处理/prompt请求
+
+        Returns:
+            Tuple[int, dict]: (HTTP状态码, 响应JSON)
+        """
+        self.stats['prompts'] += 1
+        if not isinstance(prompt, dict) or not prompt:
+            self.stats['rejected'] += 1
+            return 400, {'error': {'type': 'prompt_no_outputs', 'message': 'Prompt has no outputs'}, 'node_errors': {}}
+        if self.max_queue and self.queue_size() >= self.max_queue:
+            self.stats['rejected'] += 1
+            return 503, {'error': {'type': 'queue_full', 'message': 'Queue is full'}}
+        with self._lock:
+            inject_failure = self._random.random() < self.prompt_failure_rate
+        if inject_failure:
+            self.stats['rejected'] += 1
+            return 500, {'error': {'type': 'injected_failure', 'message': 'Injected /prompt failure'}}
+
+        prompt_id, number = self._enqueue(prompt, client_id)
+        self._broadcast_status()
+        return 200, {'prompt_id': prompt_id, 'number': number, 'node_errors': {}}
+
+    def _execute_loop(self):
+        """执行线程：按先进先出顺序取任务执行"""
+        while True:
+            with self._lock:
+                while not self._pending and not self._stopping:
+                    self._lock.wait()
+                if self._stopping:
+                    return
+                number, prompt_id, prompt, client_id = self._pending.popleft()
+                self._running[prompt_id] = (number, client_id)
+                delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+                fail = bool(prompt) and self._random.random() < self.execution_failure_rate
+
+            self._send(client_id, 'execution_start', {'prompt_id': prompt_id})
+            time.sleep(delay)
+            try:
+                if fail:
+                    node_id = next(iter(prompt), '')
+                    self._send(client_id, 'execution_error', {
+                        'prompt_id': prompt_id,
+                        'node_id': node_id,
+                        'node_type': prompt.get(node_id, {}).get('class_type', ''),
+                        'exception_message': 'Injected execution failure'
+                    })
+                    self.stats['failed'] += 1
+                    outputs, status = {}, 'error'
+                else:
+                    outputs = self._render_outputs(prompt, client_id, prompt_id) if prompt else {}
+                    status = 'success'
+                    if prompt:
+                        self.stats['completed'] += 1
+
+                with self._lock:
+                    self._running.pop(prompt_id, None)
+                    if prompt:
+                        self._history[prompt_id] = {
+                            'prompt': [number, prompt_id, prompt, {'client_id': client_id}, list(outputs)],
+                            'outputs': outputs,
+                            'status': {'status_str': status, 'completed': status == 'success', 'messages': []}
+                        }
+                # 与ComfyUI一致：无论成功失败，都以node为None的executing消息结束
+                self._send(client_id, 'executing', {'node': None, 'prompt_id': prompt_id})
+            finally:
+                with self._lock:
+                    self._running.pop(prompt_id, None)
+                self._broadcast_status()
+
+    def _render_outputs(self, prompt: dict, client_id: str, prompt_id: str) -> Dict[str, Any]:
+        """为工作流中的保存节点生成确定性的输出文件，并发送executing/executed消息"""
+        digest = hashlib.sha256(json.dumps(prompt, sort_keys=True, ensure_ascii=False).encode('utf-8')).digest()
+
+        # 从潜空间节点读取图像尺寸
+        width = height = 512
+        for node in prompt.values():
+            inputs = node.get('inputs', {}) if isinstance(node, dict) else {}
+            if 'LatentImage' in node.get('class_type', '') and 'width' in inputs:
+                width, height = int(inputs['width']), int(inputs['height'])
+        if self.max_image_side and max(width, height) > self.max_image_side:
+            scale = self.max_image_side / max(width, height)
+            width, height = max(1, int(width * scale)), max(1, int(height * scale))
+
+        outputs = {}
+        for node_id, node in prompt.items():
+            if not isinstance(node, dict):
+                continue
+            class_type = node.get('class_type', '')
+            self._send(client_id, 'executing', {'node': node_id, 'prompt_id': prompt_id})
+            if class_type not in ('SaveImage', 'SaveAudio'):
+                continue
+
+            prefix = str(node.get('inputs', {}).get('filename_prefix', 'ComfyUI'))
+            subfolder = os.path.dirname(prefix)
+            with self._lock:
+                self._file_counter += 1
+                counter = self._file_counter
+            if class_type == 'SaveImage':
+                filename = f'{os.path.basename(prefix)}_{counter:05}_.png'
+                data, content_type, key = make_png(width, height, digest), 'image/png', 'images'
+            else:
+                filename = f'{os.path.basename(prefix)}_{counter:05}_.wav'
+                data, content_type, key = make_wav(self.audio_seconds, digest), 'audio/wav', 'audio'
+
+            with self._lock:
+                self._files[(subfolder, filename)] = (data, content_type)
+            if self.output_dir:
+                target_dir = os.path.join(self.output_dir, subfolder)
+                os.makedirs(target_dir, exist_ok=True)
+                with open(os.path.join(target_dir, filename), 'wb') as f:
+                    f.write(data)
+
+            output = {key: [{'filename': filename, 'subfolder': subfolder, 'type': 'output'}]}
+            outputs[node_id] = output
+            self._send(client_id, 'executed', {'node': node_id, 'output': output, 'prompt_id': prompt_id})
+        return outputs
+
+    # ------------------------------------------------------------------
+    # WebSocket消息
+    # ------------------------------------------------------------------
+
+    def _status_message(self) -> Dict[str, Any]:
+        return {'status': {'exec_info': {'queue_remaining': self.queue_size()}}}
+
+    def _send(self, client_id: str, message_type: str, data: Dict[str, Any]):
+        with self._lock:
+            connections = list(self._sockets.get(client_id, []))
+        for conn in connections:
+            conn.send_json({'type': message_type, 'data': data})
+
+    def _broadcast_status(self):
+        with self._lock:
+            connections = [conn for conns in self._sockets.values() for conn in conns]
+        message = {'type': 'status', 'data': self._status_message()}
+        for conn in connections:
+            conn.send_json(message)
+
+    def _register(self, client_id: str, conn: _WebSocketConnection):
+        with self._lock:
+            self._sockets.setdefault(client_id, []).append(conn)
+
+    def _unregister(self, client_id: str, conn: _WebSocketConnection):
+        with self._lock:
+            conns = self._sockets.get(client_id, [])
+            if conn in conns:
+                conns.remove(conn)
+            if not conns:
+                self._sockets.pop(client_id, None)
+
+    # ------------------------------------------------------------------
+    # 查询接口
+    # ------------------------------------------------------------------
+
+    def queue_info(self) -> Dict[str, Any]:
+        with self._lock:
+            running = [[number, prompt_id, {}, {'client_id': client_id}, []]
+                       for prompt_id, (number, client_id) in self._running.items()]
+            pending = [[number, prompt_id, {}, {'client_id': client_id}, []]
+                       for number, prompt_id, _, client_id in self._pending]
+        return {'queue_running': running, 'queue_pending': pending}
+
+    def history(self, prompt_id: Optional[str] = None) -> Dict[str, Any]:
+        with self._lock:
+            if prompt_id is None:
+                return dict(self._history)
+            entry = self._history.get(prompt_id)
+            return {prompt_id: entry} if entry else {}
+
+    def add_input_file(self, filename: str, data: bytes, content_type: str = 'audio/wav', subfolder: str = ''):
+        """放入input目录中的文件（LoadAudio/LoadImage节点引用的参考文件），可通过/view?type=input读取"""
+        with self._lock:
+            self._inputs[(subfolder, filename)] = (data, content_type)
+
+    def get_file(self, filename: str, subfolder: str, file_type: str = 'output') -> Optional[Tuple[bytes, str]]:
+        with self._lock:
+            files = self._inputs if file_type == 'input' else self._files
+            return files.get((subfolder, filename))
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """模拟ComfyUI的HTTP/WebSocket接口"""
+
+    fake: FakeComfyUIServer = None
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        with self.fake._lock:
+            self.fake._connections.add(self.connection)
+
+    def finish(self):
+        with self.fake._lock:
+            self.fake._connections.discard(self.connection)
+        try:
+            super().finish()
+        except OSError:
+            pass
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def _send_json(self, status: int, payload: Any):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        query = parse_qs(parsed.query)
+        if parsed.path == '/ws':
+            self._handle_websocket(query.get('clientId', [''])[0])
+        elif parsed.path == '/system_stats':
+            self._send_json(200, {
+                'system': {'os': 'fake', 'python_version': '', 'embedded_python': False},
+                'devices': [{'name': 'fake', 'type': 'cpu', 'index': 0, 'vram_total': 0, 'vram_free': 0}]
+            })
+        elif parsed.path == '/queue':
+            self._send_json(200, self.fake.queue_info())
+        elif parsed.path == '/history':
+            self._send_json(200, self.fake.history())
+        elif parsed.path.startswith('/history/'):
+            self._send_json(200, self.fake.history(parsed.path[len('/history/'):]))
+        elif parsed.path == '/view':
+            found = self.fake.get_file(query.get('filename', [''])[0], query.get('subfolder', [''])[0],
+                                       query.get('type', ['output'])[0])
+            if found is None:
+                self._send_json(404, {'error': 'file not found'})
+                return
+            data, content_type = found
+            self.fake.stats['downloads'] += 1
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        parsed = urlparse(self.path)
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length) if length else b''
+        if parsed.path != '/prompt':
+            self._send_json(404, {'error': 'not found'})
+            return
+        try:
+            payload = json.loads(body or b'{}')
+        except ValueError:
+            self._send_json(400, {'error': 'invalid json'})
+            return
+        status, response = self.fake.submit(payload.get('prompt'), payload.get('client_id', ''))
+        self._send_json(status, response)
+
+    def _handle_websocket(self, client_id: str):
+        key = self.headers.get('Sec-WebSocket-Key')
+        if not key or 'websocket' not in self.headers.get('Upgrade', '').lower():
+            self._send_json(400, {'error': 'websocket upgrade required'})
+            return
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode('ascii')).digest()).decode('ascii')
+        self.send_response(101, 'Switching Protocols')
+        self.send_header('Upgrade', 'websocket')
+        self.send_header('Connection', 'Upgrade')
+        self.send_header('Sec-WebSocket-Accept', accept)
+        self.end_headers()
+        self.wfile.flush()
+
+        conn = _WebSocketConnection(self.connection)
+        client_id = client_id or str(uuid.uuid4())
+        self.fake._register(client_id, conn)
+        try:
+            conn.send_json({'type': 'status', 'data': dict(self.fake._status_message(), sid=client_id)})
+            conn.serve()
+        finally:
+            self.fake._unregister(client_id, conn)
+            self.close_connection = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地模拟ComfyUI服务器')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8188)
+    parser.add_argument('--latency', type=float, default=0.5, help='每个prompt的执行耗时（秒）')
+    parser.add_argument('--jitter', type=float, default=0.0, help='执行耗时的随机波动（秒）')
+    parser.add_argument('--workers', type=int, default=1, help='并行执行的prompt数')
+    parser.add_argument('--background-queue', type=int, default=0, help='启动时预置的排队任务数')
+    parser.add_argument('--max-queue', type=int, default=0, help='队列上限，超出时/prompt返回503，0表示不限制')
+    parser.add_argument('--prompt-failure-rate', type=float, default=0.0, help='/prompt返回500的概率')
+    parser.add_argument('--execution-failure-rate', type=float, default=0.0, help='执行时发送execution_error的概率')
+    parser.add_argument('--audio-seconds', type=float, default=1.0, help='生成音频的时长（秒）')
+    parser.add_argument('--max-image-side', type=int, default=0, help='生成图像长边上限，0表示按工作流尺寸')
+    parser.add_argument('--output-dir', default=None, help='同时把输出文件写入该目录（模拟ComfyUI的output目录）')
+    parser.add_argument('--seed', type=int, default=0, help='故障注入和耗时波动的随机种子')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    server = FakeComfyUIServer(
+        host=args.host, port=args.port, latency=args.latency, jitter=args.jitter, workers=args.workers,
+        background_queue=args.background_queue, max_queue=args.max_queue,
+        prompt_failure_rate=args.prompt_failure_rate, execution_failure_rate=args.execution_failure_rate,
+        audio_seconds=args.audio_seconds, max_image_side=args.max_image_side, output_dir=args.output_dir,
+        seed=args.seed
+    ).start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AutoMovie文件缓存模块
+提供基于内容哈希的磁盘文件缓存，按总大小上限进行LRU淘汰
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+import threading
+import time
+from typing import Optional, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+
+def hash_file(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    计算文件内容的SHA256哈希
+
+    Args:
+        file_path: 文件路径
+        chunk_size: 每次读取的字节数
+
+    Returns:
+        str: 十六进制哈希字符串
+    """
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def hash_payload(payload: Any) -> str:
+    """
+    计算可JSON序列化对象的规范化SHA256哈希（键排序，紧凑格式）
+
+    Args:
+        payload: 可JSON序列化的对象
+
+    Returns:
+        str: 十六进制哈希字符串
+    """
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class FileLRUCache:
+    """
+    磁盘文件LRU缓存
+
+    每个缓存条目是cache_dir下以键命名的一个文件，命中时刷新文件的修改时间，
+    写入后如果总大小超过上限，则按修改时间从旧到新删除条目。
+    命中/未命中统计保存在cache_dir/stats.json中。
+    """
+
+    STATS_FILENAME = 'stats.json'
+
+    def __init__(self, cache_dir: str, max_bytes: int, suffix: str = ''):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def path_for(self, key: str) -> str:
+        """
+        获取缓存键对应的文件路径（按键前两位分目录，避免单目录文件过多）
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            str: 缓存文件路径
+        """
+        return os.path.join(self.cache_dir, key[:2], f'{key}{self.suffix}')
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        查询缓存条目，命中时刷新LRU时间
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            缓存文件路径或None
+        """
+        path = self.path_for(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            os.utime(path, None)
+        except OSError as e:
+            logger.warning(f"刷新缓存访问时间失败 {path}: {e}")
+        return path
+
+    def fetch(self, key: str, output_path: str) -> bool:
+        """
+        将缓存条目放置到目标路径（优先硬链接，失败时复制）
+
+        Args:
+            key: 缓存键
+            output_path: 目标文件路径
+
+        Returns:
+            bool: 是否命中并放置成功
+        """
+        cached_path = self.get(key)
+        if not cached_path:
+            return False
+
+        try:
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            try:
+                os.link(cached_path, output_path)
+            except OSError:
+                shutil.copy2(cached_path, output_path)
+            return True
+        except Exception as e:
+            logger.warning(f"从缓存放置文件失败 {cached_path} -> {output_path}: {e}")
+            return False
+
+    def put(self, key: str, source_path: str, move: bool = False) -> Optional[str]:
+        """
+        写入缓存条目（先写临时文件再原子替换），写入后执行淘汰
+
+        Args:
+            key: 缓存键
+            source_path: 要缓存的源文件路径
+            move: 是否直接移动源文件（源文件与缓存目录在同一文件系统时可省去一次复制）
+
+        Returns:
+            缓存文件路径或None
+        """
+        try:
+            path = self.path_for(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if move:
+                os.replace(source_path, path)
+            else:
+                temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+                shutil.copy2(source_path, temp_path)
+                os.replace(temp_path, path)
+            os.utime(path, None)
+            self.evict()
+            return path
+        except Exception as e:
+            logger.warning(f"写入缓存失败 {source_path}: {e}")
+            return None
+
+    def _iter_entries(self):
+        """遍历所有缓存条目，返回 (路径, 大小, 修改时间)"""
+        for dirpath, _, filenames in os.walk(self.cache_dir):
+            for filename in filenames:
+                if filename == self.STATS_FILENAME or filename.endswith('.tmp'):
+                    continue
+                if self.suffix and not filename.endswith(self.suffix):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat_info = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat_info.st_size, stat_info.st_mtime
+
+    def evict(self) -> int:
+        """
+        按LRU策略淘汰条目，直到总大小不超过上限
+
+        Returns:
+            int: 删除的条目数量
+        """
+        entries = list(self._iter_entries())
+        total_bytes = sum(size for _, size, _ in entries)
+        if total_bytes <= self.max_bytes:
+            return 0
+
+        removed = 0
+        entries.sort(key=lambda entry: entry[2])  # 最久未使用的在前
+        for path, size, _ in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total_bytes -= size
+                removed += 1
+            except OSError as e:
+                logger.warning(f"淘汰缓存条目失败 {path}: {e}")
+
+        logger.info(f"缓存淘汰完成: 删除 {removed} 个条目, 当前大小 {total_bytes / (1024 * 1024):.1f} MB")
+        return removed
+
+    def _stats_path(self) -> str:
+        return os.path.join(self.cache_dir, self.STATS_FILENAME)
+
+    def _load_counters(self) -> Dict[str, Any]:
+        try:
+            with open(self._stats_path(), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def record(self, hits: int = 0, misses: int = 0, group: Optional[str] = None):
+        """
+        累加命中/未命中计数并持久化
+
+        Args:
+            hits: 命中次数
+            misses: 未命中次数
+            group: 可选的分组名（例如项目名），同时累加到该分组的计数
+        """
+        if not hits and not misses:
+            return
+        with self._lock:
+            counters = self._load_counters()
+            counters['hits'] = counters.get('hits', 0) + hits
+            counters['misses'] = counters.get('misses', 0) + misses
+            if group:
+                groups = counters.setdefault('groups', {})
+                group_counters = groups.setdefault(group, {'hits': 0, 'misses': 0})
+                group_counters['hits'] += hits
+                group_counters['misses'] += misses
+            counters['updated_time'] = time.strftime('%Y-%m-%d %H:%M:%S')
+
+            temp_path = f'{self._stats_path()}.{os.getpid()}.tmp'
+            try:
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump(counters, f, ensure_ascii=False, indent=2)
+                os.replace(temp_path, self._stats_path())
+            except OSError as e:
+                logger.warning(f"保存缓存统计失败: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+
+        Returns:
+            dict: 条目数、总大小、上限、命中/未命中次数和命中率
+        """
+        entries = list(self._iter_entries())
+        counters = self._load_counters()
+        hits = counters.get('hits', 0)
+        misses = counters.get('misses', 0)
+        lookups = hits + misses
+
+        groups = {}
+        for name, group_counters in counters.get('groups', {}).items():
+            group_lookups = group_counters.get('hits', 0) + group_counters.get('misses', 0)
+            groups[name] = {
+                'hits': group_counters.get('hits', 0),
+                'misses': group_counters.get('misses', 0),
+                'hit_rate': round(group_counters.get('hits', 0) / group_lookups, 4) if group_lookups else 0.0
+            }
+
+        return {
+            'cache_dir': self.cache_dir,
+            'entries': len(entries),
+            'total_bytes': sum(size for _, size, _ in entries),
+            'max_bytes': self.max_bytes,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+            'groups': groups,
+            'updated_time': counters.get('updated_time', '')
+        }
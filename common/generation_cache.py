@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AutoMovie生成结果缓存模块
+按替换占位符后的最终工作流JSON计算哈希，相同的工作流（提示词、种子、模型参数都相同）
+直接从磁盘返回上次ComfyUI生成的图像/音频，不再提交到GPU服务器
+"""
+
+import os
+import json
+import uuid
+import logging
+import threading
+import configparser
+from typing import Optional, Dict, Any, List
+
+from file_cache import FileLRUCache, hash_payload
+
+logger = logging.getLogger(__name__)
+
+# 缓存键版本号，输出文件的保存方式发生不兼容变化时递增，使旧缓存自然失效
+GENERATION_CACHE_VERSION = 1
+
+# 不影响生成结果的节点输入（只决定ComfyUI端的文件名），计算缓存键时忽略
+IGNORED_INPUTS = ('filename_prefix',)
+
+
+def load_generation_cache_config() -> Dict[str, Any]:
+    """
+    从config.ini加载生成结果缓存配置
+
+    Returns:
+        dict: {'enabled': bool, 'cache_dir': str, 'max_size_mb': int}
+    """
+    # 获取项目根目录路径
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    cache_config = {
+        'enabled': True,
+        'cache_dir': os.path.join(project_root, 'cache', 'generation'),
+        'max_size_mb': 4096
+    }
+
+    try:
+        config_path = os.path.join(project_root, 'config.ini')
+        if os.path.exists(config_path):
+            config = configparser.ConfigParser(interpolation=None)
+            config.read(config_path, encoding='utf-8')
+
+            if config.has_section('GENERATION_CACHE_CONFIG'):
+                cache_config['enabled'] = config.getboolean('GENERATION_CACHE_CONFIG', 'enable_cache', fallback=True)
+                cache_config['max_size_mb'] = config.getint('GENERATION_CACHE_CONFIG', 'max_size_mb', fallback=4096)
+                cache_dir = config.get('GENERATION_CACHE_CONFIG', 'cache_dir', fallback='').strip()
+                if cache_dir:
+                    # 支持绝对路径或相对于项目根目录的路径
+                    cache_config['cache_dir'] = cache_dir if os.path.isabs(cache_dir) else os.path.join(project_root, cache_dir)
+    except Exception as e:
+        logger.error(f"加载生成结果缓存配置失败，使用默认值: {e}")
+
+    return cache_config
+
+
+def canonical_workflow(workflow: dict) -> dict:
+    """
+    去掉不影响生成结果的输入（如SaveImage/SaveAudio的filename_prefix），得到用于计算缓存键的工作流
+
+    Args:
+        workflow: 替换占位符后的工作流
+
+    Returns:
+        dict: 规范化的工作流副本
+    """
+    canonical = {}
+    for node_id, node in workflow.items():
+        if isinstance(node, dict) and isinstance(node.get('inputs'), dict):
+            node = dict(node, inputs={key: value for key, value in node['inputs'].items()
+                                      if key not in IGNORED_INPUTS})
+            node.pop('_meta', None)  # 节点标题等界面信息
+        canonical[str(node_id)] = node
+    return canonical
+
+
+class GenerationCache:
+    """
+    ComfyUI生成结果缓存
+
+    每次生成保存为一个清单条目（<键>.json，记录输出文件名）和若干输出文件条目（<键>-<序号><扩展名>），
+    共用一个按大小淘汰的LRU目录。任一输出文件被淘汰后该条目视为未命中，重新生成时覆盖。
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_size_mb: Optional[int] = None,
+                 enabled: Optional[bool] = None):
+        cache_config = load_generation_cache_config()
+        self.enabled = cache_config['enabled'] if enabled is None else enabled
+        self.cache_dir = cache_dir or cache_config['cache_dir']
+        max_size_mb = cache_config['max_size_mb'] if max_size_mb is None else max_size_mb
+        self._cache = FileLRUCache(self.cache_dir, max_size_mb * 1024 * 1024) if self.enabled else None
+
+    def build_key(self, workflow_type: str, workflow: dict) -> str:
+        """
+        计算生成结果缓存键
+
+        Args:
+            workflow_type: 'image' 或 'audio'
+            workflow: 替换占位符后、提交给ComfyUI的最终工作流
+
+        Returns:
+            str: 缓存键
+        """
+        return hash_payload({
+            'version': GENERATION_CACHE_VERSION,
+            'type': workflow_type,
+            'workflow': canonical_workflow(workflow)
+        })
+
+    def lookup(self, key: str) -> Optional[List[str]]:
+        """
+        查询缓存，命中时刷新所有相关条目的LRU时间
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            缓存中的输出文件路径列表（按生成时的顺序），未命中或条目不完整时返回None
+        """
+        if not self._cache:
+            return None
+        manifest_path = self._cache.get(f'{key}.json')
+        if not manifest_path:
+            return None
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                names = json.load(f)['files']
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"读取生成缓存清单失败 {manifest_path}: {e}")
+            return None
+
+        cached_files = []
+        for name in names:
+            path = self._cache.get(name)
+            if not path:
+                return None
+            cached_files.append(path)
+        return cached_files or None
+
+    def store(self, key: str, output_files: List[str]):
+        """
+        把一次生成的输出文件写入缓存（先写输出文件，最后写清单，清单存在即表示条目完整）
+
+        Args:
+            key: 缓存键
+            output_files: 生成的图像/音频文件路径（不含工作流JSON）
+        """
+        if not self._cache or not output_files:
+            return
+        names = []
+        for index, output_file in enumerate(output_files):
+            name = f'{key}-{index}{os.path.splitext(output_file)[1].lower()}'
+            if not self._cache.put(name, output_file):
+                return
+            names.append(name)
+
+        manifest_path = os.path.join(self.cache_dir, f'{key}.{uuid.uuid4().hex}.tmp')
+        try:
+            with open(manifest_path, 'w', encoding='utf-8') as f:
+                json.dump({'files': names}, f)
+            if self._cache.put(f'{key}.json', manifest_path, move=True):
+                logger.info(f"生成结果已写入缓存: {key[:12]} ({len(names)} 个文件)")
+        finally:
+            if os.path.exists(manifest_path):
+                os.remove(manifest_path)
+
+    def record_lookup(self, hit: bool, project: Optional[str] = None):
+        """
+        记录一次查询的命中/未命中
+
+        Args:
+            hit: 是否命中
+            project: 项目名（同时累加到该项目的计数）
+        """
+        if self._cache:
+            self._cache.record(hits=int(hit), misses=int(not hit), group=project)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+
+        Returns:
+            dict: 缓存统计
+        """
+        if not self._cache:
+            return {'enabled': False, 'cache_dir': self.cache_dir}
+        stats = self._cache.get_stats()
+        stats['enabled'] = True
+        return stats
+
+
+_generation_cache = None
+_generation_cache_lock = threading.Lock()
+
+
+def get_generation_cache() -> GenerationCache:
+    """
+    获取进程内共享的生成结果缓存
+
+    Returns:
+        GenerationCache: 生成结果缓存
+    """
+    global _generation_cache
+    with _generation_cache_lock:
+        if _generation_cache is None:
+            _generation_cache = GenerationCache()
+        return _generation_cache
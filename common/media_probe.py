@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AutoMovie媒体信息探测模块
+基于ffprobe的JSON输出获取时长、流布局、编码、分辨率、帧率和音频采样率，
+结果按 路径+修改时间+文件大小 持久化缓存，文件未变化时不再启动ffprobe子进程
+"""
+
+import os
+import json
+import atexit
+import logging
+import contextlib
+import subprocess
+import threading
+from typing import Optional, Dict, Any
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+logger = logging.getLogger(__name__)
+
+# 缓存格式版本号，探测结果结构发生不兼容变化时递增，使旧缓存自然失效
+MEDIA_PROBE_CACHE_VERSION = 2
+
+
+def _parse_rate(rate: Optional[str]) -> float:
+    """
+    解析ffprobe的分数形式帧率（如 "25/1"、"30000/1001"）
+
+    Args:
+        rate: 帧率字符串
+
+    Returns:
+        float: 帧率，无法解析时返回0.0
+    """
+    if not rate:
+        return 0.0
+    try:
+        if '/' in rate:
+            numerator, denominator = rate.split('/', 1)
+            denominator = float(denominator)
+            return float(numerator) / denominator if denominator else 0.0
+        return float(rate)
+    except ValueError:
+        return 0.0
+
+
+def _to_float(value: Any) -> Optional[float]:
+    """将ffprobe输出中的数值字符串转换为float，无法转换时返回None"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_int(value: Any) -> Optional[int]:
+    """将ffprobe输出中的数值字符串转换为int，无法转换时返回None"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+@contextlib.contextmanager
+def _file_lock(lock_path: str):
+    """
+    跨进程独占文件锁（Windows使用msvcrt，其他系统使用fcntl），阻塞直到获得锁
+
+    Args:
+        lock_path: 锁文件路径（不存在时创建）
+
+    Raises:
+        OSError: 无法创建锁文件或获取锁
+    """
+    with open(lock_path, 'a+b') as f:
+        if os.name == 'nt':
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def parse_ffprobe_output(data: Dict[str, Any], file_path: str = '') -> Dict[str, Any]:
+    """
+    将ffprobe -show_format -show_streams的JSON输出整理为统一的信息字典
+
+    Args:
+        data: ffprobe输出的JSON对象
+        file_path: 媒体文件路径
+
+    Returns:
+        dict: 媒体信息，包含duration、streams、video、audio以及兼容旧接口的width/height/fps/size/total_frames
+    """
+    format_info = data.get('format', {})
+    streams = data.get('streams', [])
+
+    video_stream = next((stream for stream in streams if stream.get('codec_type') == 'video'
+                         and not stream.get('disposition', {}).get('attached_pic')), None)
+    audio_stream = next((stream for stream in streams if stream.get('codec_type') == 'audio'), None)
+
+    duration = _to_float(format_info.get('duration'))
+    if duration is None:
+        stream_durations = [_to_float(stream.get('duration')) for stream in streams]
+        stream_durations = [value for value in stream_durations if value is not None]
+        duration = max(stream_durations) if stream_durations else 0.0
+
+    video = None
+    if video_stream:
+        fps = _parse_rate(video_stream.get('r_frame_rate'))
+        avg_fps = _parse_rate(video_stream.get('avg_frame_rate'))
+        video = {
+            'codec': video_stream.get('codec_name', ''),
+            'profile': video_stream.get('profile', ''),
+            'level': video_stream.get('level'),
+            'width': video_stream.get('width', 0),
+            'height': video_stream.get('height', 0),
+            'pix_fmt': video_stream.get('pix_fmt', ''),
+            'sample_aspect_ratio': video_stream.get('sample_aspect_ratio', ''),
+            'fps': round(fps, 3),
+            'avg_fps': round(avg_fps, 3),
+            'time_base': video_stream.get('time_base', ''),
+            'duration': _to_float(video_stream.get('duration')),
+            'nb_frames': _to_int(video_stream.get('nb_frames')),
+            'bit_rate': _to_int(video_stream.get('bit_rate'))
+        }
+
+    audio = None
+    if audio_stream:
+        audio = {
+            'codec': audio_stream.get('codec_name', ''),
+            'sample_rate': _to_int(audio_stream.get('sample_rate')) or 0,
+            'channels': audio_stream.get('channels', 0),
+            'channel_layout': audio_stream.get('channel_layout', ''),
+            'sample_fmt': audio_stream.get('sample_fmt', ''),
+            'duration': _to_float(audio_stream.get('duration')),
+            'bit_rate': _to_int(audio_stream.get('bit_rate'))
+        }
+
+    width = video['width'] if video else 0
+    height = video['height'] if video else 0
+    fps = video['fps'] if video else 0.0
+    total_frames = video['nb_frames'] if video and video['nb_frames'] else int(round(fps * duration)) if fps else 0
+
+    return {
+        'path': file_path,
+        'format_name': format_info.get('format_name', ''),
+        'duration': duration,
+        'bit_rate': _to_int(format_info.get('bit_rate')),
+        'file_size': _to_int(format_info.get('size')),
+        'streams': [stream.get('codec_type', '') for stream in streams],
+        'has_video': video is not None,
+        'has_audio': audio is not None,
+        'video': video,
+        'audio': audio,
+        # 兼容原MoviePy实现返回的字段
+        'fps': fps,
+        'size': [width, height],
+        'width': width,
+        'height': height,
+        'total_frames': total_frames
+    }
+
+
+def run_ffprobe(file_path: str, ffprobe_path: str = 'ffprobe', timeout: int = 30) -> Optional[Dict[str, Any]]:
+    """
+    调用ffprobe获取媒体信息（不使用缓存）
+
+    Args:
+        file_path: 媒体文件路径
+        ffprobe_path: ffprobe可执行文件路径
+        timeout: 超时时间（秒）
+
+    Returns:
+        媒体信息字典或None
+    """
+    cmd = [
+        ffprobe_path,
+        '-v', 'error',
+        '-print_format', 'json',
+        '-show_format',
+        '-show_streams',
+        file_path
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8',
+                                errors='replace', timeout=timeout)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.error(f"执行ffprobe失败 {file_path}: {e}")
+        return None
+
+    if result.returncode != 0:
+        logger.error(f"ffprobe返回错误 {file_path}: {result.stderr.strip()}")
+        return None
+
+    try:
+        data = json.loads(result.stdout or '{}')
+    except ValueError as e:
+        logger.error(f"解析ffprobe输出失败 {file_path}: {e}")
+        return None
+
+    return parse_ffprobe_output(data, file_path)
+
+
+class MediaProbe:
+    """
+    带持久化缓存的媒体信息探测器
+
+    缓存以文件绝对路径为键，同时记录探测时的修改时间(纳秒)和文件大小，
+    二者任一变化即视为文件已更新并重新探测。缓存保存在一个JSON文件中，
+    进程重启后仍然有效；超过条目上限时优先丢弃最早写入的条目。
+    多个进程（如Django和渲染子进程）共用缓存文件：保存时在文件锁内重新读取磁盘上的条目，
+    只合并本进程新增或删除的条目，不会覆盖其他进程写入的结果。
+    新探测的结果不会每次都重写整个缓存文件：在save_delay秒内累积后一次保存，
+    批量探测结束时调用flush()立即保存，进程退出时保存剩余的改动。
+    """
+
+    def __init__(self, cache_path: Optional[str] = None, ffprobe_path: str = 'ffprobe',
+                 max_entries: int = 5000, save_delay: float = 1.0):
+        # 获取项目根目录路径
+        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.cache_path = cache_path or os.path.join(project_root, 'cache', 'media_probe.json')
+        self.ffprobe_path = ffprobe_path
+        self.max_entries = max_entries
+        self.save_delay = save_delay  # 新条目延迟保存的秒数，0表示每次探测后立即保存
+        self._lock = threading.Lock()
+        self._save_timer = None  # 延迟保存定时器
+        self._entries = None  # 延迟加载: 绝对路径 -> {'mtime_ns', 'size', 'info'}
+        self._changes = {}  # 尚未保存的改动: 绝对路径 -> 条目，None表示删除
+        self.hits = 0
+        self.misses = 0
+        atexit.register(self.flush)
+
+    def _read_entries(self) -> Dict[str, Any]:
+        """读取磁盘上的缓存条目，文件不存在、损坏或版本不符时返回空字典"""
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == MEDIA_PROBE_CACHE_VERSION:
+                return data.get('entries', {})
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def _load(self) -> Dict[str, Any]:
+        """加载缓存文件（调用方需持有锁）"""
+        if self._entries is None:
+            self._entries = self._read_entries()
+        return self._entries
+
+    def _set(self, abs_path: str, entry: Optional[Dict[str, Any]]):
+        """修改内存中的条目并记录改动，entry为None表示删除（调用方需持有锁）"""
+        entries = self._load()
+        entries.pop(abs_path, None)  # 重新插入，保持按写入时间排序
+        if entry is not None:
+            entries[abs_path] = entry
+        self._changes.pop(abs_path, None)
+        self._changes[abs_path] = entry
+
+    def _save(self):
+        """在文件锁内把本进程的改动合并到磁盘上的最新条目，然后原子写入缓存文件（调用方需持有锁）"""
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with _file_lock(f'{self.cache_path}.lock'):
+                entries = self._read_entries()
+                for abs_path, entry in self._changes.items():
+                    entries.pop(abs_path, None)
+                    if entry is not None:
+                        entries[abs_path] = entry
+                while len(entries) > self.max_entries:
+                    del entries[next(iter(entries))]
+
+                temp_path = f'{self.cache_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump({'version': MEDIA_PROBE_CACHE_VERSION, 'entries': entries},
+                              f, ensure_ascii=False)
+                os.replace(temp_path, self.cache_path)
+            # 同时获得其他进程写入的条目
+            self._entries = entries
+            self._changes = {}
+        except OSError as e:
+            # 改动保留在内存中，下次保存时再合并
+            logger.warning(f"保存媒体信息缓存失败: {e}")
+
+    def _schedule_save(self):
+        """save_delay秒后保存累积的改动，已有定时器时不重复创建（调用方需持有锁）"""
+        if self.save_delay <= 0:
+            self._save()
+            return
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(self.save_delay, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self):
+        """立即保存尚未写入缓存文件的改动（没有改动时不写文件）"""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if self._changes:
+                self._save()
+
+    def probe(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """
+        获取媒体信息，文件未变化时直接返回缓存结果
+
+        Args:
+            file_path: 媒体文件路径
+
+        Returns:
+            媒体信息字典或None（文件不存在或探测失败）
+        """
+        abs_path = os.path.abspath(file_path)
+        try:
+            stat_info = os.stat(abs_path)
+        except OSError:
+            logger.error(f"媒体文件不存在: {file_path}")
+            return None
+
+        with self._lock:
+            entry = self._load().get(abs_path)
+            if entry and entry.get('mtime_ns') == stat_info.st_mtime_ns and entry.get('size') == stat_info.st_size:
+                self.hits += 1
+                return dict(entry['info'], path=file_path)
+            self.misses += 1
+
+        info = run_ffprobe(abs_path, self.ffprobe_path)
+        if info is None:
+            return None
+
+        with self._lock:
+            self._set(abs_path, {
+                'mtime_ns': stat_info.st_mtime_ns,
+                'size': stat_info.st_size,
+                'info': info
+            })
+            self._schedule_save()
+        return dict(info, path=file_path)
+
+    def invalidate(self, file_path: str):
+        """
+        删除指定文件的缓存条目
+
+        Args:
+            file_path: 媒体文件路径
+        """
+        abs_path = os.path.abspath(file_path)
+        with self._lock:
+            # 条目可能由其他进程写入、不在本进程内存中，同样记录删除并合并到磁盘
+            self._set(abs_path, None)
+            self._save()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+
+        Returns:
+            dict: 缓存文件路径、条目数和本进程内的命中/未命中次数
+        """
+        with self._lock:
+            entries = len(self._load())
+        lookups = self.hits + self.misses
+        return {
+            'cache_path': self.cache_path,
+            'entries': entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+_media_probe = None
+_media_probe_lock = threading.Lock()
+
+
+def get_media_probe() -> MediaProbe:
+    """
+    获取进程内共享的媒体信息探测器
+
+    Returns:
+        MediaProbe: 媒体信息探测器
+    """
+    global _media_probe
+    with _media_probe_lock:
+        if _media_probe is None:
+            _media_probe = MediaProbe()
+        return _media_probe
+
+
+def probe_media(file_path: str) -> Optional[Dict[str, Any]]:
+    """
+    获取媒体信息（使用共享探测器和持久化缓存）
+
+    Args:
+        file_path: 媒体文件路径
+
+    Returns:
+        媒体信息字典或None
+    """
+    return get_media_probe().probe(file_path)
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AutoMovie旁白缓存模块
+按(规范化的句子文本, 音频工作流, 参考音频内容)跨项目缓存已去除静音、添加停顿的旁白音频及其时长，
+各项目重复使用的开场白和固定句式命中后不再提交到ComfyUI，也不再重复裁剪
+"""
+
+import os
+import re
+import json
+import uuid
+import logging
+import threading
+import unicodedata
+import configparser
+from typing import Optional, Dict, Any, Tuple
+
+from file_cache import FileLRUCache, hash_payload
+from generation_cache import canonical_workflow
+
+logger = logging.getLogger(__name__)
+
+# 缓存键版本号，裁剪算法或文本规范化规则发生不兼容变化时递增，使旧缓存自然失效
+NARRATION_CACHE_VERSION = 1
+
+
+def load_narration_cache_config() -> Dict[str, Any]:
+    """
+    从config.ini加载旁白缓存配置
+
+    Returns:
+        dict: {'enabled': bool, 'cache_dir': str, 'max_size_mb': int}
+    """
+    # 获取项目根目录路径
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    cache_config = {
+        'enabled': True,
+        'cache_dir': os.path.join(project_root, 'cache', 'narration'),
+        'max_size_mb': 2048
+    }
+
+    try:
+        config_path = os.path.join(project_root, 'config.ini')
+        if os.path.exists(config_path):
+            config = configparser.ConfigParser(interpolation=None)
+            config.read(config_path, encoding='utf-8')
+
+            if config.has_section('NARRATION_CACHE_CONFIG'):
+                cache_config['enabled'] = config.getboolean('NARRATION_CACHE_CONFIG', 'enable_cache', fallback=True)
+                cache_config['max_size_mb'] = config.getint('NARRATION_CACHE_CONFIG', 'max_size_mb', fallback=2048)
+                cache_dir = config.get('NARRATION_CACHE_CONFIG', 'cache_dir', fallback='').strip()
+                if cache_dir:
+                    # 支持绝对路径或相对于项目根目录的路径
+                    cache_config['cache_dir'] = cache_dir if os.path.isabs(cache_dir) else os.path.join(project_root, cache_dir)
+    except Exception as e:
+        logger.error(f"加载旁白缓存配置失败，使用默认值: {e}")
+
+    return cache_config
+
+
+def normalize_text(text: str) -> str:
+    """
+    规范化旁白文本：统一全角/半角字符（NFKC），合并连续空白，
+    只保留两个英文单词/数字之间的空格（中文和标点旁的空格不影响朗读）
+
+    Args:
+        text: 句子文本
+
+    Returns:
+        str: 用于计算缓存键的文本
+    """
+    text = re.sub(r'\s+', ' ', unicodedata.normalize('NFKC', text or '')).strip()
+    return re.sub(r'(?<![A-Za-z0-9]) | (?![A-Za-z0-9])', '', text)
+
+
+class NarrationCache:
+    """
+    旁白缓存
+
+    每条旁白保存为一个清单条目（<键>.json，记录音频文件名和裁剪后的时长）和一个音频条目（<键><扩展名>），
+    共用一个按大小淘汰的LRU目录。音频被淘汰后该条目视为未命中。
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_size_mb: Optional[int] = None,
+                 enabled: Optional[bool] = None):
+        cache_config = load_narration_cache_config()
+        self.enabled = cache_config['enabled'] if enabled is None else enabled
+        self.cache_dir = cache_dir or cache_config['cache_dir']
+        max_size_mb = cache_config['max_size_mb'] if max_size_mb is None else max_size_mb
+        self._cache = FileLRUCache(self.cache_dir, max_size_mb * 1024 * 1024) if self.enabled else None
+
+    def build_key(self, text: str, workflow_template: dict, voice_hashes: Dict[str, str],
+                  trim_settings: Tuple[float, float, float]) -> str:
+        """
+        计算旁白缓存键
+
+        Args:
+            text: 句子文本（计算前规范化）
+            workflow_template: 替换句子文本之前的音频工作流模板
+            voice_hashes: 参考音频文件名 -> 内容哈希
+            trim_settings: (前停顿时长, 后停顿时长, 静音阈值top_db)
+
+        Returns:
+            str: 缓存键
+        """
+        return hash_payload({
+            'version': NARRATION_CACHE_VERSION,
+            'text': normalize_text(text),
+            'workflow': canonical_workflow(workflow_template),
+            'voices': voice_hashes,
+            'trim': [float(value) for value in trim_settings]
+        })
+
+    def lookup(self, key: str) -> Optional[Tuple[str, float]]:
+        """
+        查询缓存，命中时刷新清单和音频的LRU时间
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            (缓存中的音频路径, 时长)，未命中或条目不完整时返回None
+        """
+        if not self._cache:
+            return None
+        manifest_path = self._cache.get(f'{key}.json')
+        if not manifest_path:
+            return None
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            name, duration = manifest['file'], float(manifest['duration'])
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"读取旁白缓存清单失败 {manifest_path}: {e}")
+            return None
+
+        audio_path = self._cache.get(name)
+        if not audio_path:
+            return None
+        return audio_path, duration
+
+    def store(self, key: str, audio_path: str, duration: float):
+        """
+        把裁剪后的旁白音频和时长写入缓存（先写音频，最后写清单，清单存在即表示条目完整）
+
+        Args:
+            key: 缓存键
+            audio_path: 已去除静音、添加停顿的音频文件路径
+            duration: 裁剪后的音频时长（秒）
+        """
+        if not self._cache or duration is None:
+            return
+        name = f'{key}{os.path.splitext(audio_path)[1].lower()}'
+        if not self._cache.put(name, audio_path):
+            return
+
+        manifest_path = os.path.join(self.cache_dir, f'{key}.{uuid.uuid4().hex}.tmp')
+        try:
+            with open(manifest_path, 'w', encoding='utf-8') as f:
+                json.dump({'file': name, 'duration': duration}, f)
+            if self._cache.put(f'{key}.json', manifest_path, move=True):
+                logger.info(f"旁白已写入缓存: {key[:12]} ({duration:.2f}秒)")
+        finally:
+            if os.path.exists(manifest_path):
+                os.remove(manifest_path)
+
+    def record_lookup(self, hit: bool, project: Optional[str] = None):
+        """
+        记录一次查询的命中/未命中
+
+        Args:
+            hit: 是否命中
+            project: 项目名（同时累加到该项目的计数）
+        """
+        if self._cache:
+            self._cache.record(hits=int(hit), misses=int(not hit), group=project)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+
+        Returns:
+            dict: 缓存统计
+        """
+        if not self._cache:
+            return {'enabled': False, 'cache_dir': self.cache_dir}
+        stats = self._cache.get_stats()
+        stats['enabled'] = True
+        return stats
+
+
+_narration_cache = None
+_narration_cache_lock = threading.Lock()
+
+
+def get_narration_cache() -> NarrationCache:
+    """
+    获取进程内共享的旁白缓存
+
+    Returns:
+        NarrationCache: 旁白缓存
+    """
+    global _narration_cache
+    with _narration_cache_lock:
+        if _narration_cache is None:
+            _narration_cache = NarrationCache()
+        return _narration_cache
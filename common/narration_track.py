@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AutoMovie旁白音轨模块
+将所有片段的旁白音频一次解码、统一采样率后按帧对齐铺到同一条NumPy时间线上，
+混入背景音乐后只做一次AAC编码，与流复制拼接的无声视频合并
+"""
+
+import logging
+import subprocess
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 统一音轨的采样率和声道数（与单次滤镜图渲染的aformat一致）
+NARRATION_SAMPLE_RATE = 44100
+NARRATION_CHANNELS = 2
+
+
+def decode_audio(audio_path: str, sample_rate: int = NARRATION_SAMPLE_RATE,
+                 channels: int = NARRATION_CHANNELS, ffmpeg_path: str = 'ffmpeg') -> np.ndarray:
+    """
+    使用FFMPEG将任意格式的音频解码并重采样为float32 PCM
+
+    Args:
+        audio_path: 音频文件路径
+        sample_rate: 目标采样率
+        channels: 目标声道数
+        ffmpeg_path: FFMPEG可执行文件路径
+
+    Returns:
+        np.ndarray: 形状为 (采样数, 声道数) 的float32数组
+
+    Raises:
+        RuntimeError: 解码失败
+    """
+    cmd = [
+        ffmpeg_path,
+        '-v', 'error',
+        '-i', audio_path,
+        '-map', '0:a:0',
+        '-f', 'f32le',
+        '-acodec', 'pcm_f32le',
+        '-ac', str(channels),
+        '-ar', str(sample_rate),
+        'pipe:1'
+    ]
+    result = subprocess.run(cmd, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"解码音频失败 {audio_path}: {result.stderr.decode('utf-8', errors='ignore')}")
+    samples = np.frombuffer(result.stdout, dtype='<f4')
+    return samples[:len(samples) - len(samples) % channels].reshape(-1, channels)
+
+
+def frame_aligned_layout(segment_frames: List[int], video_fps: float,
+                         sample_rate: int = NARRATION_SAMPLE_RATE) -> List[Tuple[int, int]]:
+    """
+    按视频帧数计算每个片段在时间线上的起止采样位置
+
+    片段起点由累计帧数换算得到，而不是逐段累加取整后的采样数，
+    因此任意多个片段后音频与画面的偏差都不超过半个采样。
+
+    Args:
+        segment_frames: 每个片段的视频帧数
+        video_fps: 视频帧率
+        sample_rate: 采样率
+
+    Returns:
+        List[Tuple[int, int]]: 每个片段的 (起始采样, 结束采样)
+    """
+    layout = []
+    elapsed_frames = 0
+    for frames in segment_frames:
+        start = round(elapsed_frames * sample_rate / video_fps)
+        elapsed_frames += frames
+        end = round(elapsed_frames * sample_rate / video_fps)
+        layout.append((start, end))
+    return layout
+
+
+def build_narration_timeline(audio_paths: List[str], segment_frames: List[int], video_fps: float,
+                             sample_rate: int = NARRATION_SAMPLE_RATE,
+                             channels: int = NARRATION_CHANNELS,
+                             ffmpeg_path: str = 'ffmpeg') -> np.ndarray:
+    """
+    将各片段旁白铺到统一时间线上，超出片段时长的部分截断，不足部分保持静音
+
+    Args:
+        audio_paths: 每个片段的旁白音频路径
+        segment_frames: 每个片段的视频帧数
+        video_fps: 视频帧率
+        sample_rate: 采样率
+        channels: 声道数
+        ffmpeg_path: FFMPEG可执行文件路径
+
+    Returns:
+        np.ndarray: 形状为 (采样数, 声道数) 的float32时间线
+    """
+    layout = frame_aligned_layout(segment_frames, video_fps, sample_rate)
+    total_samples = layout[-1][1] if layout else 0
+    timeline = np.zeros((total_samples, channels), dtype=np.float32)
+
+    for audio_path, (start, end) in zip(audio_paths, layout):
+        samples = decode_audio(audio_path, sample_rate, channels, ffmpeg_path)
+        length = min(len(samples), end - start)
+        timeline[start:start + length] = samples[:length]
+
+    return timeline
+
+
+def mix_background_music(narration: np.ndarray, bed: np.ndarray, active_samples: int,
+                         sample_rate: int = NARRATION_SAMPLE_RATE,
+                         dropout_transition: float = 2.0) -> np.ndarray:
+    """
+    将背景音乐底轨（已循环、调整音量和淡入淡出，见bgm_bed）混入旁白时间线
+
+    混音增益与FFMPEG amix=inputs=2:duration=first:dropout_transition=2一致：
+    两路同时存在时各乘0.5；背景音乐（不循环时）结束后旁白增益在dropout_transition秒内
+    逐渐恢复到1.0，因此逐片段拼接与单次滤镜图渲染的响度相同。
+
+    Args:
+        narration: 旁白时间线 (采样数, 声道数)
+        bed: 与旁白等长的背景音乐底轨
+        active_samples: 背景音乐实际覆盖的采样数
+        sample_rate: 采样率
+        dropout_transition: 背景音乐结束后旁白增益恢复的过渡时长（秒）
+
+    Returns:
+        np.ndarray: 混音后的float32时间线
+    """
+    total_samples = len(narration)
+    if total_samples == 0 or active_samples == 0:
+        return narration
+
+    # 旁白增益：背景音乐存在期间为0.5，结束后线性过渡到1.0
+    narration_gain = np.full(total_samples, 0.5, dtype=np.float32)
+    if active_samples < total_samples:
+        transition = min(int(dropout_transition * sample_rate), total_samples - active_samples)
+        narration_gain[active_samples:active_samples + transition] = np.linspace(0.5, 1.0, transition, dtype=np.float32)
+        narration_gain[active_samples + transition:] = 1.0
+
+    mixed = narration * narration_gain[:, None] + bed[:total_samples] * 0.5
+    return np.clip(mixed, -1.0, 1.0, out=mixed)
+
+
+def mux_audio_track(video_path: str, track: np.ndarray, output_path: str,
+                    audio_args: List[str], sample_rate: int = NARRATION_SAMPLE_RATE,
+                    ffmpeg_path: str = 'ffmpeg') -> Optional[str]:
+    """
+    将时间线编码为一条音轨（只编码一次），与视频流复制合并
+
+    Args:
+        video_path: 无声视频路径
+        track: 音频时间线 (采样数, 声道数)
+        output_path: 输出文件路径
+        audio_args: 音频编码参数（如 -c:a aac -b:a 128k）
+        sample_rate: 采样率
+        ffmpeg_path: FFMPEG可执行文件路径
+
+    Returns:
+        输出文件路径或None
+    """
+    cmd = [
+        ffmpeg_path,
+        '-i', video_path,
+        '-f', 'f32le',
+        '-ar', str(sample_rate),
+        '-ac', str(track.shape[1]),
+        '-i', 'pipe:0',
+        '-map', '0:v:0',
+        '-map', '1:a:0',
+        '-c:v', 'copy',
+        *audio_args,
+        '-y',
+        output_path
+    ]
+    result = subprocess.run(cmd, input=np.ascontiguousarray(track, dtype='<f4').tobytes(), capture_output=True)
+    if result.returncode != 0:
+        logger.error(f"合并统一音轨失败: {result.stderr.decode('utf-8', errors='ignore')}")
+        return None
+    return output_path
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AutoMovie渲染任务模块
+在后台线程中执行视频渲染，提供任务提交、进度查询和取消功能
+"""
+
+import time
+import uuid
+import heapq
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Callable
+
+logger = logging.getLogger(__name__)
+
+# 片段渲染阶段在整体进度中所占比例，其余为拼接阶段
+SEGMENT_STAGE_WEIGHT = 0.9
+
+# 任务优先级，数值越小越先执行
+PRIORITY_PREVIEW = 0
+PRIORITY_FINAL = 10
+
+
+class RenderJobCancelled(Exception):
+    """渲染任务被用户取消"""
+    pass
+
+
+class RenderJob:
+    """
+    单个渲染任务的状态
+
+    片段进度由FFMPEG的-progress输出换算为完成比例，整体进度按各片段音频时长加权，
+    ETA根据已用时间和整体进度估算。
+    """
+
+    def __init__(self, job_id: str, description: str = '', priority: int = PRIORITY_FINAL):
+        self.job_id = job_id
+        self.description = description
+        self.priority = priority
+        self.status = 'queued'  # queued/running/completed/failed/cancelled
+        self.stage = 'queued'  # queued/segments/concatenating/done
+        self.message = '等待开始'
+        self.created_time = time.time()
+        self.started_time = None
+        self.finished_time = None
+        self.result = None
+        self.error = None
+        self.cancel_event = threading.Event()
+        self._lock = threading.Lock()
+        self._segments = OrderedDict()  # 片段索引 -> {'weight', 'fraction', 'fps'}
+
+    def set_segments(self, segment_weights: Dict[int, float]):
+        """
+        设置本次需要渲染的片段及其权重（通常为音频时长）
+
+        Args:
+            segment_weights: 片段索引 -> 权重
+        """
+        with self._lock:
+            self._segments = OrderedDict(
+                (index, {'weight': max(float(weight), 0.001), 'fraction': 0.0, 'fps': 0.0})
+                for index, weight in segment_weights.items()
+            )
+            self.stage = 'segments'
+            self.message = f'正在渲染 {len(self._segments)} 个视频片段'
+
+    def update_segment(self, segment_index: int, fraction: Optional[float], fps: Optional[float] = None):
+        """
+        更新单个片段的渲染进度（供VideoProcessor的进度回调使用）
+
+        Args:
+            segment_index: 片段索引
+            fraction: 完成比例（0~1），None表示未知
+            fps: 当前编码速度（帧/秒）
+        """
+        with self._lock:
+            segment = self._segments.get(segment_index)
+            if segment is None:
+                return
+            if fraction is not None:
+                segment['fraction'] = min(max(fraction, segment['fraction']), 1.0)
+            if fps is not None:
+                segment['fps'] = fps if segment['fraction'] < 1.0 else 0.0
+
+    def set_stage(self, stage: str, message: str = ''):
+        """
+        切换任务阶段
+
+        Args:
+            stage: 阶段名称
+            message: 阶段说明
+        """
+        with self._lock:
+            self.stage = stage
+            if message:
+                self.message = message
+
+    def check_cancelled(self):
+        """
+        如果任务已被取消则抛出RenderJobCancelled
+
+        Raises:
+            RenderJobCancelled: 任务已取消
+        """
+        if self.cancel_event.is_set():
+            raise RenderJobCancelled(f'渲染任务已取消: {self.job_id}')
+
+    def _percent(self) -> float:
+        """计算整体完成百分比（调用方需持有锁）"""
+        if self.status == 'completed':
+            return 100.0
+        if self.stage == 'concatenating':
+            return SEGMENT_STAGE_WEIGHT * 100.0
+        total_weight = sum(segment['weight'] for segment in self._segments.values())
+        if not total_weight:
+            return 0.0
+        done_weight = sum(segment['weight'] * segment['fraction'] for segment in self._segments.values())
+        return done_weight / total_weight * SEGMENT_STAGE_WEIGHT * 100.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        导出任务状态，用于进度查询接口
+
+        Returns:
+            dict: 任务状态、整体/片段进度、ETA和编码速度
+        """
+        with self._lock:
+            percent = self._percent()
+            now = self.finished_time or time.time()
+            elapsed = now - self.started_time if self.started_time else 0.0
+
+            eta_seconds = None
+            if self.status == 'running' and 0 < percent < 100:
+                eta_seconds = round(elapsed * (100.0 - percent) / percent, 1)
+
+            segments = [
+                {
+                    'index': index,
+                    'percent': round(segment['fraction'] * 100.0, 1),
+                    'fps': round(segment['fps'], 1)
+                }
+                for index, segment in self._segments.items()
+            ]
+
+            return {
+                'task_id': self.job_id,
+                'description': self.description,
+                'priority': self.priority,
+                'status': self.status,
+                'stage': self.stage,
+                'message': self.message,
+                'percent': round(percent, 1),
+                'eta_seconds': eta_seconds,
+                'fps': round(sum(segment['fps'] for segment in self._segments.values()), 1),
+                'completed_segments': sum(1 for segment in self._segments.values() if segment['fraction'] >= 1.0),
+                'total_segments': len(self._segments),
+                'segments': segments,
+                'elapsed_seconds': round(elapsed, 1),
+                'result': self.result,
+                'error': self.error
+            }
+
+
+class RenderJobManager:
+    """
+    渲染任务管理器
+
+    任务在后台线程中按优先级执行，HTTP请求只负责提交和查询。
+    片段渲染本身已使用进程池并行，因此默认只有一个通用工作线程；
+    另有预留给预览任务的工作线程，正式渲染进行中时预览也能在几秒内完成。
+    """
+
+    def __init__(self, max_workers: int = 1, preview_workers: int = 1, history_limit: int = 50):
+        self._jobs = OrderedDict()  # 任务ID -> RenderJob
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._pending = []  # 等待执行的任务堆 (优先级, 提交序号, 任务, 函数, 位置参数, 关键字参数)
+        self._sequence = 0
+        self.history_limit = history_limit
+
+        for index in range(max_workers):
+            threading.Thread(target=self._worker_loop, args=(False,), daemon=True,
+                             name=f'render-job-{index}').start()
+        for index in range(preview_workers):
+            threading.Thread(target=self._worker_loop, args=(True,), daemon=True,
+                             name=f'render-preview-{index}').start()
+
+    def submit(self, func: Callable[..., Any], *args, description: str = '',
+               priority: int = PRIORITY_FINAL, **kwargs) -> RenderJob:
+        """
+        提交渲染任务
+
+        Args:
+            func: 任务函数，第一个参数为RenderJob，返回值作为任务结果
+            *args: 任务函数的其他位置参数
+            description: 任务说明
+            priority: 优先级（PRIORITY_PREVIEW优先于PRIORITY_FINAL）
+            **kwargs: 任务函数的关键字参数
+
+        Returns:
+            RenderJob: 新建的任务
+        """
+        job = RenderJob(uuid.uuid4().hex[:12], description, priority)
+        with self._condition:
+            self._jobs[job.job_id] = job
+            self._prune_history()
+            self._sequence += 1
+            heapq.heappush(self._pending, (priority, self._sequence, job, func, args, kwargs))
+            self._condition.notify_all()
+        logger.info(f"渲染任务已提交: {job.job_id} {description} (优先级 {priority})")
+        return job
+
+    def _take_next(self, preview_only: bool):
+        """取出优先级最高的待执行任务，预览专用线程只取预览任务（调用方需持有锁）"""
+        if not self._pending:
+            return None
+        if preview_only and self._pending[0][0] > PRIORITY_PREVIEW:
+            return None
+        return heapq.heappop(self._pending)
+
+    def _worker_loop(self, preview_only: bool):
+        """工作线程主循环"""
+        while True:
+            with self._condition:
+                entry = self._take_next(preview_only)
+                while entry is None:
+                    self._condition.wait()
+                    entry = self._take_next(preview_only)
+            _, _, job, func, args, kwargs = entry
+            self._run_job(job, func, args, kwargs)
+
+    def _run_job(self, job: RenderJob, func: Callable[..., Any], args: tuple, kwargs: dict):
+        """在后台线程中执行任务并记录最终状态"""
+        if job.cancel_event.is_set():
+            job.status = 'cancelled'
+            job.message = '任务已取消'
+            job.finished_time = time.time()
+            return
+
+        job.status = 'running'
+        job.started_time = time.time()
+        job.message = '任务开始执行'
+        try:
+            job.result = func(job, *args, **kwargs)
+            job.status = 'completed'
+            job.set_stage('done', '任务完成')
+            logger.info(f"渲染任务完成: {job.job_id}")
+        except RenderJobCancelled:
+            job.status = 'cancelled'
+            job.set_stage('done', '任务已取消')
+            logger.info(f"渲染任务已取消: {job.job_id}")
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            job.set_stage('done', '任务失败')
+            logger.error(f"渲染任务失败 {job.job_id}: {e}")
+        finally:
+            job.finished_time = time.time()
+
+    def _prune_history(self):
+        """删除超出历史上限的已结束任务（调用方需持有锁）"""
+        finished = [job_id for job_id, job in self._jobs.items()
+                    if job.status in ('completed', 'failed', 'cancelled')]
+        while len(self._jobs) > self.history_limit and finished:
+            del self._jobs[finished.pop(0)]
+
+    def get(self, job_id: str) -> Optional[RenderJob]:
+        """
+        获取任务
+
+        Args:
+            job_id: 任务ID
+
+        Returns:
+            RenderJob或None
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        请求取消任务，正在运行的FFMPEG进程会被终止
+
+        Args:
+            job_id: 任务ID
+
+        Returns:
+            bool: 任务是否存在且尚未结束
+        """
+        job = self.get(job_id)
+        if not job or job.status in ('completed', 'failed', 'cancelled'):
+            return False
+        job.cancel_event.set()
+        job.message = '正在取消任务'
+        logger.info(f"请求取消渲染任务: {job_id}")
+        return True
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        """
+        获取所有任务的状态
+
+        Returns:
+            List[dict]: 任务状态列表（按提交顺序）
+        """
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.to_dict() for job in jobs]
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_render_job_manager() -> RenderJobManager:
+    """
+    获取进程内共享的渲染任务管理器
+
+    Returns:
+        RenderJobManager: 渲染任务管理器
+    """
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = RenderJobManager()
+        return _manager
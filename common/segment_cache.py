@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AutoMovie视频片段缓存模块
+按片段的全部输入内容计算哈希，命中时直接复用已渲染的segment_NNN.mp4
+"""
+
+import os
+import logging
+import configparser
+from typing import Optional, Dict, Any
+
+from file_cache import FileLRUCache, hash_file, hash_payload
+
+logger = logging.getLogger(__name__)
+
+# 缓存键版本号，片段渲染逻辑发生不兼容变化时递增，使旧缓存自然失效
+SEGMENT_CACHE_VERSION = 1
+
+
+def load_segment_cache_config() -> Dict[str, Any]:
+    """
+    从config.ini加载片段缓存配置
+
+    Returns:
+        dict: {'enabled': bool, 'cache_dir': str, 'max_size_mb': int}
+    """
+    # 获取项目根目录路径
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    cache_config = {
+        'enabled': True,
+        'cache_dir': os.path.join(project_root, 'cache', 'segments'),
+        'max_size_mb': 2048
+    }
+
+    try:
+        config_path = os.path.join(project_root, 'config.ini')
+        if os.path.exists(config_path):
+            config = configparser.ConfigParser(interpolation=None)
+            config.read(config_path, encoding='utf-8')
+
+            if config.has_section('SEGMENT_CACHE_CONFIG'):
+                cache_config['enabled'] = config.getboolean('SEGMENT_CACHE_CONFIG', 'enable_cache', fallback=True)
+                cache_config['max_size_mb'] = config.getint('SEGMENT_CACHE_CONFIG', 'max_size_mb', fallback=2048)
+                cache_dir = config.get('SEGMENT_CACHE_CONFIG', 'cache_dir', fallback='').strip()
+                if cache_dir:
+                    # 支持绝对路径或相对于项目根目录的路径
+                    cache_config['cache_dir'] = cache_dir if os.path.isabs(cache_dir) else os.path.join(project_root, cache_dir)
+    except Exception as e:
+        logger.error(f"加载片段缓存配置失败，使用默认值: {e}")
+
+    return cache_config
+
+
+class SegmentCache:
+    """
+    视频片段缓存
+
+    缓存键由以下输入共同决定：图片字节、旁白音频字节、字幕文本、
+    VIDEO_SUBTITLE/VIDEO_FADE配置以及分辨率和编码设置。
+    任何一项变化都会得到不同的键，因此修改一句文案只会让对应片段重新渲染。
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_size_mb: Optional[int] = None,
+                 enabled: Optional[bool] = None):
+        cache_config = load_segment_cache_config()
+        self.enabled = cache_config['enabled'] if enabled is None else enabled
+        self.cache_dir = cache_dir or cache_config['cache_dir']
+        max_size_mb = cache_config['max_size_mb'] if max_size_mb is None else max_size_mb
+        self._cache = FileLRUCache(self.cache_dir, max_size_mb * 1024 * 1024, suffix='.mp4') if self.enabled else None
+
+    def build_key(self, image_path: str, audio_path: str, subtitle_text: str,
+                  config: configparser.ConfigParser, encode_settings: Dict[str, Any]) -> str:
+        """
+        计算片段缓存键
+
+        Args:
+            image_path: 图片路径
+            audio_path: 旁白音频路径
+            subtitle_text: 字幕文本
+            config: 已读取parameter.ini的ConfigParser对象
+            encode_settings: 分辨率、帧数、编码器等渲染设置
+
+        Returns:
+            str: 缓存键
+        """
+        def section_items(section: str) -> Dict[str, str]:
+            return dict(config.items(section)) if config.has_section(section) else {}
+
+        payload = {
+            'version': SEGMENT_CACHE_VERSION,
+            'image': hash_file(image_path),
+            'audio': hash_file(audio_path),
+            'subtitle_text': subtitle_text,
+            'subtitle': section_items('VIDEO_SUBTITLE'),
+            'fade': section_items('VIDEO_FADE'),
+            'encode': encode_settings
+        }
+        return hash_payload(payload)
+
+    def fetch(self, key: str, output_path: str) -> bool:
+        """
+        缓存命中时将片段放置到输出路径
+
+        Args:
+            key: 缓存键
+            output_path: 片段输出路径（videos/segment_NNN.mp4）
+
+        Returns:
+            bool: 是否命中
+        """
+        if not self._cache:
+            return False
+        hit = self._cache.fetch(key, output_path)
+        if hit:
+            logger.info(f"片段缓存命中: {key[:12]} -> {output_path}")
+        return hit
+
+    def store(self, key: str, segment_path: str):
+        """
+        将渲染完成的片段写入缓存
+
+        Args:
+            key: 缓存键
+            segment_path: 片段文件路径
+        """
+        if not self._cache or not os.path.exists(segment_path):
+            return
+        if self._cache.put(key, segment_path):
+            logger.info(f"片段已写入缓存: {key[:12]}")
+
+    def record_lookups(self, hits: int, misses: int):
+        """
+        记录一次渲染中的命中/未命中次数
+
+        Args:
+            hits: 命中次数
+            misses: 未命中次数
+        """
+        if self._cache:
+            self._cache.record(hits=hits, misses=misses)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+
+        Returns:
+            dict: 缓存统计
+        """
+        if not self._cache:
+            return {'enabled': False, 'cache_dir': self.cache_dir}
+        stats = self._cache.get_stats()
+        stats['enabled'] = True
+        return stats
@@ -0,0 +1,134 @@
+"""
+静音裁剪模块
+基于soundfile和向量化NumPy RMS分帧去除音频前后的静音，保持原始采样率、声道和采样格式，
+判定规则与librosa.effects.trim一致（帧RMS能量低于最大帧能量top_db分贝视为静音）
+"""
+
+import os
+import logging
+from typing import Tuple
+
+import numpy as np
+import soundfile as sf
+
+logger = logging.getLogger(__name__)
+
+# soundfile子类型 -> 以原始精度读取时使用的dtype
+_SUBTYPE_DTYPES = {
+    'PCM_S8': 'int16',
+    'PCM_U8': 'int16',
+    'PCM_16': 'int16',
+    'PCM_24': 'int32',
+    'PCM_32': 'int32',
+    'FLOAT': 'float32',
+    'DOUBLE': 'float64'
+}
+
+# 整数dtype的满幅值，用于换算为[-1, 1]浮点幅度
+_INT_FULL_SCALE = {
+    'int16': 32768.0,
+    'int32': 2147483648.0
+}
+
+
+def find_non_silent_range(audio: np.ndarray, top_db: float = 20.0, frame_length: int = 2048,
+                          hop_length: int = 512) -> Tuple[int, int]:
+    """
+    计算非静音部分的起止采样位置
+
+    与librosa.effects.trim相同：多声道先取平均，按居中分帧（两端各补frame_length//2个零）计算
+    每帧RMS，能量（RMS平方）比最大帧能量低top_db分贝以上的帧为静音；起点为第一个非静音帧
+    的起始采样，终点为最后一个非静音帧的下一帧起始采样。
+
+    Args:
+        audio: 音频数据，形状为 (采样数,) 或 (采样数, 声道数)，整数或浮点
+        top_db: 静音阈值（相对最大帧能量的分贝数）
+        frame_length: 帧长度（采样数）
+        hop_length: 帧移（采样数）
+
+    Returns:
+        Tuple[int, int]: (起始采样, 结束采样)，全部为静音时返回 (0, 0)
+    """
+    if len(audio) == 0:
+        return 0, 0
+
+    # 单声道float32信号，整数格式换算为[-1, 1]范围
+    scale = _INT_FULL_SCALE.get(audio.dtype.name, 1.0)
+    if audio.ndim > 1:
+        mono = audio.mean(axis=1, dtype=np.float32)
+    else:
+        mono = audio.astype(np.float32, copy=False)
+    if scale != 1.0:
+        mono = mono / np.float32(scale)
+
+    # 居中分帧：滑动窗口视图不复制数据，按帧移取帧后用einsum逐帧求平方和
+    pad = frame_length // 2
+    padded = np.pad(mono, pad, mode='constant')
+    frames = np.lib.stride_tricks.sliding_window_view(padded, frame_length)[::hop_length]
+    power = np.einsum('ij,ij->i', frames, frames) / np.float32(frame_length)
+
+    # 与librosa.power_to_db一致：下限amin=1e-10，以最大帧能量为参考
+    amin = 1e-10
+    db = 10.0 * np.log10(np.maximum(power, amin)) - 10.0 * np.log10(max(float(power.max()), amin))
+    non_silent = np.flatnonzero(db > -top_db)
+    if len(non_silent) == 0:
+        return 0, 0
+
+    start = int(non_silent[0]) * hop_length
+    end = min(len(audio), (int(non_silent[-1]) + 1) * hop_length)
+    return start, end
+
+
+def trim_silence_file(audio_path: str, output_path: str = None, top_db: float = 20.0,
+                      frame_length: int = 2048, hop_length: int = 512, pre_pause: float = 0.0,
+                      post_pause: float = 0.0) -> Tuple[str, float, float]:
+    """
+    去除音频文件前后的静音并添加前后停顿
+
+    以文件原始采样率和采样格式读取，输出沿用原文件的格式和子类型，
+    只写入裁剪后的片段和停顿静音；覆盖原文件时先写临时文件再原子替换。
+
+    Args:
+        audio_path: 输入音频文件路径
+        output_path: 输出音频文件路径，None表示覆盖原文件
+        top_db: 静音阈值（相对最大帧能量的分贝数）
+        frame_length: 帧长度（采样数）
+        hop_length: 帧移（采样数）
+        pre_pause: 前停顿时长（秒）
+        post_pause: 后停顿时长（秒）
+
+    Returns:
+        Tuple[str, float, float]: (输出文件路径, 原始时长, 最终时长)
+    """
+    info = sf.info(audio_path)
+    dtype = _SUBTYPE_DTYPES.get(info.subtype, 'float32')
+    audio, sr = sf.read(audio_path, dtype=dtype, always_2d=True)
+
+    start, end = find_non_silent_range(audio, top_db, frame_length, hop_length)
+    pre_samples = int(pre_pause * sr) if pre_pause > 0 else 0
+    post_samples = int(post_pause * sr) if post_pause > 0 else 0
+
+    if output_path is None:
+        output_path = audio_path
+
+    # 输出扩展名与原文件相同时沿用原格式和子类型，否则由soundfile按扩展名选择默认格式
+    same_format = os.path.splitext(output_path)[1].lower() == os.path.splitext(audio_path)[1].lower()
+    format_args = {'format': info.format, 'subtype': info.subtype} if same_format else {}
+
+    base, ext = os.path.splitext(output_path)
+    temp_path = f'{base}.trim_{os.getpid()}{ext}'
+    try:
+        with sf.SoundFile(temp_path, 'w', samplerate=sr, channels=audio.shape[1], **format_args) as f:
+            if pre_samples:
+                f.write(np.zeros((pre_samples, audio.shape[1]), dtype=audio.dtype))
+            f.write(audio[start:end])
+            if post_samples:
+                f.write(np.zeros((post_samples, audio.shape[1]), dtype=audio.dtype))
+        os.replace(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    original_duration = len(audio) / sr
+    final_duration = (pre_samples + (end - start) + post_samples) / sr
+    return output_path, original_duration, final_duration
@@ -10,21 +10,294 @@ import logging
 import subprocess
 import configparser
 import math
-from typing import List, Optional, Tuple, Dict, Any
+import tempfile
+import threading
+import multiprocessing
+import queue
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Optional, Tuple, Dict, Any, Callable
+from segment_cache import SegmentCache
+from file_cache import hash_payload
+from media_probe import get_media_probe
 # MoviePy相关导入已注释，等待FFMPEG实现
 # from moviepy import VideoFileClip, concatenate_videoclips, ColorClip
 # from moviepy import CompositeVideoClip, TextClip
 
 logger = logging.getLogger(__name__)
 
+# 输出质量档位（x264预设、CRF和音频码率）
+# draft: 编码速度约为standard的3~5倍，同等画质下文件约大50%，适合预览和快速检查
+# standard: 默认档位，编码速度与文件大小平衡
+# final: 编码时间约为standard的2~3倍，画质最好，同等画质下文件最小，适合最终发布
+QUALITY_PROFILES = {
+    'draft': {'preset': 'ultrafast', 'crf': 28, 'audio_bitrate': '96k'},
+    'standard': {'preset': 'medium', 'crf': 23, 'audio_bitrate': '128k'},
+    'final': {'preset': 'slow', 'crf': 18, 'audio_bitrate': '192k'}
+}
+
+# 视频生成页面的质量选项与档位的对应关系
+QUALITY_PROFILE_ALIASES = {
+    'low': 'draft',
+    'medium': 'standard',
+    'high': 'final'
+}
+
+
+def resolve_output_settings(resolution: Optional[Dict[str, Any]] = None,
+                            quality: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    将视频生成页面的分辨率和质量设置转换为编码参数
+    
+    Args:
+        resolution: 分辨率设置 {'width', 'height'}，None表示保持图片原始尺寸
+        quality: 质量设置 {'preset': draft/standard/final/high/medium/low/custom,
+                 'videoBitrate', 'audioBitrate'}，自定义码率单位为kbps
+                 
+    Returns:
+        dict: 输出设置（width, height, profile, preset, crf, video_bitrate, audio_bitrate, pix_fmt）
+    """
+    quality = quality or {}
+    profile_name = str(quality.get('preset', 'standard')).strip().lower()
+    profile_name = QUALITY_PROFILE_ALIASES.get(profile_name, profile_name)
+    
+    settings = {'width': None, 'height': None, 'pix_fmt': 'yuv420p', 'video_bitrate': None}
+    if profile_name == 'custom':
+        # 自定义质量：固定码率编码
+        settings.update({
+            'profile': 'custom',
+            'preset': 'medium',
+            'crf': None,
+            'video_bitrate': f"{int(quality.get('videoBitrate', 5000))}k",
+            'audio_bitrate': f"{int(quality.get('audioBitrate', 192))}k"
+        })
+    else:
+        if profile_name not in QUALITY_PROFILES:
+            logger.warning(f"未知的质量档位: {profile_name}，使用standard")
+            profile_name = 'standard'
+        settings['profile'] = profile_name
+        settings.update(QUALITY_PROFILES[profile_name])
+    
+    if resolution and resolution.get('width') and resolution.get('height'):
+        # yuv420p要求宽高为偶数
+        settings['width'] = int(resolution['width']) // 2 * 2
+        settings['height'] = int(resolution['height']) // 2 * 2
+    
+    return settings
+
+
+def resolve_preview_settings(output_settings: Optional[Dict[str, Any]] = None,
+                             max_size: int = 640, fps: int = 12) -> Dict[str, Any]:
+    """
+    根据正式输出设置生成预览编码参数：按比例缩小分辨率、降低帧率、使用ultrafast编码
+    
+    Args:
+        output_settings: 正式输出设置（resolve_output_settings的返回值）
+        max_size: 预览画面长边的最大像素数
+        fps: 预览帧率
+        
+    Returns:
+        dict: 预览输出设置
+    """
+    output_settings = output_settings or {}
+    settings = {
+        'profile': 'preview',
+        'preset': 'ultrafast',
+        'crf': 32,
+        'video_bitrate': None,
+        'audio_bitrate': '64k',
+        'pix_fmt': 'yuv420p',
+        'width': None,
+        'height': None,
+        'max_size': max_size,
+        'fps': fps,
+        'subtitle_scale': 1.0
+    }
+    
+    width, height = output_settings.get('width'), output_settings.get('height')
+    if width and height:
+        scale = min(1.0, max_size / max(width, height))
+        settings['width'] = max(2, int(width * scale) // 2 * 2)
+        settings['height'] = max(2, int(height * scale) // 2 * 2)
+        # 字幕字号和描边按相同比例缩小，预览中的字幕位置和占比与正式视频一致
+        settings['subtitle_scale'] = scale
+    
+    return settings
+
+
 class VideoProcessor:
     """
     视频处理类，提供视频拼接、剪辑等功能
     """
     
-    def __init__(self):
+    def __init__(self, ffmpeg_threads: int = 0, output_settings: Optional[Dict[str, Any]] = None):
         self.temp_files = []  # 临时文件列表，用于清理
         self.ffmpeg_path = 'ffmpeg'  # FFMPEG可执行文件路径
+        self.ffmpeg_threads = ffmpeg_threads  # 单个FFMPEG进程的编码线程数，0表示由FFMPEG自动决定
+        self.output_settings = output_settings  # 输出分辨率和编码参数（resolve_output_settings），None表示保持原始尺寸和默认编码参数
+        self.segment_cache = SegmentCache()  # 视频片段缓存
+        self.media_probe = get_media_probe()  # 带持久化缓存的ffprobe媒体信息探测
+        self.last_segment_cache_hit = False  # 最近一次generate_video_segment是否命中缓存
+        self.progress_callback = None  # 片段编码进度回调 (片段索引, 完成比例, 编码fps)
+        self.cancel_event = None  # 取消事件，置位后终止正在运行的FFMPEG进程
+    
+    def _thread_args(self) -> List[str]:
+        """
+        获取FFMPEG编码线程数参数，并行渲染时用于限制每个进程占用的CPU核心
+        
+        Returns:
+            List[str]: FFMPEG命令行参数
+        """
+        if self.ffmpeg_threads and self.ffmpeg_threads > 0:
+            return ['-threads', str(self.ffmpeg_threads)]
+        return []
+    
+    def _scale_filters(self) -> List[str]:
+        """
+        获取缩放到输出分辨率的滤镜（等比缩放后居中补黑边），未设置分辨率时为空
+        
+        Returns:
+            List[str]: 滤镜列表
+        """
+        settings = self.output_settings or {}
+        width, height = settings.get('width'), settings.get('height')
+        if not width or not height:
+            # 只限制长边（预览未指定分辨率时），保持宽高为偶数
+            max_size = settings.get('max_size')
+            if max_size:
+                return [
+                    f"scale='min({max_size},iw)':'min({max_size},ih)':force_original_aspect_ratio=decrease",
+                    'scale=trunc(iw/2)*2:trunc(ih/2)*2',
+                    'setsar=1'
+                ]
+            return []
+        return [
+            f'scale={width}:{height}:force_original_aspect_ratio=decrease',
+            f'pad={width}:{height}:(ow-iw)/2:(oh-ih)/2',
+            'setsar=1'
+        ]
+    
+    def _apply_fps_override(self, video_fps: int, fade_in_frames: int,
+                            fade_out_frames: int) -> Tuple[int, int, int]:
+        """
+        输出设置指定了帧率（如预览）时，替换项目帧率并按比例换算淡入淡出帧数，保持淡入淡出时长不变
+        
+        Args:
+            video_fps: 项目帧率
+            fade_in_frames: 淡入帧数
+            fade_out_frames: 淡出帧数
+            
+        Returns:
+            Tuple[int, int, int]: (帧率, 淡入帧数, 淡出帧数)
+        """
+        fps = (self.output_settings or {}).get('fps')
+        if not fps or fps == video_fps:
+            return video_fps, fade_in_frames, fade_out_frames
+        ratio = fps / video_fps
+        return fps, round(fade_in_frames * ratio), round(fade_out_frames * ratio)
+    
+    def _video_encode_args(self, pix_fmt: Optional[str] = None) -> List[str]:
+        """
+        获取视频编码参数（x264预设、CRF或码率、像素格式）
+        
+        Args:
+            pix_fmt: 指定像素格式，None时使用输出设置中的像素格式
+            
+        Returns:
+            List[str]: FFMPEG命令行参数
+        """
+        settings = self.output_settings or {}
+        args = ['-c:v', 'libx264']
+        if settings.get('preset'):
+            args += ['-preset', settings['preset']]
+        if settings.get('video_bitrate'):
+            args += ['-b:v', settings['video_bitrate']]
+        elif settings.get('crf') is not None:
+            args += ['-crf', str(settings['crf'])]
+        args += ['-pix_fmt', pix_fmt or settings.get('pix_fmt', 'yuv420p')]
+        return args
+    
+    def _audio_encode_args(self) -> List[str]:
+        """
+        获取音频编码参数
+        
+        Returns:
+            List[str]: FFMPEG命令行参数
+        """
+        settings = self.output_settings or {}
+        args = ['-c:a', 'aac']
+        if settings.get('audio_bitrate'):
+            args += ['-b:a', settings['audio_bitrate']]
+        return args
+    
+    def _is_cancelled(self) -> bool:
+        """当前渲染是否已被取消"""
+        return self.cancel_event is not None and self.cancel_event.is_set()
+    
+    def _run_ffmpeg(self, cmd: List[str], segment_index: Optional[int] = None,
+                    duration: float = 0.0) -> subprocess.CompletedProcess:
+        """
+        执行FFMPEG命令
+        
+        没有设置进度回调和取消事件时等同于subprocess.run；否则追加-progress pipe:1，
+        逐行解析FFMPEG的进度输出并回调，取消事件置位时终止FFMPEG进程。
+        
+        Args:
+            cmd: FFMPEG命令（第一个元素为可执行文件路径）
+            segment_index: 进度回调中的片段索引，None表示不回调进度
+            duration: 输出时长（秒），与FFMPEG已输出的时间戳换算完成比例
+            
+        Returns:
+            subprocess.CompletedProcess: 执行结果（stdout为空，stderr为FFMPEG日志）
+        """
+        if self.progress_callback is None and self.cancel_event is None:
+            return subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8', errors='ignore')
+        
+        progress_cmd = [cmd[0], '-progress', 'pipe:1', '-nostats'] + list(cmd[1:])
+        
+        # stderr写入临时文件，避免管道缓冲区写满导致FFMPEG阻塞
+        with tempfile.TemporaryFile(mode='w+', encoding='utf-8', errors='ignore') as stderr_file:
+            process = subprocess.Popen(progress_cmd, stdout=subprocess.PIPE, stderr=stderr_file,
+                                       text=True, encoding='utf-8', errors='ignore')
+            progress = {}
+            for line in process.stdout:
+                if self._is_cancelled():
+                    process.kill()
+                    break
+                
+                key, _, value = line.strip().partition('=')
+                progress[key] = value
+                if key != 'progress':
+                    continue
+                
+                # 每组进度信息以progress=continue/end结尾
+                if segment_index is not None and self.progress_callback:
+                    # 按输出时间戳换算比例：静态图片编码模式只输出画面变化的帧，帧数远小于总帧数
+                    # out_time_ms与out_time_us一样以微秒为单位（FFMPEG的历史遗留），旧版本只有out_time_ms
+                    out_time = None
+                    for time_key in ('out_time_us', 'out_time_ms'):
+                        try:
+                            out_time = int(progress.get(time_key, '')) / 1_000_000
+                            break
+                        except ValueError:
+                            continue
+                    try:
+                        fps = float(progress.get('fps', 0) or 0)
+                    except ValueError:
+                        fps = 0.0
+                    fraction = min(max(out_time / duration, 0.0), 1.0) if duration and out_time is not None else None
+                    self.progress_callback(segment_index, fraction, fps)
+                progress = {}
+            
+            process.stdout.close()
+            returncode = process.wait()
+            stderr_file.seek(0)
+            stderr = stderr_file.read()
+        
+        if self._is_cancelled():
+            stderr += '\n渲染已取消'
+            returncode = returncode or -1
+        
+        return subprocess.CompletedProcess(progress_cmd, returncode, '', stderr)
     
     def generate_video_segment(self, project_path: str, segment_index: int, 
                               audio_duration: float, image_path: str) -> bool:
@@ -41,6 +314,10 @@ class VideoProcessor:
             bool: 是否成功
         """
         try:
+            if self._is_cancelled():
+                logger.info(f"渲染已取消，跳过片段{segment_index}")
+                return False
+            
             # 读取项目配置
             parameter_file = os.path.join(project_path, 'parameter.ini')
             if not os.path.exists(parameter_file):
@@ -54,47 +331,100 @@ class VideoProcessor:
             fade_in_frames = config.getint('VIDEO_FADE', 'fade_in_frames', fallback=4)
             fade_out_frames = config.getint('VIDEO_FADE', 'fade_out_frames', fallback=4)
             video_fps = config.getint('VIDEO_FADE', 'video_fps', fallback=25)
+            video_fps, fade_in_frames, fade_out_frames = self._apply_fps_override(
+                video_fps, fade_in_frames, fade_out_frames
+            )
+            
+            # 获取渲染模式（fused: 单次编码直接输出片段，filtergraph: 单次滤镜图渲染，frames: 逐帧渲染）
+            render_mode = config.get('VIDEO_RENDER', 'render_mode', fallback='fused').strip().lower()
+            
+            # 静态图片编码模式：只输出画面变化的帧（淡入淡出和一帧静止画面），使用可变帧率
+            still_image = config.getboolean('VIDEO_RENDER', 'still_image_mode', fallback=True)
+            
+            # 统一音轨模式：片段只输出画面，旁白在拼接阶段一次性铺到统一时间线上并只编码一次AAC
+            embed_audio = not config.getboolean('VIDEO_RENDER', 'unified_audio_track', fallback=True)
             
             # 计算总帧数
             total_frames = math.ceil(audio_duration * video_fps)
-            logger.info(f"片段{segment_index}: 音频时长={audio_duration}秒, 总帧数={total_frames}, FPS={video_fps}")
+            logger.info(f"片段{segment_index}: 音频时长={audio_duration}秒, 总帧数={total_frames}, FPS={video_fps}, 渲染模式={render_mode}")
             
-            # 创建TEMP目录
-            temp_dir = os.path.join(project_path, 'TEMP')
-            os.makedirs(temp_dir, exist_ok=True)
+            videos_dir = os.path.join(project_path, 'videos')
+            final_output_path = os.path.join(videos_dir, f'segment_{segment_index:03d}.mp4')
             
-            # 生成帧图片
-            frames_generated = self._generate_frames_with_fade(
-                image_path, temp_dir, segment_index, total_frames, 
-                fade_in_frames, fade_out_frames
+            # 查询片段缓存，命中时直接复用已渲染的片段
+            self.last_segment_cache_hit = False
+            cache_key = self._get_segment_cache_key(
+                project_path, config, segment_index, image_path,
+                self._segment_encode_settings(render_mode, total_frames, video_fps, still_image, embed_audio)
             )
+            if cache_key and self.segment_cache.fetch(cache_key, final_output_path):
+                self.last_segment_cache_hit = True
+                logger.info(f"视频片段生成完成（缓存命中）: {final_output_path}")
+                return True
             
-            if not frames_generated:
-                logger.error(f"生成帧图片失败: 片段{segment_index}")
-                return False
+            # 移除旧片段（可能是缓存文件的硬链接），避免覆盖写入时改动缓存内容
+            if os.path.exists(final_output_path):
+                os.remove(final_output_path)
+            
+            if render_mode == 'fused':
+                # 融合模式：图片、旁白、字幕和淡入淡出一次H.264编码，直接输出到videos目录
+                fused_output_path = self._render_fused_segment(
+                    project_path, config, segment_index, image_path,
+                    total_frames, video_fps, fade_in_frames, fade_out_frames, still_image, embed_audio
+                )
+                if not fused_output_path:
+                    return False
+                self._store_segment_in_cache(cache_key, fused_output_path)
+                return True
             
-            # 使用FFMPEG合成视频
-            video_path = self._create_video_from_frames(
-                temp_dir, segment_index, total_frames, video_fps, audio_duration,
-                fade_in_frames, fade_out_frames
-            )
+            # 创建TEMP目录
+            temp_dir = os.path.join(project_path, 'TEMP')
+            os.makedirs(temp_dir, exist_ok=True)
+            
+            if render_mode == 'frames':
+                # 逐帧模式（旧实现）：先生成帧图片，再由帧图片合成视频
+                frames_generated = self._generate_frames_with_fade(
+                    image_path, temp_dir, segment_index, total_frames,
+                    fade_in_frames, fade_out_frames
+                )
+                
+                if not frames_generated:
+                    logger.error(f"生成帧图片失败: 片段{segment_index}")
+                    return False
+                
+                # 使用FFMPEG合成视频
+                video_path = self._create_video_from_frames(
+                    temp_dir, segment_index, total_frames, video_fps, audio_duration,
+                    fade_in_frames, fade_out_frames
+                )
+            else:
+                # 滤镜图模式：单次FFMPEG调用直接由图片生成视频，不生成帧文件
+                video_path = self._create_video_from_image(
+                    image_path, temp_dir, segment_index, total_frames, video_fps,
+                    fade_in_frames, fade_out_frames, still_image
+                )
             
             if not video_path:
                 logger.error(f"合成视频失败: 片段{segment_index}")
                 return False
             
-            # 添加对应的音频文件
-            video_with_audio_path = self._add_audio_to_video(
-                video_path, project_path, segment_index
-            )
+            # 添加对应的音频文件（统一音轨模式下片段保持无声）
+            if embed_audio:
+                video_with_audio_path = self._add_audio_to_video(
+                    video_path, project_path, segment_index
+                )
+            else:
+                video_with_audio_path = video_path
             
             if not video_with_audio_path:
                 logger.error(f"添加音频失败: 片段{segment_index}")
                 return False
             
             # 添加字幕
+            # 滤镜图模式的静态图片片段是可变帧率，叠加字幕的二次编码沿用静态图片编码参数
             final_video_path = self._add_subtitles_to_video(
-                video_with_audio_path, project_path, segment_index
+                video_with_audio_path, project_path, segment_index,
+                total_frames, video_fps, still_image and render_mode != 'frames'
             )
             
             if not final_video_path:
@@ -105,11 +435,9 @@ class VideoProcessor:
             self._cleanup_segment_temp_files(temp_dir, segment_index)
             
             # 移动到videos目录
-            videos_dir = os.path.join(project_path, 'videos')
             os.makedirs(videos_dir, exist_ok=True)
             
             # 最终输出统一为mp4格式
-            final_output_path = os.path.join(videos_dir, f'segment_{segment_index:03d}.mp4')
             if os.path.exists(final_video_path):
                 # 如果是.mov格式，需要转换为.mp4
                 if final_video_path.endswith('.mov'):
@@ -117,21 +445,23 @@ class VideoProcessor:
                     cmd = [
                         self.ffmpeg_path,
                         '-i', final_video_path,
-                        '-c:v', 'libx264',
-                        '-pix_fmt', 'yuv420p',
+                        *self._video_encode_args(),
+                        *self._thread_args(),
                         '-y',
                         final_output_path
                     ]
                     result = subprocess.run(cmd, capture_output=True, text=True)
                     if result.returncode == 0:
                         os.remove(final_video_path)  # 删除临时.mov文件
+                        self._store_segment_in_cache(cache_key, final_output_path)
                         logger.info(f"视频片段生成完成: {final_output_path}")
                         return True
                     else:
                         logger.error(f"格式转换失败: {result.stderr}")
                         return False
                 else:
-                    os.rename(final_video_path, final_output_path)
+                    os.replace(final_video_path, final_output_path)
+                    self._store_segment_in_cache(cache_key, final_output_path)
                     logger.info(f"视频片段生成完成: {final_output_path}")
                     return True
             
@@ -141,22 +471,290 @@ class VideoProcessor:
             logger.error(f"生成视频片段失败: {e}")
             return False
     
+    def _segment_encode_settings(self, render_mode: str, total_frames: int,
+                                 video_fps: int, still_image: bool = False,
+                                 embed_audio: bool = True) -> Dict[str, Any]:
+        """
+        获取影响片段输出内容的渲染和编码设置（用于片段缓存键）
+        
+        Args:
+            render_mode: 渲染模式
+            total_frames: 总帧数
+            video_fps: 视频帧率
+            still_image: 是否使用静态图片编码模式
+            embed_audio: 片段是否包含旁白音轨
+            
+        Returns:
+            dict: 渲染和编码设置
+        """
+        return {
+            'render_mode': render_mode,
+            'total_frames': total_frames,
+            'fps': video_fps,
+            'still_image': still_image and render_mode != 'frames',
+            'output': self.output_settings or {},
+            'vcodec': 'libx264',
+            'acodec': 'aac' if embed_audio else None
+        }
+    
+    def _get_segment_cache_key(self, project_path: str, config: configparser.ConfigParser,
+                               segment_index: int, image_path: str,
+                               encode_settings: Dict[str, Any]) -> Optional[str]:
+        """
+        计算片段缓存键，缓存未启用或输入文件缺失时返回None
+        
+        Args:
+            project_path: 项目路径
+            config: 已读取parameter.ini的ConfigParser对象
+            segment_index: 片段索引
+            image_path: 图片路径
+            encode_settings: 渲染和编码设置
+            
+        Returns:
+            缓存键或None
+        """
+        if not self.segment_cache.enabled:
+            return None
+        try:
+            audio_path = self._find_segment_audio(project_path, segment_index)
+            subtitle_text = config.get('PAPER_CONTENT', f'line_{segment_index}', fallback='')
+            return self.segment_cache.build_key(image_path, audio_path, subtitle_text, config, encode_settings)
+        except Exception as e:
+            logger.warning(f"计算片段{segment_index}缓存键失败，跳过缓存: {e}")
+            return None
+    
+    def _store_segment_in_cache(self, cache_key: Optional[str], segment_path: str):
+        """
+        将渲染完成的片段写入缓存
+        
+        Args:
+            cache_key: 缓存键，为None时不写入
+            segment_path: 片段文件路径
+        """
+        if cache_key:
+            self.segment_cache.store(cache_key, segment_path)
+    
+    def get_segment_cache_stats(self) -> Dict[str, Any]:
+        """
+        获取片段缓存统计信息
+        
+        Returns:
+            dict: 缓存统计
+        """
+        return self.segment_cache.get_stats()
+    
+    def generate_video_segments(self, project_path: str,
+                                segment_jobs: List[Tuple[int, float, str]],
+                                max_workers: Optional[int] = None,
+                                progress_callback: Optional[Callable[[int, Optional[float], Optional[float]], None]] = None,
+                                cancel_event: Optional[threading.Event] = None) -> List[int]:
+        """
+        使用进程池并行生成多个视频片段
+        
+        每个片段在独立进程中调用generate_video_segment，并按CPU核心数为每个
+        FFMPEG进程分配编码线程（-threads），避免多个编码同时运行时超额占用CPU。
+        子进程的编码进度通过Manager队列转发到当前进程，在当前进程中调用progress_callback。
+        
+        Args:
+            project_path: 项目路径
+            segment_jobs: 片段任务列表，每个元素为 (片段索引, 音频时长, 图片路径)
+            max_workers: 并行进程数，None时从parameter.ini的VIDEO_RENDER节读取，0表示自动
+            progress_callback: 进度回调 (片段索引, 完成比例, 编码fps)，片段结束时完成比例为1.0
+            cancel_event: 取消事件，置位后不再启动新片段并终止正在运行的FFMPEG进程
+            
+        Returns:
+            List[int]: 生成成功的片段索引列表（按片段索引升序，可直接用于拼接）
+        """
+        if not segment_jobs:
+            return []
+        
+        workers, threads_per_job = self._plan_segment_workers(project_path, len(segment_jobs), max_workers)
+        logger.info(f"开始渲染 {len(segment_jobs)} 个视频片段: 并行进程数={workers}, 每个FFMPEG线程数={threads_per_job}")
+        
+        generated_segments = []
+        cache_hits = 0
+        
+        if workers <= 1:
+            # 单进程时直接在当前进程中顺序渲染
+            self.ffmpeg_threads = threads_per_job
+            self.progress_callback = progress_callback
+            self.cancel_event = cancel_event
+            for segment_index, audio_duration, image_path in segment_jobs:
+                if self._is_cancelled():
+                    break
+                if self.generate_video_segment(project_path, segment_index, audio_duration, image_path):
+                    generated_segments.append(segment_index)
+                    cache_hits += 1 if self.last_segment_cache_hit else 0
+                    logger.info(f"片段{segment_index}生成成功")
+                else:
+                    logger.error(f"片段{segment_index}生成失败")
+                if progress_callback:
+                    progress_callback(segment_index, 1.0, 0.0)
+            self._record_segment_cache_lookups(cache_hits, len(segment_jobs))
+            return sorted(generated_segments)
+        
+        # 需要进度或取消时，通过Manager在进程间共享进度队列和取消事件
+        track_progress = progress_callback is not None or cancel_event is not None
+        manager = multiprocessing.Manager() if track_progress else None
+        progress_queue = manager.Queue() if track_progress else None
+        worker_cancel_event = manager.Event() if track_progress else None
+        
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(
+                        _render_segment_job,
+                        (project_path, segment_index, audio_duration, image_path, threads_per_job,
+                         self.output_settings, progress_queue, worker_cancel_event)
+                    ): segment_index
+                    for segment_index, audio_duration, image_path in segment_jobs
+                }
+                
+                monitor_stop = threading.Event()
+                monitor_thread = None
+                if track_progress:
+                    monitor_thread = threading.Thread(
+                        target=self._monitor_segment_workers,
+                        args=(futures, progress_queue, worker_cancel_event, monitor_stop,
+                              progress_callback, cancel_event),
+                        daemon=True
+                    )
+                    monitor_thread.start()
+                
+                try:
+                    for future in as_completed(futures):
+                        segment_index = futures[future]
+                        try:
+                            _, success, cache_hit = future.result()
+                        except Exception as e:
+                            logger.error(f"片段{segment_index}渲染进程异常: {e}")
+                            success, cache_hit = False, False
+                        
+                        if success:
+                            generated_segments.append(segment_index)
+                            cache_hits += 1 if cache_hit else 0
+                            logger.info(f"片段{segment_index}生成成功")
+                        else:
+                            logger.error(f"片段{segment_index}生成失败")
+                        if progress_callback:
+                            progress_callback(segment_index, 1.0, 0.0)
+                finally:
+                    monitor_stop.set()
+                    if monitor_thread:
+                        monitor_thread.join()
+        finally:
+            if manager:
+                manager.shutdown()
+        
+        self._record_segment_cache_lookups(cache_hits, len(segment_jobs))
+        
+        # 进程完成顺序不确定，按片段索引排序后返回
+        return sorted(generated_segments)
+    
+    def _monitor_segment_workers(self, futures: Dict[Any, int], progress_queue, worker_cancel_event,
+                                 stop_event: threading.Event,
+                                 progress_callback: Optional[Callable[[int, Optional[float], Optional[float]], None]],
+                                 cancel_event: Optional[threading.Event]):
+        """
+        监视线程：转发子进程的进度，并把取消请求同步到子进程
+        
+        Args:
+            futures: 进程池任务 -> 片段索引
+            progress_queue: 子进程写入 (片段索引, 完成比例, 编码fps) 的队列
+            worker_cancel_event: 子进程共享的取消事件
+            stop_event: 所有片段结束后置位
+            progress_callback: 进度回调
+            cancel_event: 调用方的取消事件
+        """
+        while not stop_event.is_set():
+            if cancel_event is not None and cancel_event.is_set() and not worker_cancel_event.is_set():
+                logger.info("收到取消请求，停止渲染视频片段")
+                worker_cancel_event.set()
+                for future in futures:
+                    future.cancel()
+            
+            try:
+                segment_index, fraction, fps = progress_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            
+            if progress_callback:
+                progress_callback(segment_index, fraction, fps)
+    
+    def _record_segment_cache_lookups(self, cache_hits: int, job_count: int):
+        """
+        在主进程中统一记录片段缓存命中情况（子进程不写统计，避免并发写入）
+        
+        Args:
+            cache_hits: 命中次数
+            job_count: 片段任务总数
+        """
+        if self.segment_cache.enabled:
+            self.segment_cache.record_lookups(cache_hits, job_count - cache_hits)
+            logger.info(f"片段缓存: 命中 {cache_hits}/{job_count}")
+    
+    def _plan_segment_workers(self, project_path: str, job_count: int,
+                              max_workers: Optional[int] = None) -> Tuple[int, int]:
+        """
+        计算并行渲染的进程数和每个FFMPEG进程的线程数
+        
+        Args:
+            project_path: 项目路径
+            job_count: 片段任务数量
+            max_workers: 指定的并行进程数，None时从parameter.ini读取
+            
+        Returns:
+            Tuple[int, int]: (并行进程数, 每个FFMPEG进程的线程数)
+        """
+        cpu_count = os.cpu_count() or 1
+        ffmpeg_threads = 0
+        
+        parameter_file = os.path.join(project_path, 'parameter.ini')
+        if os.path.exists(parameter_file):
+            config = configparser.ConfigParser(interpolation=None)
+            config.read(parameter_file, encoding='utf-8')
+            if max_workers is None:
+                max_workers = config.getint('VIDEO_RENDER', 'max_workers', fallback=0)
+            ffmpeg_threads = config.getint('VIDEO_RENDER', 'ffmpeg_threads', fallback=0)
+        
+        # 自动模式：每个编码任务约占4个核心
+        if not max_workers or max_workers <= 0:
+            max_workers = max(1, cpu_count // 4)
+        
+        workers = max(1, min(max_workers, job_count, cpu_count))
+        
+        # 按并行进程数平分CPU核心作为每个FFMPEG进程的线程预算
+        if ffmpeg_threads <= 0:
+            ffmpeg_threads = max(1, cpu_count // workers)
+        
+        return workers, ffmpeg_threads
+    
     def concatenate_videos(self, video_paths: List[str], output_path: str, 
-                          project_path: str, fps: int = 24, codec: str = 'libx264') -> bool:
+                          project_path: str, fps: int = 24, codec: str = 'libx264',
+                          segments: Optional[List[Tuple[int, float, str]]] = None) -> bool:
         """
         拼接多个视频文件并添加背景音乐
         
+        传入segments且片段数量和总时长都在VIDEO_RENDER的单次渲染阈值内时，
+        不使用已渲染的片段文件，而是用一个filter_complex一次编码出最终视频。
+        
         Args:
             video_paths: 视频文件路径列表
             output_path: 输出文件路径（应该在项目根目录）
             project_path: 项目路径
             fps: 输出视频帧率
             codec: 视频编码器
+            segments: 片段任务列表，每个元素为 (片段索引, 音频时长, 图片路径)
             
         Returns:
             bool: 是否成功
         """
         try:
+            if segments and self.should_use_single_graph(project_path, segments):
+                return self.render_single_graph(project_path, segments, output_path)
+            
             logger.info(f"开始拼接 {len(video_paths)} 个视频文件")
             
             # 检查输入文件
@@ -240,6 +838,253 @@ class VideoProcessor:
         #     logger.error(f"视频拼接失败: {e}")
         #     return False
     
+    def should_use_single_graph(self, project_path: str,
+                                segments: List[Tuple[int, float, str]]) -> bool:
+        """
+        判断是否使用单次滤镜图渲染整段视频
+        
+        片段数量和总时长都不超过VIDEO_RENDER中的single_graph_max_segments和
+        single_graph_max_duration时使用（任一阈值为0表示禁用）。片段过多时单个
+        filter_complex的输入和内存占用过大，逐片段渲染配合缓存更合适。
+        
+        Args:
+            project_path: 项目路径
+            segments: 片段任务列表，每个元素为 (片段索引, 音频时长, 图片路径)
+            
+        Returns:
+            bool: 是否使用单次渲染
+        """
+        if not segments:
+            return False
+        
+        config = configparser.ConfigParser(interpolation=None)
+        config.read(os.path.join(project_path, 'parameter.ini'), encoding='utf-8')
+        max_segments = config.getint('VIDEO_RENDER', 'single_graph_max_segments', fallback=12)
+        max_duration = config.getfloat('VIDEO_RENDER', 'single_graph_max_duration', fallback=60.0)
+        if max_segments <= 0 or max_duration <= 0:
+            return False
+        
+        total_duration = sum(audio_duration for _, audio_duration, _ in segments)
+        use_single_graph = len(segments) <= max_segments and total_duration <= max_duration
+        logger.info(f"片段数={len(segments)}, 总时长={total_duration:.2f}秒, "
+                    f"{'使用单次滤镜图渲染' if use_single_graph else '使用逐片段渲染'}")
+        return use_single_graph
+    
+    def render_single_graph(self, project_path: str, segments: List[Tuple[int, float, str]],
+                            output_path: str, publish: bool = True) -> bool:
+        """
+        单次滤镜图渲染：所有片段的图片、旁白、字幕、淡入淡出以及循环背景音乐
+        在一个filter_complex中完成，一次编码直接输出最终视频，不生成片段和中间文件
+        
+        Args:
+            project_path: 项目路径
+            segments: 片段任务列表，每个元素为 (片段索引, 音频时长, 图片路径)
+            output_path: 输出文件路径
+            publish: 是否作为最终视频发布（清理TEMP目录并复制到output目录），预览时为False
+            
+        Returns:
+            bool: 是否成功
+        """
+        partial_output_path = output_path.replace('.mp4', '.part.mp4')
+        try:
+            parameter_file = os.path.join(project_path, 'parameter.ini')
+            config = configparser.ConfigParser(interpolation=None)
+            config.read(parameter_file, encoding='utf-8')
+            
+            fade_in_frames = config.getint('VIDEO_FADE', 'fade_in_frames', fallback=4)
+            fade_out_frames = config.getint('VIDEO_FADE', 'fade_out_frames', fallback=4)
+            video_fps = config.getint('VIDEO_FADE', 'video_fps', fallback=25)
+            video_fps, fade_in_frames, fade_out_frames = self._apply_fps_override(
+                video_fps, fade_in_frames, fade_out_frames
+            )
+            
+            inputs = []
+            input_count = 0
+            filter_parts = []
+            concat_labels = []
+            total_frames_all = 0
+            
+            for position, (segment_index, audio_duration, image_path) in enumerate(segments):
+                if not os.path.exists(image_path):
+                    logger.error(f"图片文件不存在: {image_path}")
+                    return False
+                audio_path = self._find_segment_audio(project_path, segment_index)
+                
+                # 与逐片段渲染相同的帧数计算，保证两种模式输出时长一致
+                total_frames = math.ceil(audio_duration * video_fps)
+                segment_duration = total_frames / video_fps
+                total_frames_all += total_frames
+                
+                video_input, audio_input = input_count, input_count + 1
+                inputs += ['-loop', '1', '-framerate', str(video_fps), '-i', image_path, '-i', audio_path]
+                input_count += 2
+                
+                video_filters = [f'trim=end_frame={total_frames}', 'setpts=PTS-STARTPTS']
+                video_filters += self._scale_filters()
+                video_filters += self._build_fade_filters(total_frames, fade_in_frames, fade_out_frames)
+                drawtext_filter = self._build_subtitle_filter(config, segment_index)
+                if drawtext_filter:
+                    video_filters.append(drawtext_filter)
+                video_filters += ['format=yuv420p', 'setsar=1']
+                filter_parts.append(f"[{video_input}:v]{','.join(video_filters)}[v{position}]")
+                
+                # 旁白补齐或截断到片段时长，统一采样格式以便concat
+                filter_parts.append(
+                    f"[{audio_input}:a]aformat=sample_fmts=fltp:sample_rates=44100:channel_layouts=stereo,"
+                    f"apad,atrim=end={segment_duration:.6f},asetpts=PTS-STARTPTS[a{position}]"
+                )
+                concat_labels.append(f'[v{position}][a{position}]')
+            
+            filter_parts.append(f"{''.join(concat_labels)}concat=n={len(segments)}:v=1:a=1[vout][narration]")
+            audio_label = '[narration]'
+            
+            # 背景音乐：循环、音量和淡入淡出，与旁白混音
+            bgm_file = config.get('VIDEO_BACKGROUND_MUSIC', 'file', fallback='').strip()
+            bgm_path = self._find_background_music(project_path, bgm_file) if bgm_file and bgm_file != 'None' else None
+            if bgm_path:
+                volume = config.getfloat('VIDEO_BACKGROUND_MUSIC', 'volume', fallback=30) / 100.0
+                fade_in = config.getfloat('VIDEO_BACKGROUND_MUSIC', 'fade_in', fallback=2.0)
+                fade_out = config.getfloat('VIDEO_BACKGROUND_MUSIC', 'fade_out', fallback=2.0)
+                loop_mode = config.get('VIDEO_BACKGROUND_MUSIC', 'loop_mode', fallback='loop')
+                total_duration = total_frames_all / video_fps
+                
+                bgm_input = input_count
+                if loop_mode == 'loop':
+                    inputs += ['-stream_loop', '-1']
+                inputs += ['-i', bgm_path]
+                
+                bgm_filters = [
+                    'aformat=sample_fmts=fltp:sample_rates=44100:channel_layouts=stereo',
+                    f'atrim=end={total_duration:.6f}',
+                    f'volume={volume}'
+                ]
+                if fade_in > 0:
+                    bgm_filters.append(f'afade=t=in:st=0:d={fade_in}')
+                if fade_out > 0:
+                    bgm_filters.append(f'afade=t=out:st={max(total_duration - fade_out, 0):.6f}:d={fade_out}')
+                filter_parts.append(f"[{bgm_input}:a]{','.join(bgm_filters)}[bgm]")
+                filter_parts.append('[narration][bgm]amix=inputs=2:duration=first:dropout_transition=2[aout]')
+                audio_label = '[aout]'
+            
+            cmd = [
+                self.ffmpeg_path,
+                *inputs,
+                '-filter_complex', ';'.join(filter_parts),
+                '-map', '[vout]',
+                '-map', audio_label,
+                *self._video_encode_args(),
+                *self._audio_encode_args(),
+                *self._thread_args(),
+                '-y',
+                partial_output_path
+            ]
+            
+            logger.info(f"开始单次滤镜图渲染: {len(segments)} 个片段, 共{total_frames_all}帧")
+            result = self._run_ffmpeg(cmd, 0, total_frames_all / video_fps)
+            if result.returncode != 0:
+                logger.error(f"单次滤镜图渲染失败: {result.stderr}")
+                if os.path.exists(partial_output_path):
+                    os.remove(partial_output_path)
+                return False
+            
+            os.replace(partial_output_path, output_path)
+            
+            if not publish:
+                logger.info(f"视频渲染完成（单次滤镜图渲染）: {output_path}")
+                return True
+            
+            # 清理整个TEMP目录
+            self._cleanup_all_temp_files(os.path.join(project_path, 'TEMP'))
+            
+            # 复制视频到output目录
+            self._copy_video_to_output_dir(output_path)
+            
+            logger.info(f"最终视频生成完成（单次滤镜图渲染）: {output_path}")
+            return True
+            
+        except Exception as e:
+            logger.error(f"单次滤镜图渲染失败: {e}")
+            if os.path.exists(partial_output_path):
+                os.remove(partial_output_path)
+            return False
+    
+    def render_preview(self, project_path: str, segments: List[Tuple[int, float, str]],
+                       output_path: str, first_segment: Optional[int] = None,
+                       last_segment: Optional[int] = None) -> bool:
+        """
+        渲染低分辨率预览：降低分辨率和帧率、ultrafast编码，只渲染选定范围的片段，
+        一次滤镜图输出预览视频。相同输入的预览结果保存在片段缓存中，再次预览直接复用。
+        
+        Args:
+            project_path: 项目路径
+            segments: 片段任务列表，每个元素为 (片段索引, 音频时长, 图片路径)
+            output_path: 预览视频输出路径
+            first_segment: 起始片段索引（包含），None表示从第一个片段开始
+            last_segment: 结束片段索引（包含），None表示到最后一个片段
+            
+        Returns:
+            bool: 是否成功
+        """
+        selected = [
+            segment for segment in segments
+            if (first_segment is None or segment[0] >= first_segment)
+            and (last_segment is None or segment[0] <= last_segment)
+        ]
+        if not selected:
+            logger.error(f"预览范围内没有片段: {first_segment}-{last_segment}")
+            return False
+        
+        config = configparser.ConfigParser(interpolation=None)
+        config.read(os.path.join(project_path, 'parameter.ini'), encoding='utf-8')
+        preview_settings = resolve_preview_settings(
+            self.output_settings,
+            max_size=config.getint('VIDEO_RENDER', 'preview_max_size', fallback=640),
+            fps=config.getint('VIDEO_RENDER', 'preview_fps', fallback=12)
+        )
+        
+        preview = VideoProcessor(ffmpeg_threads=self.ffmpeg_threads, output_settings=preview_settings)
+        preview.progress_callback = self.progress_callback
+        preview.cancel_event = self.cancel_event
+        
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        
+        # 预览缓存键：所选片段各自的输入哈希加上预览设置
+        cache_key = None
+        if self.segment_cache.enabled:
+            try:
+                segment_keys = [
+                    self.segment_cache.build_key(
+                        image_path, self._find_segment_audio(project_path, segment_index),
+                        config.get('PAPER_CONTENT', f'line_{segment_index}', fallback=''),
+                        config, {'segment_index': segment_index, 'audio_duration': audio_duration}
+                    )
+                    for segment_index, audio_duration, image_path in selected
+                ]
+                cache_key = hash_payload({
+                    'mode': 'preview',
+                    'segments': segment_keys,
+                    'background_music': dict(config.items('VIDEO_BACKGROUND_MUSIC')) if config.has_section('VIDEO_BACKGROUND_MUSIC') else {},
+                    'settings': preview_settings
+                })
+            except Exception as e:
+                logger.warning(f"计算预览缓存键失败，跳过缓存: {e}")
+        
+        if cache_key and self.segment_cache.fetch(cache_key, output_path):
+            logger.info(f"预览生成完成（缓存命中）: {output_path}")
+            return True
+        
+        # 移除旧预览（可能是缓存文件的硬链接）
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        
+        logger.info(f"开始渲染预览: 片段 {selected[0][0]}-{selected[-1][0]}, "
+                    f"{preview_settings['width'] or '-'}x{preview_settings['height'] or '-'}@{preview_settings['fps']}fps")
+        if not preview.render_single_graph(project_path, selected, output_path, publish=False):
+            return False
+        
+        self._store_segment_in_cache(cache_key, output_path)
+        return True
+    
     def create_color_clip(self, color: Tuple[int, int, int], duration: float, 
                          size: Tuple[int, int] = (1920, 1080), fps: int = 24) -> Optional[object]:
         """
@@ -323,44 +1168,32 @@ class VideoProcessor:
     
     def get_video_info(self, video_path: str) -> Optional[dict]:
         """
-        获取视频信息
+        获取视频信息（基于ffprobe，结果按 路径+修改时间+文件大小 持久化缓存）
         
         Args:
             video_path: 视频文件路径
             
         Returns:
-            包含视频信息的字典或None
+            包含视频信息的字典或None，主要字段:
+            duration, streams, video{codec, width, height, fps, pix_fmt, ...},
+            audio{codec, sample_rate, channels, ...}，以及width/height/fps/size/total_frames
         """
-        # MoviePy实现已注释，等待FFMPEG实现
-        logger.error("MoviePy获取视频信息功能已弃用，等待FFMPEG实现")
-        return None
-        
-        # 以下是原MoviePy实现，已注释
-        # try:
-        #     if not os.path.exists(video_path):
-        #         logger.error(f"视频文件不存在: {video_path}")
-        #         return None
-        #     
-        #     clip = VideoFileClip(video_path)
-        #     
-        #     info = {
-        #         'path': video_path,
-        #         'duration': clip.duration,
-        #         'fps': clip.fps,
-        #         'size': clip.size,
-        #         'width': clip.w,
-        #         'height': clip.h,
-        #         'total_frames': int(clip.fps * clip.duration) if clip.fps else 0
-        #     }
-        #     
-        #     clip.close()
-        #     
-        #     logger.info(f"视频信息: {info}")
-        #     return info
-        #     
-        # except Exception as e:
-        #     logger.error(f"获取视频信息失败: {e}")
-        #     return None
+        try:
+            if not os.path.exists(video_path):
+                logger.error(f"视频文件不存在: {video_path}")
+                return None
+            
+            info = self.media_probe.probe(video_path)
+            if info is None:
+                logger.error(f"获取视频信息失败: {video_path}")
+                return None
+            
+            logger.debug(f"视频信息: {info}")
+            return info
+            
+        except Exception as e:
+            logger.error(f"获取视频信息失败: {e}")
+            return None
     
     def resize_video(self, input_path: str, output_path: str, 
                     new_size: Tuple[int, int]) -> bool:
@@ -731,82 +1564,375 @@ class VideoProcessor:
             logger.info(f"生成{total_frames}帧图片完成: {segment_temp_dir}")
             return True
             
-        except Exception as e:
-            logger.error(f"生成帧图片失败: {e}")
-            return False
+        except Exception as e:
+            logger.error(f"生成帧图片失败: {e}")
+            return False
+    
+    def _create_video_from_frames(self, temp_dir: str, segment_index: int,
+                                 total_frames: int, video_fps: int, 
+                                 audio_duration: float, fade_in_frames: int = 0,
+                                 fade_out_frames: int = 0) -> Optional[str]:
+        """
+        从帧图片创建视频
+        
+        Args:
+            temp_dir: 临时目录
+            segment_index: 片段索引
+            total_frames: 总帧数
+            video_fps: 视频帧率
+            audio_duration: 音频时长
+            
+        Returns:
+            视频文件路径或None
+        """
+        try:
+            segment_temp_dir = os.path.join(temp_dir, f'segment_{segment_index:03d}')
+            video_path = os.path.join(temp_dir, f'video_{segment_index:03d}.mp4')
+            
+            # 使用FFMPEG从帧图片创建视频，支持透明度
+            # 检查是否有透明度帧
+            has_fade_frames = fade_in_frames > 0 or fade_out_frames > 0
+            
+            # 缩放到输出分辨率
+            scale_filters = self._scale_filters()
+            
+            if has_fade_frames:
+                # 有淡入淡出效果，使用支持alpha通道的编码器
+                video_path = video_path.replace('.mp4', '.mov')  # 改为mov格式
+                cmd = [
+                    self.ffmpeg_path,
+                    '-framerate', str(video_fps),
+                    '-i', os.path.join(segment_temp_dir, 'frame_%06d.png'),
+                    '-t', str(audio_duration),
+                    *(['-vf', ','.join(scale_filters)] if scale_filters else []),
+                    '-c:v', 'qtrle',  # QuickTime Animation RLE支持alpha通道
+                    '-pix_fmt', 'rgba',
+                    '-y',
+                    video_path
+                ]
+            else:
+                # 没有淡入淡出效果，使用标准编码器
+                cmd = [
+                    self.ffmpeg_path,
+                    '-framerate', str(video_fps),
+                    '-i', os.path.join(segment_temp_dir, 'frame_%06d.png'),
+                    '-t', str(audio_duration),
+                    *(['-vf', ','.join(scale_filters)] if scale_filters else []),
+                    *self._video_encode_args(),
+                    '-y',
+                    video_path
+                ]
+            
+            result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8', errors='ignore')
+            if result.returncode != 0:
+                logger.error(f"创建视频失败: {result.stderr}")
+                return None
+            
+            logger.info(f"视频创建完成: {video_path}")
+            return video_path
+            
+        except Exception as e:
+            logger.error(f"创建视频失败: {e}")
+            return None
+    
+    def _build_fade_filters(self, total_frames: int, fade_in_frames: int,
+                            fade_out_frames: int) -> List[str]:
+        """
+        构建黑场淡入淡出滤镜，效果与逐帧模式的黑色蒙版一致
+        
+        Args:
+            total_frames: 总帧数
+            fade_in_frames: 淡入帧数
+            fade_out_frames: 淡出帧数
+            
+        Returns:
+            List[str]: fade滤镜列表
+        """
+        filters = []
+        
+        # 淡入：第0帧全黑，第fade_in_frames帧恢复原始亮度
+        if fade_in_frames > 0:
+            filters.append(f'fade=t=in:s=0:n={fade_in_frames}')
+        
+        # 淡出：最后fade_out_frames帧逐渐变暗
+        if fade_out_frames > 0:
+            fade_out_start = max(total_frames - fade_out_frames, 0)
+            filters.append(f'fade=t=out:s={fade_out_start}:n={fade_out_frames}')
+        
+        return filters
+    
+    def _build_still_image_select(self, total_frames: int, fade_in_frames: int,
+                                  fade_out_frames: int) -> str:
+        """
+        构建静态图片模式的select滤镜：只保留淡入帧、淡入结束后的一帧静止画面、
+        淡出帧和最后一帧，其余重复帧全部丢弃。保留的帧沿用原时间戳（可变帧率），
+        最后一帧保证片段时长与音频一致。
+        
+        Args:
+            total_frames: 总帧数
+            fade_in_frames: 淡入帧数
+            fade_out_frames: 淡出帧数
+            
+        Returns:
+            str: select滤镜字符串
+        """
+        last_frame = max(total_frames - 1, 0)
+        hold_frame = min(max(fade_in_frames, 0), last_frame)
+        fade_out_start = total_frames - max(fade_out_frames, 0)
+        return (f"select='lt(n,{hold_frame})+eq(n,{hold_frame})"
+                f"+gte(n,{fade_out_start})+eq(n,{last_frame})'")
+    
+    def _still_image_encode_args(self, total_frames: int, video_fps: int) -> List[str]:
+        """
+        静态图片模式的编码参数：x264 stillimage调优、整个片段一个GOP、按原时间戳输出可变帧率，
+        轨道时间基保持为video_fps的整数倍，兼容按固定帧率处理的播放器和拼接
+        
+        Args:
+            total_frames: 总帧数
+            video_fps: 视频帧率
+            
+        Returns:
+            List[str]: FFMPEG命令行参数
+        """
+        return [
+            '-tune', 'stillimage',
+            '-g', str(max(total_frames, 1)),
+            '-fps_mode', 'vfr',
+            '-video_track_timescale', str(video_fps * 1000)
+        ]
     
-    def _create_video_from_frames(self, temp_dir: str, segment_index: int,
-                                 total_frames: int, video_fps: int, 
-                                 audio_duration: float, fade_in_frames: int = 0,
-                                 fade_out_frames: int = 0) -> Optional[str]:
+    def _create_video_from_image(self, image_path: str, temp_dir: str, segment_index: int,
+                                 total_frames: int, video_fps: int, fade_in_frames: int = 0,
+                                 fade_out_frames: int = 0, still_image: bool = False) -> Optional[str]:
         """
-        从帧图片创建视频
+        由静态图片直接创建视频（单次FFMPEG调用，循环输入图片并应用淡入淡出滤镜）
         
         Args:
+            image_path: 原始图片路径
             temp_dir: 临时目录
             segment_index: 片段索引
             total_frames: 总帧数
             video_fps: 视频帧率
-            audio_duration: 音频时长
+            fade_in_frames: 淡入帧数
+            fade_out_frames: 淡出帧数
+            still_image: 是否使用静态图片编码模式（可变帧率，只输出画面变化的帧）
             
         Returns:
             视频文件路径或None
         """
         try:
-            segment_temp_dir = os.path.join(temp_dir, f'segment_{segment_index:03d}')
+            if not os.path.exists(image_path):
+                logger.error(f"图片文件不存在: {image_path}")
+                return None
+            
             video_path = os.path.join(temp_dir, f'video_{segment_index:03d}.mp4')
             
-            # 使用FFMPEG从帧图片创建视频，支持透明度
-            # 检查是否有透明度帧
-            has_fade_frames = fade_in_frames > 0 or fade_out_frames > 0
+            # 淡入淡出滤镜，最后统一转换为yuv420p
+            # 缩放只在这一次编码中进行，之后的字幕按输出分辨率绘制
+            filters = self._scale_filters()
+            filters += self._build_fade_filters(total_frames, fade_in_frames, fade_out_frames)
+            if still_image:
+                filters = [f'trim=end_frame={total_frames}'] + filters
+                filters.append(self._build_still_image_select(total_frames, fade_in_frames, fade_out_frames))
+            filters.append('format=yuv420p')
             
-            if has_fade_frames:
-                # 有淡入淡出效果，使用支持alpha通道的编码器
-                video_path = video_path.replace('.mp4', '.mov')  # 改为mov格式
-                cmd = [
-                    self.ffmpeg_path,
-                    '-framerate', str(video_fps),
-                    '-i', os.path.join(segment_temp_dir, 'frame_%06d.png'),
-                    '-t', str(audio_duration),
-                    '-c:v', 'qtrle',  # QuickTime Animation RLE支持alpha通道
-                    '-pix_fmt', 'rgba',
-                    '-y',
-                    video_path
-                ]
-            else:
-                # 没有淡入淡出效果，使用标准编码器
-                cmd = [
-                    self.ffmpeg_path,
-                    '-framerate', str(video_fps),
-                    '-i', os.path.join(segment_temp_dir, 'frame_%06d.png'),
-                    '-t', str(audio_duration),
-                    '-c:v', 'libx264',
-                    '-pix_fmt', 'yuv420p',
-                    '-y',
-                    video_path
-                ]
+            cmd = [
+                self.ffmpeg_path,
+                '-loop', '1',                     # 循环输入静态图片
+                '-framerate', str(video_fps),
+                '-i', image_path,
+                '-frames:v', str(total_frames),   # 按音频时长对应的帧数截止
+                '-vf', ','.join(filters),
+                *self._video_encode_args(),
+                *(self._still_image_encode_args(total_frames, video_fps) if still_image else []),
+                *self._thread_args(),
+                '-y',
+                video_path
+            ]
             
-            result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8', errors='ignore')
+            result = self._run_ffmpeg(cmd, segment_index, total_frames / video_fps)
             if result.returncode != 0:
-                logger.error(f"创建视频失败: {result.stderr}")
+                logger.error(f"由图片创建视频失败: {result.stderr}")
                 return None
             
-            logger.info(f"视频创建完成: {video_path}")
+            logger.info(f"视频创建完成（滤镜图模式，{total_frames}帧）: {video_path}")
             return video_path
             
         except Exception as e:
-            logger.error(f"创建视频失败: {e}")
+            logger.error(f"由图片创建视频失败: {e}")
             return None
     
-    def _add_subtitles_to_video(self, video_path: str, project_path: str, 
+    def _render_fused_segment(self, project_path: str, config: configparser.ConfigParser,
+                              segment_index: int, image_path: str, total_frames: int,
+                              video_fps: int, fade_in_frames: int = 0,
+                              fade_out_frames: int = 0, still_image: bool = False,
+                              embed_audio: bool = True) -> Optional[str]:
+        """
+        融合渲染单个片段：图片、旁白音频、字幕和淡入淡出在一次FFMPEG调用中完成，
+        直接编码为H.264输出到videos/segment_NNN.mp4，不生成任何中间视频文件
+        
+        Args:
+            project_path: 项目路径
+            config: 已读取parameter.ini的ConfigParser对象
+            segment_index: 片段索引
+            image_path: 图片路径
+            total_frames: 总帧数
+            video_fps: 视频帧率
+            fade_in_frames: 淡入帧数
+            fade_out_frames: 淡出帧数
+            still_image: 是否使用静态图片编码模式（可变帧率，只输出画面变化的帧）
+            embed_audio: 是否编码旁白音轨，统一音轨模式下为False，片段只包含画面
+            
+        Returns:
+            片段视频路径或None
+        """
+        try:
+            if not os.path.exists(image_path):
+                logger.error(f"图片文件不存在: {image_path}")
+                return None
+            
+            # 查找旁白音频
+            if embed_audio:
+                audio_path = self._find_segment_audio(project_path, segment_index)
+                audio_args = ['-i', audio_path, '-map', '0:v:0', '-map', '1:a:0']
+            else:
+                audio_args = ['-map', '0:v:0']
+            
+            # 视频滤镜链：先缩放到输出分辨率，再淡入淡出（黑场），最后叠加字幕，与分步流程的效果一致
+            filters = self._scale_filters()
+            filters += self._build_fade_filters(total_frames, fade_in_frames, fade_out_frames)
+            drawtext_filter = self._build_subtitle_filter(config, segment_index)
+            if drawtext_filter:
+                filters.append(drawtext_filter)
+            if still_image:
+                filters = [f'trim=end_frame={total_frames}'] + filters
+                filters.append(self._build_still_image_select(total_frames, fade_in_frames, fade_out_frames))
+            filters.append('format=yuv420p')
+            
+            videos_dir = os.path.join(project_path, 'videos')
+            os.makedirs(videos_dir, exist_ok=True)
+            final_output_path = os.path.join(videos_dir, f'segment_{segment_index:03d}.mp4')
+            
+            # 先写入临时文件，编码成功后再替换，避免留下不完整的片段
+            partial_output_path = os.path.join(videos_dir, f'segment_{segment_index:03d}.part.mp4')
+            
+            cmd = [
+                self.ffmpeg_path,
+                '-loop', '1',                     # 循环输入静态图片
+                '-framerate', str(video_fps),
+                '-i', image_path,
+                *audio_args,
+                '-frames:v', str(total_frames),   # 按音频时长对应的帧数截止
+                '-vf', ','.join(filters),
+                *self._video_encode_args(),
+                *(self._still_image_encode_args(total_frames, video_fps) if still_image else []),
+                *(self._audio_encode_args() + ['-shortest'] if embed_audio else ['-an']),
+                *self._thread_args(),
+                '-y',
+                partial_output_path
+            ]
+            
+            result = self._run_ffmpeg(cmd, segment_index, total_frames / video_fps)
+            if result.returncode != 0:
+                logger.error(f"融合渲染片段{segment_index}失败: {result.stderr}")
+                if os.path.exists(partial_output_path):
+                    os.remove(partial_output_path)
+                return None
+            
+            os.replace(partial_output_path, final_output_path)
+            logger.info(f"视频片段生成完成（融合模式）: {final_output_path}")
+            return final_output_path
+            
+        except Exception as e:
+            logger.error(f"融合渲染片段{segment_index}失败: {e}")
+            return None
+    
+    def _build_subtitle_filter(self, config: configparser.ConfigParser,
                                segment_index: int) -> Optional[str]:
         """
+        根据项目配置构建片段的drawtext字幕滤镜
+        
+        Args:
+            config: 已读取parameter.ini的ConfigParser对象
+            segment_index: 片段索引
+            
+        Returns:
+            drawtext滤镜字符串，没有字幕文本时返回None
+        """
+        # 获取字幕文本
+        subtitle_text = config.get('PAPER_CONTENT', f'line_{segment_index}', fallback='')
+        if not subtitle_text:
+            logger.warning(f"未找到片段{segment_index}的字幕文本")
+            return None
+        
+        # 获取字幕设置
+        font_size = config.getint('VIDEO_SUBTITLE', 'size', fallback=24)
+        font_color = config.get('VIDEO_SUBTITLE', 'color', fallback='#ffffff')
+        stroke_width = config.getint('VIDEO_SUBTITLE', 'stroke_width', fallback=2)
+        stroke_color = config.get('VIDEO_SUBTITLE', 'stroke_color', fallback='#000000')
+        position = config.get('VIDEO_SUBTITLE', 'position', fallback='bottom-quarter')
+        font_file = config.get('VIDEO_SUBTITLE', 'font', fallback='SourceHanSansCN-Regular.otf')
+        
+        # 预览等缩小分辨率的输出按比例缩放字号和描边
+        subtitle_scale = (self.output_settings or {}).get('subtitle_scale', 1.0)
+        if subtitle_scale != 1.0:
+            font_size = max(1, round(font_size * subtitle_scale))
+            stroke_width = round(stroke_width * subtitle_scale)
+        
+        # 构建字体文件路径
+        font_path = os.path.join(os.path.dirname(__file__), 'Fonts', font_file)
+        if not os.path.exists(font_path):
+            logger.warning(f"指定字体文件不存在: {font_path}，使用默认字体")
+            font_path = os.path.join(os.path.dirname(__file__), 'Fonts', 'SourceHanSansCN-Regular.otf')
+            if not os.path.exists(font_path):
+                logger.warning(f"默认字体文件也不存在: {font_path}，将使用系统默认字体")
+                font_path = None
+        
+        # 构建字幕滤镜
+        # 转换颜色格式
+        font_color_rgb = font_color.replace('#', '0x')
+        stroke_color_rgb = stroke_color.replace('#', '0x')
+        
+        # 设置字幕位置
+        if position == 'bottom-quarter':
+            subtitle_y = 'h*3/4'
+        elif position == 'bottom-center':
+            subtitle_y = 'h-th-20'
+        elif position == 'center':
+            subtitle_y = '(h-th)/2'
+        elif position == 'top-center':
+            subtitle_y = '20'
+        else:
+            subtitle_y = 'h*3/4'
+        
+        # 转义字幕文本中的特殊字符
+        subtitle_text_escaped = subtitle_text.replace(':', '\\:').replace("'", "\\'").replace('"', '\\"')
+        
+        # 构建字幕滤镜参数
+        if font_path and os.path.exists(font_path):
+            # 使用测试验证的字体路径格式：转义冒号但不加引号
+            font_path_escaped = font_path.replace('\\', '/').replace(':', '\\\\:')
+            drawtext_filter = f"drawtext=fontfile={font_path_escaped}:text='{subtitle_text_escaped}':fontsize={font_size}:fontcolor={font_color_rgb}:x=(w-tw)/2:y={subtitle_y}:borderw={stroke_width}:bordercolor={stroke_color_rgb}"
+            logger.info(f"使用自定义字体: {font_path}")
+        else:
+            drawtext_filter = f"drawtext=text='{subtitle_text_escaped}':fontsize={font_size}:fontcolor={font_color_rgb}:x=(w-tw)/2:y={subtitle_y}:borderw={stroke_width}:bordercolor={stroke_color_rgb}"
+            logger.info("使用系统默认字体")
+        
+        return drawtext_filter
+    
+    def _add_subtitles_to_video(self, video_path: str, project_path: str, 
+                               segment_index: int, total_frames: int = 0, video_fps: int = 25,
+                               still_image: bool = False) -> Optional[str]:
+        """
         为视频添加字幕
         
         Args:
             video_path: 视频文件路径
             project_path: 项目路径
             segment_index: 片段索引
+            total_frames: 总帧数
+            video_fps: 视频帧率
+            still_image: 输入是否为静态图片编码模式的可变帧率视频（重新编码时保持相同的编码参数）
             
         Returns:
             添加字幕后的视频路径或None
@@ -817,71 +1943,26 @@ class VideoProcessor:
             config = configparser.ConfigParser(interpolation=None)
             config.read(parameter_file, encoding='utf-8')
             
-            # 获取字幕文本
-            subtitle_text = config.get('PAPER_CONTENT', f'line_{segment_index}', fallback='')
-            if not subtitle_text:
-                logger.warning(f"未找到片段{segment_index}的字幕文本")
+            # 构建字幕滤镜，没有字幕文本时直接返回原视频
+            drawtext_filter = self._build_subtitle_filter(config, segment_index)
+            if not drawtext_filter:
                 return video_path
             
-            # 获取字幕设置
-            font_size = config.getint('VIDEO_SUBTITLE', 'size', fallback=24)
-            font_color = config.get('VIDEO_SUBTITLE', 'color', fallback='#ffffff')
-            stroke_width = config.getint('VIDEO_SUBTITLE', 'stroke_width', fallback=2)
-            stroke_color = config.get('VIDEO_SUBTITLE', 'stroke_color', fallback='#000000')
-            position = config.get('VIDEO_SUBTITLE', 'position', fallback='bottom-quarter')
-            font_file = config.get('VIDEO_SUBTITLE', 'font', fallback='SourceHanSansCN-Regular.otf')
-            
-            # 构建字体文件路径
-            font_path = os.path.join(os.path.dirname(__file__), 'Fonts', font_file)
-            if not os.path.exists(font_path):
-                logger.warning(f"指定字体文件不存在: {font_path}，使用默认字体")
-                font_path = os.path.join(os.path.dirname(__file__), 'Fonts', 'SourceHanSansCN-Regular.otf')
-                if not os.path.exists(font_path):
-                    logger.warning(f"默认字体文件也不存在: {font_path}，将使用系统默认字体")
-                    font_path = None
-            
             # 输出路径，保持原格式
             if video_path.endswith('.mov'):
                 output_path = video_path.replace('.mov', '_with_subtitle.mov')
             else:
                 output_path = video_path.replace('.mp4', '_with_subtitle.mp4')
             
-            # 构建字幕滤镜
-            # 转换颜色格式
-            font_color_rgb = font_color.replace('#', '0x')
-            stroke_color_rgb = stroke_color.replace('#', '0x')
-            
-            # 设置字幕位置
-            if position == 'bottom-quarter':
-                subtitle_y = 'h*3/4'
-            elif position == 'bottom-center':
-                subtitle_y = 'h-th-20'
-            elif position == 'center':
-                subtitle_y = '(h-th)/2'
-            elif position == 'top-center':
-                subtitle_y = '20'
-            else:
-                subtitle_y = 'h*3/4'
-            
-            # 转义字幕文本中的特殊字符
-            subtitle_text_escaped = subtitle_text.replace(':', '\\:').replace("'", "\\'").replace('"', '\\"')
-            
-            # 构建字幕滤镜参数
-            if font_path and os.path.exists(font_path):
-                # 使用测试验证的字体路径格式：转义冒号但不加引号
-                font_path_escaped = font_path.replace('\\', '/').replace(':', '\\\\:')
-                drawtext_filter = f"drawtext=fontfile={font_path_escaped}:text='{subtitle_text_escaped}':fontsize={font_size}:fontcolor={font_color_rgb}:x=(w-tw)/2:y={subtitle_y}:borderw={stroke_width}:bordercolor={stroke_color_rgb}"
-                logger.info(f"使用自定义字体: {font_path}")
-            else:
-                drawtext_filter = f"drawtext=text='{subtitle_text_escaped}':fontsize={font_size}:fontcolor={font_color_rgb}:x=(w-tw)/2:y={subtitle_y}:borderw={stroke_width}:bordercolor={stroke_color_rgb}"
-                logger.info("使用系统默认字体")
-            
             # 使用FFMPEG添加字幕
             cmd = [
                 self.ffmpeg_path,
                 '-i', video_path,
                 '-vf', drawtext_filter,
+                *self._video_encode_args(),
+                *(self._still_image_encode_args(total_frames, video_fps) if still_image else []),
                 '-c:a', 'copy',
+                *self._thread_args(),
                 '-y',
                 output_path
             ]
@@ -898,6 +1979,36 @@ class VideoProcessor:
             logger.error(f"添加字幕失败: {e}")
             return None
     
+    def _find_segment_audio(self, project_path: str, segment_index: int) -> str:
+        """
+        查找片段对应的旁白音频文件（script_N_1.*）
+        
+        Args:
+            project_path: 项目路径
+            segment_index: 片段索引
+            
+        Returns:
+            str: 音频文件路径
+        
+        Raises:
+            FileNotFoundError: 音频文件不存在
+        """
+        audios_dir = os.path.join(project_path, 'audios')
+        
+        # 支持的音频格式列表，按优先级排序
+        audio_extensions = ['.flac', '.wav', '.mp3', '.m4a', '.aac', '.ogg']
+        
+        # 按优先级查找音频文件
+        for ext in audio_extensions:
+            potential_path = os.path.join(audios_dir, f'script_{segment_index}_1{ext}')
+            if os.path.exists(potential_path):
+                return potential_path
+        
+        # 音频文件不存在则报错
+        error_msg = f"音频文件不存在: script_{segment_index}_1.{{flac,wav,mp3,m4a,aac,ogg}}，请先生成对应的音频文件"
+        logger.error(error_msg)
+        raise FileNotFoundError(error_msg)
+    
     def _add_audio_to_video(self, video_path: str, project_path: str, 
                            segment_index: int) -> Optional[str]:
         """
@@ -913,24 +2024,7 @@ class VideoProcessor:
         """
         try:
             # 查找对应的音频文件（支持多种格式）
-            audios_dir = os.path.join(project_path, 'audios')
-            
-            # 支持的音频格式列表，按优先级排序
-            audio_extensions = ['.flac', '.wav', '.mp3', '.m4a', '.aac', '.ogg']
-            audio_path = None
-            
-            # 按优先级查找音频文件
-            for ext in audio_extensions:
-                potential_path = os.path.join(audios_dir, f'script_{segment_index}_1{ext}')
-                if os.path.exists(potential_path):
-                    audio_path = potential_path
-                    break
-            
-            # 检查音频文件是否存在，不存在则报错
-            if audio_path is None:
-                error_msg = f"音频文件不存在: script_{segment_index}_1.{{flac,wav,mp3,m4a,aac,ogg}}，请先生成对应的音频文件"
-                logger.error(error_msg)
-                raise FileNotFoundError(error_msg)
+            audio_path = self._find_segment_audio(project_path, segment_index)
             
             # 输出路径，保持原格式
             if video_path.endswith('.mov'):
@@ -944,7 +2038,7 @@ class VideoProcessor:
                 '-i', video_path,
                 '-i', audio_path,
                 '-c:v', 'copy',  # 复制视频流，不重新编码
-                '-c:a', 'aac',   # 音频编码为AAC
+                *self._audio_encode_args(),  # 音频编码为AAC
                 '-map', '0:v:0', # 映射第一个输入的视频流
                 '-map', '1:a:0', # 映射第二个输入的音频流
                 '-shortest',     # 以最短的流为准
@@ -964,6 +2058,185 @@ class VideoProcessor:
             logger.error(f"添加音频失败: {e}")
             return None
     
+    def _concat_signature(self, info: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        提取决定能否用concat demuxer + -c copy无损拼接的流参数
+        
+        编码器、profile/level、分辨率、像素格式、采样宽高比、帧率和时间基决定视频码流
+        能否直接衔接；音频编码器、采样率和声道数决定音频码流能否直接衔接。
+        
+        Args:
+            info: get_video_info的返回值
+            
+        Returns:
+            dict或None: 拼接参数签名，无法探测或没有视频流时为None
+        """
+        if not info or not info.get('video'):
+            return None
+        video = info['video']
+        audio = info.get('audio') or {}
+        return {
+            'video_codec': video.get('codec', ''),
+            'profile': video.get('profile', ''),
+            'level': video.get('level'),
+            'width': video.get('width', 0),
+            'height': video.get('height', 0),
+            'pix_fmt': video.get('pix_fmt', ''),
+            'sample_aspect_ratio': video.get('sample_aspect_ratio', ''),
+            'fps': video.get('fps', 0.0),
+            'time_base': video.get('time_base', ''),
+            'audio_codec': audio.get('codec', ''),
+            'sample_rate': audio.get('sample_rate', 0),
+            'channels': audio.get('channels', 0)
+        }
+    
+    def plan_concat(self, segment_files: List[str]) -> Dict[str, Any]:
+        """
+        探测所有片段并制定拼接计划
+        
+        以出现次数最多的参数签名作为统一参数（输出设置指定了分辨率时以该分辨率为准），
+        与之完全一致的片段可直接-c copy拼接，其余片段需要重新编码。
+        
+        Args:
+            segment_files: 视频片段文件列表
+            
+        Returns:
+            dict: {'canonical': 统一参数签名, 'conforming': 可直接拼接的片段,
+                   'nonconforming': [(片段路径, 不一致的字段列表)]}
+        """
+        signatures = {path: self._concat_signature(self.get_video_info(path)) for path in segment_files}
+        self.media_probe.flush()
+        
+        counts = {}
+        for signature in signatures.values():
+            if signature is None:
+                continue
+            key = tuple(sorted(signature.items()))
+            counts[key] = counts.get(key, 0) + 1
+        
+        canonical = dict(max(counts.items(), key=lambda item: item[1])[0]) if counts else None
+        settings = self.output_settings or {}
+        if canonical and settings.get('width') and settings.get('height'):
+            canonical['width'], canonical['height'] = settings['width'], settings['height']
+        
+        conforming, nonconforming = [], []
+        for path in segment_files:
+            signature = signatures[path]
+            if signature is None or canonical is None:
+                nonconforming.append((path, ['unprobeable']))
+                continue
+            mismatched = [field for field, value in canonical.items() if signature.get(field) != value]
+            if mismatched:
+                nonconforming.append((path, mismatched))
+            else:
+                conforming.append(path)
+        
+        if nonconforming:
+            for path, fields in nonconforming:
+                logger.warning(f"片段参数与统一参数不一致，需要重新编码: {os.path.basename(path)} {fields}")
+        else:
+            logger.info(f"全部 {len(conforming)} 个片段参数一致，直接流复制拼接")
+        
+        return {
+            'canonical': canonical,
+            'conforming': conforming,
+            'nonconforming': nonconforming
+        }
+    
+    def _normalize_concat_segments(self, segment_files: List[str], concat_plan: Dict[str, Any],
+                                   normalized_dir: str) -> Tuple[Optional[List[str]], List[str]]:
+        """
+        将不一致的片段重新编码为统一参数，并验证结果可以直接拼接
+        
+        Args:
+            segment_files: 视频片段文件列表
+            concat_plan: plan_concat的返回值
+            normalized_dir: 重新编码后片段的存放目录
+            
+        Returns:
+            Tuple: (替换后的片段文件列表或None, 重新编码生成的文件列表)
+        """
+        canonical = concat_plan['canonical']
+        if canonical is None or canonical['video_codec'] != 'h264' or canonical['audio_codec'] not in ('aac', ''):
+            logger.error(f"无法确定可重新编码的统一参数: {canonical}")
+            return None, []
+        
+        os.makedirs(normalized_dir, exist_ok=True)
+        replacements = {}
+        for path, mismatched in concat_plan['nonconforming']:
+            normalized_path = os.path.join(normalized_dir, os.path.basename(path))
+            if not self._normalize_segment(path, canonical, normalized_path, mismatched):
+                return None, list(replacements.values())
+            
+            # 重新编码后再次探测，确认参数已与统一参数完全一致
+            signature = self._concat_signature(self.get_video_info(normalized_path))
+            if signature != canonical:
+                logger.error(f"片段重新编码后参数仍不一致: {path} {signature} != {canonical}")
+                return None, list(replacements.values()) + [normalized_path]
+            replacements[path] = normalized_path
+        
+        logger.info(f"已重新编码 {len(replacements)} 个不一致的片段，其余 {len(concat_plan['conforming'])} 个片段直接流复制")
+        return [replacements.get(path, path) for path in segment_files], list(replacements.values())
+    
+    def _normalize_segment(self, input_path: str, canonical: Dict[str, Any], output_path: str,
+                           mismatched: Optional[List[str]] = None) -> bool:
+        """
+        按统一参数重新编码单个片段，只有音频参数不一致时视频流直接复制
+        
+        Args:
+            input_path: 片段文件路径
+            canonical: 统一参数签名
+            output_path: 输出文件路径
+            mismatched: 与统一参数不一致的字段
+            
+        Returns:
+            bool: 是否成功
+        """
+        audio_only = bool(mismatched) and set(mismatched) <= {'audio_codec', 'sample_rate', 'channels'}
+        width, height = canonical['width'], canonical['height']
+        video_filters = [
+            f'scale={width}:{height}:force_original_aspect_ratio=decrease',
+            f'pad={width}:{height}:(ow-iw)/2:(oh-ih)/2',
+            'setsar=1'
+        ]
+        if canonical['fps']:
+            video_filters.append(f"fps={canonical['fps']}")
+        if canonical['pix_fmt']:
+            video_filters.append(f"format={canonical['pix_fmt']}")
+        
+        cmd = [self.ffmpeg_path, '-i', input_path]
+        source_info = self.get_video_info(input_path) or {}
+        if canonical['audio_codec'] and not source_info.get('has_audio'):
+            # 片段没有音轨时补一段静音，保证所有片段的流布局相同
+            cmd += ['-f', 'lavfi', '-i', f"anullsrc=r={canonical['sample_rate']}:cl={'mono' if canonical['channels'] == 1 else 'stereo'}"]
+            audio_map = ['-map', '0:v:0', '-map', '1:a:0', '-shortest']
+        elif canonical['audio_codec']:
+            audio_map = ['-map', '0:v:0', '-map', '0:a:0']
+        else:
+            audio_map = ['-map', '0:v:0']
+        
+        if audio_only:
+            cmd += ['-c:v', 'copy']
+        else:
+            cmd += [
+                '-vf', ','.join(video_filters),
+                *self._thread_args(),
+                *self._video_encode_args(pix_fmt=canonical['pix_fmt'] or None)
+            ]
+            time_base = str(canonical.get('time_base') or '')
+            if time_base.startswith('1/'):
+                cmd += ['-video_track_timescale', time_base[2:]]
+        if canonical['audio_codec']:
+            cmd += [*self._audio_encode_args(), '-ar', str(canonical['sample_rate']), '-ac', str(canonical['channels'])]
+        cmd += [*audio_map, '-y', output_path]
+        
+        result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8', errors='ignore')
+        if result.returncode != 0:
+            logger.error(f"片段重新编码失败 {input_path}: {result.stderr}")
+            return False
+        logger.info(f"片段已重新编码为统一参数: {input_path} -> {output_path}")
+        return True
+    
     def _merge_video_segments_with_background_music(self, segment_files: List[str], 
                                                    output_path: str, project_path: str) -> bool:
         """
@@ -982,6 +2255,23 @@ class VideoProcessor:
                 logger.error("没有视频片段文件可合并")
                 return False
             
+            # 检查片段编码参数是否一致，不一致的片段先重新编码为统一参数，保证-c copy拼接有效
+            concat_plan = self.plan_concat(segment_files)
+            normalized_files = []
+            if concat_plan['nonconforming']:
+                normalized_dir = os.path.join(project_path, 'TEMP', 'concat_normalized')
+                segment_files, normalized_files = self._normalize_concat_segments(
+                    segment_files, concat_plan, normalized_dir
+                )
+                if segment_files is None:
+                    return False
+            
+            # 读取项目配置获取背景音乐和音轨设置
+            parameter_file = os.path.join(project_path, 'parameter.ini')
+            config = configparser.ConfigParser(interpolation=None)
+            config.read(parameter_file, encoding='utf-8')
+            unified_audio = config.getboolean('VIDEO_RENDER', 'unified_audio_track', fallback=True)
+            
             # 创建临时文件列表
             temp_list_file = os.path.join(os.path.dirname(output_path), 'segments_list.txt')
             
@@ -999,21 +2289,35 @@ class VideoProcessor:
                 '-safe', '0',
                 '-i', temp_list_file,
                 '-c', 'copy',
+                *(['-an'] if unified_audio else []),
                 '-y',
                 temp_video_path
             ]
             
             result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8', errors='ignore')
+            for normalized_file in normalized_files:
+                if os.path.exists(normalized_file):
+                    os.remove(normalized_file)
             if result.returncode != 0:
                 logger.error(f"合并视频失败: {result.stderr}")
                 return False
             
             logger.info(f"视频片段合并完成: {temp_video_path}")
             
-            # 读取项目配置获取背景音乐设置
-            parameter_file = os.path.join(project_path, 'parameter.ini')
-            config = configparser.ConfigParser(interpolation=None)
-            config.read(parameter_file, encoding='utf-8')
+            # 统一音轨模式：旁白和背景音乐在一条时间线上混音，只编码一次
+            if unified_audio:
+                success = self._mux_narration_track(
+                    temp_video_path, output_path, project_path, config, segment_files
+                )
+                for temp_file in (temp_video_path, temp_list_file):
+                    if os.path.exists(temp_file):
+                        os.remove(temp_file)
+                if not success:
+                    return False
+                self._cleanup_all_temp_files(os.path.join(project_path, 'TEMP'))
+                self._copy_video_to_output_dir(output_path)
+                logger.info(f"最终视频生成完成: {output_path}")
+                return True
             
             # 检查是否有背景音乐设置
             if config.has_section('VIDEO_BACKGROUND_MUSIC'):
@@ -1054,6 +2358,105 @@ class VideoProcessor:
             logger.error(f"合并视频片段失败: {e}")
             return False
     
+    def _get_bgm_bed(self, bgm_path: str, config: configparser.ConfigParser, total_samples: int,
+                     sample_rate: int, channels: int):
+        """
+        按项目的VIDEO_BACKGROUND_MUSIC设置获取背景音乐底轨（带缓存）
+        
+        Args:
+            bgm_path: 背景音乐文件路径
+            config: 已读取parameter.ini的ConfigParser对象
+            total_samples: 底轨采样数
+            sample_rate: 采样率
+            channels: 声道数
+            
+        Returns:
+            Tuple[np.ndarray, int]: (底轨, 背景音乐实际覆盖的采样数)
+        """
+        from bgm_bed import get_bgm_bed_cache
+        
+        bed_cache = get_bgm_bed_cache()
+        bed_cache.ffmpeg_path = self.ffmpeg_path
+        return bed_cache.get_bed(
+            bgm_path, total_samples,
+            volume=config.getfloat('VIDEO_BACKGROUND_MUSIC', 'volume', fallback=30) / 100.0,
+            fade_in=config.getfloat('VIDEO_BACKGROUND_MUSIC', 'fade_in', fallback=2.0),
+            fade_out=config.getfloat('VIDEO_BACKGROUND_MUSIC', 'fade_out', fallback=2.0),
+            loop=config.get('VIDEO_BACKGROUND_MUSIC', 'loop_mode', fallback='loop') == 'loop',
+            sample_rate=sample_rate,
+            channels=channels
+        )
+    
+    def _mux_narration_track(self, video_path: str, output_path: str, project_path: str,
+                             config: configparser.ConfigParser, segment_files: List[str]) -> bool:
+        """
+        构建统一旁白音轨并与拼接后的无声视频合并
+        
+        所有script_N_1.*只解码一次并重采样为44100Hz立体声，按AUDIO_INFO中的时长换算出的
+        片段帧数定位到时间线上（与片段画面的帧边界对齐），混入背景音乐后只编码一次AAC，
+        避免逐片段AAC编码在每个片段边界产生的priming间隙和爆音。
+        
+        Args:
+            video_path: 拼接后的无声视频路径
+            output_path: 输出文件路径
+            project_path: 项目路径
+            config: 已读取parameter.ini的ConfigParser对象
+            segment_files: 视频片段文件列表（segment_NNN.mp4，按拼接顺序）
+            
+        Returns:
+            bool: 是否成功
+        """
+        try:
+            import re
+            from narration_track import (
+                NARRATION_SAMPLE_RATE, NARRATION_CHANNELS, build_narration_timeline,
+                mix_background_music, mux_audio_track
+            )
+            
+            video_fps = config.getint('VIDEO_FADE', 'video_fps', fallback=25)
+            video_fps, _, _ = self._apply_fps_override(video_fps, 0, 0)
+            
+            # 每个片段的帧数与生成片段时一致：ceil(音频时长 * 帧率)
+            audio_paths, segment_frames = [], []
+            for segment_file in segment_files:
+                match = re.search(r'segment_(\d+)', os.path.basename(segment_file))
+                if not match:
+                    logger.error(f"无法从片段文件名解析片段索引: {segment_file}")
+                    return False
+                segment_index = int(match.group(1))
+                audio_paths.append(self._find_segment_audio(project_path, segment_index))
+                
+                duration_key = f'script_{segment_index}_duration'
+                if config.has_option('AUDIO_INFO', duration_key):
+                    segment_frames.append(math.ceil(config.getfloat('AUDIO_INFO', duration_key) * video_fps))
+                else:
+                    info = self.get_video_info(segment_file) or {}
+                    segment_frames.append(round((info.get('duration') or 0.0) * video_fps))
+            self.media_probe.flush()
+            
+            track = build_narration_timeline(audio_paths, segment_frames, video_fps, ffmpeg_path=self.ffmpeg_path)
+            logger.info(f"统一旁白音轨构建完成: {len(audio_paths)} 段旁白, 时长 {len(track) / NARRATION_SAMPLE_RATE:.2f}秒")
+            
+            # 背景音乐：使用缓存的底轨（已循环、调整音量和淡入淡出），只需一次混音
+            bgm_file = config.get('VIDEO_BACKGROUND_MUSIC', 'file', fallback='').strip()
+            bgm_path = self._find_background_music(project_path, bgm_file) if bgm_file and bgm_file != 'None' else None
+            if bgm_file and bgm_file != 'None' and not bgm_path:
+                logger.warning(f"背景音乐文件不存在: {bgm_file}")
+            if bgm_path:
+                bed, active_samples = self._get_bgm_bed(
+                    bgm_path, config, len(track), NARRATION_SAMPLE_RATE, NARRATION_CHANNELS
+                )
+                track = mix_background_music(track, bed, active_samples, NARRATION_SAMPLE_RATE)
+                logger.info(f"背景音乐已混入统一音轨: {bgm_path}")
+            
+            return mux_audio_track(
+                video_path, track, output_path, self._audio_encode_args(), ffmpeg_path=self.ffmpeg_path
+            ) is not None
+            
+        except Exception as e:
+            logger.error(f"构建统一旁白音轨失败: {e}")
+            return False
+    
     def _add_background_music_to_video(self, video_path: str, output_path: str,
                                       project_path: str, bgm_filename: str) -> bool:
         """
@@ -1070,19 +2473,7 @@ class VideoProcessor:
         """
         try:
             # 查找背景音乐文件
-            bgm_path = None
-            
-            # 在common/back_mus目录中查找
-            common_bgm_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common', 'back_mus')
-            potential_bgm_path = os.path.join(common_bgm_dir, bgm_filename)
-            
-            if os.path.exists(potential_bgm_path):
-                bgm_path = potential_bgm_path
-            else:
-                # 在项目目录中查找
-                project_bgm_path = os.path.join(project_path, bgm_filename)
-                if os.path.exists(project_bgm_path):
-                    bgm_path = project_bgm_path
+            bgm_path = self._find_background_music(project_path, bgm_filename)
             
             if not bgm_path:
                 logger.warning(f"背景音乐文件不存在: {bgm_filename}")
@@ -1096,39 +2487,31 @@ class VideoProcessor:
             config = configparser.ConfigParser(interpolation=None)
             config.read(parameter_file, encoding='utf-8')
             
-            volume = config.getfloat('VIDEO_BACKGROUND_MUSIC', 'volume', fallback=30) / 100.0
-            fade_in = config.getfloat('VIDEO_BACKGROUND_MUSIC', 'fade_in', fallback=2.0)
-            fade_out = config.getfloat('VIDEO_BACKGROUND_MUSIC', 'fade_out', fallback=2.0)
-            loop_mode = config.get('VIDEO_BACKGROUND_MUSIC', 'loop_mode', fallback='loop')
+            # 使用缓存的底轨（已循环、调整音量和淡入淡出），与视频原音轨只做一次混音
+            import numpy as np
+            from narration_track import NARRATION_SAMPLE_RATE, NARRATION_CHANNELS
+            
+            info = self.get_video_info(video_path) or {}
+            total_samples = round((info.get('duration') or 0.0) * NARRATION_SAMPLE_RATE)
+            bed, _ = self._get_bgm_bed(bgm_path, config, total_samples, NARRATION_SAMPLE_RATE, NARRATION_CHANNELS)
             
-            # 使用FFMPEG添加背景音乐
             cmd = [
                 self.ffmpeg_path,
                 '-i', video_path,
-                '-i', bgm_path,
+                '-f', 'f32le',
+                '-ar', str(NARRATION_SAMPLE_RATE),
+                '-ac', str(NARRATION_CHANNELS),
+                '-i', 'pipe:0',
                 '-filter_complex',
-                f'[1:a]volume={volume}[bgm];[0:a][bgm]amix=inputs=2:duration=first:dropout_transition=2',
+                '[0:a][1:a]amix=inputs=2:duration=first:dropout_transition=2',
                 '-c:v', 'copy',
+                *self._audio_encode_args(),
                 '-y',
                 output_path
             ]
             
-            # 如果需要循环背景音乐
-            if loop_mode == 'loop':
-                cmd = [
-                    self.ffmpeg_path,
-                    '-i', video_path,
-                    '-stream_loop', '-1',
-                    '-i', bgm_path,
-                    '-filter_complex',
-                    f'[1:a]volume={volume}[bgm];[0:a][bgm]amix=inputs=2:duration=first:dropout_transition=2',
-                    '-c:v', 'copy',
-                    '-shortest',
-                    '-y',
-                    output_path
-                ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8', errors='ignore')
+            result = subprocess.run(cmd, input=np.ascontiguousarray(bed, dtype='<f4').tobytes(), capture_output=True)
+            result.stderr = result.stderr.decode('utf-8', errors='ignore')
             if result.returncode != 0:
                 logger.error(f"添加背景音乐失败: {result.stderr}")
                 # 如果添加背景音乐失败，直接复制原视频
@@ -1149,6 +2532,30 @@ class VideoProcessor:
                 os.rename(video_path, output_path)
             return True
     
+    def _find_background_music(self, project_path: str, bgm_filename: str) -> Optional[str]:
+        """
+        查找背景音乐文件（先在common/back_mus目录，再在项目目录）
+        
+        Args:
+            project_path: 项目路径
+            bgm_filename: 背景音乐文件名
+            
+        Returns:
+            背景音乐文件路径或None
+        """
+        # 在common/back_mus目录中查找
+        common_bgm_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common', 'back_mus')
+        potential_bgm_path = os.path.join(common_bgm_dir, bgm_filename)
+        if os.path.exists(potential_bgm_path):
+            return potential_bgm_path
+        
+        # 在项目目录中查找
+        project_bgm_path = os.path.join(project_path, bgm_filename)
+        if os.path.exists(project_bgm_path):
+            return project_bgm_path
+        
+        return None
+    
     def _cleanup_segment_temp_files(self, temp_dir: str, segment_index: int):
         """
         清理指定片段的临时文件
@@ -1253,6 +2660,29 @@ class VideoProcessor:
         self.cleanup()
 
 
+def _render_segment_job(job: Tuple[str, int, float, str, int, Optional[Dict[str, Any]], Any, Any]) -> Tuple[int, bool, bool]:
+    """
+    进程池任务：在子进程中渲染单个视频片段
+    
+    Args:
+        job: (项目路径, 片段索引, 音频时长, 图片路径, FFMPEG线程数, 输出设置, 进度队列, 取消事件)，
+             进度队列和取消事件为Manager代理对象，不需要进度时为None
+        
+    Returns:
+        Tuple[int, bool, bool]: (片段索引, 是否成功, 是否命中片段缓存)
+    """
+    (project_path, segment_index, audio_duration, image_path, ffmpeg_threads,
+     output_settings, progress_queue, cancel_event) = job
+    processor = VideoProcessor(ffmpeg_threads=ffmpeg_threads, output_settings=output_settings)
+    processor.cancel_event = cancel_event
+    if progress_queue is not None:
+        processor.progress_callback = lambda index, fraction, fps: progress_queue.put((index, fraction, fps))
+    success = processor.generate_video_segment(project_path, segment_index, audio_duration, image_path)
+    # fork方式创建的子进程退出时不执行atexit，任务结束前保存本片段新探测的媒体信息
+    processor.media_probe.flush()
+    return segment_index, success, processor.last_segment_cache_hit
+
+
 def create_demo_videos(output_dir: str = "TEST/demo_videos") -> List[str]:
     """
     创建一些演示视频文件用于测试
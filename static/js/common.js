@@ -190,6 +190,50 @@ function makeRequest(url, options = {}) {
         });
 }
 
+// 以POST提交JSON并逐行读取NDJSON流式响应，每解析一行调用一次onMessage
+async function streamNdjson(url, body, onMessage) {
+    const response = await fetch(url, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': getCookie('csrftoken')
+        },
+        body: JSON.stringify(body)
+    });
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    
+    // 参数错误时服务端直接返回普通JSON
+    const contentType = response.headers.get('content-type') || '';
+    if (!contentType.includes('ndjson')) {
+        const result = await response.json();
+        throw new Error(result.error || '请求失败');
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder('utf-8');
+    let buffer = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+        let newlineIndex;
+        while ((newlineIndex = buffer.indexOf('\n')) >= 0) {
+            const line = buffer.slice(0, newlineIndex).trim();
+            buffer = buffer.slice(newlineIndex + 1);
+            if (line) {
+                onMessage(JSON.parse(line));
+            }
+        }
+        if (done) {
+            break;
+        }
+    }
+    if (buffer.trim()) {
+        onMessage(JSON.parse(buffer));
+    }
+}
+
 function getCurrentProjectPath() {
     // 这个函数需要根据你的应用逻辑来实现，例如从URL、localStorage或全局变量中获取
     // 这里我们先用一个假数据
@@ -289,5 +333,6 @@ window.AutoMovie = {
     validateField,
     showLoading,
     hideLoading,
-    makeRequest
+    makeRequest,
+    streamNdjson
 };
\ No newline at end of file
@@ -442,7 +442,7 @@ class AudioGenerator {
         }
     }
 
-    // 批量生成所有音频
+    // 批量生成所有音频（一次请求提交全部句子，服务端按完成顺序逐个推送结果，无需逐个请求和等待）
     async batchGenerateAudios() {
         // 确认批量生成
         if (!confirm(`确定要批量生成 ${this.sentenceCount} 个音频吗？这可能需要较长时间。`)) {
@@ -455,35 +455,53 @@ class AudioGenerator {
             batchBtn.textContent = '🔄 生成中...';
         }
 
-        let successCount = 0;
-        let failCount = 0;
+        // 根据sentenceCount生成所有音频
+        const scriptIds = [];
+        for (let i = 1; i <= this.sentenceCount; i++) {
+            if (this.markAudioGenerating(i)) {
+                scriptIds.push(i);
+            }
+        }
+        const pendingIds = new Set(scriptIds);
 
         try {
-            // 根据sentenceCount生成所有音频
-            for (let i = 1; i <= this.sentenceCount; i++) {
-                try {
-                    console.log(`开始生成第${i}段音频`);
-                    await this.generateAudio(i);
-                    successCount++;
-                    console.log(`音频 ${i} 生成成功`);
-                } catch (error) {
-                    failCount++;
-                    console.error(`音频 ${i} 生成失败:`, error);
-                }
-                
-                // 添加延迟避免请求过快
-                if (i < this.sentenceCount) {
-                    await new Promise(resolve => setTimeout(resolve, 2000));
-                }
+            if (scriptIds.length === 0) {
+                return;
             }
             
-            // 显示批量生成结果
-            console.log(`批量生成完成！成功: ${successCount} 个，失败: ${failCount} 个`);
-            console.log('批量生成完成');
+            await window.AutoMovie.streamNdjson('/generate_audios_batch/', {
+                project_path: this.projectPath,
+                script_ids: scriptIds
+            }, (message) => {
+                if (message.type === 'result') {
+                    pendingIds.delete(message.script_id);
+                    const card = document.querySelector(`[data-script-id="${message.script_id}"]`);
+                    if (card) {
+                        this.showAudioResult(card, message);
+                    }
+                    if (message.success) {
+                        console.log(`音频 ${message.script_id} 生成成功`);
+                    } else {
+                        console.error(`音频 ${message.script_id} 生成失败:`, message.error);
+                    }
+                } else if (message.type === 'error') {
+                    this.showError('批量生成过程中出现错误: ' + message.error);
+                } else if (message.type === 'done') {
+                    // 显示批量生成结果
+                    console.log(`批量生成完成！成功: ${message.success_count} 个，失败: ${message.fail_count} 个，耗时: ${message.elapsed}秒`);
+                }
+            });
         } catch (error) {
             console.error('Batch generation error:', error);
             this.showError('批量生成过程中出现错误: ' + error.message);
         } finally {
+            // 没有收到结果的句子标记为失败
+            pendingIds.forEach(scriptId => {
+                const card = document.querySelector(`[data-script-id="${scriptId}"]`);
+                if (card) {
+                    this.showAudioResult(card, { success: false });
+                }
+            });
             if (batchBtn) {
                 batchBtn.disabled = false;
                 batchBtn.textContent = '🎵 批量生成所有音频';
@@ -491,20 +509,18 @@ class AudioGenerator {
         }
     }
 
-    // 生成单个音频
-    async generateAudio(scriptId) {
-        console.log(`generateAudio called with scriptId: ${scriptId}`);
-        
+    // 将卡片切换为生成中状态，返回卡片元素（找不到卡片时返回null）
+    markAudioGenerating(scriptId) {
         const card = document.querySelector(`[data-script-id="${scriptId}"]`);
         console.log(`Found card:`, card);
         
         if (!card) {
             console.warn(`Card not found for script ID: ${scriptId}`);
-            return;
+            return null;
         }
 
         const statusIndicator = card.querySelector('.status-indicator');
-        let placeholder = card.querySelector('.audio-placeholder');
+        const placeholder = card.querySelector('.audio-placeholder');
         const audioControls = card.querySelector('.audio-controls');
         
         // 隐藏音频控制器，显示占位符
@@ -522,6 +538,40 @@ class AudioGenerator {
         if (placeholder) {
             placeholder.innerHTML = '<span class="icon">⏳</span><span class="text">生成中...</span>';
         }
+        return card;
+    }
+
+    // 在卡片上显示生成结果
+    showAudioResult(card, result, failText = '生成失败') {
+        const statusIndicator = card.querySelector('.status-indicator');
+        const placeholder = card.querySelector('.audio-placeholder');
+        if (result.success) {
+            // 生成成功，显示音频（添加时间戳防止缓存）
+            const timestamp = new Date().getTime();
+            const audioUrlWithTimestamp = `${result.audio_url}?t=${timestamp}`;
+            this.displayAudio(card, audioUrlWithTimestamp);
+            if (statusIndicator) {
+                statusIndicator.className = 'status-indicator completed';
+            }
+        } else {
+            // 生成失败
+            if (statusIndicator) {
+                statusIndicator.className = 'status-indicator failed';
+            }
+            if (placeholder) {
+                placeholder.innerHTML = `<span class="icon">❌</span><span class="text">${failText}</span>`;
+            }
+        }
+    }
+
+    // 生成单个音频
+    async generateAudio(scriptId, forceNew = false) {
+        console.log(`generateAudio called with scriptId: ${scriptId}`);
+        
+        const card = this.markAudioGenerating(scriptId);
+        if (!card) {
+            return;
+        }
 
         try {
             const response = await fetch('/generate_audio/', {
@@ -533,40 +583,23 @@ class AudioGenerator {
                 body: JSON.stringify({
                     script_id: scriptId,
                     project_path: this.projectPath,
-                    seed: Math.floor(Math.random() * 1000000)
+                    seed: Math.floor(Math.random() * 1000000),
+                    force_new: forceNew
                 })
             });
 
             const result = await response.json();
+            this.showAudioResult(card, result);
 
             if (result.success) {
-                // 生成成功，显示音频（添加时间戳防止缓存）
-                const timestamp = new Date().getTime();
-                const audioUrlWithTimestamp = `${result.audio_url}?t=${timestamp}`;
-                this.displayAudio(card, audioUrlWithTimestamp);
-                if (statusIndicator) {
-                    statusIndicator.className = 'status-indicator completed';
-                }
                 console.log('音频生成成功:', result.message);
             } else {
-                // 生成失败
-                if (statusIndicator) {
-                    statusIndicator.className = 'status-indicator failed';
-                }
-                if (placeholder) {
-                    placeholder.innerHTML = '<span class="icon">❌</span><span class="text">生成失败</span>';
-                }
                 console.error('Audio generation failed:', result.message);
                 alert(`音频生成失败: ${result.error || result.message}`);
             }
         } catch (error) {
             console.error('Error generating audio:', error);
-            if (statusIndicator) {
-                statusIndicator.className = 'status-indicator failed';
-            }
-            if (placeholder) {
-                placeholder.innerHTML = '<span class="icon">❌</span><span class="text">网络错误</span>';
-            }
+            this.showAudioResult(card, { success: false }, '网络错误');
             alert(`音频生成失败: ${error.message}`);
         }
     }
@@ -574,7 +607,8 @@ class AudioGenerator {
     // 重新生成音频
     async regenerateAudio(scriptId) {
         console.log(`regenerateAudio called with scriptId: ${scriptId}`);
-        await this.generateAudio(scriptId);
+        // 重新生成时跳过生成结果缓存
+        await this.generateAudio(scriptId, true);
     }
 
     // 上传本地音频
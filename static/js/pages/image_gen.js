@@ -264,7 +264,32 @@ class ImageGenerator {
         });
     }
 
-    // 批量生成所有图像
+    // 检查是否是paper.json相关错误（项目文案未格式化）
+    isPaperError(errorMessage) {
+        return errorMessage.includes('paper.json') ||
+            errorMessage.includes('无法加载paper.json数据') ||
+            errorMessage.includes('项目文案未格式化');
+    }
+
+    // 弹窗提示用户项目文案未格式化
+    promptPaperNotFormatted() {
+        const userConfirm = confirm(
+            '⚠️ 项目文案未格式化\n\n' +
+            '检测到当前项目的文案还没有进行格式化处理，无法生成图像。\n\n' +
+            '请先到"文案生成"页面完成以下步骤：\n' +
+            '1. 生成或输入项目文案\n' +
+            '2. 点击"格式化文案"按钮\n' +
+            '3. 确保生成了paper.json文件\n\n' +
+            '是否现在跳转到文案生成页面？'
+        );
+        
+        if (userConfirm) {
+            // 跳转到文案生成页面
+            window.location.href = '/text_generation/';
+        }
+    }
+
+    // 批量生成所有图像（一次请求提交全部句子，服务端按完成顺序逐个推送结果，无需逐个请求和等待）
     async batchGenerateImages() {
         const batchBtn = document.getElementById('batch-generate-btn');
         if (batchBtn) {
@@ -272,55 +297,64 @@ class ImageGenerator {
             batchBtn.textContent = '🔄 生成中...';
         }
 
+        // 根据sentenceCount生成所有图像，而不是依赖scriptData
+        const scriptIds = [];
+        for (let i = 1; i <= this.sentenceCount; i++) {
+            if (this.markImageGenerating(i)) {
+                scriptIds.push(i);
+            }
+        }
+        const pendingIds = new Set(scriptIds);
+
         try {
-            // 根据sentenceCount生成所有图像，而不是依赖scriptData
-            for (let i = 1; i <= this.sentenceCount; i++) {
-                console.log(`开始生成第${i}段图像`);
-                
-                try {
-                    await this.generateImage(i);
-                } catch (error) {
-                    // 如果是第一个图片生成失败，检查是否是paper.json相关错误
-                    if (i === 1) {
-                        const errorMessage = error.message || '';
-                        if (errorMessage.includes('paper.json') || 
-                            errorMessage.includes('无法加载paper.json数据') ||
-                            errorMessage.includes('项目文案未格式化')) {
-                            
-                            // 弹窗提示用户项目文案未格式化
-                            const userConfirm = confirm(
-                                '⚠️ 项目文案未格式化\n\n' +
-                                '检测到当前项目的文案还没有进行格式化处理，无法生成图像。\n\n' +
-                                '请先到"文案生成"页面完成以下步骤：\n' +
-                                '1. 生成或输入项目文案\n' +
-                                '2. 点击"格式化文案"按钮\n' +
-                                '3. 确保生成了paper.json文件\n\n' +
-                                '是否现在跳转到文案生成页面？'
-                            );
-                            
-                            if (userConfirm) {
-                                // 跳转到文案生成页面
-                                window.location.href = '/text_generation/';
-                            }
-                            
-                            // 停止批量生成
-                            console.log('由于文案未格式化，停止批量生成');
-                            return;
+            if (scriptIds.length === 0) {
+                return;
+            }
+            
+            let batchError = '';
+            await window.AutoMovie.streamNdjson('/generate_images_batch/', {
+                project_path: this.projectPath,
+                script_ids: scriptIds
+            }, (message) => {
+                if (message.type === 'result') {
+                    pendingIds.delete(message.script_id);
+                    const card = document.querySelector(`[data-script-id="${message.script_id}"]`);
+                    if (card) {
+                        this.showImageResult(card, message);
+                    }
+                    if (!message.success) {
+                        console.error(`第${message.script_id}段图像生成失败:`, message.error);
+                        if (this.isPaperError(message.error || '')) {
+                            batchError = message.error;
                         }
                     }
-                    
-                    // 其他错误继续处理但不中断批量生成
-                    console.error(`第${i}段图像生成失败:`, error);
+                } else if (message.type === 'error') {
+                    batchError = message.error;
+                } else if (message.type === 'done') {
+                    console.log(`批量生成完成！成功: ${message.success_count} 个，失败: ${message.fail_count} 个，耗时: ${message.elapsed}秒`);
+                }
+            });
+            
+            if (batchError) {
+                if (this.isPaperError(batchError)) {
+                    // 由于文案未格式化，整批无法生成
+                    console.log('由于文案未格式化，停止批量生成');
+                    this.promptPaperNotFormatted();
+                } else {
+                    this.showError('批量生成过程中出现错误: ' + batchError);
                 }
-                
-                // 添加延迟避免请求过快
-                await new Promise(resolve => setTimeout(resolve, 1000));
             }
-            console.log('批量生成完成');
         } catch (error) {
             console.error('Batch generation error:', error);
             this.showError('批量生成过程中出现错误: ' + error.message);
         } finally {
+            // 没有收到结果的句子标记为失败
+            pendingIds.forEach(scriptId => {
+                const card = document.querySelector(`[data-script-id="${scriptId}"]`);
+                if (card) {
+                    this.showImageResult(card, { success: false, error: '未返回结果' });
+                }
+            });
             if (batchBtn) {
                 batchBtn.disabled = false;
                 batchBtn.textContent = '🎨 批量生成所有图像';
@@ -328,16 +362,14 @@ class ImageGenerator {
         }
     }
 
-    // 生成单个图像
-    async generateImage(scriptId) {
-        console.log(`generateImage called with scriptId: ${scriptId}`);
-        
+    // 将卡片切换为生成中状态，返回卡片元素（找不到卡片时返回null）
+    markImageGenerating(scriptId) {
         const card = document.querySelector(`[data-script-id="${scriptId}"]`);
         console.log(`Found card:`, card);
         
         if (!card) {
             console.warn(`Card not found for script ID: ${scriptId}`);
-            return;
+            return null;
         }
 
         const statusIndicator = card.querySelector('.status-indicator');
@@ -360,7 +392,7 @@ class ImageGenerator {
         
         if (!statusIndicator && !placeholder) {
             console.error(`Required elements not found in card for script ID: ${scriptId}`);
-            return;
+            return null;
         }
         
         // 获取当前的状态指示器（可能是新创建的）
@@ -369,6 +401,41 @@ class ImageGenerator {
         // 更新状态为生成中
         currentStatusIndicator.className = 'status-indicator generating';
         placeholder.innerHTML = '<span class="icon">⏳</span><span class="text">生成中...</span>';
+        return card;
+    }
+
+    // 在卡片上显示生成结果
+    showImageResult(card, result, failText = '生成失败') {
+        if (result.success) {
+            // 生成成功，显示图像（添加时间戳防止缓存）
+            const timestamp = new Date().getTime();
+            const imageUrlWithTimestamp = `${result.image_url}?t=${timestamp}`;
+            this.displayImage(card, imageUrlWithTimestamp);
+            const finalStatusIndicator = card.querySelector('.status-indicator');
+            if (finalStatusIndicator) {
+                finalStatusIndicator.className = 'status-indicator completed';
+            }
+        } else {
+            // 生成失败
+            const statusIndicator = card.querySelector('.status-indicator');
+            const placeholder = card.querySelector('.image-placeholder');
+            if (statusIndicator) {
+                statusIndicator.className = 'status-indicator failed';
+            }
+            if (placeholder) {
+                placeholder.innerHTML = `<span class="icon">❌</span><span class="text">${failText}</span>`;
+            }
+        }
+    }
+
+    // 生成单个图像
+    async generateImage(scriptId, forceNew = false) {
+        console.log(`generateImage called with scriptId: ${scriptId}`);
+        
+        const card = this.markImageGenerating(scriptId);
+        if (!card) {
+            return;
+        }
 
         try {
             const response = await fetch('/generate_image/', {
@@ -379,54 +446,34 @@ class ImageGenerator {
                 },
                 body: JSON.stringify({
                     script_id: scriptId,
-                    project_path: this.projectPath
+                    project_path: this.projectPath,
+                    force_new: forceNew
                 })
             });
 
             const result = await response.json();
+            this.showImageResult(card, result);
 
-            if (result.success) {
-                // 生成成功，显示图像（添加时间戳防止缓存）
-                const timestamp = new Date().getTime();
-                const imageUrlWithTimestamp = `${result.image_url}?t=${timestamp}`;
-                this.displayImage(card, imageUrlWithTimestamp);
-                const finalStatusIndicator = card.querySelector('.status-indicator');
-                if (finalStatusIndicator) {
-                    finalStatusIndicator.className = 'status-indicator completed';
-                }
-            } else {
-                // 生成失败
-                currentStatusIndicator.className = 'status-indicator failed';
-                placeholder.innerHTML = '<span class="icon">❌</span><span class="text">生成失败</span>';
+            if (!result.success) {
                 console.error('Image generation failed:', result.message);
                 
-                // 检查是否是paper.json相关错误，如果是则抛出异常
+                // 检查是否是paper.json相关错误，如果是则提示用户先格式化文案
                 const errorMessage = result.error || result.message || '';
-                if (errorMessage.includes('paper.json') || 
-                    errorMessage.includes('无法加载paper.json数据') ||
-                    errorMessage.includes('项目文案未格式化')) {
-                    throw new Error(errorMessage);
+                if (this.isPaperError(errorMessage)) {
+                    this.promptPaperNotFormatted();
                 }
             }
         } catch (error) {
             console.error('Error generating image:', error);
-            currentStatusIndicator.className = 'status-indicator failed';
-            placeholder.innerHTML = '<span class="icon">❌</span><span class="text">网络错误</span>';
-            
-            // 如果是paper.json相关错误，重新抛出异常
-            const errorMessage = error.message || '';
-            if (errorMessage.includes('paper.json') || 
-                errorMessage.includes('无法加载paper.json数据') ||
-                errorMessage.includes('项目文案未格式化')) {
-                throw error;
-            }
+            this.showImageResult(card, { success: false }, '网络错误');
         }
     }
 
     // 重新生成图像
     async regenerateImage(scriptId) {
         console.log(`regenerateImage called with scriptId: ${scriptId}`);
-        await this.generateImage(scriptId);
+        // 重新生成时跳过生成结果缓存
+        await this.generateImage(scriptId, true);
     }
 
     // 上传本地图像
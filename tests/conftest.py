@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试公共夹具：把common目录加入模块搜索路径（与Mainsite/views.py的做法一致），
+提供按需启动的模拟ComfyUI服务器和带paper.json的临时项目，并关闭写入仓库cache目录的生成结果缓存和旁白缓存
+"""
+
+import os
+import sys
+import json
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'common'))
+
+import comfyui_client
+import generation_cache
+import narration_cache
+from comfyui_benchmark import build_workflow
+from fake_comfyui_server import FakeComfyUIServer
+
+# 测试用工作流模板：与comfyui_benchmark的合成工作流相同，文本节点带占位符
+WORKFLOW_TEMPLATES = {
+    'image': dict(build_workflow('image', 0), **{
+        '4': {'class_type': 'CLIPTextEncode', 'inputs': {'text': '%AutoMovieclip%'}}
+    }),
+    'audio': dict(build_workflow('audio', 0), **{
+        '1': {'class_type': 'CosyVoiceNode', 'inputs': {'tts_text': '%AutoMovieSound%', 'seed': 1}}
+    })
+}
+
+
+@pytest.fixture(autouse=True)
+def isolated_caches(monkeypatch, tmp_path):
+    """关闭生成结果缓存和旁白缓存，工作流从WORKFLOW_TEMPLATES读取而不是config.ini"""
+    monkeypatch.setattr(generation_cache, '_generation_cache', generation_cache.GenerationCache(enabled=False))
+    monkeypatch.setattr(narration_cache, '_narration_cache', narration_cache.NarrationCache(enabled=False))
+    monkeypatch.setattr(comfyui_client.ComfyUIClient, '_load_workflow_from_config',
+                        lambda self, workflow_type='image': json.loads(json.dumps(WORKFLOW_TEMPLATES[workflow_type])))
+    monkeypatch.setattr(comfyui_client, '_clients', {})
+
+
+@pytest.fixture
+def fake_servers():
+    """启动模拟ComfyUI服务器的工厂（端口0，随机分配），测试结束时全部停止"""
+    servers = []
+
+    def start(**kwargs) -> FakeComfyUIServer:
+        kwargs.setdefault('latency', 0.05)
+        server = FakeComfyUIServer(**kwargs).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def project(tmp_path):
+    """带paper.json的临时项目目录"""
+    project_path = tmp_path / 'project'
+    project_path.mkdir()
+    paper = {'scenes': [{'id': i, 'text': f'测试句子 {i}', 'prompt': f'test scene {i}'} for i in range(1, 9)]}
+    (project_path / 'paper.json').write_text(json.dumps(paper, ensure_ascii=False), encoding='utf-8')
+    return str(project_path)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ComfyUIPool调度测试：在多台模拟ComfyUI服务器上验证按排队数分配、按任务类型的权重、故障转移和冷却
+"""
+
+import os
+import threading
+import time
+
+from comfyui_pool import ComfyUIPool, ComfyUIServer
+
+
+def make_pool(servers, **kwargs) -> ComfyUIPool:
+    kwargs.setdefault('start_health_checks', False)
+    return ComfyUIPool(servers, **kwargs)
+
+
+def test_select_prefers_server_with_shorter_queue(fake_servers, project):
+    busy = fake_servers(latency=5, background_queue=4)
+    idle = fake_servers()
+    busy_member, idle_member = ComfyUIServer(busy.address), ComfyUIServer(idle.address)
+    pool = make_pool([busy_member, idle_member], queue_ttl=60)
+
+    # 排队数4的服务器在空闲服务器也分到4个任务之前不会被选中
+    assert [pool.select('image').address for _ in range(4)] == [idle.address] * 4
+
+    # 每次分配前都刷新排队数时，整批任务都分配给空闲服务器
+    pool = make_pool([busy_member, idle_member], queue_ttl=0)
+    results = list(pool.iter_generate_batch('image', project, [1, 2, 3]))
+    assert all(result['files'] for result in results)
+    assert idle_member.completed == 3
+    assert busy_member.completed == 0
+    assert idle.stats['prompts'] == 3
+
+
+def test_zero_weight_excludes_server_per_workflow_type(fake_servers, project):
+    image_server = fake_servers()
+    audio_server = fake_servers()
+    image_member = ComfyUIServer(image_server.address, image_weight=1.0, audio_weight=0.0)
+    audio_member = ComfyUIServer(audio_server.address, image_weight=0.0, audio_weight=2.0)
+    pool = make_pool([image_member, audio_member])
+
+    assert {pool.select('image').address for _ in range(5)} == {image_server.address}
+    assert {pool.select('audio').address for _ in range(5)} == {audio_server.address}
+
+    assert pool.generate_image(project, 1)
+    audio_files = pool.generate_audio(project, 2)
+    assert any(path.endswith('.wav') for path in audio_files)
+    assert image_server.stats['prompts'] == 1
+    assert audio_server.stats['prompts'] == 1
+
+
+def test_failover_and_cooldown_after_server_stops(fake_servers, project):
+    stopped = fake_servers()
+    healthy = fake_servers()
+    stopped_member, healthy_member = ComfyUIServer(stopped.address), ComfyUIServer(healthy.address)
+    pool = make_pool([stopped_member, healthy_member], failure_cooldown=0.5, queue_ttl=0)
+    stopped.stop()
+
+    files = pool.generate_image(project, 1)
+    assert files and os.path.exists(files[0])
+    assert stopped_member.failures >= 1
+    assert stopped_member.to_dict()['cooling_down']
+    assert healthy_member.completed == 1
+
+    # 冷却期内不再分配到已停止的服务器
+    assert {pool.select('image').address for _ in range(3)} == {healthy.address}
+
+    # 冷却结束后健康检查失败的服务器仍被排除
+    time.sleep(0.6)
+    assert pool.check_health() == {stopped.address: False, healthy.address: True}
+    assert {pool.select('image').address for _ in range(3)} == {healthy.address}
+
+
+def test_batch_fails_over_when_server_stops_mid_batch(fake_servers, project):
+    slow = fake_servers(latency=3)
+    fast = fake_servers()
+    slow_member, fast_member = ComfyUIServer(slow.address), ComfyUIServer(fast.address)
+    pool = make_pool([slow_member, fast_member], failure_cooldown=60)
+
+    timer = threading.Timer(1.0, slow.stop)
+    timer.start()
+    started = time.time()
+    try:
+        results = list(pool.iter_generate_batch('image', project, [1, 2, 3, 4]))
+    finally:
+        timer.cancel()
+
+    assert time.time() - started < 20
+    assert sorted(result['sentence_id'] for result in results) == [1, 2, 3, 4]
+    assert all(result['files'] for result in results), results
+    assert slow_member.failures >= 1
+    assert fast_member.completed == 4
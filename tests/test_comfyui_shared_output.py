@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+共享输出目录测试：模拟ComfyUI服务器把输出写入临时目录（充当共享卷），
+验证ComfyUIClient优先硬链接、硬链接失败时复制、文件缺失时改用HTTP下载，以及拒绝跳出输出目录的路径
+"""
+
+import os
+import urllib.parse
+
+import pytest
+
+import comfyui_client
+from comfyui_benchmark import build_workflow
+from comfyui_client import ComfyUIClient
+from comfyui_pool import ComfyUIServer, parse_output_dirs
+
+
+@pytest.fixture
+def shared_dir(tmp_path):
+    path = tmp_path / 'comfyui_output'
+    path.mkdir()
+    return str(path)
+
+
+@pytest.fixture
+def shared_client(fake_servers, shared_dir):
+    server = fake_servers(output_dir=shared_dir)
+    client = ComfyUIClient(server.address, comfyui_output_dir=shared_dir)
+    yield server, client
+    client.close()
+
+
+def generate(client: ComfyUIClient, output_dir: str, index: int = 1):
+    """生成一张图像，返回(/view地址, 共享目录中的源文件, 保存后的文件)"""
+    urls = client.get_images_from_websocket(build_workflow('image', index))
+    assert len(urls) == 1
+    source = client._local_output_path(urls[0])
+    saved = client.save_images_to_disk(urls, output_dir, f'script_{index}')
+    assert len(saved) == 1
+    return urls[0], source, saved[0]
+
+
+def test_hardlinks_output_from_shared_directory(shared_client, tmp_path):
+    server, client = shared_client
+    _, source, saved = generate(client, str(tmp_path / 'images'))
+
+    assert source is not None
+    assert os.stat(saved).st_ino == os.stat(source).st_ino
+    assert server.stats['downloads'] == 0
+
+
+def test_copies_when_hardlink_fails(shared_client, tmp_path, monkeypatch):
+    server, client = shared_client
+
+    def refuse_link(source, target):
+        raise OSError('cross-device link')
+    monkeypatch.setattr(comfyui_client.os, 'link', refuse_link)
+
+    _, source, saved = generate(client, str(tmp_path / 'images'))
+
+    assert os.stat(saved).st_ino != os.stat(source).st_ino
+    with open(saved, 'rb') as f_saved, open(source, 'rb') as f_source:
+        assert f_saved.read() == f_source.read()
+    assert server.stats['downloads'] == 0
+
+
+def test_falls_back_to_http_when_file_is_missing(shared_client, tmp_path):
+    server, client = shared_client
+    urls = client.get_images_from_websocket(build_workflow('image', 1))
+    source = client._local_output_path(urls[0])
+    os.remove(source)
+
+    assert client._local_output_path(urls[0]) is None
+    saved = client.save_images_to_disk(urls, str(tmp_path / 'images'), 'script_1')
+
+    assert len(saved) == 1 and os.path.getsize(saved[0]) > 0
+    assert server.stats['downloads'] == 1
+
+
+@pytest.mark.parametrize('subfolder, filename', [
+    ('../..', 'secret.png'),
+    ('..', 'secret.png'),
+    ('', '../secret.png'),
+    ('', '/etc/passwd'),
+])
+def test_rejects_paths_outside_shared_directory(shared_client, tmp_path, subfolder, filename):
+    _, client = shared_client
+    (tmp_path / 'secret.png').write_bytes(b'not an output')
+    query = urllib.parse.urlencode({'filename': filename, 'subfolder': subfolder, 'type': 'output'})
+
+    assert client._local_output_path(f'http://{client.server_address}/view?{query}') is None
+
+
+def test_transport_is_selected_per_pool_member(fake_servers, shared_dir, tmp_path):
+    local = fake_servers(output_dir=shared_dir)
+    remote = fake_servers()
+    output_dirs = parse_output_dirs(f'http://{local.address}/={shared_dir}, invalid-entry')
+    assert output_dirs == {local.address: shared_dir}
+
+    local_member = ComfyUIServer(local.address, output_dir=output_dirs.get(local.address))
+    remote_member = ComfyUIServer(remote.address, output_dir=output_dirs.get(remote.address))
+    assert local_member.to_dict()['transport'] == 'filesystem'
+    assert remote_member.to_dict()['transport'] == 'http'
+
+    generate(local_member.client, str(tmp_path / 'local'))
+    generate(remote_member.client, str(tmp_path / 'remote'))
+    assert local.stats['downloads'] == 0
+    assert remote.stats['downloads'] == 1
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模拟ComfyUI服务器冒烟测试：在随机端口启动服务器，用ComfyUIClient、AsyncComfyUIClient和ComfyUIPool
+完成生成，并验证执行失败注入、队列上限拒绝和批量生成中途停止服务器时的行为
+"""
+
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+import requests
+
+from async_comfyui_client import AsyncComfyUIClient
+from comfyui_benchmark import build_workflow
+from comfyui_client import ComfyUIClient
+from comfyui_pool import ComfyUIPool, ComfyUIServer, is_server_error
+
+
+def run_async_batch(address: str, workflow_type: str, project: str, sentence_ids):
+    """用AsyncComfyUIClient.generate_batch生成一批句子，返回按句子ID排序的结果"""
+    async def run():
+        async with AsyncComfyUIClient(address) as client:
+            return [result async for result in client.generate_batch(workflow_type, project, sentence_ids)]
+    return sorted(asyncio.run(run()), key=lambda result: result['sentence_id'])
+
+
+def test_server_listens_on_random_port(fake_servers):
+    server = fake_servers()
+    host, port = server.address.rsplit(':', 1)
+    assert int(port) > 0
+    assert requests.get(f'http://{server.address}/system_stats', timeout=5).ok
+
+
+def test_sync_client_generates_image_and_audio(fake_servers, project):
+    server = fake_servers()
+    client = ComfyUIClient(server.address)
+
+    images = client.generate_image(project, 1)
+    audios = client.generate_audio(project, 2)
+
+    assert images and all(os.path.getsize(path) > 0 for path in images)
+    assert any(path.endswith('.wav') for path in audios)
+    assert server.stats['completed'] == 2
+
+
+def test_async_client_generates_batch(fake_servers, project):
+    server = fake_servers()
+
+    results = run_async_batch(server.address, 'image', project, [1, 2, 3, 4])
+
+    assert [result['sentence_id'] for result in results] == [1, 2, 3, 4]
+    assert all(result['files'] and result['error'] is None for result in results)
+    assert server.stats['prompts'] == 4
+
+
+def test_pool_generates_batch_across_servers(fake_servers, project):
+    servers = [fake_servers(), fake_servers()]
+    pool = ComfyUIPool([ComfyUIServer(server.address) for server in servers], start_health_checks=False)
+
+    results = list(pool.iter_generate_batch('image', project, [1, 2, 3, 4]))
+
+    assert sorted(result['sentence_id'] for result in results) == [1, 2, 3, 4]
+    assert all(result['files'] for result in results)
+    assert sum(server.stats['completed'] for server in servers) == 4
+
+
+def test_execution_failure_is_reported_per_sentence(fake_servers, project):
+    server = fake_servers(execution_failure_rate=1.0)
+
+    with pytest.raises(RuntimeError, match='ComfyUI执行失败'):
+        ComfyUIClient(server.address).get_images_from_websocket(build_workflow('image', 1))
+
+    results = run_async_batch(server.address, 'image', project, [1, 2])
+    assert all(not result['files'] and 'ComfyUI执行失败' in result['error'] for result in results)
+
+    # 执行错误不是服务器故障，池不换服务器重试，也不把服务器标记为失败
+    member = ComfyUIServer(server.address)
+    pool = ComfyUIPool([member], start_health_checks=False)
+    results = list(pool.iter_generate_batch('image', project, [1, 2]))
+    assert all(not result['files'] and result['error'] for result in results)
+    assert member.failures == 0
+    assert server.stats['failed'] == 5
+
+
+def test_full_queue_rejects_prompt_and_pool_fails_over(fake_servers, project):
+    full = fake_servers(latency=5, background_queue=2, max_queue=2)
+    spare = fake_servers()
+
+    with pytest.raises(requests.HTTPError) as excinfo:
+        ComfyUIClient(full.address).queue_prompt(build_workflow('image', 1))
+    assert excinfo.value.response.status_code == 503
+    assert is_server_error(excinfo.value)
+
+    # 排队数快照过期之前池看不到队列已满，按权重先选中已满的服务器，被拒绝后转移到另一台
+    full_member = ComfyUIServer(full.address, image_weight=2.0)
+    spare_member = ComfyUIServer(spare.address)
+    pool = ComfyUIPool([full_member, spare_member], start_health_checks=False, queue_ttl=60)
+    full_member.queue_checked = spare_member.queue_checked = time.time()
+    assert pool.generate_image(project, 1)
+    assert full.stats['rejected'] == 2
+    assert full_member.failures == 1
+    assert spare_member.completed == 1
+
+
+def test_async_batch_fails_fast_when_server_stops(fake_servers, project):
+    server = fake_servers(latency=3)
+    timer = threading.Timer(0.5, server.stop)
+    timer.start()
+    started = time.time()
+    try:
+        with pytest.raises(Exception) as excinfo:
+            run_async_batch(server.address, 'image', project, [1, 2, 3])
+    finally:
+        timer.cancel()
+
+    assert is_server_error(excinfo.value)
+    assert time.time() - started < 15
+
+
+def restart_later(fake_servers, server, delay: float) -> threading.Timer:
+    """delay秒后停止服务器，并在同一端口启动一个新服务器（队列和历史记录为空，相当于ComfyUI重启）"""
+    def restart():
+        server.stop()
+        fake_servers(port=server.port)
+    timer = threading.Timer(delay, restart)
+    timer.start()
+    return timer
+
+
+def test_sync_client_fails_fast_when_server_restarts(fake_servers, project):
+    server = fake_servers(latency=3)
+    client = ComfyUIClient(server.address)
+    timer = restart_later(fake_servers, server, 0.5)
+    started = time.time()
+    try:
+        with pytest.raises(Exception) as excinfo:
+            client.generate_image(project, 1)
+    finally:
+        timer.cancel()
+        timer.join()
+
+    assert is_server_error(excinfo.value)
+    assert time.time() - started < 15
+    # 同一个共享客户端在重启后的服务器上继续可用
+    assert client.generate_image(project, 2)
+
+
+def test_sync_client_reports_prompt_lost_after_restart(fake_servers):
+    server = fake_servers(latency=5)
+    client = ComfyUIClient(server.address)
+    prompt_id = client.queue_prompt(build_workflow('image', 1))['prompt_id']
+    assert client._poll_prompt(prompt_id) is False
+
+    server.stop()
+    fake_servers(port=server.port)
+
+    with pytest.raises(ConnectionError, match='服务器可能已重启'):
+        client._poll_prompt(prompt_id)
+
+
+def test_async_batch_fails_fast_when_server_restarts(fake_servers, project):
+    server = fake_servers(latency=3)
+    timer = restart_later(fake_servers, server, 0.5)
+    started = time.time()
+    try:
+        with pytest.raises(Exception) as excinfo:
+            run_async_batch(server.address, 'image', project, [1, 2, 3])
+    finally:
+        timer.cancel()
+        timer.join()
+
+    assert is_server_error(excinfo.value)
+    assert time.time() - started < 15
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+生成结果缓存测试：相同的最终工作流（指定种子）第二次生成不再提交到ComfyUI，
+force_new和随机种子跳过缓存，filename_prefix不影响缓存键，超出大小上限时淘汰最久未使用的条目
+"""
+
+import json
+import os
+import shutil
+import time
+
+import pytest
+
+import generation_cache
+from comfyui_client import ComfyUIClient
+from generation_cache import GenerationCache
+
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    cache = GenerationCache(cache_dir=str(tmp_path / 'generation'), max_size_mb=64, enabled=True)
+    monkeypatch.setattr(generation_cache, '_generation_cache', cache)
+    return cache
+
+
+@pytest.fixture
+def other_project(project, tmp_path):
+    """与project文案相同的另一个项目"""
+    project_path = tmp_path / 'other_project'
+    project_path.mkdir()
+    shutil.copy(os.path.join(project, 'paper.json'), project_path / 'paper.json')
+    return str(project_path)
+
+
+def read_bytes(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_same_workflow_and_seed_is_served_from_cache(cache, fake_servers, project, other_project):
+    server = fake_servers()
+    client = ComfyUIClient(server.address)
+
+    first = client.generate_image(project, 1, seed=5)
+    second = client.generate_image(other_project, 1, seed=5)
+
+    assert server.stats['prompts'] == 1
+    image = [path for path in second if not path.endswith('.json')][0]
+    assert image.startswith(other_project)
+    assert read_bytes(image) == read_bytes(first[0])
+
+    stats = cache.get_stats()
+    assert (stats['hits'], stats['misses']) == (1, 1)
+    assert stats['groups']['other_project']['hits'] == 1
+    assert stats['groups']['project']['misses'] == 1
+
+
+def test_force_new_and_random_seed_skip_cache(cache, fake_servers, project):
+    server = fake_servers()
+    client = ComfyUIClient(server.address)
+
+    client.generate_image(project, 1, seed=5)
+    client.generate_image(project, 1, seed=5, force_new=True)
+    assert server.stats['prompts'] == 2
+
+    entries = cache.get_stats()['entries']
+    client.generate_image(project, 1)
+    client.generate_image(project, 1)
+    assert server.stats['prompts'] == 4
+    stats = cache.get_stats()
+    assert stats['entries'] == entries
+    assert stats['hits'] + stats['misses'] == 1
+
+
+def test_audio_is_cached_without_seed(cache, fake_servers, project):
+    server = fake_servers()
+    client = ComfyUIClient(server.address)
+
+    first = client.generate_audio(project, 2)
+    second = client.generate_audio(project, 2)
+
+    assert server.stats['prompts'] == 1
+    assert read_bytes(second[0]) == read_bytes(first[0])
+
+
+def test_filename_prefix_does_not_change_key(cache, fake_servers, project):
+    client = ComfyUIClient(fake_servers().address)
+    workflow = client.prepare_image_workflow(project, 1, seed=5)
+    renamed = json.loads(json.dumps(workflow))
+    reseeded = client.prepare_image_workflow(project, 1, seed=6)
+    for node in renamed.values():
+        if 'filename_prefix' in node.get('inputs', {}):
+            node['inputs']['filename_prefix'] = 'somewhere/else'
+            break
+    else:
+        pytest.fail('工作流中没有filename_prefix输入')
+
+    assert cache.build_key('image', renamed) == cache.build_key('image', workflow)
+    assert cache.build_key('image', reseeded) != cache.build_key('image', workflow)
+    assert cache.build_key('audio', workflow) != cache.build_key('image', workflow)
+
+
+def test_size_cap_evicts_least_recently_used_entry(tmp_path):
+    entry_size = 40 * 1024
+    cache = GenerationCache(cache_dir=str(tmp_path / 'generation'), max_size_mb=100 * 1024 / (1024 * 1024),
+                            enabled=True)
+    outputs = {}
+    for name in ('a', 'b', 'c'):
+        outputs[name] = str(tmp_path / f'{name}.png')
+        with open(outputs[name], 'wb') as f:
+            f.write(os.urandom(entry_size))
+
+    cache.store('a', [outputs['a']])
+    time.sleep(0.05)
+    cache.store('b', [outputs['b']])
+    time.sleep(0.05)
+    assert cache.lookup('a')  # 刷新a的LRU时间，b成为最久未使用的条目
+    time.sleep(0.05)
+    cache.store('c', [outputs['c']])
+
+    assert cache.lookup('b') is None
+    assert read_bytes(cache.lookup('a')[0]) == read_bytes(outputs['a'])
+    assert read_bytes(cache.lookup('c')[0]) == read_bytes(outputs['c'])
+    assert cache.get_stats()['total_bytes'] <= cache.get_stats()['max_bytes']
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+媒体信息缓存测试：多个MediaProbe实例（各自持有内存中的条目，相当于多个进程）共用一个缓存文件时，
+保存只合并自己的改动，不覆盖其他实例写入的条目；一批探测只写一次缓存文件
+"""
+
+import os
+import threading
+import time
+
+import pytest
+
+import media_probe
+from media_probe import MediaProbe
+
+
+@pytest.fixture
+def fake_ffprobe(monkeypatch):
+    calls = []
+
+    def run_ffprobe(file_path, ffprobe_path='ffprobe', timeout=30):
+        calls.append(file_path)
+        return {'path': file_path, 'duration': 1.5}
+    monkeypatch.setattr(media_probe, 'run_ffprobe', run_ffprobe)
+    return calls
+
+
+@pytest.fixture
+def media_files(tmp_path):
+    paths = []
+    for index in range(4):
+        path = tmp_path / f'clip_{index}.wav'
+        path.write_bytes(b'RIFF' + bytes(index))
+        paths.append(str(path))
+    return paths
+
+
+def test_instances_merge_entries_instead_of_overwriting(fake_ffprobe, media_files, tmp_path):
+    cache_path = str(tmp_path / 'cache' / 'media_probe.json')
+    first, second = MediaProbe(cache_path), MediaProbe(cache_path)
+
+    # 两个实例都在对方保存之前加载了缓存
+    assert first.get_stats()['entries'] == 0 and second.get_stats()['entries'] == 0
+    first.probe(media_files[0])
+    second.probe(media_files[1])
+    first.probe(media_files[2])
+    first.flush()
+    second.flush()
+
+    reader = MediaProbe(cache_path)
+    for path in media_files[:3]:
+        assert reader.probe(path)['duration'] == 1.5
+    assert reader.hits == 3
+    assert len(fake_ffprobe) == 3
+
+
+def test_invalidate_removes_entry_written_by_other_instance(fake_ffprobe, media_files, tmp_path):
+    cache_path = str(tmp_path / 'media_probe.json')
+    writer, other = MediaProbe(cache_path), MediaProbe(cache_path)
+    other.get_stats()
+    writer.probe(media_files[0])
+    writer.probe(media_files[1])
+    writer.flush()
+
+    other.invalidate(media_files[0])
+
+    reader = MediaProbe(cache_path)
+    reader.probe(media_files[0])
+    reader.probe(media_files[1])
+    assert (reader.hits, reader.misses) == (1, 1)
+
+
+def test_concurrent_instances_keep_every_entry(fake_ffprobe, tmp_path):
+    cache_path = str(tmp_path / 'media_probe.json')
+    paths = []
+    for index in range(40):
+        path = tmp_path / f'clip_{index}.wav'
+        path.write_bytes(bytes(index))
+        paths.append(str(path))
+
+    def worker(offset: int):
+        probe = MediaProbe(cache_path)
+        for path in paths[offset::4]:
+            probe.probe(path)
+        probe.flush()
+
+    threads = [threading.Thread(target=worker, args=(offset,)) for offset in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert MediaProbe(cache_path).get_stats()['entries'] == len(paths)
+
+
+@pytest.fixture
+def count_writes(monkeypatch):
+    """统计缓存文件的写入次数"""
+    writes = []
+    replace = os.replace
+
+    def counting_replace(source, target):
+        writes.append(target)
+        replace(source, target)
+    monkeypatch.setattr(media_probe.os, 'replace', counting_replace)
+    return writes
+
+
+def test_batch_of_misses_is_written_once(fake_ffprobe, count_writes, media_files, tmp_path):
+    cache_path = str(tmp_path / 'media_probe.json')
+    probe = MediaProbe(cache_path, save_delay=60)
+
+    for path in media_files:
+        probe.probe(path)
+    assert count_writes == []
+
+    probe.flush()
+    probe.flush()  # 没有新的改动时不再写文件
+    assert count_writes == [cache_path]
+    assert MediaProbe(cache_path).get_stats()['entries'] == len(media_files)
+
+
+def test_pending_entries_are_saved_after_delay(fake_ffprobe, count_writes, media_files, tmp_path):
+    cache_path = str(tmp_path / 'media_probe.json')
+    probe = MediaProbe(cache_path, save_delay=0.2)
+
+    probe.probe(media_files[0])
+    probe.probe(media_files[1])
+
+    deadline = time.time() + 5
+    while not count_writes and time.time() < deadline:
+        time.sleep(0.05)
+    assert count_writes == [cache_path]
+    assert MediaProbe(cache_path).get_stats()['entries'] == 2
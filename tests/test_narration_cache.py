@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+旁白缓存测试：按views.generate_audio的流程（查询缓存 -> 生成 -> 去除静音 -> 写入缓存）生成两个项目中相同的句子，
+验证第二个项目不再提交prompt、不再裁剪并得到第一次的时长，以及文本规范化、参考音频哈希、
+按项目统计命中率和服务器不可达时查询不会长时间阻塞
+"""
+
+import configparser
+import json
+import os
+import socket
+import time
+
+import pytest
+
+import comfyui_client
+import narration_cache
+from audio_processor import AudioProcessor
+from comfyui_pool import ComfyUIPool, ComfyUIServer
+from conftest import WORKFLOW_TEMPLATES
+from fake_comfyui_server import make_wav
+from narration_cache import NarrationCache, normalize_text
+
+VOICE_REFERENCE = 'voices/narrator.wav'
+
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    cache = NarrationCache(cache_dir=str(tmp_path / 'narration'), max_size_mb=64, enabled=True)
+    monkeypatch.setattr(narration_cache, '_narration_cache', cache)
+    return cache
+
+
+@pytest.fixture
+def voice_workflow(monkeypatch):
+    """音频工作流带LoadAudio参考音频节点"""
+    template = dict(WORKFLOW_TEMPLATES['audio'], **{
+        '9': {'class_type': 'LoadAudio', 'inputs': {'audio': VOICE_REFERENCE}}
+    })
+    monkeypatch.setattr(comfyui_client.ComfyUIClient, '_load_workflow_from_config',
+                        lambda self, workflow_type='image': json.loads(json.dumps(template)))
+
+
+@pytest.fixture
+def server(fake_servers):
+    server = fake_servers()
+    subfolder, filename = os.path.split(VOICE_REFERENCE)
+    server.add_input_file(filename, make_wav(1.0, b'narrator'), subfolder=subfolder)
+    return server
+
+
+def make_project(tmp_path, name: str, texts) -> str:
+    project_path = tmp_path / name
+    project_path.mkdir()
+    paper = {'scenes': [{'id': i, 'text': text, 'prompt': ''} for i, text in enumerate(texts, 1)]}
+    (project_path / 'paper.json').write_text(json.dumps(paper, ensure_ascii=False), encoding='utf-8')
+    return str(project_path)
+
+
+def narrate(pool: ComfyUIPool, project_path: str, script_id: int) -> dict:
+    """与views.generate_audio相同的步骤，返回{'path', 'duration', 'cached'}"""
+    audio_processor = AudioProcessor()
+    narration = pool.lookup_narration_cache(
+        project_path, [script_id], audio_processor.load_trim_settings(project_path)
+    )[script_id]
+    if narration['files']:
+        audio_processor.update_parameter_ini(project_path, script_id, narration['duration'])
+        return {'path': narration['files'][0], 'duration': narration['duration'], 'cached': True}
+
+    saved_files = pool.generate_audio(project_path, script_id)
+    audio_path = [path for path in saved_files if not path.endswith('.json')][0]
+    processed_path, duration = audio_processor.process_audio_after_generation(audio_path, project_path, script_id)
+    pool.store_narration_cache(narration['key'], processed_path, duration)
+    return {'path': processed_path, 'duration': duration, 'cached': False}
+
+
+def audio_info_duration(project_path: str, script_id: int) -> float:
+    config = configparser.ConfigParser(interpolation=None)
+    config.read(os.path.join(project_path, 'parameter.ini'), encoding='utf-8')
+    return config.getfloat('AUDIO_INFO', f'script_{script_id}_duration')
+
+
+def test_normalize_text_ignores_width_and_spacing():
+    assert normalize_text('你好，世界！  Hello   world 2') == normalize_text(' 你好, 世界 ! Hello world 2')
+    assert normalize_text('hello world') != normalize_text('helloworld')
+
+
+def test_shared_sentence_is_reused_across_projects(cache, voice_workflow, server, tmp_path, monkeypatch):
+    pool = ComfyUIPool([ComfyUIServer(server.address)], start_health_checks=False)
+    first_project = make_project(tmp_path, 'first', ['欢迎收看本期节目，Hello world', '第一个项目的句子'])
+    second_project = make_project(tmp_path, 'second', ['第二个项目的句子', '欢迎收看本期节目, Hello  world'])
+
+    first = narrate(pool, first_project, 1)
+    assert not first['cached']
+    prompts = server.stats['prompts']
+
+    def no_trim(*args, **kwargs):
+        raise AssertionError('命中旁白缓存时不应再去除静音')
+    monkeypatch.setattr(AudioProcessor, 'trim_silence', no_trim)
+    monkeypatch.setattr(AudioProcessor, 'process_audio_after_generation', no_trim)
+
+    second = narrate(pool, second_project, 2)
+
+    assert second['cached']
+    assert server.stats['prompts'] == prompts
+    assert second['duration'] == pytest.approx(first['duration'])
+    assert audio_info_duration(second_project, 2) == pytest.approx(first['duration'])
+    assert os.path.basename(second['path']) == 'script_2_1.wav'
+    with open(first['path'], 'rb') as f_first, open(second['path'], 'rb') as f_second:
+        assert f_first.read() == f_second.read()
+    assert os.path.exists(os.path.join(second_project, 'audios', 'script_2_workflow.json'))
+
+    groups = cache.get_stats()['groups']
+    assert (groups['first']['hits'], groups['first']['misses']) == (0, 1)
+    assert (groups['second']['hits'], groups['second']['misses']) == (1, 0)
+
+
+def test_voice_reference_content_is_part_of_key(cache, voice_workflow, server, tmp_path):
+    pool = ComfyUIPool([ComfyUIServer(server.address)], start_health_checks=False)
+    project_path = make_project(tmp_path, 'project', ['同一句旁白'])
+    trim_settings = AudioProcessor().load_trim_settings(project_path)
+    downloads = server.stats['downloads']
+
+    key = pool.lookup_narration_cache(project_path, [1], trim_settings)[1]['key']
+    assert server.stats['downloads'] == downloads + 1
+    # 参考音频哈希在VOICE_HASH_TTL内复用，不再下载
+    assert pool.lookup_narration_cache(project_path, [1], trim_settings)[1]['key'] == key
+    assert server.stats['downloads'] == downloads + 1
+
+    subfolder, filename = os.path.split(VOICE_REFERENCE)
+    server.add_input_file(filename, make_wav(1.0, b'another narrator'), subfolder=subfolder)
+    pool.servers[0].client._voice_hashes.clear()
+    assert pool.lookup_narration_cache(project_path, [1], trim_settings)[1]['key'] != key
+
+
+def test_lookup_gives_up_quickly_when_server_does_not_respond(cache, voice_workflow, tmp_path):
+    # 只监听不应答的端口：连接成功但读取一直阻塞
+    silent = socket.socket()
+    silent.bind(('127.0.0.1', 0))
+    silent.listen(8)
+    try:
+        address = f'127.0.0.1:{silent.getsockname()[1]}'
+        pool = ComfyUIPool([ComfyUIServer(address)], start_health_checks=False, request_timeout=0.5)
+        assert pool.servers[0].client.http_timeout > 5
+        project_path = make_project(tmp_path, 'project', ['同一句旁白'])
+
+        started = time.time()
+        result = pool.lookup_narration_cache(project_path, [1], AudioProcessor().load_trim_settings(project_path))
+
+        assert time.time() - started < 3
+        assert result == {1: {'key': None, 'files': None, 'duration': None}}
+    finally:
+        silent.close()
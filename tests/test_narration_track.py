@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+旁白音轨测试：按帧对齐的时间线布局、背景音乐混音增益（与amix dropout_transition一致）；
+解码和铺设时间线的真实FFMPEG冒烟测试在未安装ffmpeg时跳过
+"""
+
+import shutil
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from narration_track import build_narration_timeline, decode_audio, frame_aligned_layout, mix_background_music
+
+requires_ffmpeg = pytest.mark.skipif(shutil.which('ffmpeg') is None, reason='未安装ffmpeg')
+
+
+def test_frame_aligned_layout_is_contiguous():
+    layout = frame_aligned_layout([25, 50, 10], video_fps=25, sample_rate=1000)
+
+    assert layout == [(0, 1000), (1000, 3000), (3000, 3400)]
+
+
+def test_frame_aligned_layout_does_not_drift():
+    # 29.97fps下每帧1471.47个采样，逐段取整会累积误差，按累计帧数换算不会
+    segments = [7] * 1000
+    layout = frame_aligned_layout(segments, video_fps=30000 / 1001, sample_rate=44100)
+
+    assert all(end == next_start for (_, end), (next_start, _) in zip(layout, layout[1:]))
+    assert layout[-1][1] == round(sum(segments) * 44100 * 1001 / 30000)
+    assert frame_aligned_layout([], 25) == []
+
+
+def test_mix_halves_both_tracks_while_music_plays():
+    narration = np.full((100, 2), 0.4, dtype=np.float32)
+    bed = np.full((100, 2), 0.2, dtype=np.float32)
+
+    mixed = mix_background_music(narration, bed, active_samples=100, sample_rate=10)
+
+    assert mixed.dtype == np.float32
+    assert np.allclose(mixed, 0.3)
+
+
+def test_mix_restores_narration_gain_after_music_ends():
+    narration = np.full((100, 1), 0.4, dtype=np.float32)
+    bed = np.zeros((100, 1), dtype=np.float32)
+    bed[:40] = 0.2
+
+    mixed = mix_background_music(narration, bed, active_samples=40, sample_rate=10, dropout_transition=2.0)
+
+    assert np.allclose(mixed[:40], 0.3)
+    # 20个采样内从0.5线性过渡到1.0
+    assert mixed[40, 0] == pytest.approx(0.2)
+    assert np.all(np.diff(mixed[40:60, 0]) > 0)
+    assert mixed[59, 0] == pytest.approx(0.4)
+    assert np.allclose(mixed[60:], 0.4)
+
+
+def test_mix_clips_and_skips_empty_music():
+    narration = np.full((10, 2), 0.9, dtype=np.float32)
+    bed = np.full((10, 2), 1.5, dtype=np.float32)
+
+    assert np.all(mix_background_music(narration, bed, active_samples=10) <= 1.0)
+    untouched = np.full((10, 2), 0.9, dtype=np.float32)
+    assert mix_background_music(untouched, bed, active_samples=0) is untouched
+
+
+@requires_ffmpeg
+def test_timeline_truncates_and_pads_segments(tmp_path):
+    sample_rate = 8000
+    long_path, short_path = str(tmp_path / 'long.wav'), str(tmp_path / 'short.wav')
+    sf.write(long_path, np.full(sample_rate * 2, 0.5, dtype=np.float32), sample_rate)
+    sf.write(short_path, np.full(sample_rate // 2, -0.5, dtype=np.float32), sample_rate)
+
+    decoded = decode_audio(long_path, sample_rate=sample_rate, channels=2)
+    assert decoded.shape == (sample_rate * 2, 2)
+
+    timeline = build_narration_timeline([long_path, short_path], [25, 25], video_fps=25,
+                                        sample_rate=sample_rate, channels=2)
+
+    assert timeline.shape == (sample_rate * 2, 2)
+    assert np.allclose(timeline[:sample_rate], 0.5, atol=1e-3)
+    assert np.allclose(timeline[sample_rate:sample_rate * 3 // 2], -0.5, atol=1e-3)
+    assert np.allclose(timeline[sample_rate * 3 // 2:], 0.0)
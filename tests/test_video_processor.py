@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+视频处理测试：不依赖FFMPEG的参数构建函数（输出设置、淡入淡出和静态图片select滤镜、
+静态图片编码参数、拼接计划、进度解析）按参数逐项验证；真实FFMPEG冒烟测试在未安装ffmpeg时跳过
+"""
+
+import os
+import shutil
+import stat
+import subprocess
+import sys
+
+import pytest
+
+import video_processor
+from media_probe import MediaProbe
+from segment_cache import SegmentCache
+from video_processor import VideoProcessor, resolve_output_settings, resolve_preview_settings
+
+requires_ffmpeg = pytest.mark.skipif(shutil.which('ffmpeg') is None or shutil.which('ffprobe') is None,
+                                     reason='未安装ffmpeg/ffprobe')
+
+
+@pytest.fixture
+def processor(monkeypatch, tmp_path):
+    """片段缓存关闭、媒体信息缓存写入临时目录的VideoProcessor"""
+    monkeypatch.setattr(video_processor, 'SegmentCache', lambda: SegmentCache(enabled=False))
+    monkeypatch.setattr(video_processor, 'get_media_probe',
+                        lambda: MediaProbe(str(tmp_path / 'media_probe.json')))
+    return VideoProcessor()
+
+
+def make_info(width=1280, height=720, fps=25.0, audio_codec='aac', pix_fmt='yuv420p') -> dict:
+    """构造get_video_info返回值中与拼接签名相关的字段"""
+    return {
+        'video': {'codec': 'h264', 'profile': 'High', 'level': 31, 'width': width, 'height': height,
+                  'pix_fmt': pix_fmt, 'sample_aspect_ratio': '1:1', 'fps': fps, 'time_base': '1/25000'},
+        'audio': {'codec': audio_codec, 'sample_rate': 44100, 'channels': 2}
+    }
+
+
+@pytest.mark.parametrize('preset, profile', [
+    (None, 'standard'), ('draft', 'draft'), ('final', 'final'),
+    ('low', 'draft'), ('medium', 'standard'), (' HIGH ', 'final'), ('unknown', 'standard')
+])
+def test_resolve_output_settings_maps_quality_presets(preset, profile):
+    quality = {'preset': preset} if preset else None
+    settings = resolve_output_settings(None, quality)
+
+    expected = video_processor.QUALITY_PROFILES[profile]
+    assert settings['profile'] == profile
+    assert (settings['preset'], settings['crf'], settings['audio_bitrate']) == \
+        (expected['preset'], expected['crf'], expected['audio_bitrate'])
+    assert settings['video_bitrate'] is None
+    assert (settings['width'], settings['height'], settings['pix_fmt']) == (None, None, 'yuv420p')
+
+
+def test_resolve_output_settings_custom_bitrate_and_even_resolution():
+    settings = resolve_output_settings({'width': 1281, 'height': '721'},
+                                       {'preset': 'custom', 'videoBitrate': '3000', 'audioBitrate': 160})
+
+    assert settings['profile'] == 'custom'
+    assert settings['crf'] is None
+    assert (settings['video_bitrate'], settings['audio_bitrate']) == ('3000k', '160k')
+    assert (settings['width'], settings['height']) == (1280, 720)
+
+    # 宽高缺一时保持原始尺寸
+    assert resolve_output_settings({'width': 1280, 'height': None})['width'] is None
+
+
+def test_resolve_preview_settings_scales_long_edge():
+    preview = resolve_preview_settings({'width': 1920, 'height': 1080}, max_size=640, fps=12)
+
+    assert (preview['width'], preview['height']) == (640, 360)
+    assert preview['subtitle_scale'] == pytest.approx(1 / 3)
+    assert (preview['preset'], preview['fps']) == ('ultrafast', 12)
+    # 已经小于max_size时不放大
+    assert resolve_preview_settings({'width': 320, 'height': 240})['width'] == 320
+
+
+def test_video_encode_args_prefers_bitrate_over_crf(processor):
+    processor.output_settings = resolve_output_settings(None, {'preset': 'draft'})
+    assert processor._video_encode_args() == ['-c:v', 'libx264', '-preset', 'ultrafast', '-crf', '28',
+                                              '-pix_fmt', 'yuv420p']
+
+    processor.output_settings = resolve_output_settings(None, {'preset': 'custom', 'videoBitrate': 2000})
+    assert processor._video_encode_args('yuv444p') == ['-c:v', 'libx264', '-preset', 'medium', '-b:v', '2000k',
+                                                       '-pix_fmt', 'yuv444p']
+
+
+def test_scale_filters_pad_to_output_resolution(processor):
+    assert processor._scale_filters() == []
+
+    processor.output_settings = resolve_output_settings({'width': 1280, 'height': 720})
+    assert processor._scale_filters() == [
+        'scale=1280:720:force_original_aspect_ratio=decrease',
+        'pad=1280:720:(ow-iw)/2:(oh-ih)/2',
+        'setsar=1'
+    ]
+
+
+@pytest.mark.parametrize('total, fade_in, fade_out, expected', [
+    (100, 0, 0, []),
+    (100, 10, 0, ['fade=t=in:s=0:n=10']),
+    (100, 0, 15, ['fade=t=out:s=85:n=15']),
+    (100, 10, 15, ['fade=t=in:s=0:n=10', 'fade=t=out:s=85:n=15']),
+    # 淡出帧数超过总帧数时从第0帧开始淡出
+    (10, 0, 15, ['fade=t=out:s=0:n=15']),
+])
+def test_build_fade_filters(processor, total, fade_in, fade_out, expected):
+    assert processor._build_fade_filters(total, fade_in, fade_out) == expected
+
+
+@pytest.mark.parametrize('total, fade_in, fade_out, expected', [
+    # 保留淡入帧0~9、淡入结束后的第10帧、淡出帧85~99和最后一帧
+    (100, 10, 15, "select='lt(n,10)+eq(n,10)+gte(n,85)+eq(n,99)'"),
+    # 没有淡入淡出时只保留第0帧和最后一帧
+    (100, 0, 0, "select='lt(n,0)+eq(n,0)+gte(n,100)+eq(n,99)'"),
+    # 淡入帧数超过总帧数时静止帧不越过最后一帧
+    (5, 10, 0, "select='lt(n,4)+eq(n,4)+gte(n,5)+eq(n,4)'"),
+    (1, 0, 0, "select='lt(n,0)+eq(n,0)+gte(n,1)+eq(n,0)'"),
+])
+def test_build_still_image_select(processor, total, fade_in, fade_out, expected):
+    assert processor._build_still_image_select(total, fade_in, fade_out) == expected
+
+
+def test_still_image_encode_args(processor):
+    assert processor._still_image_encode_args(250, 25) == [
+        '-tune', 'stillimage', '-g', '250', '-fps_mode', 'vfr', '-video_track_timescale', '25000'
+    ]
+    assert processor._still_image_encode_args(0, 30)[3] == '1'
+
+
+def test_plan_concat_uses_most_common_signature(processor, monkeypatch):
+    infos = {
+        'a.mp4': make_info(),
+        'b.mp4': make_info(),
+        'c.mp4': make_info(width=1920, height=1080),
+        'd.mp4': make_info(audio_codec='mp3'),
+        'e.mp4': None,
+    }
+    monkeypatch.setattr(processor, 'get_video_info', infos.get)
+
+    plan = processor.plan_concat(list(infos))
+
+    assert plan['canonical']['width'] == 1280
+    assert plan['conforming'] == ['a.mp4', 'b.mp4']
+    assert dict(plan['nonconforming']) == {
+        'c.mp4': ['height', 'width'],
+        'd.mp4': ['audio_codec'],
+        'e.mp4': ['unprobeable'],
+    }
+
+
+def test_plan_concat_follows_output_resolution(processor, monkeypatch):
+    infos = {'a.mp4': make_info(), 'b.mp4': make_info(), 'c.mp4': make_info(width=1920, height=1080)}
+    monkeypatch.setattr(processor, 'get_video_info', infos.get)
+    processor.output_settings = resolve_output_settings({'width': 1920, 'height': 1080})
+
+    plan = processor.plan_concat(list(infos))
+
+    assert (plan['canonical']['width'], plan['canonical']['height']) == (1920, 1080)
+    assert plan['conforming'] == ['c.mp4']
+    assert [path for path, _ in plan['nonconforming']] == ['a.mp4', 'b.mp4']
+
+
+def test_plan_concat_without_probeable_segments(processor, monkeypatch):
+    monkeypatch.setattr(processor, 'get_video_info', lambda path: None)
+
+    plan = processor.plan_concat(['a.mp4'])
+
+    assert plan == {'canonical': None, 'conforming': [], 'nonconforming': [('a.mp4', ['unprobeable'])]}
+
+
+def test_run_ffmpeg_reports_progress_from_output_time(processor, tmp_path):
+    # 用Python脚本代替FFMPEG，按-progress pipe:1的格式输出两组进度（旧版本只有out_time_ms）
+    script = tmp_path / 'fake_ffmpeg'
+    script.write_text(
+        f'#!{sys.executable}\n'
+        'import sys\n'
+        'assert sys.argv[1:4] == ["-progress", "pipe:1", "-nostats"], sys.argv\n'
+        'print("fps=50.0\\nout_time_us=1000000\\nprogress=continue")\n'
+        'print("fps=N/A\\nout_time_ms=4000000\\nprogress=end")\n'
+        'sys.stderr.write("encoder log")\n',
+        encoding='utf-8'
+    )
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    calls = []
+    processor.progress_callback = lambda index, fraction, fps: calls.append((index, fraction, fps))
+
+    result = processor._run_ffmpeg([str(script), '-i', 'input.png'], segment_index=3, duration=2.0)
+
+    assert result.returncode == 0
+    assert result.stderr == 'encoder log'
+    assert calls == [(3, 0.5, 50.0), (3, 1.0, 0.0)]
+
+
+@requires_ffmpeg
+@pytest.mark.parametrize('still_image', [False, True])
+def test_create_video_from_image_matches_frame_count(processor, tmp_path, still_image):
+    image_path = str(tmp_path / 'image.png')
+    subprocess.run(['ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', 'color=c=red:s=96x64',
+                    '-frames:v', '1', '-y', image_path], check=True)
+    processor.output_settings = resolve_output_settings({'width': 64, 'height': 64}, {'preset': 'draft'})
+
+    video_path = processor._create_video_from_image(image_path, str(tmp_path), 1, total_frames=30,
+                                                    video_fps=25, fade_in_frames=5, fade_out_frames=5,
+                                                    still_image=still_image)
+
+    assert video_path and os.path.exists(video_path)
+    info = processor.get_video_info(video_path)
+    assert (info['width'], info['height']) == (64, 64)
+    assert info['duration'] == pytest.approx(30 / 25, abs=0.05)
+
+
+@requires_ffmpeg
+def test_plan_concat_on_rendered_segments(processor, tmp_path):
+    image_path = str(tmp_path / 'image.png')
+    subprocess.run(['ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', 'color=c=blue:s=64x64',
+                    '-frames:v', '1', '-y', image_path], check=True)
+    processor.output_settings = resolve_output_settings(None, {'preset': 'draft'})
+    segments = [processor._create_video_from_image(image_path, str(tmp_path), index, 10, 25)
+                for index in (1, 2)]
+
+    plan = processor.plan_concat(segments)
+
+    assert plan['conforming'] == segments
+    assert plan['canonical']['video_codec'] == 'h264'